@@ -29,7 +29,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["Content-Length", "Content-Type"]
+    expose_headers=["Content-Length", "Content-Type", "X-Phi0-Cache-Hits", "X-Phi0-Cache-Misses"]
 )
 
 # Redis client
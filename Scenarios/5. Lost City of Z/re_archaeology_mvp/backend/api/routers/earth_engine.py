@@ -4,7 +4,7 @@ Earth Engine Router
 FastAPI router for Earth Engine data processing operations.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
@@ -17,6 +17,7 @@ import redis
 from backend.api.database import get_db
 from backend.models.database import DataProcessingTask, GridCell
 from backend.data_processors.earth_engine.pipeline import EarthEnginePipeline
+from backend.workers.tasks import process_region_task, process_cells_task, resume_task as resume_task_job, process_cell_task
 from backend.core.agent_self_model.model import REAgentSelfModel
 from backend.utils.config import settings
 
@@ -41,10 +42,14 @@ class ProcessRegionRequest(BaseModel):
     bounding_box: BoundingBox
     data_sources: Optional[List[str]] = None
     max_cells: Optional[int] = 100
+    prioritize: bool = True  # most promising cells first
+    ee_request_budget: Optional[int] = None  # default: EE_JOB_REQUEST_BUDGET
 
 class ProcessCellsRequest(BaseModel):
     cell_ids: List[str]
     data_sources: Optional[List[str]] = None
+    prioritize: bool = True
+    ee_request_budget: Optional[int] = None
 
 class TaskStatus(BaseModel):
     task_id: int
@@ -61,75 +66,6 @@ def get_agent_model(db: Session = Depends(get_db)):
         logger.error(f"Failed to initialize agent model: {e}")
         return None
 
-# Background task functions
-def process_region_background(
-    request: ProcessRegionRequest,
-    db: Session,
-    task_id: int
-):
-    """Background task to process a region"""
-    try:
-        # Create session for background task
-        pipeline = EarthEnginePipeline(db, get_agent_model(db))
-        
-        # Process region
-        results = pipeline.process_region(
-            bounding_box=[
-                request.bounding_box.min_lon,
-                request.bounding_box.min_lat,
-                request.bounding_box.max_lon,
-                request.bounding_box.max_lat
-            ],
-            data_sources=request.data_sources,
-            max_cells=request.max_cells
-        )
-        
-        # Store results in Redis (for faster access)
-        redis_client.setex(
-            f"earth_engine:task:{task_id}", 
-            86400,  # 24 hour expiration
-            str(results)
-        )
-    except Exception as e:
-        logger.error(f"Background task failed: {e}")
-        # Store error in Redis
-        redis_client.setex(
-            f"earth_engine:task:{task_id}", 
-            86400,
-            str({"error": str(e)})
-        )
-
-def process_cells_background(
-    request: ProcessCellsRequest,
-    db: Session,
-    task_id: int
-):
-    """Background task to process specific cells"""
-    try:
-        # Create session for background task
-        pipeline = EarthEnginePipeline(db, get_agent_model(db))
-        
-        # Process cells
-        results = pipeline.process_cells_batch(
-            cell_ids=request.cell_ids,
-            data_sources=request.data_sources
-        )
-        
-        # Store results in Redis
-        redis_client.setex(
-            f"earth_engine:task:{task_id}", 
-            86400,
-            str(results)
-        )
-    except Exception as e:
-        logger.error(f"Background task failed: {e}")
-        # Store error in Redis
-        redis_client.setex(
-            f"earth_engine:task:{task_id}", 
-            86400,
-            str({"error": str(e)})
-        )
-
 # Endpoints
 @router.get("/earth-engine/status")
 def check_earth_engine_status(db: Session = Depends(get_db)):
@@ -168,11 +104,10 @@ def check_earth_engine_status(db: Session = Depends(get_db)):
 @router.post("/earth-engine/process-region", response_model=TaskStatus)
 def process_region(
     request: ProcessRegionRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
-    Start processing all cells in a region with Earth Engine
+    Queue processing all cells in a region with Earth Engine (run by a worker)
     """
     # Create task record
     task = DataProcessingTask(
@@ -186,20 +121,17 @@ def process_region(
                 request.bounding_box.max_lat
             ],
             "data_sources": request.data_sources,
-            "max_cells": request.max_cells
+            "max_cells": request.max_cells,
+            "prioritize": request.prioritize,
+            "ee_request_budget": request.ee_request_budget
         }
     )
     db.add(task)
     db.commit()
     db.refresh(task)
     
-    # Start background task
-    background_tasks.add_task(
-        process_region_background,
-        request=request,
-        db=db,
-        task_id=task.id
-    )
+    # Enqueue the job for a worker
+    process_region_task.delay(task.id)
     
     return {
         "task_id": task.id,
@@ -210,11 +142,10 @@ def process_region(
 @router.post("/earth-engine/process-cells", response_model=TaskStatus)
 def process_cells(
     request: ProcessCellsRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
-    Start processing specific cells with Earth Engine
+    Queue processing specific cells with Earth Engine (run by a worker)
     """
     # Validate cell IDs
     valid_cells = db.query(GridCell).filter(GridCell.cell_id.in_(request.cell_ids)).all()
@@ -229,20 +160,17 @@ def process_cells(
         status="queued",
         params={
             "cell_ids": valid_ids,
-            "data_sources": request.data_sources
+            "data_sources": request.data_sources,
+            "prioritize": request.prioritize,
+            "ee_request_budget": request.ee_request_budget
         }
     )
     db.add(task)
     db.commit()
     db.refresh(task)
     
-    # Start background task
-    background_tasks.add_task(
-        process_cells_background,
-        request=ProcessCellsRequest(cell_ids=valid_ids, data_sources=request.data_sources),
-        db=db,
-        task_id=task.id
-    )
+    # Enqueue the job for a worker
+    process_cells_task.delay(task.id)
     
     return {
         "task_id": task.id,
@@ -282,7 +210,7 @@ def get_task_status(
                         
                     return {
                         "task_id": task_id,
-                        "status": "completed",
+                        "status": "paused" if "paused" in redis_data else "completed",
                         "results": redis_data
                     }
         except Exception as e:
@@ -302,7 +230,9 @@ def get_task_status(
         response["results"] = task.results
     elif task.status == "failed" and task.error_message:
         response["error"] = task.error_message
-    elif task.status == "running" and task.results:
+    elif task.status in ("running", "paused") and task.results:
+        if task.status == "paused":
+            response["results"] = task.results
         # Calculate approximate progress if available
         if isinstance(task.results, dict):
             if "processed_cells" in task.results and "total_cells" in task.results:
@@ -313,6 +243,77 @@ def get_task_status(
 
     return response
 
+@router.post("/earth-engine/task/{task_id}/resume", response_model=TaskStatus)
+def resume_task(
+    task_id: int,
+    ee_request_budget: Optional[int] = Query(None, description="New Earth Engine request budget of the task"),
+    force: bool = Query(False, description="Resume a task marked running or queued, e.g. after its worker was lost"),
+    db: Session = Depends(get_db)
+):
+    """
+    Resume an interrupted, failed or paused processing task, skipping cells already completed
+    
+    A task that is running or queued already has a job; resuming it would
+    start a second job on the same cells, so it is refused unless forced.
+    """
+    task = db.query(DataProcessingTask).filter(DataProcessingTask.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    if task.task_type not in ("region_processing", "batch_processing"):
+        raise HTTPException(status_code=400, detail=f"Tasks of type {task.task_type} cannot be resumed")
+    if task.status == "completed":
+        raise HTTPException(status_code=409, detail=f"Task {task_id} is already completed")
+    if task.status in ("running", "queued") and not force:
+        raise HTTPException(status_code=409, detail=f"Task {task_id} is already {task.status}")
+    
+    # Drop the stored outcome of the previous run
+    redis_client.delete(f"earth_engine:task:{task_id}")
+    
+    # Enqueue the job for a worker
+    resume_task_job.delay(task.id, ee_request_budget)
+    
+    progress = None
+    if isinstance(task.results, dict) and task.results.get("total_cells"):
+        progress = task.results.get("processed_cells", 0) / task.results["total_cells"]
+    
+    return {
+        "task_id": task.id,
+        "status": "queued",
+        "progress": progress
+    }
+
+@router.post("/earth-engine/process-cell/{cell_id}", response_model=TaskStatus)
+def queue_single_cell(
+    cell_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Queue processing a single cell with all data sources (run by a worker)
+    """
+    cell = db.query(GridCell).filter(GridCell.cell_id == cell_id).first()
+    if not cell:
+        raise HTTPException(status_code=404, detail=f"Cell {cell_id} not found")
+    
+    # Create task record
+    task = DataProcessingTask(
+        task_type="full_cell_processing",
+        status="queued",
+        cell_id=cell_id,
+        params={"sources": ["ndvi", "canopy", "terrain", "water"]}
+    )
+    db.add(task)
+    db.commit()
+    db.refresh(task)
+    
+    # Enqueue the job for a worker
+    process_cell_task.delay(cell_id, task.id)
+    
+    return {
+        "task_id": task.id,
+        "status": "queued",
+        "progress": 0.0
+    }
+
 @router.get("/earth-engine/process-cell/{cell_id}")
 def process_single_cell(
     cell_id: str,
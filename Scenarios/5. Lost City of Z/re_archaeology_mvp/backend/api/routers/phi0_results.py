@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 import numpy as np
@@ -9,6 +9,10 @@ from backend.api.database import get_db
 from backend.models.database import Phi0Result, GridCell, EnvironmentalData
 from backend.core.contradiction_detection.detector import ContradictionDetector
 from backend.core.resonance_calculation.calculator import ResonanceCalculator
+from backend.core.attractor_framework.dirty_regions import DirtyRegionTracker
+from backend.core.resonance_calculation.fingerprint import phi0_fingerprint, scoring_config_version
+from backend.core.scoring_engine.engine import RegionScoringEngine
+from backend.core.scoring_engine.sweep import ParameterSweep, build_feature_cache, parameter_grid
 from geoalchemy2.shape import to_shape
 
 # Configure logging
@@ -41,6 +45,24 @@ class Phi0ResultResponse(Phi0ResultBase):
 class CalculationRequest(BaseModel):
     cell_ids: List[str]
 
+class RegionScoringRequest(BaseModel):
+    min_lon: float
+    min_lat: float
+    max_lon: float
+    max_lat: float
+    n_workers: Optional[int] = None
+    tile_size_degrees: float = 0.1
+    geometric_strategy: Optional[str] = None
+
+class ParameterSweepRequest(BaseModel):
+    min_lon: float
+    min_lat: float
+    max_lon: float
+    max_lat: float
+    grid: Dict[str, List[float]]
+    geometric_strategy: Optional[str] = None
+    histogram_bins: int = 10
+
 # Endpoints
 @router.get("/phi0-results/", response_model=List[Phi0ResultResponse])
 def get_phi0_results(
@@ -226,21 +248,28 @@ def get_phi0_result(cell_id: str, db: Session = Depends(get_db)):
     
     return result
 
-@router.post("/phi0-results/calculate", response_model=List[Phi0ResultResponse])
-def calculate_phi0_results(
-    request: CalculationRequest,
-    db: Session = Depends(get_db)
+def _calculate_cells(
+    db: Session,
+    cell_ids: List[str],
+    contradiction_detector: ContradictionDetector,
+    resonance_calculator: ResonanceCalculator
 ):
     """
-    Calculate phi0 resonance scores for specified grid cells
+    Calculate and store phi0 resonance scores for a list of grid cells
+    
+    Cells whose stored result has the same fingerprint (environmental data,
+    attractor set and scoring configuration) are not recalculated or written.
+    
+    Returns:
+        Tuple of (results, IDs of cells whose calculation failed,
+        {"hits": ..., "misses": ...} fingerprint cache counts)
     """
     results = []
+    failed = []
+    cache_stats = {"hits": 0, "misses": 0}
+    scoring_version = scoring_config_version(contradiction_detector, resonance_calculator)
     
-    # Initialize detectors and calculators
-    contradiction_detector = ContradictionDetector()
-    resonance_calculator = ResonanceCalculator(db)
-    
-    for cell_id in request.cell_ids:
+    for cell_id in cell_ids:
         try:
             # Get grid cell and environmental data
             grid_cell = db.query(GridCell).filter(GridCell.cell_id == cell_id).first()
@@ -250,6 +279,16 @@ def calculate_phi0_results(
                 logger.warning(f"Missing data for cell {cell_id}")
                 continue
             
+            # Reuse the stored result if none of its inputs changed
+            existing_result = db.query(Phi0Result).filter(Phi0Result.cell_id == cell_id).first()
+            fingerprint = phi0_fingerprint(env_data, resonance_calculator.attractor_version, scoring_version)
+            
+            if existing_result and existing_result.fingerprint == fingerprint:
+                cache_stats["hits"] += 1
+                results.append(existing_result)
+                continue
+            cache_stats["misses"] += 1
+            
             # Convert DB data to python dict for processing
             cell_data = {
                 "cell_id": cell_id,
@@ -279,8 +318,6 @@ def calculate_phi0_results(
             )
             
             # Create or update phi0 result in database
-            existing_result = db.query(Phi0Result).filter(Phi0Result.cell_id == cell_id).first()
-            
             if existing_result:
                 # Update existing record
                 existing_result.phi0_score = resonance_results["phi0_score"]
@@ -288,6 +325,7 @@ def calculate_phi0_results(
                 existing_result.site_type_prediction = resonance_results["site_type_prediction"]
                 existing_result.contradiction_patterns = contradiction_results
                 existing_result.calculation_metadata = resonance_results["calculation_metadata"]
+                existing_result.fingerprint = fingerprint
                 db_result = existing_result
             else:
                 # Create new record
@@ -297,7 +335,8 @@ def calculate_phi0_results(
                     confidence_interval=resonance_results["confidence_interval"],
                     site_type_prediction=resonance_results["site_type_prediction"],
                     contradiction_patterns=contradiction_results,
-                    calculation_metadata=resonance_results["calculation_metadata"]
+                    calculation_metadata=resonance_results["calculation_metadata"],
+                    fingerprint=fingerprint
                 )
                 db.add(db_result)
             
@@ -307,10 +346,144 @@ def calculate_phi0_results(
             
         except Exception as e:
             db.rollback()
+            failed.append(cell_id)
             logger.error(f"Error calculating phi0 score for cell {cell_id}: {e}")
     
+    logger.info(f"Phi0 fingerprint cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    
+    return results, failed, cache_stats
+
+@router.post("/phi0-results/calculate", response_model=List[Phi0ResultResponse])
+def calculate_phi0_results(
+    request: CalculationRequest,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """
+    Calculate phi0 resonance scores for specified grid cells
+    
+    Unchanged cells are served from their stored result; the fingerprint cache
+    hit and miss counts are reported in the X-Phi0-Cache-Hits and
+    X-Phi0-Cache-Misses response headers.
+    """
+    # Initialize detectors and calculators
+    contradiction_detector = ContradictionDetector()
+    resonance_calculator = ResonanceCalculator(db)
+    
+    results, _, cache_stats = _calculate_cells(
+        db, request.cell_ids, contradiction_detector, resonance_calculator
+    )
+    response.headers["X-Phi0-Cache-Hits"] = str(cache_stats["hits"])
+    response.headers["X-Phi0-Cache-Misses"] = str(cache_stats["misses"])
+    
     return results
 
+@router.post("/phi0-results/rescore-dirty", response_model=Dict[str, Any])
+def rescore_dirty_cells(
+    db: Session = Depends(get_db),
+    limit: int = Query(1000, ge=1, le=100000)
+):
+    """
+    Rescore the grid cells queued by attractor changes (see DirtyRegionTracker)
+    
+    Enqueues the cells of dirty regions left by failed flushes, then claims up
+    to `limit` cells of the rescore queue. Cells leave the queue only once
+    their new results are committed; cells whose calculation fails are
+    released, and the claims of a crashed request expire (see
+    DirtyRegionTracker.drain).
+    """
+    tracker = DirtyRegionTracker(db)
+    
+    try:
+        tracker.flush()
+    except Exception as e:
+        # The regions stay pending; the cells already queued can still be rescored
+        logger.error(f"Error flushing dirty regions: {e}")
+    
+    try:
+        cell_ids = tracker.drain(limit)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error draining rescore queue: {e}")
+        raise HTTPException(status_code=500, detail=f"Error draining rescore queue: {e}")
+    
+    contradiction_detector = ContradictionDetector()
+    resonance_calculator = ResonanceCalculator(db)
+    
+    results, failed, cache_stats = _calculate_cells(db, cell_ids, contradiction_detector, resonance_calculator)
+    failed_ids = set(failed)
+    tracker.complete([cell_id for cell_id in cell_ids if cell_id not in failed_ids])
+    tracker.release(failed)
+    
+    logger.info(f"Rescored {len(results)} of {len(cell_ids)} dirty cells")
+    
+    return {
+        "drained": len(cell_ids),
+        "rescored": len(results),
+        "failed": failed,
+        "cache_hits": cache_stats["hits"],
+        "cache_misses": cache_stats["misses"],
+        "remaining": tracker.pending_count()
+    }
+
+@router.post("/phi0-results/score-region", response_model=Dict[str, Any])
+def score_region(
+    request: RegionScoringRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Score every grid cell with environmental data in a bounding box in bulk
+    
+    Uses the process-pool RegionScoringEngine instead of the per-cell loop of
+    /phi0-results/calculate.
+    """
+    try:
+        engine = RegionScoringEngine(
+            db,
+            n_workers=request.n_workers,
+            tile_size_degrees=request.tile_size_degrees,
+            geometric_strategy=request.geometric_strategy
+        )
+        return engine.score_region((request.min_lon, request.min_lat, request.max_lon, request.max_lat))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error scoring region: {e}")
+        raise HTTPException(status_code=500, detail=f"Error scoring region: {e}")
+
+@router.post("/phi0-results/sweep", response_model=Dict[str, Any])
+def sweep_parameters(
+    request: ParameterSweepRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    What-if evaluation of scoring parameters over a region
+    
+    Every combination of the values in `grid` (e.g. {"ndvi_canopy_threshold":
+    [0.2, 0.3, 0.4], "collapse_threshold": [3.0, 3.5]}) is scored in one vectorized
+    pass over the region's features. Nothing is written to phi0_results.
+    """
+    try:
+        cache = build_feature_cache(
+            db,
+            (request.min_lon, request.min_lat, request.max_lon, request.max_lat),
+            geometric_strategy=request.geometric_strategy
+        )
+        sweep = ParameterSweep(cache)
+        settings = parameter_grid(request.grid)
+        
+        return {
+            "cell_count": len(cache["cell_ids"]),
+            "setting_count": len(settings),
+            "results": sweep.run(settings, bins=request.histogram_bins)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error running parameter sweep: {e}")
+        raise HTTPException(status_code=500, detail=f"Error running parameter sweep: {e}")
+
 @router.get("/phi0-results/heatmap", response_model=Dict[str, Any])
 def get_phi0_heatmap(
     db: Session = Depends(get_db),
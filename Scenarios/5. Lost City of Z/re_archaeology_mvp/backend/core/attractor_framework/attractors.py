@@ -1,11 +1,17 @@
 import numpy as np
-from typing import Dict, List, Any, Tuple
+import json
+from typing import Dict, List, Any, Tuple, Optional
 from sqlalchemy.orm import Session
 import logging
 from backend.models.database import Psi0Attractor, GridCell
 from shapely import wkb
 from shapely.geometry import Point, shape
 from geoalchemy2.shape import to_shape, from_shape
+from backend.utils.config import settings
+from backend.core.geo.distance import (
+    GeoPointIndex, haversine_km, radius_to_km, km_to_degrees, lon_half_width_degrees
+)
+from backend.core.attractor_framework.dirty_regions import DirtyRegionTracker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,14 +28,34 @@ class AttractorFramework:
     def __init__(self, db_session: Session):
         """Initialize the attractor framework"""
         self.db = db_session
+        self.dirty_regions = DirtyRegionTracker(db_session)
         
+    def flush_dirty_regions(self) -> int:
+        """
+        Enqueue the cells of all pending dirty regions for rescoring
+        
+        Attractor changes are committed together with their dirty regions
+        before the regions are flushed, so a failing flush must not fail the
+        change itself. The error is logged and the regions stay pending in
+        phi0_dirty_regions until the next flush.
+        
+        Returns:
+            Number of newly enqueued cells
+        """
+        try:
+            return self.dirty_regions.flush()
+        except Exception as e:
+            logger.error(f"Keeping dirty regions pending after failed flush: {e}")
+            return 0
+    
     def create_attractor(self, 
                         name: str, 
                         attractor_type: str, 
                         coordinates: Tuple[float, float],
                         strength: float,
                         influence_radius: float,
-                        metadata: Dict[str, Any] = None) -> Psi0Attractor:
+                        metadata: Dict[str, Any] = None,
+                        flush_dirty: bool = True) -> Psi0Attractor:
         """
         Create a new ψ⁰ attractor
         
@@ -38,8 +64,11 @@ class AttractorFramework:
             attractor_type: Type of attractor (hydrological, geological, symbolic, etc.)
             coordinates: (longitude, latitude) of the attractor
             strength: Strength of the attractor (0.0 to 1.0)
-            influence_radius: Radius of influence in degrees
+            influence_radius: Radius of influence in degrees of great-circle arc
             metadata: Additional metadata for the attractor
+            flush_dirty: Enqueue the cells within the influence radius for rescoring
+                         right away; pass False to batch several changes and call
+                         self.flush_dirty_regions() once
             
         Returns:
             Created attractor entity
@@ -59,11 +88,16 @@ class AttractorFramework:
             )
             
             self.db.add(attractor)
+            self.db.flush()
+            self.dirty_regions.mark(coordinates, influence_radius, "attractor_created", attractor.id)
             self.db.commit()
             self.db.refresh(attractor)
             
             logger.info(f"Created attractor: {name} at {coordinates}")
             
+            if flush_dirty:
+                self.flush_dirty_regions()
+            
             return attractor
             
         except Exception as e:
@@ -71,6 +105,104 @@ class AttractorFramework:
             logger.error(f"Error creating attractor: {e}")
             raise
     
+    def update_attractor(self,
+                        attractor_id: int,
+                        coordinates: Optional[Tuple[float, float]] = None,
+                        strength: Optional[float] = None,
+                        influence_radius: Optional[float] = None,
+                        metadata: Optional[Dict[str, Any]] = None,
+                        flush_dirty: bool = True) -> Optional[Psi0Attractor]:
+        """
+        Update an existing ψ⁰ attractor
+        
+        Both the old and the new influence regions are marked dirty, so cells the
+        attractor no longer reaches are rescored as well.
+        
+        Args:
+            attractor_id: ID of the attractor to update
+            coordinates: New (longitude, latitude), if moved
+            strength: New strength (0.0 to 1.0)
+            influence_radius: New radius of influence in degrees of great-circle arc
+            metadata: New metadata for the attractor
+            flush_dirty: Enqueue the affected cells for rescoring right away
+            
+        Returns:
+            Updated attractor entity, or None if it does not exist
+        """
+        try:
+            attractor = self.db.query(Psi0Attractor).filter(Psi0Attractor.id == attractor_id).first()
+            if not attractor:
+                logger.error(f"Attractor {attractor_id} not found")
+                return None
+            
+            old_geom = to_shape(attractor.geom)
+            self.dirty_regions.mark((old_geom.x, old_geom.y), attractor.influence_radius,
+                                    "attractor_updated", attractor_id)
+            
+            if coordinates is not None:
+                attractor.geom = from_shape(Point(coordinates))
+            if strength is not None:
+                attractor.strength = min(max(strength, 0.0), 1.0)
+            if influence_radius is not None:
+                attractor.influence_radius = influence_radius
+            if metadata is not None:
+                attractor.symbolic_metadata = metadata
+            
+            new_coordinates = coordinates if coordinates is not None else (old_geom.x, old_geom.y)
+            self.dirty_regions.mark(new_coordinates, attractor.influence_radius,
+                                    "attractor_updated", attractor_id)
+            self.db.commit()
+            self.db.refresh(attractor)
+            
+            if flush_dirty:
+                self.flush_dirty_regions()
+            
+            logger.info(f"Updated attractor: {attractor.attractor_name}")
+            
+            return attractor
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error updating attractor: {e}")
+            raise
+    
+    def delete_attractor(self, attractor_id: int, flush_dirty: bool = True) -> bool:
+        """
+        Delete a ψ⁰ attractor and mark its influence region dirty
+        
+        Args:
+            attractor_id: ID of the attractor to delete
+            flush_dirty: Enqueue the affected cells for rescoring right away
+            
+        Returns:
+            True if the attractor was deleted, False if it does not exist
+        """
+        try:
+            attractor = self.db.query(Psi0Attractor).filter(Psi0Attractor.id == attractor_id).first()
+            if not attractor:
+                logger.error(f"Attractor {attractor_id} not found")
+                return False
+            
+            geom = to_shape(attractor.geom)
+            coordinates = (geom.x, geom.y)
+            influence_radius = attractor.influence_radius
+            
+            self.db.delete(attractor)
+            self.dirty_regions.mark(coordinates, influence_radius, "attractor_deleted", attractor_id)
+            self.db.commit()
+            
+            if flush_dirty:
+                self.flush_dirty_regions()
+            
+            logger.info(f"Deleted attractor {attractor_id}")
+            
+            return True
+            
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error deleting attractor: {e}")
+            raise
+    
     def get_attractors(self, 
                       attractor_type: str = None, 
                       region_bbox: Tuple[float, float, float, float] = None) -> List[Dict[str, Any]]:
@@ -144,28 +276,25 @@ class AttractorFramework:
             influences = []
             total_influence = 0.0
             
-            for attractor in attractors:
-                attractor_point = Point(attractor["coordinates"])
-                distance = cell_centroid.distance(attractor_point)
+            cell_idx, attractor_idx, distance_km, influence = self._influence_pairs(
+                attractors, [cell_centroid.y], [cell_centroid.x]
+            )
+            
+            for idx, distance, influence_strength in zip(attractor_idx, distance_km, influence):
+                attractor = attractors[idx]
+                influences.append({
+                    "attractor_id": attractor["id"],
+                    "attractor_name": attractor["name"],
+                    "attractor_type": attractor["type"],
+                    "influence_strength": float(influence_strength),
+                    "distance": float(km_to_degrees(distance)),
+                    "distance_km": float(distance)
+                })
                 
-                # Only consider attractors within their influence radius
-                if distance <= attractor["influence_radius"]:
-                    # Calculate decay based on distance (linear decay)
-                    decay_factor = 1.0 - (distance / attractor["influence_radius"])
-                    influence_strength = attractor["strength"] * decay_factor
-                    
-                    influences.append({
-                        "attractor_id": attractor["id"],
-                        "attractor_name": attractor["name"],
-                        "attractor_type": attractor["type"],
-                        "influence_strength": influence_strength,
-                        "distance": distance
-                    })
-                    
-                    total_influence += influence_strength
+                total_influence += influence_strength
             
             # Cap total influence at 1.0
-            total_influence = min(total_influence, 1.0)
+            total_influence = float(min(total_influence, 1.0))
             
             return {
                 "cell_id": cell_id,
@@ -177,16 +306,27 @@ class AttractorFramework:
             logger.error(f"Error calculating cell influences: {e}")
             return {"influences": [], "total_influence": 0.0}
     
-    def generate_influence_field(self, region_bbox: Tuple[float, float, float, float]) -> Dict[str, Any]:
+    def generate_influence_field(self, 
+                                region_bbox: Tuple[float, float, float, float],
+                                mode: str = "cells",
+                                resolution: Optional[float] = None) -> Dict[str, Any]:
         """
         Generate an influence field for all cells in a region
         
         Args:
             region_bbox: (min_lon, min_lat, max_lon, max_lat) to define the region
+            mode: "cells" for per-cell, per-attractor entries of the stored grid cells,
+                  or "raster" for a dense total-influence surface (see generate_influence_raster)
+            resolution: Pixel size in degrees for raster mode
             
         Returns:
             Dictionary with influence field data
         """
+        if mode == "raster":
+            return self.generate_influence_raster(region_bbox, resolution)
+        if mode != "cells":
+            raise ValueError(f"Unknown influence field mode: {mode}")
+        
         try:
             # Get all cells in the region
             min_lon, min_lat, max_lon, max_lat = region_bbox
@@ -197,43 +337,35 @@ class AttractorFramework:
                 GridCell.centroid.ST_Y() <= max_lat
             ).all()
             
-            # Get all attractors in the region (plus buffer)
-            buffer = max(max_lon - min_lon, max_lat - min_lat)
-            region_with_buffer = (min_lon - buffer, min_lat - buffer, max_lon + buffer, max_lat + buffer)
-            attractors = self.get_attractors(region_bbox=region_with_buffer)
+            # Get all attractors; the spatial index only pairs cells with attractors that reach them
+            attractors = self.get_attractors()
+            
+            centroids = [to_shape(cell.centroid) for cell in cells]
+            cell_idx, attractor_idx, distance_km, influence = self._influence_pairs(
+                attractors, [c.y for c in centroids], [c.x for c in centroids]
+            )
             
             # Calculate influence for each cell
             influence_field = {
                 "region": region_bbox,
                 "cell_count": len(cells),
-                "attractor_count": len(attractors),
+                "attractor_count": len(np.unique(attractor_idx)),
                 "field_data": {}
             }
             
-            for cell in cells:
-                cell_centroid = to_shape(cell.centroid)
-                cell_influences = []
-                total_influence = 0.0
-                
-                for attractor in attractors:
-                    attractor_point = Point(attractor["coordinates"])
-                    distance = cell_centroid.distance(attractor_point)
-                    
-                    if distance <= attractor["influence_radius"]:
-                        decay_factor = 1.0 - (distance / attractor["influence_radius"])
-                        influence_strength = attractor["strength"] * decay_factor
-                        
-                        cell_influences.append({
-                            "attractor_id": attractor["id"],
-                            "influence": influence_strength
-                        })
-                        
-                        total_influence += influence_strength
-                
+            totals = np.bincount(cell_idx, weights=influence, minlength=len(cells))
+            cell_influences = [[] for _ in cells]
+            for i, idx, influence_strength in zip(cell_idx, attractor_idx, influence):
+                cell_influences[i].append({
+                    "attractor_id": attractors[idx]["id"],
+                    "influence": float(influence_strength)
+                })
+            
+            for i, cell in enumerate(cells):
                 influence_field["field_data"][cell.cell_id] = {
-                    "coordinates": (cell_centroid.x, cell_centroid.y),
-                    "total_influence": min(total_influence, 1.0),
-                    "attractors": cell_influences
+                    "coordinates": (centroids[i].x, centroids[i].y),
+                    "total_influence": float(min(totals[i], 1.0)),
+                    "attractors": cell_influences[i]
                 }
             
             return influence_field
@@ -242,6 +374,167 @@ class AttractorFramework:
             logger.error(f"Error generating influence field: {e}")
             return {"region": region_bbox, "cell_count": 0, "attractor_count": 0, "field_data": {}}
     
+    def generate_influence_raster(self, 
+                                 region_bbox: Tuple[float, float, float, float],
+                                 resolution: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Generate a dense raster of total attractor influence for a region
+        
+        Each attractor's linear-decay kernel is splatted onto the pixels within
+        its influence radius, so the cost scales with the covered area rather
+        than with cells × attractors.
+        
+        Args:
+            region_bbox: (min_lon, min_lat, max_lon, max_lat) to define the region
+            resolution: Pixel size in degrees (default: DEFAULT_GRID_SIZE_DEGREES)
+            
+        Returns:
+            Dictionary with the float32 influence array (rows × cols, north-up),
+            its GDAL-style geotransform and raster metadata
+        """
+        if resolution is None:
+            resolution = settings.DEFAULT_GRID_SIZE_DEGREES
+        if resolution <= 0:
+            raise ValueError("Raster resolution must be positive")
+        
+        min_lon, min_lat, max_lon, max_lat = region_bbox
+        width = max(int(np.ceil((max_lon - min_lon) / resolution)), 1)
+        height = max(int(np.ceil((max_lat - min_lat) / resolution)), 1)
+        
+        # Pixel centers; rows run north to south
+        lon_centers = min_lon + (np.arange(width) + 0.5) * resolution
+        lat_centers = max_lat - (np.arange(height) + 0.5) * resolution
+        
+        total_influence = np.zeros((height, width), dtype=np.float64)
+        attractors = self.get_attractors()
+        attractor_count = 0
+        
+        for attractor in attractors:
+            radius = attractor["influence_radius"]
+            if not radius or radius <= 0:
+                continue
+            lon, lat = attractor["coordinates"]
+            radius_km = radius_to_km(radius)
+            lon_radius = lon_half_width_degrees(lat, radius)
+            
+            # Pixel window covering the attractor's radius of influence
+            col_start = np.searchsorted(lon_centers, lon - lon_radius, side="left")
+            col_end = np.searchsorted(lon_centers, lon + lon_radius, side="right")
+            row_start = np.searchsorted(-lat_centers, -(lat + radius), side="left")
+            row_end = np.searchsorted(-lat_centers, -(lat - radius), side="right")
+            if col_start >= col_end or row_start >= row_end:
+                continue
+            
+            distance_km = haversine_km(
+                lat_centers[row_start:row_end, None], lon_centers[None, col_start:col_end], lat, lon
+            )
+            
+            # Linear decay within the radius
+            kernel = np.where(
+                distance_km <= radius_km, 
+                (attractor["strength"] or 0.0) * (1.0 - distance_km / radius_km), 
+                0.0
+            )
+            total_influence[row_start:row_end, col_start:col_end] += kernel
+            attractor_count += 1
+        
+        return {
+            "region": region_bbox,
+            "resolution": resolution,
+            "width": width,
+            "height": height,
+            "crs": "EPSG:4326",
+            "geotransform": (min_lon, resolution, 0.0, max_lat, 0.0, -resolution),
+            "attractor_count": attractor_count,
+            # Cap total influence at 1.0
+            "influence": np.minimum(total_influence, 1.0).astype(np.float32)
+        }
+    
+    def save_influence_raster(self, raster: Dict[str, Any], path: str) -> str:
+        """
+        Save an influence raster as .npy (with a JSON sidecar) or as GeoTIFF
+        
+        Args:
+            raster: Result of generate_influence_raster
+            path: Output path ending in .npy, .tif or .tiff
+            
+        Returns:
+            Path of the written raster
+        """
+        influence = raster["influence"]
+        
+        if path.endswith(".npy"):
+            np.save(path, influence)
+            # Keep georeferencing next to the array
+            with open(path[:-len(".npy")] + ".json", "w") as f:
+                json.dump({
+                    "region": list(raster["region"]),
+                    "resolution": raster["resolution"],
+                    "crs": raster["crs"],
+                    "geotransform": list(raster["geotransform"])
+                }, f)
+        elif path.endswith((".tif", ".tiff")):
+            import rasterio
+            from rasterio.transform import Affine
+            
+            with rasterio.open(
+                path, "w",
+                driver="GTiff",
+                height=raster["height"],
+                width=raster["width"],
+                count=1,
+                dtype="float32",
+                crs=raster["crs"],
+                transform=Affine.from_gdal(*raster["geotransform"]),
+                compress="deflate"
+            ) as dst:
+                dst.write(influence, 1)
+        else:
+            raise ValueError(f"Unsupported raster format for {path}; use .npy or .tif")
+        
+        logger.info(f"Saved influence raster ({raster['height']}x{raster['width']}) to {path}")
+        return path
+    
+    def _influence_pairs(self, 
+                         attractors: List[Dict[str, Any]], 
+                         lats: List[float], 
+                         lons: List[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pair cells with the attractors whose influence radius reaches them
+        
+        Influence radii are stored in degrees of great-circle arc and compared
+        against haversine distances.
+        
+        Args:
+            attractors: Attractors as returned by get_attractors
+            lats: Cell centroid latitudes
+            lons: Cell centroid longitudes
+            
+        Returns:
+            Tuple of (cell indices, attractor indices, distances in km, influence strengths)
+        """
+        usable = [i for i, a in enumerate(attractors) if a["influence_radius"] and a["influence_radius"] > 0]
+        empty = np.zeros(0, dtype=np.int64)
+        if not usable or not len(lats):
+            return empty, empty, np.zeros(0), np.zeros(0)
+        
+        usable = np.array(usable)
+        radii_km = radius_to_km([attractors[i]["influence_radius"] for i in usable])
+        strengths = np.array([attractors[i]["strength"] or 0.0 for i in usable], dtype=np.float64)
+        index = GeoPointIndex(
+            [attractors[i]["coordinates"][1] for i in usable],
+            [attractors[i]["coordinates"][0] for i in usable]
+        )
+        
+        cell_idx, point_idx, distance_km = index.query_pairs(lats, lons, radii_km.max(), units="km")
+        within = distance_km <= radii_km[point_idx]
+        cell_idx, point_idx, distance_km = cell_idx[within], point_idx[within], distance_km[within]
+        
+        # Linear decay with distance
+        influence = strengths[point_idx] * (1.0 - (distance_km / radii_km[point_idx]))
+        
+        return cell_idx, usable[point_idx], distance_km, influence
+    
     def create_symbolic_attractors(self, metadata_source: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Create symbolic attractors based on historical, mythological, or archaeological knowledge
@@ -281,7 +574,8 @@ class AttractorFramework:
                             "description": reference.get("description"),
                             "year": reference.get("year"),
                             "symbolism": reference.get("symbolism")
-                        }
+                        },
+                        flush_dirty=False
                     )
                     
                     created_attractors.append({
@@ -313,7 +607,8 @@ class AttractorFramework:
                             "feature_type": feature.get("feature_type"),
                             "description": feature.get("description"),
                             "analysis": feature.get("analysis")
-                        }
+                        },
+                        flush_dirty=False
                     )
                     
                     created_attractors.append({
@@ -323,6 +618,9 @@ class AttractorFramework:
                         "strength": attractor.strength
                     })
             
+            # Enqueue the cells of all new attractors at once; overlapping regions are coalesced
+            self.flush_dirty_regions()
+            
             return created_attractors
             
         except Exception as e:
@@ -0,0 +1,304 @@
+"""
+Dirty Region Tracking
+=====================
+Tracks the parts of the grid whose φ⁰ results are stale after ψ⁰ attractors
+are created, updated or deleted.
+
+Every attractor change marks the circle it influences (its influence_radius
+around its location) as dirty by adding it to phi0_dirty_regions in the
+change's own transaction, so a region is never lost once the change is
+committed. Flushing coalesces the pending circles into groups of overlapping
+circles and copies the affected grid cells of each group into
+phi0_rescore_queue with a single PostGIS query: an index-backed bounding box
+test on grid_cells.centroid selects the candidates and ST_DWithin keeps those
+within the great-circle radius. A failed flush leaves the regions in
+phi0_dirty_regions for the next one.
+
+The queue is drained by the φ⁰ results router, so only those cells are
+rescored instead of the full grid. Draining only claims cells (claimed_at);
+they are removed once their new results are committed, and claims older than
+CLAIM_LEASE_SECONDS are taken again, so a crashed rescore loses no cells.
+"""
+
+import numpy as np
+import logging
+from typing import Dict, List, Any, Tuple, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.core.geo.distance import haversine_km, radius_to_km, km_to_degrees, lon_half_width_degrees
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Slack on the bounding box prefilter so it never drops cells the spherical
+# ST_DWithin test would keep
+BBOX_MARGIN = 1.01
+
+# Seconds after which cells claimed by a drain that never completed are handed out again
+CLAIM_LEASE_SECONDS = 900
+
+def bbox_half_widths(lat: float, radius_km: float) -> Tuple[float, float]:
+    """
+    Latitude and longitude half-widths in degrees of the box around a dirty circle
+    
+    Args:
+        lat: Latitude of the circle center
+        radius_km: Circle radius in kilometers
+    
+    Returns:
+        (dlat, dlon) in degrees
+    """
+    dlat = float(km_to_degrees(radius_km)) * BBOX_MARGIN
+    dlon = float(lon_half_width_degrees(lat, dlat))
+    return dlat, min(dlon, 180.0)
+
+class DirtyRegionTracker:
+    """
+    Records dirty circles from attractor changes and enqueues the grid cells inside them.
+    """
+    
+    def __init__(self, db_session: Session):
+        """Initialize the tracker"""
+        self.db = db_session
+    
+    def mark(self,
+             coordinates: Tuple[float, float],
+             influence_radius: float,
+             reason: str,
+             attractor_id: Optional[int] = None):
+        """
+        Mark the influence circle of an attractor as dirty
+        
+        The region is added to the session's transaction and becomes pending
+        when the caller commits it together with the attractor change.
+        
+        Args:
+            coordinates: (longitude, latitude) of the attractor
+            influence_radius: Radius of influence in degrees of great-circle arc
+            reason: Why the region is dirty (e.g. "attractor_created")
+            attractor_id: ID of the attractor that changed, if known
+        """
+        if influence_radius is None or influence_radius <= 0:
+            logger.warning(f"Ignoring dirty region for attractor {attractor_id} without influence radius")
+            return
+        
+        self.db.execute(text(
+            "INSERT INTO public.phi0_dirty_regions (lon, lat, radius_km, reason, attractor_id) "
+            "VALUES (:lon, :lat, :radius_km, :reason, :attractor_id)"
+        ), {
+            "lon": float(coordinates[0]),
+            "lat": float(coordinates[1]),
+            "radius_km": float(radius_to_km(influence_radius)),
+            "reason": reason,
+            "attractor_id": attractor_id
+        })
+    
+    def pending_regions(self) -> List[Dict[str, Any]]:
+        """
+        Lock and return the committed dirty regions not flushed yet
+        
+        Regions locked by a concurrent flush are skipped.
+        
+        Returns:
+            List of dirty circles with id, lon, lat, radius_km, reason and attractor_id
+        """
+        rows = self.db.execute(text(
+            "SELECT id, lon, lat, radius_km, reason, attractor_id FROM public.phi0_dirty_regions "
+            "ORDER BY id FOR UPDATE SKIP LOCKED"
+        )).fetchall()
+        
+        return [dict(row._mapping) for row in rows]
+    
+    @staticmethod
+    def coalesce(regions: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Group dirty circles so that overlapping circles end up together
+        
+        Circles fully contained in another circle of the same group are dropped,
+        since they cannot add cells to the group.
+        
+        Args:
+            regions: Dirty circles with lon, lat and radius_km
+        
+        Returns:
+            List of groups, each a list of dirty circles
+        """
+        n = len(regions)
+        if n == 0:
+            return []
+        
+        lats = np.array([r["lat"] for r in regions])
+        lons = np.array([r["lon"] for r in regions])
+        radii = np.array([r["radius_km"] for r in regions])
+        distance = haversine_km(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+        
+        # Union-find over overlapping circles
+        parent = list(range(n))
+        
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        overlapping = np.argwhere(np.triu(distance <= radii[:, None] + radii[None, :], k=1))
+        for i, j in overlapping:
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_j] = root_i
+        
+        # Drop circles contained in a larger (or identical, earlier) circle
+        contains = distance + radii[None, :] <= radii[:, None]
+        np.fill_diagonal(contains, False)
+        tie = np.isclose(radii[:, None], radii[None, :]) & np.triu(np.ones((n, n), dtype=bool), k=1)
+        redundant = (contains & ((radii[:, None] > radii[None, :]) | tie)).any(axis=0)
+        
+        groups: Dict[int, List[Dict[str, Any]]] = {}
+        for i in range(n):
+            if not redundant[i]:
+                groups.setdefault(find(i), []).append(regions[i])
+        
+        return list(groups.values())
+    
+    def flush(self) -> int:
+        """
+        Enqueue the grid cells inside all pending dirty regions for rescoring
+        
+        Commits the session. If the flush fails the session is rolled back and
+        the regions stay pending for the next flush.
+        
+        Returns:
+            Number of newly enqueued cells
+        """
+        enqueued = 0
+        
+        try:
+            regions = self.pending_regions()
+            if not regions:
+                self.db.commit()
+                return 0
+            groups = self.coalesce(regions)
+            
+            for group in groups:
+                conditions = []
+                params = {"reason": ",".join(sorted({r["reason"] for r in group}))}
+                
+                for i, region in enumerate(group):
+                    # The bounding box test on the bare column can use grid_cells_centroid_idx;
+                    # the geography cast in ST_DWithin cannot, so it only refines the candidates
+                    conditions.append(
+                        f"(centroid && ST_Expand(ST_SetSRID(ST_MakePoint(:lon_{i}, :lat_{i}), 4326), "
+                        f":dlon_{i}, :dlat_{i}) AND "
+                        f"ST_DWithin(centroid::geography, "
+                        f"ST_SetSRID(ST_MakePoint(:lon_{i}, :lat_{i}), 4326)::geography, :meters_{i}, false))"
+                    )
+                    dlat, dlon = bbox_half_widths(region["lat"], region["radius_km"])
+                    params[f"lon_{i}"] = region["lon"]
+                    params[f"lat_{i}"] = region["lat"]
+                    params[f"dlon_{i}"] = dlon
+                    params[f"dlat_{i}"] = dlat
+                    params[f"meters_{i}"] = region["radius_km"] * 1000.0
+                
+                # Cells claimed by a running drain are released, so they are
+                # rescored again against the changed attractors
+                result = self.db.execute(text(
+                    "INSERT INTO public.phi0_rescore_queue (cell_id, reason) "
+                    "SELECT cell_id, :reason FROM public.grid_cells "
+                    f"WHERE {' OR '.join(conditions)} "
+                    "ON CONFLICT (cell_id) DO UPDATE SET claimed_at = NULL, reason = EXCLUDED.reason "
+                    "WHERE phi0_rescore_queue.claimed_at IS NOT NULL"
+                ), params)
+                enqueued += max(result.rowcount or 0, 0)
+            
+            self.db.execute(text(
+                "DELETE FROM public.phi0_dirty_regions WHERE id = ANY(CAST(:ids AS integer[]))"
+            ), {"ids": [region["id"] for region in regions]})
+            self.db.commit()
+        
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error enqueueing dirty regions: {e}")
+            raise
+        
+        logger.info(f"Coalesced {len(regions)} dirty regions into {len(groups)} groups, "
+                    f"enqueued {enqueued} cells for rescoring")
+        
+        return enqueued
+    
+    def pending_count(self) -> int:
+        """Number of cells waiting in the rescore queue"""
+        return self.db.execute(text("SELECT COUNT(*) FROM public.phi0_rescore_queue")).scalar() or 0
+    
+    def drain(self, limit: int = 1000, lease_seconds: float = CLAIM_LEASE_SECONDS) -> List[str]:
+        """
+        Claim up to limit cells of the rescore queue and return their IDs
+        
+        Unclaimed cells and cells whose claim is older than lease_seconds are
+        taken; rows locked by a concurrent drain are skipped, so several
+        workers can drain the queue at the same time. The caller commits the
+        session to claim the cells, then calls complete() once their new
+        results are committed and release() for cells that failed.
+        
+        Args:
+            limit: Maximum number of cells to take
+            lease_seconds: Age after which an unfinished claim expires
+        
+        Returns:
+            List of cell IDs, oldest first
+        """
+        rows = self.db.execute(text(
+            "UPDATE public.phi0_rescore_queue SET claimed_at = NOW() WHERE cell_id IN ("
+            "SELECT cell_id FROM public.phi0_rescore_queue "
+            "WHERE claimed_at IS NULL OR claimed_at < NOW() - make_interval(secs => :lease_seconds) "
+            "ORDER BY enqueued_at LIMIT :limit FOR UPDATE SKIP LOCKED"
+            ") RETURNING cell_id, enqueued_at"
+        ), {"limit": limit, "lease_seconds": lease_seconds}).fetchall()
+        
+        return [row[0] for row in sorted(rows, key=lambda row: row[1])]
+    
+    def complete(self, cell_ids: List[str]) -> int:
+        """
+        Remove rescored cells from the queue and commit
+        
+        Cells released by a flush since they were claimed stay queued.
+        
+        Args:
+            cell_ids: IDs of claimed cells whose new results are committed
+        
+        Returns:
+            Number of removed cells
+        """
+        if not cell_ids:
+            return 0
+        
+        result = self.db.execute(text(
+            "DELETE FROM public.phi0_rescore_queue "
+            "WHERE cell_id = ANY(CAST(:cell_ids AS varchar[])) AND claimed_at IS NOT NULL"
+        ), {"cell_ids": list(cell_ids)})
+        self.db.commit()
+        
+        return max(result.rowcount or 0, 0)
+    
+    def release(self, cell_ids: List[str], reason: str = "rescore_failed") -> int:
+        """
+        Return claimed cells to the queue and commit, e.g. after their rescoring failed
+        
+        Args:
+            cell_ids: IDs of the claimed cells
+            reason: Why the cells are queued again
+        
+        Returns:
+            Number of released cells
+        """
+        if not cell_ids:
+            return 0
+        
+        result = self.db.execute(text(
+            "UPDATE public.phi0_rescore_queue SET claimed_at = NULL, reason = :reason "
+            "WHERE cell_id = ANY(CAST(:cell_ids AS varchar[]))"
+        ), {"cell_ids": list(cell_ids), "reason": reason})
+        self.db.commit()
+        
+        return max(result.rowcount or 0, 0)
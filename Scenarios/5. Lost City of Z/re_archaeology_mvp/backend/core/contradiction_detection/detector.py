@@ -1,7 +1,12 @@
 import numpy as np
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Optional
 import logging
 from backend.utils.config import settings
+from backend.core.contradiction_detection.geometric import (
+    GEOMETRIC_STRATEGIES, DEFAULT_DETECTION_THRESHOLD,
+    detect_geometric_stack, detect_geometric_parallel, describe_patterns
+)
+from backend.core.contradiction_detection.rules import RuleRegistry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,9 +19,25 @@ class ContradictionDetector:
     that might indicate human modification of the landscape.
     """
     
-    def __init__(self):
-        """Initialize the contradiction detector with configuration parameters"""
+    def __init__(self,
+                 geometric_strategy: Optional[str] = None,
+                 n_workers: Optional[int] = None,
+                 rules: Optional[RuleRegistry] = None):
+        """
+        Initialize the contradiction detector with configuration parameters
+        
+        Args:
+            geometric_strategy: Geometric pattern detector, "edge_density" or
+                                "spectral_hough" (FFT periodicity + Hough lines/circles)
+            n_workers: Worker processes for large spectral_hough batches
+            rules: Contradiction rule registry (default: config/contradiction_rules.json)
+        """
         self.ndvi_canopy_threshold = settings.NDVI_CANOPY_CONTRADICTION_THRESHOLD
+        self.rules = rules or RuleRegistry.from_file(
+            param_overrides={"ndvi_canopy_low_ndvi": self.ndvi_canopy_threshold}
+        )
+        self.geometric_strategy = self._check_strategy(geometric_strategy or settings.GEOMETRIC_DETECTION_STRATEGY)
+        self.n_workers = n_workers or settings.GEOMETRIC_DETECTION_WORKERS or None
     
     def detect_ndvi_canopy_contradiction(self, ndvi: float, canopy_height: float) -> Tuple[bool, float]:
         """
@@ -24,22 +45,25 @@ class ContradictionDetector:
         
         In natural Amazon conditions, high NDVI typically correlates with high canopy.
         A contradiction (high NDVI, low canopy or vice versa) may indicate human intervention.
+        Thresholds come from the "ndvi_canopy" rule.
         """
-        if ndvi > 0.7 and canopy_height < 10.0:  # High vegetation density but low canopy
-            contradiction_strength = min(ndvi, 1.0) * (1.0 - (canopy_height / 10.0))
-            return True, contradiction_strength
-        elif ndvi < 0.3 and canopy_height > 20.0:  # Low vegetation density but high canopy
-            contradiction_strength = (1.0 - min(ndvi, 1.0)) * (canopy_height / 30.0)
-            return True, contradiction_strength
-        return False, 0.0
+        return self._evaluate_rule("ndvi_canopy", ndvi_mean=ndvi, canopy_height_mean=canopy_height)
     
-    def detect_geometric_patterns(self, ndvi_matrix: np.ndarray) -> Tuple[bool, float, List[Dict]]:
+    def detect_geometric_patterns(self,
+                                  ndvi_matrix: np.ndarray,
+                                  strategy: Optional[str] = None) -> Tuple[bool, float, List[Dict]]:
         """
         Detect geometric patterns in NDVI data that might indicate human structures
         
-        This is a simplified implementation. In practice, this would use more sophisticated
-        image processing and pattern recognition techniques.
+        The "edge_density" strategy below is a simplified edge count; the
+        "spectral_hough" strategy runs the FFT / Hough detectors in geometric.py.
         """
+        ndvi_matrix = np.asarray(ndvi_matrix, dtype=np.float64)
+        
+        if self._check_strategy(strategy or self.geometric_strategy) == "spectral_hough":
+            result = detect_geometric_stack(ndvi_matrix)
+            return bool(result["detected"][0]), float(result["strength"][0]), describe_patterns(result, 0)
+        
         # This is a placeholder implementation
         # In a real implementation, this would use techniques like:
         # - Hough transforms to detect lines
@@ -86,33 +110,26 @@ class ContradictionDetector:
         Detect contradictions in water proximity and terrain
         
         Settlement patterns often show specific relationships with water bodies
-        that contradict natural distribution patterns.
+        that contradict natural distribution patterns: ancient settlements are often
+        near water but elevated enough to avoid flooding, on gentle slopes.
+        Thresholds come from the "water_proximity" rule.
         """
-        contradiction = False
-        strength = 0.0
-        
-        # Ancient settlements often near water but elevated enough to avoid flooding
-        if 50 < water_proximity < 500 and elevation > 5.0 and slope < 10.0:
-            # Ideal settlement location: close to water, elevated, not too steep
-            contradiction = True
-            proximity_factor = 1.0 - (water_proximity / 500.0)
-            elevation_factor = min(elevation / 20.0, 1.0)
-            slope_factor = 1.0 - (slope / 10.0)
-            
-            # Calculate overall strength
-            strength = proximity_factor * elevation_factor * slope_factor
-        
-        return contradiction, strength
+        return self._evaluate_rule(
+            "water_proximity",
+            water_proximity=water_proximity, elevation_mean=elevation, slope_mean=slope
+        )
     
     def detect_all_contradictions(self, 
                                  cell_data: Dict[str, Any], 
-                                 regional_context: Dict[str, Any] = None) -> Dict[str, Any]:
+                                 regional_context: Dict[str, Any] = None,
+                                 geometric_strategy: Optional[str] = None) -> Dict[str, Any]:
         """
         Detect all contradiction types in the provided cell data
         
         Args:
             cell_data: Dictionary containing environmental data for the cell
             regional_context: Optional dictionary with wider regional context
+            geometric_strategy: Optional override of the detector's geometric strategy
             
         Returns:
             Dictionary containing detected contradictions and overall ψ⁰ field strength
@@ -131,42 +148,35 @@ class ContradictionDetector:
             logger.warning(f"Missing required fields for contradiction detection in cell {cell_data.get('cell_id')}")
             return results
         
-        # Detect NDVI-Canopy contradiction
-        contradiction, strength = self.detect_ndvi_canopy_contradiction(
-            cell_data["ndvi_mean"], cell_data["canopy_height_mean"]
-        )
-        if contradiction:
-            results["contradictions"].append({
-                "type": "ndvi_canopy",
-                "strength": strength,
-                "description": "Contradiction between vegetation density and canopy height"
-            })
-        
-        # Detect water proximity contradiction
-        contradiction, strength = self.detect_water_proximity_contradiction(
-            cell_data["water_proximity"],
-            cell_data["elevation_mean"],
-            cell_data["slope_mean"]
-        )
-        if contradiction:
-            results["contradictions"].append({
-                "type": "water_proximity",
-                "strength": strength,
-                "description": "Unusual relationship between water proximity and terrain"
-            })
-        
-        # Detect geometric patterns if NDVI matrix is available
-        if "ndvi_matrix" in cell_data:
-            contradiction, strength, patterns = self.detect_geometric_patterns(
-                cell_data["ndvi_matrix"]
-            )
-            if contradiction:
-                for pattern in patterns:
+        # 7-D features may be nested as in EnhancedEarthEngineConnector.extract_all_features
+        features = dict(cell_data)
+        features.update(cell_data.get("features") or {})
+        evaluations = self.rules.evaluate(features)
+        
+        # Report contradictions in rule order
+        for rule in self.rules.rules:
+            if rule.type == "geometric_pattern":
+                # Detect geometric patterns if NDVI matrix is available
+                if cell_data.get("ndvi_matrix") is None:
+                    continue
+                contradiction, strength, patterns = self.detect_geometric_patterns(
+                    cell_data["ndvi_matrix"], geometric_strategy
+                )
+                if contradiction:
+                    for pattern in patterns:
+                        results["contradictions"].append({
+                            "type": "geometric_pattern",
+                            "strength": pattern["strength"],
+                            "pattern_type": pattern["type"],
+                            "description": rule.description
+                        })
+            elif rule.type in evaluations:
+                contradiction, strength = evaluations[rule.type]
+                if contradiction:
                     results["contradictions"].append({
-                        "type": "geometric_pattern",
-                        "strength": pattern["strength"],
-                        "pattern_type": pattern["type"],
-                        "description": "Detected geometric pattern inconsistent with natural formation"
+                        "type": rule.type,
+                        "strength": float(strength),
+                        "description": rule.description
                     })
         
         # Calculate overall contradiction strength
@@ -175,3 +185,165 @@ class ContradictionDetector:
             results["overall_strength"] = max(c["strength"] for c in results["contradictions"])
         
         return results
+    
+    def detect_batch(self,
+                     ndvi_mean: np.ndarray,
+                     canopy_height_mean: np.ndarray,
+                     water_proximity: np.ndarray,
+                     elevation_mean: np.ndarray,
+                     slope_mean: np.ndarray,
+                     ndvi_matrix: Optional[np.ndarray] = None,
+                     geometric_strategy: Optional[str] = None,
+                     features: Optional[Dict[str, np.ndarray]] = None,
+                     params: Optional[Dict[str, Any]] = None,
+                     geometric_result: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> Dict[str, Any]:
+        """
+        Detect all contradiction types for a batch of cells in one pass
+        
+        This is the vectorized counterpart of detect_all_contradictions for region
+        scans: every argument is a column with one entry per cell and the strengths
+        are identical to the scalar path, cell for cell. Missing values (None/NaN)
+        never trigger a contradiction.
+        
+        Args:
+            ndvi_mean: Mean NDVI per cell, shape (N,)
+            canopy_height_mean: Mean canopy height per cell in meters, shape (N,)
+            water_proximity: Distance to water per cell in meters, shape (N,)
+            elevation_mean: Mean elevation per cell in meters, shape (N,)
+            slope_mean: Mean slope per cell in degrees, shape (N,)
+            ndvi_matrix: Optional stacked NDVI cube of shape (N, rows, cols)
+            geometric_strategy: Optional override of the detector's geometric strategy
+            features: Optional additional feature columns for the 7-D rules
+                      (NDBI, Curvature, ElevationAnomaly, FractalNDVI), shape (N,)
+            params: Optional rule parameter overrides; arrays of shape (P, 1)
+                    evaluate P parameter settings at once and give (P, N) results
+            geometric_result: Precomputed detect_geometric_patterns_batch(..., return_counts=True)
+                              output, used instead of ndvi_matrix
+            
+        Returns:
+            Dictionary with per-type strength arrays, per-type detection masks,
+            per-type entry counts (one cell can report several geometric patterns),
+            the number of contradictions per cell and the overall ψ⁰ field strength
+        """
+        columns = dict(features or {})
+        columns.update({
+            "ndvi_mean": self._as_column(ndvi_mean),
+            "canopy_height_mean": self._as_column(canopy_height_mean),
+            "water_proximity": self._as_column(water_proximity),
+            "elevation_mean": self._as_column(elevation_mean),
+            "slope_mean": self._as_column(slope_mean)
+        })
+        ndvi = columns["ndvi_mean"]
+        evaluations = self.rules.evaluate(columns, params)
+        
+        detected = {}
+        strengths = {}
+        entries = {}
+        
+        for rule in self.rules.rules:
+            if rule.type == "geometric_pattern":
+                # Geometric patterns if a stacked NDVI cube is available
+                if geometric_result is not None:
+                    detected[rule.type], strengths[rule.type], entries[rule.type] = geometric_result
+                elif ndvi_matrix is not None:
+                    detected[rule.type], strengths[rule.type], entries[rule.type] = self.detect_geometric_patterns_batch(
+                        ndvi_matrix, geometric_strategy, return_counts=True
+                    )
+                else:
+                    detected[rule.type] = np.zeros(ndvi.shape, dtype=bool)
+                    strengths[rule.type] = np.zeros(ndvi.shape)
+                    entries[rule.type] = np.zeros(ndvi.shape, dtype=np.int64)
+            elif rule.type in evaluations:
+                detected[rule.type], strengths[rule.type] = evaluations[rule.type]
+                entries[rule.type] = detected[rule.type].astype(np.int64)
+        
+        # Overall strength is the max over detected contradictions, as in the scalar path
+        overall_strength = np.zeros(ndvi.shape)
+        contradiction_count = np.zeros(ndvi.shape, dtype=np.int64)
+        for contradiction_type, mask in detected.items():
+            overall_strength = np.where(
+                mask, np.maximum(overall_strength, strengths[contradiction_type]), overall_strength
+            )
+            contradiction_count = contradiction_count + entries[contradiction_type]
+        
+        return {
+            "strengths": strengths,
+            "detected": detected,
+            "entries": entries,
+            "contradiction_count": contradiction_count,
+            "overall_strength": overall_strength
+        }
+    
+    def detect_geometric_patterns_batch(self,
+                                        ndvi_matrix: np.ndarray,
+                                        strategy: Optional[str] = None,
+                                        return_counts: bool = False) -> Tuple[np.ndarray, ...]:
+        """
+        Vectorized detect_geometric_patterns over a stack of matrices
+        
+        Large "spectral_hough" stacks are split across a process pool.
+        
+        Args:
+            ndvi_matrix: Stacked NDVI cube of shape (N, rows, cols)
+            strategy: Optional override of the detector's geometric strategy
+            return_counts: Also return the number of patterns reported per matrix
+            
+        Returns:
+            Tuple of (detected mask, strength array[, pattern counts]), each of shape (N,)
+        """
+        detected, strength, pattern_count = self._geometric_batch(ndvi_matrix, strategy)
+        return (detected, strength, pattern_count) if return_counts else (detected, strength)
+    
+    def _geometric_batch(self,
+                         ndvi_matrix: np.ndarray,
+                         strategy: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Geometric detection with the number of patterns reported per matrix"""
+        cube = np.asarray(ndvi_matrix, dtype=np.float64)
+        if cube.ndim != 3:
+            raise ValueError(f"Expected an (N, rows, cols) NDVI cube, got shape {cube.shape}")
+        
+        if self._check_strategy(strategy or self.geometric_strategy) == "spectral_hough":
+            result = detect_geometric_parallel(cube, n_workers=self.n_workers)
+            pattern_count = np.zeros(len(cube), dtype=np.int64)
+            if "period" in result:
+                for cue in ("periodicity", "line", "circle"):
+                    pattern_count += result[cue] > DEFAULT_DETECTION_THRESHOLD
+            return result["detected"], result["strength"], pattern_count
+        
+        n_cells, rows, cols = cube.shape
+        if rows < 3 or cols < 3:
+            return np.zeros(n_cells, dtype=bool), np.zeros(n_cells), np.zeros(n_cells, dtype=np.int64)
+        
+        with np.errstate(invalid="ignore"):
+            h_edges = np.sum(np.abs(np.diff(cube, axis=1)) > 0.2, axis=(1, 2))
+            v_edges = np.sum(np.abs(np.diff(cube, axis=2)) > 0.2, axis=(1, 2))
+        
+        edge_density = (h_edges + v_edges) / (rows * cols)
+        detected = edge_density > 0.3
+        strength = np.where(detected, np.minimum(edge_density, 1.0), 0.0)
+        
+        return detected, strength, detected.astype(np.int64)
+    
+    def _evaluate_rule(self, contradiction_type: str, **features) -> Tuple[bool, float]:
+        """Evaluate a single expression rule for one cell"""
+        rule = next((r for r in self.rules.rules if r.type == contradiction_type and not r.builtin), None)
+        if rule is None:
+            return False, 0.0
+        
+        env = dict(self.rules.params)
+        env.update({name: np.nan if value is None else float(value) for name, value in features.items()})
+        contradiction, strength = rule.evaluate(env)
+        
+        return bool(contradiction), float(strength) if contradiction else 0.0
+    
+    @staticmethod
+    def _check_strategy(strategy: str) -> str:
+        """Validate a geometric strategy name"""
+        if strategy not in GEOMETRIC_STRATEGIES:
+            raise ValueError(f"Unknown geometric strategy: {strategy} (expected one of {GEOMETRIC_STRATEGIES})")
+        return strategy
+    
+    @staticmethod
+    def _as_column(values: Any) -> np.ndarray:
+        """Convert a feature column to a float array, mapping None to NaN"""
+        return np.asarray(values, dtype=np.float64).reshape(-1)
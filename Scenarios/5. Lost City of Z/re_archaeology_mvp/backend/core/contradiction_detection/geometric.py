@@ -0,0 +1,379 @@
+"""
+Geometric Pattern Detection
+===========================
+Batched detectors for earthworks and geoglyph-like structures in NDVI matrices.
+
+Every function works on a stack of matrices of shape (N, rows, cols) so whole
+tiles are scored with a handful of NumPy calls instead of one Python call per
+cell. Three cues are combined:
+
+- Periodicity: peak share of the 2-D FFT power spectrum (regular fields, grids)
+- Lines: straight-line Hough transform over the edge map (ditches, causeways)
+- Circles: gradient-directed circle Hough transform (ring ditches, plazas)
+
+Large stacks can be split across a process pool with detect_geometric_parallel.
+"""
+
+import os
+import warnings
+import numpy as np
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Names accepted by ContradictionDetector(geometric_strategy=...)
+GEOMETRIC_STRATEGIES = ("edge_density", "spectral_hough")
+
+# Default detection parameters
+DEFAULT_EDGE_THRESHOLD = 0.15  # Minimum NDVI gradient magnitude of an edge pixel (half the step of a sharp edge)
+DEFAULT_DETECTION_THRESHOLD = 0.5
+DEFAULT_N_THETA = 90
+DEFAULT_MIN_RADIUS = 2
+DEFAULT_MIN_AMPLITUDE = 0.01
+DEFAULT_MIN_FREQUENCY_BINS = 2.0  # Frequencies closer to DC are trends, not periodicity
+DEFAULT_MIN_PERIOD = 2.0          # Pixels
+DEFAULT_CIRCLE_SECTORS = 8        # Directions a circle's edges must be found in
+
+def prepare_stack(ndvi_matrix: Any) -> np.ndarray:
+    """
+    Convert NDVI matrices to a float64 (N, rows, cols) stack with NaNs filled
+    
+    A single 2-D matrix is promoted to a stack of one. Missing values are
+    replaced by the mean of their matrix (0 for all-missing matrices).
+    """
+    cube = np.asarray(ndvi_matrix, dtype=np.float64)
+    if cube.ndim == 2:
+        cube = cube[None]
+    if cube.ndim != 3:
+        raise ValueError(f"Expected an (N, rows, cols) NDVI cube, got shape {cube.shape}")
+    
+    missing = np.isnan(cube)
+    if missing.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            fill = np.nan_to_num(np.nanmean(cube, axis=(1, 2)))
+        cube = np.where(missing, fill[:, None, None], cube)
+    
+    return cube
+
+def fft_periodicity(cube: np.ndarray,
+                    min_amplitude: float = DEFAULT_MIN_AMPLITUDE,
+                    min_frequency_bins: float = DEFAULT_MIN_FREQUENCY_BINS,
+                    min_period: float = DEFAULT_MIN_PERIOD) -> Dict[str, np.ndarray]:
+    """
+    Frequency-domain periodicity of each matrix
+    
+    The matrix is demeaned and Hann-windowed; the share of the non-DC power
+    carried by the strongest frequency is rescaled so that white noise scores
+    about 0 and a pure sinusoid scores 1. Only frequencies at least
+    min_frequency_bins from DC with a period of at least min_period pixels
+    can be the peak: the power of smooth fields (trends, single blobs) sits
+    in the lowest bins and the window leaks it into their neighbours, so
+    without the mask every smooth field would look periodic.
+    
+    Args:
+        cube: NDVI stack of shape (N, rows, cols)
+        min_amplitude: Minimum NDVI standard deviation for a matrix to be analysed
+        min_frequency_bins: Radius of the masked low-frequency disc, in frequency bins
+        min_period: Shortest period in pixels
+    
+    Returns:
+        Dictionary with "strength", "period" (pixels) and "orientation" (degrees) per matrix
+    """
+    n, rows, cols = cube.shape
+    window = np.outer(np.hanning(rows), np.hanning(cols)) if rows > 2 and cols > 2 else np.ones((rows, cols))
+    
+    centered = cube - cube.mean(axis=(1, 2), keepdims=True)
+    power = np.abs(np.fft.fft2(centered * window, axes=(1, 2))) ** 2
+    power[:, 0, 0] = 0.0
+    total = power.sum(axis=(1, 2))
+    
+    fy = np.fft.fftfreq(rows)[:, None]
+    fx = np.fft.fftfreq(cols)[None, :]
+    frequency = np.hypot(fx, fy)
+    candidate = (np.hypot(fy * rows, fx * cols) >= min_frequency_bins) & (frequency <= 1.0 / min_period)
+    
+    # Peak energy is summed over the 3x3 neighbourhood to absorb window leakage and
+    # doubled for the mirrored peak of the real-valued input; the low frequencies
+    # are masked first so their leakage cannot make up a peak
+    masked = np.where(candidate, power, 0.0)
+    neighbourhood = sum(np.roll(masked, (dy, dx), axis=(1, 2)) for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+    flat = np.where(candidate, neighbourhood, -1.0).reshape(n, -1)
+    peak_idx = flat.argmax(axis=1)
+    peak = 2.0 * np.maximum(flat[np.arange(n), peak_idx], 0.0)
+    
+    # Matrices without meaningful variation (e.g. constant NDVI) have no periodicity
+    baseline = min(36.0 / max(rows * cols - 1, 1), 0.99)
+    varying = centered.std(axis=(1, 2)) > min_amplitude
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = np.where(varying & (total > 0), np.minimum(peak / total, 1.0), 0.0)
+    strength = np.clip((share - baseline) / (1.0 - baseline), 0.0, 1.0)
+    
+    peak_fy = np.broadcast_to(fy, (rows, cols)).ravel()[peak_idx]
+    peak_fx = np.broadcast_to(fx, (rows, cols)).ravel()[peak_idx]
+    peak_frequency = frequency.ravel()[peak_idx]
+    with np.errstate(divide="ignore"):
+        period = np.where((strength > 0) & (peak_frequency > 0), 1.0 / peak_frequency, 0.0)
+    orientation = np.degrees(np.arctan2(peak_fy, peak_fx)) % 180.0
+    
+    return {"strength": strength, "period": period, "orientation": orientation}
+
+def edge_map(cube: np.ndarray, edge_threshold: float = DEFAULT_EDGE_THRESHOLD):
+    """
+    Gradient edge map of each matrix
+    
+    Returns:
+        Tuple of (edge mask, gradient along rows, gradient along columns)
+    """
+    gy, gx = np.gradient(cube, axis=(1, 2))
+    return np.hypot(gx, gy) > edge_threshold, gy, gx
+
+def hough_lines(edges: np.ndarray,
+                gy: np.ndarray,
+                gx: np.ndarray,
+                n_theta: int = DEFAULT_N_THETA,
+                angle_tolerance: int = 2) -> Dict[str, np.ndarray]:
+    """
+    Straight-line Hough transform of each edge map
+    
+    Each edge pixel only votes for lines whose normal is within angle_tolerance
+    bins of its gradient direction, so scattered noise edges rarely line up.
+    All edge pixels of the stack vote at once; the accumulator is filled with a
+    single np.bincount over (matrix, angle, distance) bins.
+    
+    Args:
+        edges: Boolean edge stack of shape (N, rows, cols)
+        gy, gx: NDVI gradients along rows and columns
+        n_theta: Number of line angles in [0, 180)
+        angle_tolerance: Angle bins on either side of the gradient direction
+    
+    Returns:
+        Dictionary with "strength" (votes of the best line over the longest
+        possible line), "votes" and "orientation" (degrees) per matrix
+    """
+    n, rows, cols = edges.shape
+    thetas = np.linspace(0.0, np.pi, n_theta, endpoint=False)
+    diag = int(np.ceil(np.hypot(rows, cols)))
+    n_rho = 2 * diag + 1
+    
+    votes = np.zeros((n, n_theta * n_rho), dtype=np.int64)
+    m, y, x = np.nonzero(edges)
+    if len(m):
+        gradient_angle = np.arctan2(gy[m, y, x], gx[m, y, x]) % np.pi
+        center_bin = np.rint(gradient_angle / np.pi * n_theta).astype(np.int64)
+        theta_idx = (center_bin[:, None] + np.arange(-angle_tolerance, angle_tolerance + 1)) % n_theta
+        
+        rho = np.rint(x[:, None] * np.cos(thetas[theta_idx]) + y[:, None] * np.sin(thetas[theta_idx]))
+        flat = (m[:, None] * n_theta + theta_idx) * n_rho + rho.astype(np.int64) + diag
+        votes = np.bincount(flat.ravel(), minlength=n * n_theta * n_rho).reshape(n, -1)
+    
+    best = votes.argmax(axis=1)
+    best_votes = votes[np.arange(n), best]
+    
+    return {
+        "strength": np.minimum(best_votes / max(rows, cols), 1.0),
+        "votes": best_votes,
+        "orientation": np.degrees(thetas[best // n_rho])
+    }
+
+def hough_circles(edges: np.ndarray,
+                  gy: np.ndarray,
+                  gx: np.ndarray,
+                  min_radius: int = DEFAULT_MIN_RADIUS,
+                  max_radius: Optional[int] = None,
+                  n_sectors: int = DEFAULT_CIRCLE_SECTORS) -> Dict[str, np.ndarray]:
+    """
+    Gradient-directed circle Hough transform of each edge map
+    
+    Each edge pixel votes for the two centres along its gradient direction at
+    every candidate radius, which keeps the cost linear in the number of edges.
+    Votes of a rasterized circle scatter over neighbouring centres, so each
+    candidate collects the votes of its 3x3 centre neighbourhood. A circle
+    must be supported all around: the strength is the share of the n_sectors
+    directions around the centre that edges were found in, times the share of
+    the circumference covered by votes. Straight edges only support one or
+    two directions.
+    
+    Args:
+        edges: Boolean edge stack of shape (N, rows, cols)
+        gy, gx: NDVI gradients along rows and columns
+        min_radius: Smallest circle radius in pixels
+        max_radius: Largest circle radius in pixels (default: half the shorter side)
+        n_sectors: Number of directions around the centre (at most 8)
+    
+    Returns:
+        Dictionary with "strength", "radius" and "center" (row, col) per matrix
+    """
+    n, rows, cols = edges.shape
+    max_radius = max_radius or min(rows, cols) // 2
+    radii = np.arange(min_radius, max_radius + 1)
+    
+    empty = {
+        "strength": np.zeros(n),
+        "radius": np.zeros(n, dtype=np.int64),
+        "center": np.zeros((n, 2), dtype=np.int64)
+    }
+    m, y, x = np.nonzero(edges)
+    if not len(radii) or not len(m):
+        return empty
+    
+    magnitude = np.hypot(gx[m, y, x], gy[m, y, x])
+    uy = gy[m, y, x] / magnitude
+    ux = gx[m, y, x] / magnitude
+    
+    size = n * len(radii) * rows * cols
+    votes = np.zeros(size, dtype=np.int64)
+    sectors = np.zeros(size, dtype=np.uint8)  # Bit mask of the directions votes came from
+    for sign in (1.0, -1.0):
+        cy = np.rint(y[:, None] + sign * uy[:, None] * radii).astype(np.int64)
+        cx = np.rint(x[:, None] + sign * ux[:, None] * radii).astype(np.int64)
+        inside = (cy >= 0) & (cy < rows) & (cx >= 0) & (cx < cols)
+        r_idx = np.broadcast_to(np.arange(len(radii)), cy.shape)
+        mm = np.broadcast_to(m[:, None], cy.shape)
+        flat = ((mm * len(radii) + r_idx) * rows + cy) * cols + cx
+        votes += np.bincount(flat[inside], minlength=size)
+        
+        # Direction from the centre to the edge pixel
+        angle = np.arctan2(-sign * uy, -sign * ux) % (2.0 * np.pi)
+        bit = (1 << (np.floor(angle / (2.0 * np.pi) * n_sectors).astype(np.int64) % n_sectors)).astype(np.uint8)
+        np.bitwise_or.at(sectors, flat[inside], np.broadcast_to(bit[:, None], cy.shape)[inside])
+    
+    # Collect the votes and directions of each centre's 3x3 neighbourhood
+    shape = (n, len(radii), rows, cols)
+    padded_votes = np.pad(votes.reshape(shape), ((0, 0), (0, 0), (1, 1), (1, 1)))
+    padded_sectors = np.pad(sectors.reshape(shape), ((0, 0), (0, 0), (1, 1), (1, 1)))
+    votes = np.zeros(shape, dtype=np.int64)
+    sectors = np.zeros(shape, dtype=np.uint8)
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            votes += padded_votes[:, :, dy:dy + rows, dx:dx + cols]
+            sectors |= padded_sectors[:, :, dy:dy + rows, dx:dx + cols]
+    
+    coverage = np.unpackbits(sectors[..., None], axis=-1).sum(axis=-1) / n_sectors
+    completeness = np.minimum(votes / (2.0 * np.pi * radii[None, :, None, None]), 1.0)
+    score = (coverage * completeness).reshape(n, -1)
+    best = score.argmax(axis=1)
+    
+    return {
+        "strength": score[np.arange(n), best],
+        "radius": radii[best // (rows * cols)],
+        "center": np.column_stack(np.divmod(best % (rows * cols), cols))
+    }
+
+def detect_geometric_stack(ndvi_matrix: Any,
+                           edge_threshold: float = DEFAULT_EDGE_THRESHOLD,
+                           detection_threshold: float = DEFAULT_DETECTION_THRESHOLD) -> Dict[str, np.ndarray]:
+    """
+    FFT / Hough geometric pattern detection over a stack of NDVI matrices
+    
+    Args:
+        ndvi_matrix: NDVI stack of shape (N, rows, cols) or a single matrix
+        edge_threshold: Minimum gradient magnitude of an edge pixel
+        detection_threshold: Minimum combined strength to report a pattern
+    
+    Returns:
+        Dictionary of per-matrix arrays: "detected", "strength" (max of the three
+        cues), "periodicity", "line", "circle" and the cue parameters
+    """
+    cube = prepare_stack(ndvi_matrix)
+    n, rows, cols = cube.shape
+    if rows < 3 or cols < 3:
+        zeros = np.zeros(n)
+        return {"detected": np.zeros(n, dtype=bool), "strength": zeros,
+                "periodicity": zeros, "line": zeros, "circle": zeros}
+    
+    periodicity = fft_periodicity(cube)
+    edges, gy, gx = edge_map(cube, edge_threshold)
+    lines = hough_lines(edges, gy, gx)
+    circles = hough_circles(edges, gy, gx)
+    
+    strength = np.maximum.reduce([periodicity["strength"], lines["strength"], circles["strength"]])
+    
+    return {
+        "detected": strength > detection_threshold,
+        "strength": np.where(strength > detection_threshold, strength, 0.0),
+        "periodicity": periodicity["strength"],
+        "period": periodicity["period"],
+        "period_orientation": periodicity["orientation"],
+        "line": lines["strength"],
+        "line_orientation": lines["orientation"],
+        "circle": circles["strength"],
+        "circle_radius": circles["radius"],
+        "circle_center": circles["center"]
+    }
+
+def detect_geometric_parallel(ndvi_matrix: Any,
+                              n_workers: Optional[int] = None,
+                              chunk_size: int = 2048,
+                              **kwargs) -> Dict[str, np.ndarray]:
+    """
+    Run detect_geometric_stack over chunks of a large stack in a process pool
+    
+    Stacks that fit in a single chunk (or n_workers == 1) run in-process.
+    
+    Args:
+        ndvi_matrix: NDVI stack of shape (N, rows, cols)
+        n_workers: Number of worker processes (default: CPU count)
+        chunk_size: Matrices per task
+        **kwargs: Passed on to detect_geometric_stack
+    
+    Returns:
+        Same dictionary as detect_geometric_stack, concatenated over chunks
+    """
+    cube = prepare_stack(ndvi_matrix)
+    n_workers = n_workers or os.cpu_count() or 1
+    
+    if n_workers == 1 or len(cube) <= chunk_size:
+        return detect_geometric_stack(cube, **kwargs)
+    
+    chunks = [cube[start:start + chunk_size] for start in range(0, len(cube), chunk_size)]
+    logger.info(f"Detecting geometric patterns in {len(cube)} matrices with {n_workers} workers")
+    
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        parts = list(executor.map(_detect_chunk, chunks, [kwargs] * len(chunks)))
+    
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+def describe_patterns(result: Dict[str, np.ndarray],
+                      index: int,
+                      detection_threshold: float = DEFAULT_DETECTION_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Pattern entries for one matrix of a detect_geometric_stack result
+    
+    Returns:
+        List of patterns in the format of ContradictionDetector.detect_geometric_patterns
+    """
+    patterns = []
+    if "period" not in result:
+        return patterns
+    
+    if result["periodicity"][index] > detection_threshold:
+        patterns.append({
+            "type": "periodic_grid",
+            "strength": float(result["periodicity"][index]),
+            "period": float(result["period"][index]),
+            "orientation": float(result["period_orientation"][index])
+        })
+    if result["line"][index] > detection_threshold:
+        patterns.append({
+            "type": "linear_feature",
+            "strength": float(result["line"][index]),
+            "orientation": float(result["line_orientation"][index])
+        })
+    if result["circle"][index] > detection_threshold:
+        patterns.append({
+            "type": "circular_feature",
+            "strength": float(result["circle"][index]),
+            "radius": int(result["circle_radius"][index]),
+            "center": [int(v) for v in result["circle_center"][index]]
+        })
+    
+    return patterns
+
+def _detect_chunk(cube: np.ndarray, kwargs: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Process pool entry point (must be a module-level function to be picklable)"""
+    return detect_geometric_stack(cube, **kwargs)
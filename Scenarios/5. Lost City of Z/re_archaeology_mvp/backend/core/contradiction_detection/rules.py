@@ -0,0 +1,312 @@
+"""
+Contradiction Rule Registry
+===========================
+Declarative contradiction rules loaded from config/contradiction_rules.json.
+
+Each rule lists cases evaluated in order (like an if/elif chain): the first case
+whose "when" predicate holds sets the rule's strength from its "strength"
+formula. Predicates and formulas are small Python expressions over feature
+columns (e.g. ndvi_mean, NDBI) and named parameters. They are parsed once,
+checked against a whitelist of operators and NumPy functions, and compiled
+into closures that evaluate whole columns at a time, so adding a rule adds no
+per-cell Python work.
+
+Parameters may be arrays that broadcast against the feature columns; passing a
+(P, 1) parameter evaluates P parameter settings over N cells in one call and
+yields (P, N) results.
+"""
+
+import os
+import ast
+import json
+import operator
+import numpy as np
+import logging
+from typing import Dict, List, Any, Tuple, Optional, Callable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(__file__), "config", "contradiction_rules.json")
+
+Expression = Callable[[Dict[str, Any]], Any]
+
+# Functions that rule expressions may call
+ALLOWED_FUNCTIONS = {
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+    "abs": np.abs,
+    "clip": np.clip,
+    "sqrt": np.sqrt,
+    "log": np.log,
+    "exp": np.exp,
+    "where": np.where
+}
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow
+}
+
+_COMPARE_OPERATORS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne
+}
+
+def compile_expression(source: str) -> Tuple[Expression, List[str]]:
+    """
+    Compile a rule expression into a vectorized closure
+    
+    "and"/"or"/"not" become element-wise &, |, ~ and chained comparisons such as
+    "50 < water_proximity < 500" are expanded, so expressions read like the
+    scalar Python they replace.
+    
+    Args:
+        source: Expression source, e.g. "ndvi_mean > ndvi_high and canopy_height_mean < 10"
+    
+    Returns:
+        Tuple of (function of a name -> value mapping, names referenced by the expression)
+    """
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid rule expression '{source}': {e}")
+    
+    names = []
+    
+    def build(node: ast.AST) -> Expression:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            value = float(node.value)
+            return lambda env: value
+        
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name.startswith("__"):
+                raise ValueError(f"Name '{name}' is not allowed in rule expression '{source}'")
+            if name not in names:
+                names.append(name)
+            return lambda env: env[name]
+        
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            op = _BINARY_OPERATORS[type(node.op)]
+            left, right = build(node.left), build(node.right)
+            return lambda env: op(left(env), right(env))
+        
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            operand = build(node.operand)
+            return lambda env: -operand(env)
+        
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operand = build(node.operand)
+            return lambda env: np.logical_not(operand(env))
+        
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            values = [build(v) for v in node.values]
+            return lambda env: combine.reduce(np.broadcast_arrays(*(v(env) for v in values)))
+        
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPERATORS for op in node.ops):
+            operands = [build(node.left)] + [build(c) for c in node.comparators]
+            ops = [_COMPARE_OPERATORS[type(op)] for op in node.ops]
+            
+            def compare(env):
+                values = [operand(env) for operand in operands]
+                result = ops[0](values[0], values[1])
+                for i in range(1, len(ops)):
+                    result = np.logical_and(result, ops[i](values[i], values[i + 1]))
+                return result
+            
+            return compare
+        
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in ALLOWED_FUNCTIONS and not node.keywords):
+            func = ALLOWED_FUNCTIONS[node.func.id]
+            args = [build(a) for a in node.args]
+            return lambda env: func(*(a(env) for a in args))
+        
+        raise ValueError(f"Unsupported construct '{ast.dump(node)}' in rule expression '{source}'")
+    
+    return build(tree.body), names
+
+class ContradictionRule:
+    """
+    A compiled contradiction rule: ordered (predicate, strength) cases plus a score modifier.
+    """
+    
+    def __init__(self,
+                 contradiction_type: str,
+                 cases: List[Dict[str, str]],
+                 description: str = "",
+                 modifier: float = 0.0,
+                 builtin: bool = False):
+        """
+        Compile a rule
+        
+        Args:
+            contradiction_type: Type reported in contradiction results
+            cases: List of {"when": predicate, "strength": formula}, first match wins
+            description: Description reported in contradiction results
+            modifier: φ⁰ score modifier added per detected contradiction of this type
+            builtin: True for rules computed in code (e.g. geometric_pattern), which
+                     only contribute their description and modifier
+        """
+        self.type = contradiction_type
+        self.description = description
+        self.modifier = float(modifier)
+        self.builtin = builtin
+        self.source_cases = [dict(case) for case in cases]
+        self.cases = []
+        self.names: List[str] = []
+        
+        for case in cases:
+            when, when_names = compile_expression(case["when"])
+            strength, strength_names = compile_expression(case["strength"])
+            self.cases.append((when, strength))
+            for name in when_names + strength_names:
+                if name not in self.names:
+                    self.names.append(name)
+    
+    def evaluate(self, env: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evaluate the rule over feature columns
+        
+        Args:
+            env: Feature columns and parameters by name
+        
+        Returns:
+            Tuple of (detected mask, strength), broadcast over features and parameters
+        """
+        conditions = []
+        strengths = []
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for when, strength in self.cases:
+                conditions.append(when(env))
+                strengths.append(strength(env))
+        
+        arrays = np.broadcast_arrays(*conditions, *strengths)
+        conditions = [np.asarray(c, dtype=bool) for c in arrays[:len(conditions)]]
+        detected = np.logical_or.reduce(conditions)
+        strength = np.select(conditions, arrays[len(conditions):], 0.0)
+        
+        return detected, strength
+
+class RuleRegistry:
+    """
+    Ordered set of contradiction rules with their default parameters.
+    """
+    
+    def __init__(self, rules: List[ContradictionRule], params: Dict[str, Any]):
+        """
+        Args:
+            rules: Compiled rules in reporting order
+            params: Default parameter values by name
+        """
+        self.rules = rules
+        self.params = dict(params)
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], param_overrides: Optional[Dict[str, Any]] = None) -> "RuleRegistry":
+        """
+        Build the registry from a parsed rules configuration
+        
+        Args:
+            config: {"params": {...}, "rules": [...]} as in contradiction_rules.json
+            param_overrides: Parameter values replacing the configured defaults
+        """
+        params = dict(config.get("params", {}))
+        params.update(param_overrides or {})
+        
+        rules = []
+        for entry in config.get("rules", []):
+            if not entry.get("enabled", True):
+                continue
+            rules.append(ContradictionRule(
+                contradiction_type=entry["type"],
+                cases=entry.get("cases", []),
+                description=entry.get("description", ""),
+                modifier=entry.get("modifier", 0.0),
+                builtin=entry.get("builtin", False)
+            ))
+        
+        return cls(rules, params)
+    
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_RULES_FILE, param_overrides: Optional[Dict[str, Any]] = None) -> "RuleRegistry":
+        """Load and compile the rules from a JSON file"""
+        with open(path, 'r') as f:
+            config = json.load(f)
+        registry = cls.from_config(config, param_overrides)
+        logger.info(f"Loaded {len(registry.rules)} contradiction rules from {path}")
+        return registry
+    
+    def describe(self) -> Dict[str, Any]:
+        """Plain description of the parameters and rules, e.g. for hashing the scoring configuration"""
+        return {
+            "params": {name: np.asarray(value).tolist() for name, value in sorted(self.params.items())},
+            "rules": [
+                {
+                    "type": rule.type,
+                    "cases": rule.source_cases,
+                    "modifier": rule.modifier,
+                    "builtin": rule.builtin
+                }
+                for rule in self.rules
+            ]
+        }
+    
+    @property
+    def modifiers(self) -> Dict[str, float]:
+        """φ⁰ score modifier per contradiction type"""
+        return {rule.type: rule.modifier for rule in self.rules}
+    
+    @property
+    def descriptions(self) -> Dict[str, str]:
+        """Description per contradiction type"""
+        return {rule.type: rule.description for rule in self.rules}
+    
+    @property
+    def feature_names(self) -> List[str]:
+        """Feature columns referenced by the expression rules"""
+        names = []
+        for rule in self.rules:
+            names.extend(n for n in rule.names if n not in self.params and n not in names)
+        return names
+    
+    def evaluate(self,
+                 features: Dict[str, Any],
+                 params: Optional[Dict[str, Any]] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Evaluate all expression rules over feature columns
+        
+        Missing features and None values are treated as NaN, which never
+        satisfies a predicate.
+        
+        Args:
+            features: Feature columns by name, each of shape (N,) or scalars
+            params: Parameter values replacing the registry defaults for this call
+        
+        Returns:
+            Dictionary mapping contradiction type to (detected mask, strength), in rule order
+        """
+        columns = {}
+        n_cells = None
+        for name in self.feature_names:
+            if features.get(name) is not None:
+                columns[name] = np.asarray(features[name], dtype=np.float64)
+                n_cells = columns[name].shape if n_cells is None else n_cells
+        n_cells = n_cells if n_cells is not None else ()
+        
+        env = {name: np.full(n_cells, np.nan) for name in self.feature_names}
+        env.update(columns)
+        env.update(self.params)
+        env.update(params or {})
+        
+        return {rule.type: rule.evaluate(env) for rule in self.rules if not rule.builtin}
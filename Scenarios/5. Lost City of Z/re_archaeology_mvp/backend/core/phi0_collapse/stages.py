@@ -0,0 +1,243 @@
+"""
+φ⁰ Collapse Stages
+=================
+Vectorized ports of the collapse stages from the archaeology research notebook
+(Steps 4-6): symbolic attractor boost, seed patch extraction, ψ⁰ drift from
+nearest neighbours and the ψ⁰ → φ⁰ collapse transformation. collapse_grid
+runs them in order over the feature vectors of a grid, as
+EnhancedEarthEngineConnector.collapse_grid does for an extracted grid.
+
+The notebook computed every distance with one geopy.geodesic call per row; the
+stages here use the shared great-circle kernels in backend.core.geo instead.
+"""
+
+import re
+import numpy as np
+import logging
+from typing import Dict, List, Any, Tuple
+
+from backend.core.geo.distance import GeoPointIndex, haversine_km
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default collapse parameters (see config/high_resolution_settings.json)
+DEFAULT_COLLAPSE_THRESHOLD = 3.5
+COLLAPSE_SCORE_SCALE = 5.0
+
+def parse_boost_tiers(boost_rules: Dict[str, Dict[str, float]]) -> Dict[str, List[Tuple[float, float]]]:
+    """
+    Parse attractor boost rules into distance tiers per site type
+    
+    Args:
+        boost_rules: Rules in config format, e.g. {"lidar": {"dist_5km": 1.5, "dist_10km": 0.75}}
+    
+    Returns:
+        Dictionary mapping site type to (max_distance_km, boost) tiers sorted by distance
+    """
+    tiers = {}
+    for site_type, rules in boost_rules.items():
+        site_tiers = []
+        for key, boost in rules.items():
+            match = re.fullmatch(r"dist_(\d+(?:\.\d+)?)km", key)
+            if not match:
+                raise ValueError(f"Invalid attractor boost rule '{key}' for type '{site_type}'")
+            site_tiers.append((float(match.group(1)), float(boost)))
+        tiers[site_type] = sorted(site_tiers)
+    return tiers
+
+def attractor_boost(lats: np.ndarray,
+                    lons: np.ndarray,
+                    sites: List[Dict[str, Any]],
+                    boost_rules: Dict[str, Dict[str, float]]) -> np.ndarray:
+    """
+    Symbolic φ⁰ boost from proximity to lidar and mythic attractor sites
+    
+    For each site, a cell gets the boost of the closest distance tier it falls
+    in (strictly closer than the tier distance); boosts from all sites add up.
+    
+    Args:
+        lats: Cell latitudes
+        lons: Cell longitudes
+        sites: Attractor sites with "lat", "lon" and "type"
+        boost_rules: Boost rules per site type in config format
+    
+    Returns:
+        Boost per cell
+    """
+    lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+    lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+    tiers = parse_boost_tiers(boost_rules)
+    boost = np.zeros(len(lats))
+    index = GeoPointIndex(lats, lons)
+    
+    for site in sites:
+        site_tiers = tiers.get(site.get("type"))
+        if not site_tiers:
+            continue
+        
+        # Only cells within the outermost tier can receive a boost
+        candidates = index.query_radius(site["lat"], site["lon"], site_tiers[-1][0], units="km")
+        if not len(candidates):
+            continue
+        distance = haversine_km(lats[candidates], lons[candidates], site["lat"], site["lon"])
+        
+        site_boost = np.zeros(len(candidates))
+        assigned = np.zeros(len(candidates), dtype=bool)
+        for max_distance, tier_boost in site_tiers:
+            in_tier = ~assigned & (distance < max_distance)
+            site_boost[in_tier] = tier_boost
+            assigned |= in_tier
+        boost[candidates] += site_boost
+    
+    return boost
+
+def patch_mask(lats: np.ndarray, lons: np.ndarray, center: Dict[str, float], radius_km: float = 5.0) -> np.ndarray:
+    """
+    Boolean mask of the cells forming a seed patch around a site
+    
+    Args:
+        lats: Cell latitudes
+        lons: Cell longitudes
+        center: Site with "lat" and "lon"
+        radius_km: Patch radius in kilometers
+    
+    Returns:
+        Mask of cells strictly within radius_km of the site
+    """
+    return haversine_km(lats, lons, center["lat"], center["lon"]) < radius_km
+
+def psi0_similarity(features: np.ndarray, seed: np.ndarray) -> np.ndarray:
+    """
+    ψ⁰ similarity: cosine similarity of each cell's features to the seed patch
+    
+    Features are standardized per column first; missing values (NaN) count as
+    the column mean, so they add nothing to either vector.
+    
+    Args:
+        features: Feature matrix, one row per cell
+        seed: Mask of the seed patch cells (see patch_mask)
+    
+    Returns:
+        Similarity in [-1, 1] per cell, 0 for cells without any feature value
+    """
+    features = np.asarray(features, dtype=np.float64)
+    seed = np.asarray(seed, dtype=bool).reshape(-1)
+    if not seed.any():
+        raise ValueError("The seed patch contains no cells")
+    
+    valid = ~np.isnan(features)
+    count = np.maximum(valid.sum(axis=0), 1)
+    centered = np.where(valid, features - np.where(valid, features, 0.0).sum(axis=0) / count, 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=0) / count)
+    z = centered / np.where(std > 0, std, 1.0)
+    
+    signature = z[seed].mean(axis=0)
+    norms = np.linalg.norm(z, axis=1) * np.linalg.norm(signature)
+    return np.divide(z @ signature, norms, out=np.zeros(len(z)), where=norms > 0)
+
+def psi0_drift(lats: np.ndarray, lons: np.ndarray, similarity: np.ndarray, n_neighbors: int = 6) -> np.ndarray:
+    """
+    ψ⁰ drift: spread of the similarity among each cell's nearest neighbours
+    
+    Args:
+        lats: Cell latitudes
+        lons: Cell longitudes
+        similarity: ψ⁰ similarity per cell
+        n_neighbors: Neighbourhood size including the cell itself
+    
+    Returns:
+        Standard deviation of the neighbours' similarity per cell
+    """
+    similarity = np.asarray(similarity, dtype=np.float64).reshape(-1)
+    n_neighbors = min(n_neighbors, len(similarity))
+    if n_neighbors < 2:
+        return np.zeros(len(similarity))
+    
+    index = GeoPointIndex(lats, lons)
+    _, indices = index.nearest(lats, lons, k=n_neighbors)
+    
+    # Drop the closest match (the cell itself) as the notebook did
+    return np.std(similarity[indices[:, 1:]], axis=1)
+
+def phi0_collapse(similarity: np.ndarray,
+                  boost: np.ndarray,
+                  tau: float = 1.0,
+                  threshold: float = DEFAULT_COLLAPSE_THRESHOLD) -> Dict[str, np.ndarray]:
+    """
+    ψ⁰ → φ⁰ collapse transformation
+    
+    Args:
+        similarity: ψ⁰ similarity per cell
+        boost: Symbolic attractor boost per cell
+        tau: Sigmoid temperature
+        threshold: φ⁰ collapse threshold on the 0-5 scale
+    
+    Returns:
+        Dictionary with phi0_core, phi0_total and the collapse_zone mask
+    """
+    similarity = np.asarray(similarity, dtype=np.float64)
+    phi0_core = COLLAPSE_SCORE_SCALE * (1.0 / (1.0 + np.exp(-similarity / tau)))
+    phi0_total = np.clip(phi0_core + boost, 0.0, COLLAPSE_SCORE_SCALE)
+    
+    return {
+        "phi0_core": phi0_core,
+        "phi0_total": phi0_total,
+        "collapse_zone": phi0_total >= threshold
+    }
+
+def collapse_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the collapse stage settings from the high-resolution configuration
+    
+    Args:
+        config: Parsed high_resolution_settings.json
+    
+    Returns:
+        Dictionary with sites, boost_rules and threshold
+    """
+    return {
+        "sites": config.get("symbolic_sites", []),
+        "boost_rules": config.get("attractor_boost", {}),
+        "threshold": config.get("collapse_threshold", DEFAULT_COLLAPSE_THRESHOLD)
+    }
+
+def collapse_grid(lats: np.ndarray,
+                  lons: np.ndarray,
+                  features: np.ndarray,
+                  seed_site: Dict[str, float],
+                  sites: List[Dict[str, Any]],
+                  boost_rules: Dict[str, Dict[str, float]],
+                  threshold: float = DEFAULT_COLLAPSE_THRESHOLD,
+                  patch_radius_km: float = 5.0,
+                  n_neighbors: int = 6,
+                  tau: float = 1.0) -> Dict[str, np.ndarray]:
+    """
+    Run the collapse stages over a grid of cells
+    
+    Args:
+        lats: Cell latitudes
+        lons: Cell longitudes
+        features: Feature matrix, one row per cell
+        seed_site: Site with "lat" and "lon" whose patch gives the ψ⁰ signature
+        sites: Attractor sites with "lat", "lon" and "type"
+        boost_rules: Boost rules per site type in config format
+        threshold: φ⁰ collapse threshold on the 0-5 scale
+        patch_radius_km: Seed patch radius in kilometers
+        n_neighbors: Drift neighbourhood size including the cell itself
+        tau: Sigmoid temperature
+    
+    Returns:
+        Dictionary with psi0_similarity, psi0_drift, boost, phi0_core,
+        phi0_total and the collapse_zone mask, one value per cell
+    """
+    seed = patch_mask(lats, lons, seed_site, patch_radius_km)
+    similarity = psi0_similarity(features, seed)
+    boost = attractor_boost(lats, lons, sites, boost_rules)
+    
+    result = phi0_collapse(similarity, boost, tau=tau, threshold=threshold)
+    result["psi0_similarity"] = similarity
+    result["psi0_drift"] = psi0_drift(lats, lons, similarity, n_neighbors)
+    result["boost"] = boost
+    return result
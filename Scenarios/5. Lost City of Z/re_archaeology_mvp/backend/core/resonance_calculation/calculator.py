@@ -3,15 +3,111 @@ from typing import Dict, List, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 import logging
 from backend.models.database import Psi0Attractor
-from shapely.geometry import Point
 import geopandas as gpd
 from shapely import wkb
 from geoalchemy2.shape import to_shape
+from backend.core.geo.distance import GeoPointIndex, radius_to_km
+from backend.core.contradiction_detection.rules import RuleRegistry
+from backend.core.resonance_calculation.fingerprint import attractor_set_version
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Site type predictions, indexed by the codes returned by phi0_scores_batch
+SITE_TYPES = (
+    "unlikely",
+    "settlement",
+    "ceremonial_center",
+    "major_settlement",
+    "minor_settlement",
+    "potential_site"
+)
+
+class AttractorIndex:
+    """
+    Spatial index over ψ⁰ attractor coordinates.
+    
+    Attractors are stored in a great-circle KD-tree (see backend.core.geo) so that
+    each cell only visits the attractors whose influence radius can reach it,
+    instead of looping over every attractor for every cell.
+    """
+    
+    def __init__(self, 
+                 coordinates: np.ndarray, 
+                 strengths: np.ndarray, 
+                 radii: np.ndarray,
+                 radius_units: str = "degrees"):
+        """
+        Build the index from attractor arrays
+        
+        Args:
+            coordinates: (longitude, latitude) of each attractor, shape (M, 2)
+            strengths: Attractor strengths, shape (M,)
+            radii: Influence radius of each attractor, shape (M,)
+            radius_units: Units of the radii ("degrees" of great-circle arc or "km")
+        """
+        self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.strengths = np.asarray(strengths, dtype=np.float64).reshape(-1)
+        self.radii_km = radius_to_km(np.asarray(radii, dtype=np.float64).reshape(-1), radius_units)
+        self.max_radius_km = float(self.radii_km.max()) if len(self.radii_km) else 0.0
+        self.points = GeoPointIndex(self.coordinates[:, 1], self.coordinates[:, 0])
+    
+    @classmethod
+    def from_attractors(cls, attractors: List[Dict[str, Any]]) -> "AttractorIndex":
+        """Build the index from attractor dictionaries as loaded by ResonanceCalculator"""
+        usable = []
+        for attractor in attractors:
+            radius = attractor.get("influence_radius")
+            if radius is None or radius <= 0:
+                logger.warning(f"Skipping attractor {attractor.get('id')} without a positive influence radius")
+                continue
+            usable.append(attractor)
+        
+        return cls(
+            coordinates=[(a["point"].x, a["point"].y) for a in usable],
+            strengths=[a["strength"] or 0.0 for a in usable],
+            radii=[a["influence_radius"] for a in usable]
+        )
+    
+    def __len__(self) -> int:
+        return len(self.coordinates)
+    
+    def influence(self, coords: np.ndarray, chunk_size: int = 100000) -> np.ndarray:
+        """
+        Calculate the capped total attractor influence for many cells
+        
+        Args:
+            coords: (longitude, latitude) of each cell centroid, shape (N, 2)
+            chunk_size: Number of cells queried against the tree at once
+            
+        Returns:
+            Attractor influence per cell (0.0 to 1.0), shape (N,)
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        total_influence = np.zeros(len(coords))
+        if len(self) == 0 or len(coords) == 0:
+            return total_influence
+        
+        for start in range(0, len(coords), chunk_size):
+            chunk = coords[start:start + chunk_size]
+            
+            # Candidate attractors within the largest radius, then filter by each own radius
+            cell_idx, attractor_idx, distance_km = self.points.query_pairs(
+                chunk[:, 1], chunk[:, 0], self.max_radius_km, units="km"
+            )
+            radius_km = self.radii_km[attractor_idx]
+            within = distance_km <= radius_km
+            
+            # Linear decay with great-circle distance
+            influence = self.strengths[attractor_idx][within] * (1.0 - (distance_km[within] / radius_km[within]))
+            total_influence[start:start + len(chunk)] = np.bincount(
+                cell_idx[within], weights=influence, minlength=len(chunk)
+            )
+        
+        # Cap total influence at 1.0
+        return np.minimum(total_influence, 1.0)
+
 class ResonanceCalculator:
     """
     Implements φ⁰ Resonance Calculation for archaeological site potential scoring.
@@ -20,12 +116,28 @@ class ResonanceCalculator:
     to calculate the overall resonance score for each grid cell.
     """
     
-    def __init__(self, db_session: Session):
-        """Initialize the resonance calculator"""
+    def __init__(self, db_session: Session, rules: Optional[RuleRegistry] = None):
+        """
+        Initialize the resonance calculator
+        
+        Args:
+            db_session: Database session
+            rules: Contradiction rule registry providing the per-type score modifiers
+                   (default: config/contradiction_rules.json)
+        """
         self.db = db_session
+        self.type_modifiers = (rules or RuleRegistry.from_file()).modifiers
         
-        # Load attractors from database
+        # Load attractors from database and index them spatially
+        self.attractors = self._load_attractors()
+        self.attractor_index = AttractorIndex.from_attractors(self.attractors)
+        self.attractor_version = attractor_set_version(self.attractors)
+    
+    def reload_attractors(self) -> None:
+        """Reload attractors from the database and rebuild the spatial index"""
         self.attractors = self._load_attractors()
+        self.attractor_index = AttractorIndex.from_attractors(self.attractors)
+        self.attractor_version = attractor_set_version(self.attractors)
         
     def _load_attractors(self) -> List[Dict[str, Any]]:
         """Load psi0 attractors from the database"""
@@ -55,6 +167,9 @@ class ResonanceCalculator:
         """
         Calculate the influence of attractors on a specific cell
         
+        Distances are great-circle distances; influence radii are stored in
+        degrees of arc.
+        
         Args:
             cell_coordinates: (longitude, latitude) of the cell centroid
             
@@ -63,23 +178,36 @@ class ResonanceCalculator:
         """
         if not self.attractors:
             return 0.0
+        
+        return float(self.attractor_index.influence(np.array([cell_coordinates]))[0])
+    
+    def calculate_attractor_influence_many(self, coords: np.ndarray) -> np.ndarray:
+        """
+        Calculate the influence of attractors on many cells at once
+        
+        Only attractors whose influence radius can reach a cell are visited,
+        using the spatial index built when the attractors were loaded.
+        
+        Args:
+            coords: (longitude, latitude) of each cell centroid, shape (N, 2)
             
-        cell_point = Point(cell_coordinates)
-        total_influence = 0.0
+        Returns:
+            Attractor influence strength per cell (0.0 to 1.0), shape (N,)
+        """
+        return self.attractor_index.influence(coords)
+    
+    def calculate_phi0_batch(self, detection: Dict[str, Any], attractor_influence: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Calculate φ⁰ resonance scores for many cells at once
         
-        for attractor in self.attractors:
-            # Calculate distance to attractor
-            distance = cell_point.distance(attractor["point"])
+        Args:
+            detection: Result of ContradictionDetector.detect_batch
+            attractor_influence: Attractor influence per cell, e.g. from calculate_attractor_influence_many
             
-            # Convert distance to degrees (approximate)
-            # Only apply influence within the radius
-            if distance <= attractor["influence_radius"]:
-                # Linear decay with distance
-                influence = attractor["strength"] * (1.0 - (distance / attractor["influence_radius"]))
-                total_influence += influence
-                
-        # Cap total influence at 1.0
-        return min(total_influence, 1.0)
+        Returns:
+            See phi0_scores_batch
+        """
+        return phi0_scores_batch(detection, attractor_influence, self.type_modifiers)
     
     def calculate_confidence_interval(self, contradiction_strength: float, 
                                     attractor_influence: float, 
@@ -130,13 +258,10 @@ class ResonanceCalculator:
         # In a full implementation, this would involve more complex interactions
         base_score = contradiction_strength * 0.7 + attractor_influence * 0.3
         
-        # Apply modifiers based on contradiction types
+        # Apply modifiers based on contradiction types (e.g. geometric patterns are strong indicators)
         modifiers = 0.0
         for contradiction in contradictions:
-            if contradiction["type"] == "geometric_pattern":
-                modifiers += 0.15  # Geometric patterns are strong indicators
-            elif contradiction["type"] == "water_proximity":
-                modifiers += 0.1   # Water proximity patterns are good indicators
+            modifiers += self.type_modifiers.get(contradiction["type"], 0.0)
         
         # Apply modifiers (capped)
         final_score = min(base_score + modifiers, 1.0)
@@ -182,3 +307,76 @@ class ResonanceCalculator:
             return "minor_settlement"
         else:
             return "potential_site"
+
+def phi0_scores_batch(detection: Dict[str, Any],
+                      attractor_influence: np.ndarray,
+                      type_modifiers: Dict[str, Any],
+                      contradiction_weight: Any = 0.7,
+                      attractor_weight: Any = 0.3) -> Dict[str, np.ndarray]:
+    """
+    Vectorized ResonanceCalculator.calculate_phi0_score over a batch of cells
+    
+    Kept at module level (it needs no database access) so worker processes can
+    score tiles without a ResonanceCalculator. Results match the scalar path
+    cell for cell.
+    
+    Modifiers and weights may be (P, 1) arrays to score P parameter settings at
+    once (see scoring_engine/sweep.py); results then have shape (P, N).
+    
+    Args:
+        detection: Result of ContradictionDetector.detect_batch
+        attractor_influence: Attractor influence per cell, shape (N,)
+        type_modifiers: φ⁰ score modifier per contradiction type
+        contradiction_weight: Weight of the contradiction strength in the base score
+        attractor_weight: Weight of the attractor influence in the base score
+        
+    Returns:
+        Dictionary with phi0_score, confidence_interval, site_type_code (index
+        into SITE_TYPES), modifiers and contradiction_count arrays
+    """
+    contradiction_strength = np.asarray(detection["overall_strength"], dtype=np.float64)
+    attractor_influence = np.asarray(attractor_influence, dtype=np.float64)
+    evidence_count = detection["contradiction_count"]
+    
+    # Base resonance calculation, as in calculate_phi0_score
+    base_score = contradiction_strength * contradiction_weight + attractor_influence * attractor_weight
+    
+    # Modifiers are added entry by entry in contradiction order to keep the scalar rounding
+    modifiers = np.zeros(np.broadcast(base_score, evidence_count).shape)
+    for contradiction_type, entries in detection["entries"].items():
+        modifier = type_modifiers.get(contradiction_type, 0.0)
+        for k in range(int(np.max(entries, initial=0))):
+            modifiers = modifiers + np.where(entries > k, modifier, 0.0)
+    
+    final_score = np.minimum(base_score + modifiers, 1.0)
+    
+    # Confidence interval, as in calculate_confidence_interval
+    evidence_factor = 1.0 - np.minimum(evidence_count / 10.0, 0.8)
+    strength_factor = 1.0 - (contradiction_strength * 0.3 + attractor_influence * 0.2)
+    confidence_interval = 0.4 * evidence_factor * strength_factor
+    
+    # Site type, as in _predict_site_type: the first strong geometric or water contradiction decides
+    site_type = np.where(
+        final_score >= 0.7, SITE_TYPES.index("major_settlement"),
+        np.where(final_score >= 0.5, SITE_TYPES.index("minor_settlement"), SITE_TYPES.index("potential_site"))
+    )
+    decided = np.zeros(final_score.shape, dtype=bool)
+    for contradiction_type, mask in detection["detected"].items():
+        strength = detection["strengths"][contradiction_type]
+        if contradiction_type == "geometric_pattern":
+            strong, label = mask & (strength > 0.7), "settlement"
+        elif contradiction_type == "water_proximity":
+            strong, label = mask & (strength > 0.8), "ceremonial_center"
+        else:
+            continue
+        site_type = np.where(strong & ~decided, SITE_TYPES.index(label), site_type)
+        decided |= strong
+    site_type = np.where(final_score < 0.3, SITE_TYPES.index("unlikely"), site_type)
+    
+    return {
+        "phi0_score": final_score,
+        "confidence_interval": confidence_interval,
+        "site_type_code": site_type.astype(np.int8),
+        "modifiers": modifiers,
+        "contradiction_count": evidence_count
+    }
@@ -0,0 +1,90 @@
+"""
+φ⁰ Result Fingerprints
+=====================
+Content hashes used to memoize φ⁰ calculations.
+
+A fingerprint combines everything a cell's φ⁰ result depends on: the values of
+its EnvironmentalData row, the version of the attractor set and the version of
+the scoring configuration (contradiction rules, geometric strategy and score
+modifiers). When the stored fingerprint of a Phi0Result matches, recomputing
+the cell would produce the same result and can be skipped.
+"""
+
+import json
+import hashlib
+from typing import Dict, List, Any
+
+# Columns of EnvironmentalData that do not affect the result
+IGNORED_ENVIRONMENTAL_COLUMNS = ("id", "processed_at")
+
+def stable_hash(value: Any) -> str:
+    """SHA-256 hex digest of a JSON-serializable value, independent of dict ordering"""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=_to_json)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def environmental_payload(env_data: Any) -> Dict[str, Any]:
+    """
+    Values of an EnvironmentalData row that feed into the φ⁰ calculation
+    
+    Args:
+        env_data: EnvironmentalData instance
+    
+    Returns:
+        Dictionary of column name to value
+    """
+    return {
+        column.name: getattr(env_data, column.name)
+        for column in env_data.__table__.columns
+        if column.name not in IGNORED_ENVIRONMENTAL_COLUMNS
+    }
+
+def attractor_set_version(attractors: List[Dict[str, Any]]) -> str:
+    """
+    Version of an attractor set as loaded by ResonanceCalculator
+    
+    Changes whenever an attractor is added, removed, moved or re-weighted.
+    """
+    return stable_hash(sorted(
+        [
+            attractor["id"],
+            attractor["strength"],
+            attractor["influence_radius"],
+            attractor["point"].x,
+            attractor["point"].y
+        ]
+        for attractor in attractors
+    ))
+
+def scoring_config_version(contradiction_detector: Any, resonance_calculator: Any) -> str:
+    """Version of the scoring configuration used by a detector / calculator pair"""
+    return stable_hash({
+        "rules": contradiction_detector.rules.describe(),
+        "geometric_strategy": contradiction_detector.geometric_strategy,
+        "type_modifiers": resonance_calculator.type_modifiers
+    })
+
+def phi0_fingerprint(env_data: Any, attractor_version: str, scoring_version: str) -> str:
+    """
+    Fingerprint of a cell's φ⁰ calculation inputs
+    
+    Args:
+        env_data: EnvironmentalData instance of the cell
+        attractor_version: Result of attractor_set_version
+        scoring_version: Result of scoring_config_version
+    
+    Returns:
+        64-character hex digest
+    """
+    return stable_hash({
+        "environmental_data": environmental_payload(env_data),
+        "attractors": attractor_version,
+        "scoring": scoring_version
+    })
+
+def _to_json(value: Any) -> Any:
+    """Fallback JSON encoding for NumPy values, dates and other objects"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,429 @@
+"""
+Region Scoring Engine
+=====================
+Bulk φ⁰ scoring of every grid cell in a region.
+
+The engine loads all environmental rows and centroids of the region with one
+query, places the feature columns in multiprocessing.shared_memory arrays and
+fans contradiction detection and resonance scoring out across worker processes,
+one task per tile of cells. Workers attach to the shared arrays by name, so no
+feature data is pickled per task; they write their scores into shared output
+arrays. The results are then written back to phi0_results in large batches.
+
+Attractor influence is computed once in the parent process with the attractor
+KD-tree, since it is cheap and needs the database.
+"""
+
+import os
+import time
+import numpy as np
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Any, Tuple, Optional
+from sqlalchemy import text, insert
+from sqlalchemy.orm import Session
+
+from backend.models.database import Phi0Result
+from backend.core.contradiction_detection.detector import ContradictionDetector
+from backend.core.resonance_calculation.calculator import ResonanceCalculator, phi0_scores_batch, SITE_TYPES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Feature columns read from environmental_data for every cell
+BASE_FEATURES = ("ndvi_mean", "canopy_height_mean", "water_proximity", "elevation_mean", "slope_mean")
+
+DEFAULT_TILE_SIZE_DEGREES = 0.1
+DEFAULT_WRITE_BATCH_SIZE = 5000
+
+class SharedArrays:
+    """
+    Named NumPy arrays backed by multiprocessing.shared_memory blocks.
+    
+    The owning process creates the arrays and unlinks them on close; workers
+    attach with SharedArrays.attach(spec) using the picklable spec.
+    """
+    
+    def __init__(self):
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.spec: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+        self.owner = True
+    
+    def create(self, name: str, shape: Tuple[int, ...], dtype: Any, fill: Any = 0) -> np.ndarray:
+        """Allocate a shared array"""
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.fill(fill)
+        
+        self.blocks[name] = block
+        self.arrays[name] = array
+        self.spec[name] = (block.name, tuple(shape), dtype.str)
+        return array
+    
+    def put(self, name: str, values: np.ndarray) -> np.ndarray:
+        """Copy an existing array into shared memory"""
+        array = self.create(name, values.shape, values.dtype)
+        array[...] = values
+        return array
+    
+    @classmethod
+    def attach(cls, spec: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> "SharedArrays":
+        """Attach to arrays created by another process"""
+        shared = cls()
+        shared.owner = False
+        for name, (block_name, shape, dtype) in spec.items():
+            block = _attach_block(block_name)
+            shared.blocks[name] = block
+            shared.arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        shared.spec = dict(spec)
+        return shared
+    
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+    
+    def close(self):
+        """Release the arrays; the owner also frees the shared memory"""
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
+    
+    def __enter__(self) -> "SharedArrays":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+class RegionScoringEngine:
+    """
+    Scores all grid cells of a region in bulk across worker processes.
+    """
+    
+    def __init__(self,
+                 db_session: Session,
+                 n_workers: Optional[int] = None,
+                 tile_size_degrees: float = DEFAULT_TILE_SIZE_DEGREES,
+                 geometric_strategy: Optional[str] = None,
+                 write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE):
+        """
+        Initialize the engine
+        
+        Args:
+            db_session: Database session used for loading and writing
+            n_workers: Worker processes (default: CPU count; 1 scores in-process)
+            tile_size_degrees: Edge length of the tiles handed to workers
+            geometric_strategy: Geometric pattern strategy of the contradiction detector
+            write_batch_size: Rows per bulk write statement
+        """
+        self.db = db_session
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.tile_size = tile_size_degrees
+        self.write_batch_size = write_batch_size
+        
+        # Each worker scores its tile in one batch, so it does not need a pool of its own
+        self.contradiction_detector = ContradictionDetector(geometric_strategy, n_workers=1)
+        self.resonance_calculator = ResonanceCalculator(db_session, rules=self.contradiction_detector.rules)
+        self.feature_names = list(BASE_FEATURES) + [
+            name for name in self.contradiction_detector.rules.feature_names if name not in BASE_FEATURES
+        ]
+    
+    def load_region(self, region_bbox: Tuple[float, float, float, float]) -> Dict[str, Any]:
+        """
+        Load centroids, feature columns and NDVI matrices of a region in one query
+        
+        The most recent environmental row is used for cells with several rows.
+        7-D features are read from raw_data["features"] when present.
+        
+        Args:
+            region_bbox: (min_lon, min_lat, max_lon, max_lat)
+        
+        Returns:
+            Dictionary with cell_ids, lon, lat, features (N, F) and ndvi_matrix
+            ((N, rows, cols) with NaN for cells without a matrix, or None)
+        """
+        min_lon, min_lat, max_lon, max_lat = region_bbox
+        
+        extra_features = self.feature_names[len(BASE_FEATURES):]
+        params = {"min_lon": min_lon, "min_lat": min_lat, "max_lon": max_lon, "max_lat": max_lat}
+        columns = [f"e.{name}" for name in BASE_FEATURES]
+        for i, name in enumerate(extra_features):
+            columns.append(f"(e.raw_data->'features'->>:feature_{i})::float")
+            params[f"feature_{i}"] = name
+        
+        query = text(
+            "SELECT DISTINCT ON (g.cell_id) g.cell_id, ST_X(g.centroid), ST_Y(g.centroid), "
+            f"{', '.join(columns)}, e.raw_data->'ndvi_matrix' "
+            "FROM public.grid_cells g "
+            "JOIN public.environmental_data e ON e.cell_id = g.cell_id "
+            "WHERE ST_X(g.centroid) BETWEEN :min_lon AND :max_lon "
+            "AND ST_Y(g.centroid) BETWEEN :min_lat AND :max_lat "
+            "ORDER BY g.cell_id, e.processed_at DESC"
+        )
+        rows = self.db.execute(query, params).fetchall()
+        
+        n_features = len(self.feature_names)
+        cell_ids = [row[0] for row in rows]
+        coords = np.array([(row[1], row[2]) for row in rows], dtype=np.float64).reshape(-1, 2)
+        features = np.array(
+            [row[3:3 + n_features] for row in rows], dtype=np.float64
+        ).reshape(-1, n_features)
+        
+        return {
+            "cell_ids": cell_ids,
+            "lon": coords[:, 0],
+            "lat": coords[:, 1],
+            "features": features,
+            "ndvi_matrix": self._stack_matrices([row[3 + n_features] for row in rows])
+        }
+    
+    def score_region(self, region_bbox: Tuple[float, float, float, float]) -> Dict[str, Any]:
+        """
+        Score every cell of a region and write the results to phi0_results
+        
+        Args:
+            region_bbox: (min_lon, min_lat, max_lon, max_lat)
+        
+        Returns:
+            Summary with cell, tile and worker counts, site type counts and timings
+        """
+        start = time.time()
+        data = self.load_region(region_bbox)
+        n_cells = len(data["cell_ids"])
+        load_time = time.time() - start
+        
+        if n_cells == 0:
+            logger.info(f"No cells with environmental data in region {region_bbox}")
+            return {"region": region_bbox, "cell_count": 0, "tile_count": 0}
+        
+        # Sort cells by tile so every tile is a contiguous slice of the shared arrays
+        tile_x = np.floor(data["lon"] / self.tile_size).astype(np.int64)
+        tile_y = np.floor(data["lat"] / self.tile_size).astype(np.int64)
+        order = np.lexsort((tile_x, tile_y))
+        tile_keys = np.column_stack((tile_y[order], tile_x[order]))
+        boundaries = np.flatnonzero(np.any(np.diff(tile_keys, axis=0) != 0, axis=1)) + 1
+        tiles = list(zip(np.r_[0, boundaries], np.r_[boundaries, n_cells]))
+        
+        cell_ids = [data["cell_ids"][i] for i in order]
+        lon, lat = data["lon"][order], data["lat"][order]
+        attractor_influence = self.resonance_calculator.calculate_attractor_influence_many(
+            np.column_stack((lon, lat))
+        )
+        
+        rule_types = [rule.type for rule in self.contradiction_detector.rules.rules]
+        
+        with SharedArrays() as shared:
+            shared.put("features", data["features"][order])
+            shared.put("attractor_influence", attractor_influence)
+            if data["ndvi_matrix"] is not None:
+                shared.put("ndvi_matrix", data["ndvi_matrix"][order])
+            
+            for name in ("phi0_score", "confidence_interval", "overall_strength"):
+                shared.create(name, (n_cells,), np.float64)
+            shared.create("site_type_code", (n_cells,), np.int8)
+            shared.create("strengths", (n_cells, len(rule_types)), np.float64)
+            shared.create("entries", (n_cells, len(rule_types)), np.int64)
+            
+            config = {
+                "feature_names": self.feature_names,
+                "rule_types": rule_types,
+                "geometric_strategy": self.contradiction_detector.geometric_strategy,
+                "type_modifiers": self.resonance_calculator.type_modifiers
+            }
+            tasks = [(shared.spec, int(a), int(b), config) for a, b in tiles]
+            
+            score_start = time.time()
+            n_workers = min(self.n_workers, len(tasks))
+            if n_workers > 1:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    list(executor.map(_score_tile, tasks))
+            else:
+                for task in tasks:
+                    _score_tile(task, shared)
+            score_time = time.time() - score_start
+            
+            outputs = {name: shared[name].copy() for name in
+                       ("phi0_score", "confidence_interval", "overall_strength",
+                        "site_type_code", "strengths", "entries")}
+        
+        write_start = time.time()
+        written = self.write_results(cell_ids, outputs, rule_types)
+        write_time = time.time() - write_start
+        
+        site_type_counts = np.bincount(outputs["site_type_code"], minlength=len(SITE_TYPES))
+        logger.info(f"Scored {n_cells} cells in {len(tiles)} tiles with {max(n_workers, 1)} workers "
+                    f"(load {load_time:.1f}s, score {score_time:.1f}s, write {write_time:.1f}s)")
+        
+        return {
+            "region": region_bbox,
+            "cell_count": n_cells,
+            "tile_count": len(tiles),
+            "workers": max(n_workers, 1),
+            "written": written,
+            "site_types": {SITE_TYPES[i]: int(c) for i, c in enumerate(site_type_counts) if c},
+            "timings": {"load": load_time, "score": score_time, "write": write_time}
+        }
+    
+    def write_results(self, cell_ids: List[str], outputs: Dict[str, np.ndarray], rule_types: List[str]) -> int:
+        """
+        Bulk upsert scored cells into phi0_results
+        
+        phi0_results.cell_id is not unique, so each batch deletes the existing
+        rows of its cells and inserts the new ones in the same transaction.
+        Fingerprints are left empty: the per-cell endpoint recalculates these
+        cells once before memoizing them.
+        
+        Returns:
+            Number of rows written
+        """
+        descriptions = self.contradiction_detector.rules.descriptions
+        written = 0
+        
+        try:
+            for start in range(0, len(cell_ids), self.write_batch_size):
+                end = min(start + self.write_batch_size, len(cell_ids))
+                batch_ids = cell_ids[start:end]
+                rows = []
+                
+                for i in range(start, end):
+                    contradictions = [
+                        {
+                            "type": rule_type,
+                            "strength": float(outputs["strengths"][i, t]),
+                            "count": int(outputs["entries"][i, t]),
+                            "description": descriptions.get(rule_type, "")
+                        }
+                        for t, rule_type in enumerate(rule_types) if outputs["entries"][i, t]
+                    ]
+                    contradiction_count = int(outputs["entries"][i].sum())
+                    rows.append({
+                        "cell_id": cell_ids[i],
+                        "phi0_score": float(outputs["phi0_score"][i]),
+                        "confidence_interval": float(outputs["confidence_interval"][i]),
+                        "site_type_prediction": SITE_TYPES[outputs["site_type_code"][i]],
+                        "contradiction_patterns": {
+                            "contradictions": contradictions,
+                            "overall_strength": float(outputs["overall_strength"][i]),
+                            "cell_id": cell_ids[i]
+                        },
+                        "calculation_metadata": {
+                            "contradiction_strength": float(outputs["overall_strength"][i]),
+                            "contradiction_count": contradiction_count,
+                            "engine": "region_scoring"
+                        }
+                    })
+                
+                self.db.execute(
+                    text("DELETE FROM public.phi0_results WHERE cell_id = ANY(:cell_ids)"),
+                    {"cell_ids": batch_ids}
+                )
+                self.db.execute(insert(Phi0Result.__table__), rows)
+                self.db.commit()
+                written += len(rows)
+        
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error writing region scores after {written} rows: {e}")
+            raise
+        
+        return written
+    
+    @staticmethod
+    def _stack_matrices(matrices: List[Any]) -> Optional[np.ndarray]:
+        """
+        Stack the NDVI matrices of the most common shape into one cube
+        
+        Cells without a matrix (or with a matrix of another shape) get an all-NaN
+        matrix, which never produces a geometric contradiction.
+        """
+        shapes = {}
+        arrays = []
+        for matrix in matrices:
+            array = np.asarray(matrix, dtype=np.float64) if matrix is not None else None
+            if array is not None and array.ndim == 2:
+                shapes[array.shape] = shapes.get(array.shape, 0) + 1
+            else:
+                array = None
+            arrays.append(array)
+        
+        if not shapes:
+            return None
+        
+        shape = max(shapes, key=shapes.get)
+        skipped = sum(count for s, count in shapes.items() if s != shape)
+        if skipped:
+            logger.warning(f"Skipping geometric detection for {skipped} NDVI matrices not of shape {shape}")
+        
+        cube = np.full((len(arrays), *shape), np.nan)
+        for i, array in enumerate(arrays):
+            if array is not None and array.shape == shape:
+                cube[i] = array
+        return cube
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    """Attach to a shared memory block created by the parent process"""
+    try:
+        # The parent owns the block; keep this process's resource tracker out of it
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: workers share the parent's resource tracker, so attaching is harmless
+        return shared_memory.SharedMemory(name=name)
+
+# Detector per worker process, built on the first tile the process scores
+_worker_detectors: Dict[str, ContradictionDetector] = {}
+
+def _score_tile(task: Tuple[Dict[str, Any], int, int, Dict[str, Any]],
+                shared: Optional[SharedArrays] = None) -> int:
+    """
+    Score one tile of cells (process pool entry point)
+    
+    Args:
+        task: (shared array spec, start index, end index, scoring config)
+        shared: Already attached arrays when scoring in-process
+    
+    Returns:
+        Number of cells scored
+    """
+    spec, start, end, config = task
+    attached = shared is None
+    if attached:
+        shared = SharedArrays.attach(spec)
+    
+    try:
+        strategy = config["geometric_strategy"]
+        if strategy not in _worker_detectors:
+            _worker_detectors[strategy] = ContradictionDetector(strategy, n_workers=1)
+        detector = _worker_detectors[strategy]
+        
+        features = shared["features"][start:end]
+        columns = {name: features[:, i] for i, name in enumerate(config["feature_names"])}
+        extra = {name: columns[name] for name in config["feature_names"] if name not in BASE_FEATURES}
+        ndvi_matrix = shared["ndvi_matrix"][start:end] if "ndvi_matrix" in shared.arrays else None
+        
+        detection = detector.detect_batch(
+            *(columns[name] for name in BASE_FEATURES),
+            ndvi_matrix=ndvi_matrix,
+            features=extra
+        )
+        scores = phi0_scores_batch(detection, shared["attractor_influence"][start:end], config["type_modifiers"])
+        
+        shared["phi0_score"][start:end] = scores["phi0_score"]
+        shared["confidence_interval"][start:end] = scores["confidence_interval"]
+        shared["site_type_code"][start:end] = scores["site_type_code"]
+        shared["overall_strength"][start:end] = detection["overall_strength"]
+        for t, rule_type in enumerate(config["rule_types"]):
+            if rule_type in detection["strengths"]:
+                shared["strengths"][start:end, t] = detection["strengths"][rule_type]
+                shared["entries"][start:end, t] = detection["entries"][rule_type]
+        
+        return end - start
+    
+    finally:
+        if attached:
+            shared.close()
@@ -0,0 +1,240 @@
+"""
+Scoring Parameter Sweeps
+========================
+What-if evaluation of scoring weights and thresholds over a cached feature matrix.
+
+A sweep evaluates a grid of parameter settings in one pass: every swept value
+becomes a (P, 1) column that broadcasts against the (N,) feature columns, so
+the contradiction rules and the resonance formula run once for P settings
+instead of P full rescores. Geometric detection and attractor influence do not
+depend on the swept parameters and are computed once when the cache is built.
+
+Sweepable parameters:
+
+- Any rule parameter of config/contradiction_rules.json (e.g. water_max_distance)
+- ndvi_canopy_threshold: alias of ndvi_canopy_low_ndvi, the NDVI below which
+  tall canopy is contradictory (NDVI_CANOPY_CONTRADICTION_THRESHOLD, 0.3)
+- contradiction_weight / attractor_weight: base score weights (0.7 / 0.3)
+- modifier.<type>: φ⁰ score modifier of a contradiction type (e.g. modifier.geometric_pattern)
+- collapse_threshold: cells count as collapsed when phi0_score * 5 >= threshold (3.5)
+"""
+
+import json
+import itertools
+import numpy as np
+import logging
+from typing import Dict, List, Any, Tuple, Optional
+from sqlalchemy.orm import Session
+
+from backend.core.contradiction_detection.detector import ContradictionDetector
+from backend.core.resonance_calculation.calculator import phi0_scores_batch
+from backend.core.phi0_collapse.stages import DEFAULT_COLLAPSE_THRESHOLD, COLLAPSE_SCORE_SCALE
+from backend.core.scoring_engine.engine import RegionScoringEngine, BASE_FEATURES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PARAMETER_ALIASES = {"ndvi_canopy_threshold": "ndvi_canopy_low_ndvi"}
+SCORE_PARAMETERS = {"contradiction_weight": 0.7, "attractor_weight": 0.3}
+MODIFIER_PREFIX = "modifier."
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+DEFAULT_HISTOGRAM_BINS = 10
+
+# Upper bound on settings x cells evaluated at once, to bound memory
+DEFAULT_MAX_ELEMENTS = 20_000_000
+
+def build_feature_cache(db: Session,
+                        region_bbox: Tuple[float, float, float, float],
+                        geometric_strategy: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Load the features of a region and precompute everything sweeps do not change
+    
+    Args:
+        db: Database session
+        region_bbox: (min_lon, min_lat, max_lon, max_lat)
+        geometric_strategy: Geometric pattern strategy of the contradiction detector
+    
+    Returns:
+        Feature cache (see save_feature_cache)
+    """
+    engine = RegionScoringEngine(db, n_workers=1, geometric_strategy=geometric_strategy)
+    data = engine.load_region(region_bbox)
+    n_cells = len(data["cell_ids"])
+    
+    detector = engine.contradiction_detector
+    if data["ndvi_matrix"] is not None:
+        detected, strength, entries = detector.detect_geometric_patterns_batch(data["ndvi_matrix"], return_counts=True)
+    else:
+        detected, strength, entries = np.zeros(n_cells, dtype=bool), np.zeros(n_cells), np.zeros(n_cells, dtype=np.int64)
+    
+    logger.info(f"Built sweep feature cache for {n_cells} cells in region {region_bbox}")
+    
+    return {
+        "cell_ids": np.array(data["cell_ids"], dtype=str),
+        "lon": data["lon"],
+        "lat": data["lat"],
+        "feature_names": np.array(engine.feature_names, dtype=str),
+        "features": data["features"],
+        "attractor_influence": engine.resonance_calculator.calculate_attractor_influence_many(
+            np.column_stack((data["lon"], data["lat"]))
+        ),
+        "geometric_detected": detected,
+        "geometric_strength": strength,
+        "geometric_entries": entries,
+        "geometric_strategy": np.array(detector.geometric_strategy)
+    }
+
+def save_feature_cache(cache: Dict[str, np.ndarray], path: str) -> str:
+    """Save a feature cache as a compressed .npz file"""
+    np.savez_compressed(path, **cache)
+    return path if path.endswith(".npz") else path + ".npz"
+
+def load_feature_cache(path: str) -> Dict[str, np.ndarray]:
+    """Load a feature cache saved with save_feature_cache"""
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+def parameter_grid(grid: Dict[str, List[float]]) -> List[Dict[str, float]]:
+    """
+    Expand {name: [values]} into the list of all combinations
+    
+    Example:
+        {"contradiction_weight": [0.6, 0.7], "collapse_threshold": [3.0, 3.5]} gives 4 settings
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+class ParameterSweep:
+    """
+    Evaluates many scoring parameter settings over a cached feature matrix.
+    """
+    
+    def __init__(self,
+                 cache: Dict[str, np.ndarray],
+                 detector: Optional[ContradictionDetector] = None,
+                 max_elements: int = DEFAULT_MAX_ELEMENTS):
+        """
+        Args:
+            cache: Feature cache from build_feature_cache / load_feature_cache
+            detector: Contradiction detector providing the rules (default: configured rules)
+            max_elements: Upper bound on settings x cells evaluated per chunk
+        """
+        self.cache = cache
+        self.detector = detector or ContradictionDetector(str(cache["geometric_strategy"]), n_workers=1)
+        self.max_elements = max_elements
+        
+        names = [str(name) for name in cache["feature_names"]]
+        self.columns = {name: cache["features"][:, i] for i, name in enumerate(names)}
+        self.extra_features = {name: column for name, column in self.columns.items() if name not in BASE_FEATURES}
+        self.geometric_result = (
+            cache["geometric_detected"], cache["geometric_strength"], cache["geometric_entries"]
+        )
+    
+    @property
+    def parameter_names(self) -> List[str]:
+        """Names accepted in a sweep grid"""
+        rule_types = [rule.type for rule in self.detector.rules.rules]
+        return (sorted(self.detector.rules.params) + list(PARAMETER_ALIASES) + list(SCORE_PARAMETERS)
+                + [MODIFIER_PREFIX + t for t in rule_types] + ["collapse_threshold"])
+    
+    def run(self,
+            settings: List[Dict[str, float]],
+            percentiles: Tuple[int, ...] = DEFAULT_PERCENTILES,
+            bins: int = DEFAULT_HISTOGRAM_BINS) -> List[Dict[str, Any]]:
+        """
+        Evaluate parameter settings
+        
+        Args:
+            settings: Parameter settings, e.g. from parameter_grid; unset
+                      parameters keep their configured values
+            percentiles: Score percentiles to report per setting
+            bins: Number of equal-width score histogram bins on [0, 1]
+        
+        Returns:
+            One summary per setting with the score distribution and the number
+            of cells above the collapse threshold
+        """
+        unknown = {name for setting in settings for name in setting} - set(self.parameter_names)
+        if unknown:
+            raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+        
+        n_cells = len(self.cache["cell_ids"])
+        chunk = max(1, self.max_elements // max(n_cells, 1))
+        results = []
+        
+        for start in range(0, len(settings), chunk):
+            batch = settings[start:start + chunk]
+            scores = self._score(batch)
+            
+            collapse_threshold = self._column(batch, "collapse_threshold", DEFAULT_COLLAPSE_THRESHOLD)
+            collapsed = (scores * COLLAPSE_SCORE_SCALE >= collapse_threshold).sum(axis=1)
+            above_half = (scores >= 0.5).sum(axis=1)
+            
+            if n_cells:
+                quantiles = np.percentile(scores, percentiles, axis=1)
+                means, stds = scores.mean(axis=1), scores.std(axis=1)
+            else:
+                quantiles = np.zeros((len(percentiles), len(batch)))
+                means = stds = np.zeros(len(batch))
+            edges = np.linspace(0.0, 1.0, bins + 1)
+            bin_index = np.clip(np.digitize(scores, edges[1:-1]), 0, bins - 1)
+            offsets = np.arange(len(batch))[:, None] * bins
+            histograms = np.bincount((bin_index + offsets).ravel(), minlength=len(batch) * bins).reshape(len(batch), bins)
+            
+            for i, setting in enumerate(batch):
+                results.append({
+                    "params": setting,
+                    "cell_count": n_cells,
+                    "mean": float(means[i]),
+                    "std": float(stds[i]),
+                    "percentiles": {str(p): float(quantiles[j, i]) for j, p in enumerate(percentiles)},
+                    "histogram": {"edges": edges.tolist(), "counts": histograms[i].tolist()},
+                    "cells_above_collapse_threshold": int(collapsed[i]),
+                    "cells_above_0_5": int(above_half[i])
+                })
+        
+        logger.info(f"Evaluated {len(settings)} parameter settings over {n_cells} cells")
+        return results
+    
+    def _score(self, settings: List[Dict[str, float]]) -> np.ndarray:
+        """φ⁰ scores of shape (P, N) for a chunk of settings"""
+        rule_params = {}
+        for name in self.detector.rules.params:
+            if any(name in setting for setting in settings):
+                rule_params[name] = self._column(settings, name, self.detector.rules.params[name])
+        for alias, name in PARAMETER_ALIASES.items():
+            if any(alias in setting for setting in settings):
+                rule_params[name] = self._column(settings, alias, self.detector.rules.params[name])
+        
+        detection = self.detector.detect_batch(
+            *(self.columns[name] for name in BASE_FEATURES),
+            features=self.extra_features,
+            params=rule_params,
+            geometric_result=self.geometric_result
+        )
+        
+        modifiers = {}
+        for contradiction_type, modifier in self.detector.rules.modifiers.items():
+            modifiers[contradiction_type] = self._column(settings, MODIFIER_PREFIX + contradiction_type, modifier)
+        
+        scores = phi0_scores_batch(
+            detection,
+            self.cache["attractor_influence"],
+            modifiers,
+            contradiction_weight=self._column(settings, "contradiction_weight", SCORE_PARAMETERS["contradiction_weight"]),
+            attractor_weight=self._column(settings, "attractor_weight", SCORE_PARAMETERS["attractor_weight"])
+        )["phi0_score"]
+        
+        return np.broadcast_to(scores, (len(settings), len(self.cache["cell_ids"])))
+    
+    @staticmethod
+    def _column(settings: List[Dict[str, float]], name: str, default: float) -> np.ndarray:
+        """Values of one parameter across settings as a (P, 1) column"""
+        return np.array([setting.get(name, default) for setting in settings], dtype=np.float64)[:, None]
+
+def load_grid(path: str) -> Dict[str, List[float]]:
+    """Load a sweep grid ({name: [values]}) from a JSON file"""
+    with open(path, 'r') as f:
+        return json.load(f)
@@ -1 +1,7 @@
 # Earth Engine data processors package
+from backend.utils.config import settings
+
+if settings.EE_BACKEND.lower() == "fake":
+    # Resolve `import ee` in the processors to the offline fake backend
+    from backend.data_processors.earth_engine import fake_ee
+    fake_ee.install()
@@ -0,0 +1,249 @@
+"""
+Adaptive Quadtree Scan
+======================
+Coarse-to-fine alternative to extracting a whole region on the uniform
+high-resolution grid of EnhancedEarthEngineConnector.create_grid.
+
+The region is tiled at a coarse resolution and every cell is scored from its
+7-D features: contradiction strength (ContradictionDetector), attractor
+influence and φ⁰ score (ResonanceCalculator). Only cells where one of the
+scores reaches its refinement threshold are split into four children, level
+by level, down to the finest resolution of the configuration; quiet forest
+is never sampled finer. Each level is extracted with
+extract_all_features_fast_batch (one request per chunk of cells). Cells
+coarser than the finest resolution are reduced over their whole footprint
+(the cell grown by each band's buffer), so a feature anywhere in a coarse
+cell can trigger its refinement; finest cells are sampled like the points
+of the uniform grid.
+
+The lineage is returned with the scan, not stored: every cell records its
+parent and children, and the IDs "<level>:<row>:<col>" encode it (the parent
+of a cell is "<level - 1>:<row // 2>:<col // 2>").
+
+Settings come from the "adaptive_scan" section of
+config/high_resolution_settings.json; the finest resolution is its
+grid_resolution.
+"""
+
+import math
+import logging
+import numpy as np
+from typing import Dict, List, Any, Optional
+from sqlalchemy.orm import Session
+
+from backend.data_processors.earth_engine.enhanced_connector import EnhancedEarthEngineConnector
+from backend.core.contradiction_detection.detector import ContradictionDetector
+from backend.core.resonance_calculation.calculator import ResonanceCalculator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Used when the configuration has no "adaptive_scan" section
+DEFAULT_ADAPTIVE_SCAN = {
+    "coarse_degrees": 0.04,
+    "refine_thresholds": {
+        "phi0_score": 0.25,
+        "attractor_influence": 0.1,
+        "contradiction_strength": 0.25
+    }
+}
+
+def cells_along(extent: float, size: float) -> int:
+    """
+    Number of cells of the given size covering an extent (at least one)
+    
+    The ratio is rounded before taking the ceiling, so float error in
+    extents like 0.2° / 0.04° does not add a spurious row or column.
+    """
+    return max(int(math.ceil(round(extent / size, 9))), 1)
+
+class AdaptiveQuadtreeScanner:
+    """
+    Scans a region coarse to fine, refining only the cells that score as interesting.
+    """
+    
+    def __init__(self,
+                 db_session: Session,
+                 connector: Optional[EnhancedEarthEngineConnector] = None,
+                 detector: Optional[ContradictionDetector] = None,
+                 calculator: Optional[ResonanceCalculator] = None):
+        """
+        Args:
+            db_session: Database session (for the ψ⁰ attractors)
+            connector: Feature extraction connector (default: a new EnhancedEarthEngineConnector)
+            detector: Contradiction detector (default: a new ContradictionDetector)
+            calculator: Resonance calculator (default: a new ResonanceCalculator on db_session)
+        """
+        self.db = db_session
+        self.connector = connector or EnhancedEarthEngineConnector()
+        self.detector = detector or ContradictionDetector()
+        self.calculator = calculator or ResonanceCalculator(db_session)
+        
+        scan_settings = dict(DEFAULT_ADAPTIVE_SCAN)
+        scan_settings.update(self.connector.config.get("adaptive_scan", {}))
+        self.coarse_degrees = float(scan_settings["coarse_degrees"])
+        self.finest_degrees = float(self.connector.config["grid_resolution"]["degrees"])
+        self.thresholds = dict(DEFAULT_ADAPTIVE_SCAN["refine_thresholds"])
+        self.thresholds.update(scan_settings.get("refine_thresholds", {}))
+    
+    def scan(self,
+             min_lat: float,
+             min_lon: float,
+             max_lat: float,
+             max_lon: float,
+             include_fractal: bool = False,
+             chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Scan a bounding box with adaptive refinement
+        
+        Args:
+            min_lat: Minimum latitude
+            min_lon: Minimum longitude
+            max_lat: Maximum latitude
+            max_lon: Maximum longitude
+            include_fractal: Also extract FractalNDVI (one more request per chunk)
+            chunk_size: Points per request (default: settings.EE_BATCH_CHUNK_SIZE)
+        
+        Returns:
+            Dictionary with every scanned cell (scores, features and lineage) by
+            cell ID, per-level counts, the finest-level candidate cells and the
+            number of points extracted compared with a uniform finest grid
+        """
+        n_levels = self._refinement_levels()
+        rows = cells_along(max_lat - min_lat, self.coarse_degrees)
+        cols = cells_along(max_lon - min_lon, self.coarse_degrees)
+        
+        cells: Dict[str, Dict[str, Any]] = {}
+        levels = []
+        frontier = [(0, row, col, None) for row in range(rows) for col in range(cols)]
+        
+        for level in range(n_levels + 1):
+            if not frontier:
+                break
+            size = self.coarse_degrees / 2 ** level
+            records = [self._cell(*entry, size, min_lat, min_lon) for entry in frontier]
+            # The finest level is sampled as the uniform grid would be; coarser cells over their area
+            refine = self._score(records, include_fractal, chunk_size, size if level < n_levels else None)
+            
+            frontier = []
+            for record, interesting in zip(records, refine):
+                record["above_threshold"] = bool(interesting)
+                cells[record["id"]] = record
+                if record["parent"] is not None:
+                    cells[record["parent"]]["children"].append(record["id"])
+                if interesting and level < n_levels:
+                    frontier.extend(
+                        (level + 1, 2 * record["row"] + i, 2 * record["col"] + j, record["id"])
+                        for i in (0, 1) for j in (0, 1)
+                        # Children of edge cells may fall outside the region
+                        if min_lat + (2 * record["row"] + i) * size / 2 < max_lat
+                        and min_lon + (2 * record["col"] + j) * size / 2 < max_lon
+                    )
+            
+            levels.append({
+                "level": level,
+                "size_degrees": size,
+                "cells": len(records),
+                "above_threshold": int(np.count_nonzero(refine))
+            })
+            logger.info(f"Adaptive scan level {level} ({size}°): {len(records)} cells, {levels[-1]['above_threshold']} above threshold")
+        
+        uniform_points = (
+            cells_along(max_lat - min_lat, self.finest_degrees)
+            * cells_along(max_lon - min_lon, self.finest_degrees)
+        )
+        return {
+            "region": [min_lat, min_lon, max_lat, max_lon],
+            "cells": cells,
+            "levels": levels,
+            "candidates": [
+                cell_id for cell_id, record in cells.items()
+                if record["level"] == n_levels and record["above_threshold"]
+            ],
+            "extracted_points": len(cells),
+            "uniform_points": uniform_points
+        }
+    
+    def _refinement_levels(self) -> int:
+        """Number of quadtree splits from the coarse to the finest resolution"""
+        ratio = self.coarse_degrees / self.finest_degrees
+        levels = int(round(math.log2(ratio))) if ratio >= 1 else -1
+        if levels < 0 or not math.isclose(2 ** levels, ratio, rel_tol=1e-9):
+            raise ValueError(
+                f"Adaptive scan coarse resolution {self.coarse_degrees}° must be the finest resolution "
+                f"{self.finest_degrees}° times a power of two"
+            )
+        return levels
+    
+    def _cell(self,
+              level: int,
+              row: int,
+              col: int,
+              parent: Optional[str],
+              size: float,
+              min_lat: float,
+              min_lon: float) -> Dict[str, Any]:
+        """Record of one quadtree cell, keyed "<level>:<row>:<col>" from the region's south-west corner"""
+        south = min_lat + row * size
+        west = min_lon + col * size
+        return {
+            "id": f"{level}:{row}:{col}",
+            "parent": parent,
+            "children": [],
+            "level": level,
+            "row": row,
+            "col": col,
+            "size_degrees": size,
+            "bounds": [west, south, west + size, south + size],
+            "lat": south + size / 2,
+            "lon": west + size / 2
+        }
+    
+    def _score(self,
+               records: List[Dict[str, Any]],
+               include_fractal: bool,
+               chunk_size: Optional[int],
+               cell_size: Optional[float] = None) -> np.ndarray:
+        """
+        Extract and score the cells of one level; returns the mask of cells to refine
+        
+        With cell_size the features are reduced over the cells of that size
+        in degrees instead of around their centres.
+        """
+        extracted = self.connector.extract_all_features_fast_batch(
+            [(record["lat"], record["lon"]) for record in records],
+            chunk_size=chunk_size,
+            include_fractal=include_fractal,
+            cell_size=cell_size
+        )
+        
+        def column(name: str) -> np.ndarray:
+            return np.array([features["features"].get(name) for features in extracted], dtype=np.float64)
+        
+        missing = np.full(len(records), np.nan)
+        detection = self.detector.detect_batch(
+            ndvi_mean=column("NDVI"),
+            canopy_height_mean=column("RH100"),
+            water_proximity=missing,
+            elevation_mean=missing,
+            slope_mean=column("Slope"),
+            features={name: column(name) for name in ("NDBI", "Curvature", "ElevationAnomaly", "FractalNDVI")}
+        )
+        influence = self.calculator.calculate_attractor_influence_many(
+            np.array([(record["lon"], record["lat"]) for record in records])
+        )
+        phi0 = self.calculator.calculate_phi0_batch(detection, influence)["phi0_score"]
+        strength = detection["overall_strength"]
+        
+        for i, (record, features) in enumerate(zip(records, extracted)):
+            record["features"] = features["features"]
+            record["phi0_score"] = float(phi0[i])
+            record["attractor_influence"] = float(influence[i])
+            record["contradiction_strength"] = float(strength[i])
+        
+        return (
+            (phi0 >= self.thresholds["phi0_score"])
+            | (influence >= self.thresholds["attractor_influence"])
+            | (strength >= self.thresholds["contradiction_strength"])
+        )
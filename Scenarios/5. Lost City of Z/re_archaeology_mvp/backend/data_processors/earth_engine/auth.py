@@ -30,15 +30,29 @@ def authenticate_earth_engine():
         
         if auth_method == 'service_account':
             logger.info("Using service account authentication for Earth Engine")
-            return _authenticate_with_service_account()
+            authenticated = _authenticate_with_service_account()
         else:
             logger.info("Using application default credentials for Earth Engine")
-            return _authenticate_with_application_default()
+            authenticated = _authenticate_with_application_default()
+        
+        if authenticated:
+            _set_request_deadline()
+        return authenticated
             
     except Exception as e:
         logger.error(f"Earth Engine authentication failed: {e}")
         return False
 
+def _set_request_deadline():
+    """
+    Let the Earth Engine client abort requests running longer than EE_REQUEST_TIMEOUT
+    
+    The request executor cannot interrupt a request in a worker thread, so
+    without a client deadline a timed-out request would hold its thread.
+    """
+    if settings.EE_REQUEST_TIMEOUT:
+        ee.data.setDeadline(int(settings.EE_REQUEST_TIMEOUT * 1000))
+
 def _authenticate_with_service_account():
     """
     Authenticate with Google Earth Engine using a service account.
@@ -0,0 +1,132 @@
+"""
+Batched Cell Extraction Helpers
+===============================
+Shared helpers for the processors' batch variants, which reduce many grid
+cells with one `reduceRegions` request per data source and chunk instead of
+one or more `reduceRegion().getInfo()` round trips per cell, and for
+streaming the cells of a region.
+"""
+
+import logging
+from typing import Dict, List, Any, Optional, Iterator, Iterable, Sequence
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.data_processors.earth_engine.cell_context import load_cell_contexts
+from backend.models.database import GridCell
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def load_cell_polygons(db: Session, cell_ids: List[str]) -> Dict[str, List[List[List[float]]]]:
+    """
+    Load the polygon coordinates of many grid cells with one query
+    
+    Args:
+        db: Database session
+        cell_ids: Grid cell IDs
+    
+    Returns:
+        Earth Engine polygon coordinates by cell ID, in the order of cell_ids;
+        unknown cells are left out
+    """
+    return {cell_id: context.coords for cell_id, context in load_cell_contexts(db, cell_ids).items()}
+
+def _region_filter(bounding_box: List[float]) -> list:
+    return [
+        GridCell.lon_min >= bounding_box[0],
+        GridCell.lat_min >= bounding_box[1],
+        GridCell.lon_max <= bounding_box[2],
+        GridCell.lat_max <= bounding_box[3]
+    ]
+
+def count_region_cells(db: Session, bounding_box: List[float], max_cells: Optional[int] = None) -> int:
+    """Number of cells iter_region_cell_ids() yields for a bounding box"""
+    count = db.query(func.count(GridCell.id)).filter(*_region_filter(bounding_box)).scalar() or 0
+    return count if max_cells is None else min(count, max_cells)
+
+def iter_region_cell_ids(db: Session,
+                         bounding_box: List[float],
+                         max_cells: Optional[int] = None,
+                         page_size: Optional[int] = None) -> Iterator[str]:
+    """
+    Stream the IDs of the cells inside a bounding box
+    
+    Cells are read page by page in id order (keyset pagination), so the
+    order is stable across runs and only one page is held in memory.
+    
+    Args:
+        db: Database session
+        bounding_box: [min_lon, min_lat, max_lon, max_lat]
+        max_cells: Maximum number of cells to yield
+        page_size: Cells per query (default: settings.PIPELINE_WINDOW_SIZE)
+    
+    Yields:
+        Grid cell IDs
+    """
+    for row in iter_region_cells(db, bounding_box, max_cells=max_cells, page_size=page_size):
+        yield row.cell_id
+
+def iter_region_cells(db: Session,
+                      bounding_box: List[float],
+                      columns: Sequence[Any] = (),
+                      max_cells: Optional[int] = None,
+                      page_size: Optional[int] = None) -> Iterator[Any]:
+    """
+    Stream rows of the cells inside a bounding box in id order (see iter_region_cell_ids)
+    
+    Args:
+        db: Database session
+        bounding_box: [min_lon, min_lat, max_lon, max_lat]
+        columns: GridCell columns to read besides id and cell_id
+        max_cells: Maximum number of cells to yield
+        page_size: Cells per query (default: settings.PIPELINE_WINDOW_SIZE)
+    
+    Yields:
+        Rows with id, cell_id and the requested columns
+    """
+    page_size = max(int(page_size or settings.PIPELINE_WINDOW_SIZE), 1)
+    remaining = max_cells
+    last_id = None
+    
+    while remaining is None or remaining > 0:
+        query = db.query(GridCell.id, GridCell.cell_id, *columns).filter(*_region_filter(bounding_box))
+        if last_id is not None:
+            query = query.filter(GridCell.id > last_id)
+        limit = page_size if remaining is None else min(page_size, remaining)
+        rows = query.order_by(GridCell.id).limit(limit).all()
+        
+        yield from rows
+        
+        if len(rows) < limit:
+            return
+        last_id = rows[-1].id
+        if remaining is not None:
+            remaining -= len(rows)
+
+def chunked(items: Iterable[Any], chunk_size: Optional[int] = None) -> Iterator[List[Any]]:
+    """Split items into chunks of at most chunk_size (default: settings.EE_BATCH_CHUNK_SIZE)"""
+    chunk_size = max(int(chunk_size or settings.EE_BATCH_CHUNK_SIZE), 1)
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def reduced_value(properties: Dict[str, Any], band: str, output: str) -> Optional[float]:
+    """
+    Read one reducer output from a feature reduced by reduceRegions
+    
+    Earth Engine names the outputs "<band>_<output>" for multi-band images
+    but only "<output>" for single-band images, and uses the band name for
+    single-output reducers over several bands.
+    """
+    for key in (f"{band}_{output}", output, band):
+        if key in properties:
+            return properties[key]
+    return None
@@ -0,0 +1,376 @@
+"""
+Earth Engine Reduction Cache
+============================
+Persistent, content-addressed cache of Earth Engine reductions.
+
+An entry holds the reduced values of one band over one geometry. Its key is
+a canonical hash of everything the values depend on: dataset ID, geometry
+WKB, filterDate window, scale, reducer outputs and the band expression.
+Identical reductions from reruns, single-cell requests and region jobs are
+then served locally instead of spending Earth Engine quota.
+
+Values are stored under canonical "<band>_<output>" names, whichever
+of reduceRegion or reduceRegions produced them, so per-cell and batched
+paths share entries. The store is a SQLite file with TTL expiry and
+least-recently-used eviction once it exceeds its size limit.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterable, Sequence, Hashable
+from shapely.geometry import Polygon
+
+from backend.data_processors.earth_engine.batch import reduced_value
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate all entries when the meaning of stored values changes
+CACHE_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reductions (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reductions_accessed ON reductions (accessed);
+CREATE INDEX IF NOT EXISTS reductions_created ON reductions (created);
+"""
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+def band_reduction(band: str,
+                   dataset: str,
+                   expression: str,
+                   outputs: Sequence[str],
+                   scale: float,
+                   date_window: Optional[Sequence[str]] = None,
+                   **extra: Any) -> Dict[str, Any]:
+    """
+    Describe the reduction of one band for cache keys
+    
+    Args:
+        band: Band name in the reduced image
+        dataset: Earth Engine dataset ID(s) the band is computed from
+        expression: How the band is computed from the dataset, e.g. "normalizedDifference(B8,B4).mean()"
+        outputs: Reducer outputs, e.g. ["mean", "stdDev"]
+        scale: Reduction scale in meters
+        date_window: filterDate (start, end) as YYYY-MM-DD strings, if the dataset is filtered by date
+        extra: Any further parameters the values depend on (e.g. a point buffer)
+    
+    Returns:
+        Reduction description
+    """
+    reduction = {
+        "band": band,
+        "dataset": dataset,
+        "expression": expression,
+        "outputs": list(outputs),
+        "scale": scale,
+        "date_window": list(date_window) if date_window else None
+    }
+    reduction.update(extra)
+    return reduction
+
+def monthly_date_window(months: int, today: Optional[date] = None) -> Tuple[datetime, datetime]:
+    """
+    Date window of the last `months` whole calendar months
+    
+    The window ends at the start of the current month (filterDate ends are
+    exclusive), so it changes once a month instead of daily and identical
+    reductions keep producing the same cache keys in the meantime.
+    
+    Args:
+        months: Length of the window in months
+        today: Reference day (default: today)
+    
+    Returns:
+        (start, end) datetimes
+    """
+    today = today or date.today()
+    end = datetime(today.year, today.month, 1)
+    index = end.year * 12 + end.month - 1 - months
+    start = datetime(index // 12, index % 12 + 1, 1)
+    return start, end
+
+def geometry_wkb(geometry: Any) -> bytes:
+    """WKB of a shapely geometry, WKB bytes or Earth Engine polygon coordinates"""
+    if isinstance(geometry, (bytes, bytearray)):
+        return bytes(geometry)
+    if hasattr(geometry, "wkb"):
+        return geometry.wkb
+    return Polygon(geometry[0], geometry[1:]).wkb
+
+def reduction_key(reduction: Dict[str, Any], geometry: Any) -> str:
+    """Canonical hash of a band reduction over a geometry"""
+    payload = json.dumps(
+        {"version": CACHE_VERSION, "geometry": geometry_wkb(geometry).hex(), "reduction": reduction},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ReductionCache:
+    """
+    SQLite store of reduced band values with TTL expiry, LRU eviction and hit/miss counters.
+    """
+    
+    def __init__(self,
+                 path: Optional[str] = None,
+                 max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None,
+                 bypass: Optional[bool] = None):
+        """
+        Args:
+            path: SQLite file (default: settings.EE_CACHE_PATH, in the user cache directory)
+            max_bytes: Size limit of the stored values, 0 = unlimited (default: settings.EE_CACHE_MAX_BYTES)
+            ttl_seconds: Entry lifetime, 0 = unlimited (default: settings.EE_CACHE_TTL_SECONDS)
+            bypass: Skip the cache entirely and always compute (default: settings.EE_CACHE_BYPASS)
+        """
+        self.path = path or settings.EE_CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else settings.EE_CACHE_MAX_BYTES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.EE_CACHE_TTL_SECONDS
+        self.bypass = bypass if bypass is not None else settings.EE_CACHE_BYPASS
+        self.metrics = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+        self.lock = threading.Lock()
+        self._connection = None
+        # Running size of the stored values, counted once when the store is opened
+        self._total_bytes = 0
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+            self._total_bytes = self._stored_bytes()
+        return self._connection
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Look up entries; expired entries are deleted and count as misses
+        
+        Returns:
+            Values of the keys found
+        """
+        keys = list(dict.fromkeys(keys))
+        if self.bypass or not keys:
+            return {}
+        
+        now = time.time()
+        found = {}
+        expired = []
+        with self.lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                rows = self.connection.execute(
+                    f"SELECT key, value, created FROM reductions WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, value, created in rows:
+                    if self.ttl_seconds and now - created > self.ttl_seconds:
+                        expired.append(key)
+                    else:
+                        found[key] = json.loads(value)
+            
+            self._delete(expired)
+            self.connection.executemany("UPDATE reductions SET accessed = ? WHERE key = ?", [(now, key) for key in found])
+            self.connection.commit()
+            
+            self.metrics["hits"] += len(found)
+            self.metrics["misses"] += len(keys) - len(found)
+            self.metrics["expired"] += len(expired)
+        
+        return found
+    
+    def put_many(self, items: Dict[str, Any]) -> None:
+        """Store entries, then evict the least recently used ones beyond the size limit"""
+        if self.bypass or not items:
+            return
+        
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            encoded = json.dumps(value)
+            rows.append((key, encoded, len(encoded), now, now))
+        
+        with self.lock:
+            # Replaced entries no longer count towards the size
+            self._total_bytes -= self._sizes(list(items))
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO reductions (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._total_bytes += sum(row[2] for row in rows)
+            self.metrics["writes"] += len(rows)
+            self._evict()
+            self.connection.commit()
+    
+    def cached_reductions(self,
+                          reductions: List[Dict[str, Any]],
+                          geometries: Dict[Hashable, Any],
+                          compute: Callable[[Dict[Hashable, Any]], Dict[Hashable, Dict[str, Any]]]) -> Dict[Hashable, Dict[str, Any]]:
+        """
+        Reduce bands over many geometries, computing only what is not cached
+        
+        Args:
+            reductions: One band_reduction() per reduced band
+            geometries: Geometries by ID (Earth Engine polygon coordinates, shapely geometries or WKB)
+            compute: Reduces the given subset of geometries and returns the
+                     reduceRegion/reduceRegions properties by ID; IDs left out
+                     (e.g. for lack of coverage) are neither cached nor returned
+        
+        Returns:
+            Canonical {"<band>_<output>": value} dictionaries by ID
+        """
+        keys = {
+            geometry_id: [reduction_key(reduction, geometry) for reduction in reductions]
+            for geometry_id, geometry in geometries.items()
+        }
+        cached = self.get_many(key for geometry_keys in keys.values() for key in geometry_keys)
+        
+        results = {}
+        missing = {}
+        for geometry_id, geometry in geometries.items():
+            if all(key in cached for key in keys[geometry_id]):
+                results[geometry_id] = {}
+                for key in keys[geometry_id]:
+                    results[geometry_id].update(cached[key])
+            else:
+                missing[geometry_id] = geometry
+        
+        if not missing:
+            return results
+        
+        computed = compute(missing)
+        entries = {}
+        for geometry_id, properties in computed.items():
+            if geometry_id not in missing:
+                continue
+            results[geometry_id] = {}
+            for reduction, key in zip(reductions, keys[geometry_id]):
+                values = {
+                    f"{reduction['band']}_{output}": reduced_value(properties, reduction["band"], output)
+                    for output in reduction["outputs"]
+                }
+                results[geometry_id].update(values)
+                entries[key] = values
+        self.put_many(entries)
+        
+        return results
+    
+    def cached_reduction(self,
+                         reductions: List[Dict[str, Any]],
+                         geometry: Any,
+                         compute: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Reduce bands over one geometry, computing only if not cached
+        
+        Args:
+            reductions: One band_reduction() per reduced band
+            geometry: Earth Engine polygon coordinates, shapely geometry or WKB
+            compute: Returns the reduceRegion properties, or None to cache nothing
+        
+        Returns:
+            Canonical {"<band>_<output>": value} dictionary, or None if compute returned None
+        """
+        def compute_one(geometries):
+            properties = compute()
+            return {} if properties is None else {0: properties}
+        
+        return self.cached_reductions(reductions, {0: geometry}, compute_one).get(0)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process plus the number and size of stored entries"""
+        with self.lock:
+            entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM reductions").fetchone()
+            stats = dict(self.metrics)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+            "bypass": self.bypass
+        })
+        return stats
+    
+    def clear(self) -> None:
+        """Delete all entries"""
+        with self.lock:
+            self.connection.execute("DELETE FROM reductions")
+            self.connection.commit()
+            self._total_bytes = 0
+    
+    def _stored_bytes(self) -> int:
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM reductions").fetchone()[0]
+    
+    def _sizes(self, keys: List[str]) -> int:
+        """Total size of the stored entries among keys"""
+        total = 0
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            total += self.connection.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM reductions WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchone()[0]
+        return total
+    
+    def _delete(self, keys: List[str]) -> None:
+        self._total_bytes -= self._sizes(keys)
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            self.connection.execute(f"DELETE FROM reductions WHERE key IN ({','.join('?' * len(batch))})", batch)
+    
+    def _evict(self) -> None:
+        """
+        Drop expired entries, then least recently used ones until the store fits max_bytes
+        
+        The size is tracked as entries are written and deleted instead of
+        being summed over the store on every write. Other processes sharing
+        the file are not seen, so the store is summed again before evicting.
+        """
+        if self.ttl_seconds:
+            cutoff = time.time() - self.ttl_seconds
+            self._total_bytes -= self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM reductions WHERE created < ?", (cutoff,)
+            ).fetchone()[0]
+            cursor = self.connection.execute("DELETE FROM reductions WHERE created < ?", (cutoff,))
+            self.metrics["expired"] += cursor.rowcount
+        
+        if not self.max_bytes or self._total_bytes <= self.max_bytes:
+            return
+        total = self._total_bytes = self._stored_bytes()
+        if total <= self.max_bytes:
+            return
+        
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM reductions ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+        self._delete(evicted)
+        self.metrics["evictions"] += len(evicted)
+        logger.info(f"Evicted {len(evicted)} least recently used Earth Engine cache entries")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_reduction_cache() -> ReductionCache:
+    """Process-wide reduction cache configured from settings"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReductionCache()
+        return _cache
@@ -8,15 +8,19 @@ for grid cells in the study area.
 import ee
 import numpy as np
 import pandas as pd
-import geopandas as gpd
 from shapely.geometry import Polygon, mapping
 import logging
 from typing import Dict, List, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.orm import Session
 
-from backend.data_processors.earth_engine.connector import EarthEngineConnector
-from backend.models.database import GridCell, EnvironmentalData
+from backend.data_processors.earth_engine.connector import create_connector
+from backend.data_processors.earth_engine.batch import load_cell_polygons, chunked, reduced_value, iter_region_cell_ids
+from backend.data_processors.earth_engine.executor import is_transient
+from backend.data_processors.earth_engine.metering import get_info
+from backend.data_processors.earth_engine.cache import band_reduction, monthly_date_window
+from backend.data_processors.earth_engine.writer import EnvironmentalDataWriter
+from backend.data_processors.earth_engine.cell_context import CellContext, load_cell_context
 from backend.utils.config import settings
 
 # Configure logging
@@ -39,39 +43,42 @@ class CanopyProcessor:
             db_session: SQLAlchemy database session
         """
         self.db = db_session
-        self.ee_connector = EarthEngineConnector()
+        self.ee_connector = create_connector()
         
         # Set default parameters
         self.gedi_collection = 'LARSE/GEDI/GEDI04_A_002'
         self.backup_collection = 'NASA/GEDI/GEDI02_A_002_MONTHLY'
         self.time_window_months = 24  # Use 2 years of data for stability
+        self.global_model = 'ETH/TREE_CANOPY_HEIGHT/V1'
+        self.biome_estimate = {"canopy_height_mean": 25.0, "canopy_height_std": 8.0}  # Approximate values for Amazon rainforest
     
-    def calculate_canopy_height_for_cell(self, cell_id: str) -> Dict[str, Any]:
+    def calculate_canopy_height_for_cell(self, cell_id: str, context: Optional[CellContext] = None) -> Dict[str, Any]:
         """
         Calculate canopy height statistics for a specific grid cell
         
         Args:
             cell_id: Grid cell ID
+            context: Preloaded cell geometry (see load_cell_contexts); loaded from the database if omitted
             
         Returns:
             Dictionary with canopy height data (mean, std, etc.)
         """
-        # Get cell geometry from database
-        cell = self.db.query(GridCell).filter(GridCell.cell_id == cell_id).first()
-        if not cell:
-            logger.error(f"Cell {cell_id} not found in database")
-            return {"error": "Cell not found"}
-            
-        # Convert PostGIS geometry to shapely geometry
-        cell_geom = gpd.GeoSeries.from_wkb([bytes(cell.geom.data)], crs="EPSG:4326")[0]
+        # Get cell geometry from database unless the caller shares it
+        if context is None:
+            context = load_cell_context(self.db, cell_id)
+            if context is None:
+                return {"error": "Cell not found"}
+        
+        if self.ee_connector.is_local:
+            # Local rasters are reduced in batches only
+            return self.calculate_canopy_height_for_cells([cell_id], polygons={cell_id: context.coords})[cell_id]
         
-        # Create EE geometry
-        coords = [[[p[0], p[1]] for p in list(cell_geom.exterior.coords)]]
-        ee_geom = self.ee_connector.create_geometry(coords)
+        # EE geometry of the cell
+        coords = context.coords
+        ee_geom = context.ee_geometry
         
-        # Set time window
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30*self.time_window_months)
+        # Set time window (whole months, so cache keys stay stable within a month)
+        start_date, end_date = monthly_date_window(self.time_window_months)
         
         # Get GEDI data
         try:
@@ -84,25 +91,32 @@ class CanopyProcessor:
                                                    end_date.strftime('%Y-%m-%d')) \
                                        .filterBounds(ee_geom)
             
-            # Check if we have enough GEDI samples
-            gedi_count = gedi_filtered.size().getInfo()
-            if gedi_count < 5:
-                logger.warning(f"Insufficient GEDI coverage for cell {cell_id}, using backup")
-                return self._use_backup_canopy_source(cell_id, ee_geom, start_date, end_date)
-            
-            # Extract canopy height (rh95 = relative height 95%)
-            gedi_with_height = gedi_filtered.select('rh95')
+            def reduce():
+                # Check if we have enough GEDI samples
+                gedi_count = get_info(gedi_filtered.size())
+                if gedi_count < 5:
+                    return None
+                
+                # Extract canopy height (rh95 = relative height 95%)
+                gedi_with_height = gedi_filtered.select('rh95').mean()
+                
+                # Aggregate the data
+                return get_info(gedi_with_height.reduceRegion(
+                    reducer=ee.Reducer.mean().combine(
+                        reducer2=ee.Reducer.stdDev(),
+                        sharedInputs=True
+                    ),
+                    geometry=ee_geom,
+                    scale=25,
+                    maxPixels=1e9
+                ))
             
-            # Aggregate the data
-            height_stats = gedi_with_height.reduceRegion(
-                reducer=ee.Reducer.mean().combine(
-                    reducer2=ee.Reducer.stdDev(),
-                    sharedInputs=True
-                ),
-                geometry=ee_geom,
-                scale=25,
-                maxPixels=1e9
-            ).getInfo()
+            height_stats = self.ee_connector.cache.cached_reduction(
+                self._height_reductions("gedi", start_date, end_date), coords, reduce
+            )
+            if height_stats is None:
+                logger.warning(f"Insufficient GEDI coverage for cell {cell_id}, using backup")
+                return self._use_backup_canopy_source(cell_id, ee_geom, coords, start_date, end_date)
             
             return {
                 "cell_id": cell_id,
@@ -117,7 +131,7 @@ class CanopyProcessor:
             logger.error(f"Error calculating canopy height for cell {cell_id}: {e}")
             # Fall back to backup source
             try:
-                return self._use_backup_canopy_source(cell_id, ee_geom, start_date, end_date)
+                return self._use_backup_canopy_source(cell_id, ee_geom, coords, start_date, end_date)
             except Exception as e2:
                 logger.error(f"Backup canopy source also failed for {cell_id}: {e2}")
                 return {"error": f"Canopy height calculation failed: {str(e2)}"}
@@ -125,6 +139,7 @@ class CanopyProcessor:
     def _use_backup_canopy_source(self, 
                                 cell_id: str, 
                                 ee_geom: ee.Geometry, 
+                                coords: List[List[List[float]]], 
                                 start_date: datetime, 
                                 end_date: datetime) -> Dict[str, Any]:
         """
@@ -142,24 +157,32 @@ class CanopyProcessor:
                                       end_date.strftime('%Y-%m-%d')) \
                           .filterBounds(ee_geom)
         
-        # If still no coverage, use a global canopy height model
-        if filtered.size().getInfo() < 2:
-            logger.warning(f"Using global canopy height model for {cell_id}")
-            return self._use_global_canopy_model(cell_id, ee_geom)
+        def reduce():
+            if get_info(filtered.size()) < 2:
+                return None
+            
+            # Select canopy height band
+            with_height = filtered.select('rh95').mean()
+            
+            # Reduce to get statistics
+            return get_info(with_height.reduceRegion(
+                reducer=ee.Reducer.mean().combine(
+                    reducer2=ee.Reducer.stdDev(),
+                    sharedInputs=True
+                ),
+                geometry=ee_geom,
+                scale=25,
+                maxPixels=1e9
+            ))
         
-        # Select canopy height band
-        with_height = filtered.select('rh95')
+        height_stats = self.ee_connector.cache.cached_reduction(
+            self._height_reductions("gedi_monthly", start_date, end_date), coords, reduce
+        )
         
-        # Reduce to get statistics
-        height_stats = with_height.reduceRegion(
-            reducer=ee.Reducer.mean().combine(
-                reducer2=ee.Reducer.stdDev(),
-                sharedInputs=True
-            ),
-            geometry=ee_geom,
-            scale=25,
-            maxPixels=1e9
-        ).getInfo()
+        # If still no coverage, use a global canopy height model
+        if height_stats is None:
+            logger.warning(f"Using global canopy height model for {cell_id}")
+            return self._use_global_canopy_model(cell_id, ee_geom, coords)
         
         return {
             "cell_id": cell_id,
@@ -170,7 +193,7 @@ class CanopyProcessor:
             "processing_timestamp": datetime.now().isoformat()
         }
     
-    def _use_global_canopy_model(self, cell_id: str, ee_geom: ee.Geometry) -> Dict[str, Any]:
+    def _use_global_canopy_model(self, cell_id: str, ee_geom: ee.Geometry, coords: List[List[List[float]]]) -> Dict[str, Any]:
         """
         Use global canopy height model as last resort
         
@@ -178,18 +201,22 @@ class CanopyProcessor:
         """
         # NOTE: 'ETH/TREE_CANOPY_HEIGHT/V1' is an example collection, verify the actual asset ID
         try:
-            canopy_model = ee.Image('ETH/TREE_CANOPY_HEIGHT/V1')
+            canopy_model = ee.Image(self.global_model)
             
             # Extract height from the model
-            height_stats = canopy_model.reduceRegion(
-                reducer=ee.Reducer.mean().combine(
-                    reducer2=ee.Reducer.stdDev(),
-                    sharedInputs=True
-                ),
-                geometry=ee_geom,
-                scale=30,
-                maxPixels=1e9
-            ).getInfo()
+            height_stats = self.ee_connector.cache.cached_reduction(
+                self._height_reductions("global_model"),
+                coords,
+                lambda: get_info(canopy_model.reduceRegion(
+                    reducer=ee.Reducer.mean().combine(
+                        reducer2=ee.Reducer.stdDev(),
+                        sharedInputs=True
+                    ),
+                    geometry=ee_geom,
+                    scale=30,
+                    maxPixels=1e9
+                ))
+            )
             
             return {
                 "cell_id": cell_id,
@@ -201,14 +228,151 @@ class CanopyProcessor:
         except Exception as e:
             logger.error(f"Global canopy model failed for {cell_id}: {e}")
             # Last resort - return a warning with estimated values from similar biomes
-            return {
-                "cell_id": cell_id,
-                "canopy_height_mean": 25.0,  # Approximate value for Amazon rainforest
-                "canopy_height_std": 8.0,
-                "source": "biome_estimate",
-                "warning": "No direct measurements available, using biome average",
-                "processing_timestamp": datetime.now().isoformat()
-            }
+            return self._biome_estimate(cell_id)
+    
+    def _biome_estimate(self, cell_id: str) -> Dict[str, Any]:
+        """Estimated canopy height from similar biomes, used when no measurements are available"""
+        return {
+            "cell_id": cell_id,
+            "canopy_height_mean": self.biome_estimate["canopy_height_mean"],
+            "canopy_height_std": self.biome_estimate["canopy_height_std"],
+            "source": "biome_estimate",
+            "warning": "No direct measurements available, using biome average",
+            "processing_timestamp": datetime.now().isoformat()
+        }
+    
+    def calculate_canopy_height_for_cells(self,
+                                          cell_ids: List[str],
+                                          chunk_size: Optional[int] = None,
+                                          polygons: Optional[Dict[str, List[List[List[float]]]]] = None,
+                                          raise_transient: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Calculate canopy height statistics for many grid cells in batched requests
+        
+        Each chunk of cells goes through the same sources as the single-cell
+        path (GEDI, monthly GEDI, global canopy model, biome estimate), with
+        one coverage check and one reduceRegions call per source; a source
+        only receives the cells the previous sources left without values.
+        
+        Args:
+            cell_ids: Grid cell IDs
+            chunk_size: Cells per Earth Engine request (default: settings.EE_BATCH_CHUNK_SIZE)
+            polygons: Preloaded cell polygons (see load_cell_polygons); loaded from the database if omitted
+            raise_transient: Re-raise transient Earth Engine errors (see is_transient) so the caller can retry or defer them
+            
+        Returns:
+            Dictionary mapping cell ID to canopy data as returned by calculate_canopy_height_for_cell
+        """
+        if polygons is None:
+            polygons = load_cell_polygons(self.db, cell_ids)
+        results = {cell_id: {"error": "Cell not found"} for cell_id in cell_ids if cell_id not in polygons}
+        
+        # Set time window (whole months, so cache keys stay stable within a month)
+        start_date, end_date = monthly_date_window(self.time_window_months)
+        
+        for chunk in chunked(list(polygons), chunk_size):
+            results.update(self._calculate_canopy_chunk(
+                {cell_id: polygons[cell_id] for cell_id in chunk}, start_date, end_date, raise_transient
+            ))
+        
+        return results
+    
+    def _calculate_canopy_chunk(self,
+                                cells: Dict[str, List[List[List[float]]]],
+                                start_date: datetime,
+                                end_date: datetime,
+                                raise_transient: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Reduce one chunk of cells, falling through the canopy sources for cells without values"""
+        time_window = f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+        sources = [
+            ("gedi", lambda region: self._gedi_composite(self.gedi_collection, region, start_date, end_date, 5), 'rh95', 25),
+            ("gedi_monthly", lambda region: self._gedi_composite(self.backup_collection, region, start_date, end_date, 2), 'rh95', 25),
+            ("global_model", lambda region: ee.Image(self.global_model), 'b1', 30)
+        ]
+        
+        results = {}
+        remaining = dict(cells)
+        
+        for source, build_composite, band, scale in sources:
+            def build_image(collection, source=source, build_composite=build_composite, band=band):
+                image = build_composite(collection)
+                if image is None:
+                    logger.warning(f"Insufficient {source} coverage for {len(remaining)} cells")
+                    return None
+                return image.select(band)
+            
+            reductions = self._height_reductions(source, start_date, end_date)
+            try:
+                height_stats = self.ee_connector.cache.cached_reductions(
+                    self.ee_connector.batch_reductions(reductions),
+                    remaining,
+                    lambda cells: self.ee_connector.reduce_cells(cells, reductions, scale, build_image)
+                )
+            except Exception as e:
+                if raise_transient and is_transient(e):
+                    raise
+                logger.error(f"Error calculating {source} canopy height for {len(remaining)} cells: {e}")
+                continue
+            
+            for cell_id in list(remaining):
+                stats = height_stats.get(cell_id, {})
+                height_mean = reduced_value(stats, band, 'mean')
+                if height_mean is None:
+                    continue
+                
+                results[cell_id] = {
+                    "cell_id": cell_id,
+                    "canopy_height_mean": height_mean,
+                    "canopy_height_std": reduced_value(stats, band, 'stdDev'),
+                    "source": source,
+                    "processing_timestamp": datetime.now().isoformat()
+                }
+                if source != "global_model":
+                    results[cell_id]["time_window"] = time_window
+                del remaining[cell_id]
+            
+            if not remaining:
+                break
+        
+        for cell_id in remaining:
+            results[cell_id] = self._biome_estimate(cell_id)
+        
+        return results
+    
+    def _height_reductions(self,
+                           source: str,
+                           start_date: Optional[datetime] = None,
+                           end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Reduction cache description of the canopy height of a source"""
+        dataset, band, expression, scale = {
+            "gedi": (self.gedi_collection, 'rh95', "rh95.mean() with >= 5 images", 25),
+            "gedi_monthly": (self.backup_collection, 'rh95', "rh95.mean() with >= 2 images", 25),
+            "global_model": (self.global_model, 'b1', "b1", 30)
+        }[source]
+        date_window = None
+        if source != "global_model":
+            date_window = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        return [band_reduction(band, dataset, expression, ("mean", "stdDev"), scale, date_window)]
+    
+    def _gedi_composite(self,
+                        collection_id: str,
+                        region: Any,
+                        start_date: datetime,
+                        end_date: datetime,
+                        min_images: int) -> Optional[ee.Image]:
+        """Mean rh95 composite of a GEDI collection, or None if it has fewer than min_images images"""
+        collection = self.ee_connector.get_image_collection(collection_id)
+        if not collection:
+            raise Exception(f"Failed to get collection {collection_id}")
+        
+        filtered = collection.filterDate(start_date.strftime('%Y-%m-%d'), 
+                                      end_date.strftime('%Y-%m-%d')) \
+                          .filterBounds(region)
+        
+        if get_info(filtered.size()) < min_images:
+            return None
+        
+        return filtered.select('rh95').mean()
     
     def process_region(self, 
                     bounding_box: List[float], 
@@ -216,6 +380,9 @@ class CanopyProcessor:
         """
         Process all cells in a region
         
+        Cells are streamed from the database and processed in batches of
+        DB_WRITE_BATCH_SIZE cells, each batch saved in one transaction.
+        
         Args:
             bounding_box: [min_lon, min_lat, max_lon, max_lat]
             max_cells: Maximum number of cells to process
@@ -223,63 +390,35 @@ class CanopyProcessor:
         Returns:
             Dictionary with processing results
         """
-        # Query cells in the bounding box
-        cells = self.db.query(GridCell).filter(
-            GridCell.lon_min >= bounding_box[0],
-            GridCell.lat_min >= bounding_box[1],
-            GridCell.lon_max <= bounding_box[2],
-            GridCell.lat_max <= bounding_box[3]
-        ).limit(max_cells).all()
-        
         results = {
             "processed": 0,
             "failed": 0,
             "cell_ids": []
         }
         
-        for cell in cells:
+        writer = EnvironmentalDataWriter(self.db, autocommit=False)
+        for batch in chunked(iter_region_cell_ids(self.db, bounding_box, max_cells), writer.batch_size):
+            canopy_results = self.calculate_canopy_height_for_cells(batch)
+            saved = [cell_id for cell_id in batch if "error" not in canopy_results[cell_id]]
+            
             try:
-                canopy_data = self.calculate_canopy_height_for_cell(cell.cell_id)
-                if "error" not in canopy_data:
-                    # Save to database
-                    self._save_canopy_to_database(canopy_data)
-                    results["processed"] += 1
-                    results["cell_ids"].append(cell.cell_id)
-                else:
-                    results["failed"] += 1
+                # Save to database
+                for cell_id in saved:
+                    writer.add("canopy", canopy_results[cell_id])
+                writer.flush()
+                results["processed"] += len(saved)
+                results["failed"] += len(batch) - len(saved)
+                results["cell_ids"].extend(saved)
             except Exception as e:
-                logger.error(f"Error processing cell {cell.cell_id}: {e}")
-                results["failed"] += 1
+                logger.error(f"Error saving canopy height data of {len(batch)} cells: {e}")
+                self.db.rollback()
+                writer.discard()
+                results["failed"] += len(batch)
         
         return results
     
     def _save_canopy_to_database(self, canopy_data: Dict[str, Any]) -> None:
         """Save canopy height data to database"""
-        cell_id = canopy_data["cell_id"]
-        
-        # Check if environmental data exists for this cell
-        env_data = self.db.query(EnvironmentalData).filter(
-            EnvironmentalData.cell_id == cell_id
-        ).first()
-        
-        if env_data:
-            # Update existing record
-            env_data.canopy_height_mean = canopy_data["canopy_height_mean"]
-            env_data.canopy_height_std = canopy_data["canopy_height_std"]
-            if "raw_data" in env_data.__dict__ and env_data.raw_data:
-                raw_data = env_data.raw_data.copy() if isinstance(env_data.raw_data, dict) else {}
-                raw_data["canopy"] = canopy_data
-                env_data.raw_data = raw_data
-            else:
-                env_data.raw_data = {"canopy": canopy_data}
-        else:
-            # Create new record
-            env_data = EnvironmentalData(
-                cell_id=cell_id,
-                canopy_height_mean=canopy_data["canopy_height_mean"],
-                canopy_height_std=canopy_data["canopy_height_std"],
-                raw_data={"canopy": canopy_data}
-            )
-            self.db.add(env_data)
-        
-        self.db.commit()
+        writer = EnvironmentalDataWriter(self.db)
+        writer.add("canopy", canopy_data)
+        writer.flush()
@@ -0,0 +1,98 @@
+"""
+Grid Cell Context
+=================
+Per-cell geometry shared by the Earth Engine processors.
+
+A CellContext is loaded once per cell (or once per batch of cells, with one
+query) and passed to every processor working on the cell, so the GridCell
+row is not queried, the WKB not decoded and the Earth Engine polygon not
+rebuilt by each processor again.
+"""
+
+import ee
+import geopandas as gpd
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from backend.models.database import GridCell
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class CellContext:
+    """
+    Geometry of one grid cell with lazily built, cached Earth Engine geometries.
+    """
+    
+    __slots__ = ("cell_id", "bounds", "geometry", "_coords", "_ee_geometry", "_buffers")
+    
+    def __init__(self, cell_id: str, geometry: Any):
+        """
+        Args:
+            cell_id: Grid cell ID
+            geometry: Shapely polygon of the cell (EPSG:4326)
+        """
+        self.cell_id = cell_id
+        self.geometry = geometry
+        self.bounds: Tuple[float, float, float, float] = geometry.bounds  # (min_lon, min_lat, max_lon, max_lat)
+        self._coords = None
+        self._ee_geometry = None
+        self._buffers: Dict[float, Tuple[List[List[List[float]]], ee.Geometry]] = {}
+    
+    @property
+    def coords(self) -> List[List[List[float]]]:
+        """Earth Engine polygon coordinates of the cell"""
+        if self._coords is None:
+            self._coords = [[[p[0], p[1]] for p in list(self.geometry.exterior.coords)]]
+        return self._coords
+    
+    @property
+    def ee_geometry(self) -> ee.Geometry:
+        """Earth Engine polygon of the cell"""
+        if self._ee_geometry is None:
+            self._ee_geometry = ee.Geometry.Polygon(self.coords)
+        return self._ee_geometry
+    
+    def buffer(self, distance: float) -> Tuple[List[List[List[float]]], ee.Geometry]:
+        """
+        Polygon coordinates and Earth Engine polygon of the cell buffered by distance
+        
+        Args:
+            distance: Buffer distance in degrees
+        
+        Returns:
+            (coordinates, Earth Engine geometry), cached per distance
+        """
+        if distance not in self._buffers:
+            coords = [[[p[0], p[1]] for p in list(self.geometry.buffer(distance).exterior.coords)]]
+            self._buffers[distance] = (coords, ee.Geometry.Polygon(coords))
+        return self._buffers[distance]
+
+def load_cell_contexts(db: Session, cell_ids: List[str]) -> Dict[str, CellContext]:
+    """
+    Load the contexts of many grid cells with one query
+    
+    Args:
+        db: Database session
+        cell_ids: Grid cell IDs
+    
+    Returns:
+        Cell contexts by cell ID, in the order of cell_ids; unknown cells are left out
+    """
+    if not cell_ids:
+        return {}
+    
+    rows = db.query(GridCell.cell_id, GridCell.geom).filter(GridCell.cell_id.in_(list(cell_ids))).all()
+    geometries = gpd.GeoSeries.from_wkb([bytes(row.geom.data) for row in rows], crs="EPSG:4326")
+    contexts = {row.cell_id: CellContext(row.cell_id, geometry) for row, geometry in zip(rows, geometries)}
+    
+    return {cell_id: contexts[cell_id] for cell_id in cell_ids if cell_id in contexts}
+
+def load_cell_context(db: Session, cell_id: str) -> Optional[CellContext]:
+    """Load the context of one grid cell, or None if the cell does not exist"""
+    context = load_cell_contexts(db, [cell_id]).get(cell_id)
+    if context is None:
+        logger.error(f"Cell {cell_id} not found in database")
+    return context
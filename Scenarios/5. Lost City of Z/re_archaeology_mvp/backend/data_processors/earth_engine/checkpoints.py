@@ -0,0 +1,147 @@
+"""
+Processing Checkpoints
+======================
+Per-cell progress records of region and batch processing tasks.
+
+Every (cell, data source) outcome of a task is written to
+task_cell_checkpoints. Rows are buffered and committed together with the
+task's progress and environmental data in batches, every
+CHECKPOINT_INTERVAL_SECONDS or CHECKPOINT_BATCH_SIZE rows, so a crash loses
+at most one batch and a resumed task only processes what has not succeeded
+yet.
+"""
+
+import json
+import time
+import logging
+from typing import Dict, List, Any, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+from backend.models.database import DataProcessingTask
+from backend.data_processors.earth_engine.writer import EnvironmentalDataWriter
+from backend.data_processors.earth_engine.quota import EERequestBudget
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_UPSERT = text(
+    "INSERT INTO public.task_cell_checkpoints "
+    "(task_id, cell_id, source, success, result, error_message, checkpointed_at) "
+    "VALUES (:task_id, :cell_id, :source, :success, CAST(:result AS JSONB), :error_message, NOW()) "
+    "ON CONFLICT (task_id, cell_id, source) DO UPDATE SET "
+    "success = EXCLUDED.success, result = EXCLUDED.result, "
+    "error_message = EXCLUDED.error_message, checkpointed_at = EXCLUDED.checkpointed_at"
+)
+
+def completed_sources(db: Session, task_id: int, cell_ids: Optional[List[str]] = None) -> Dict[str, Set[str]]:
+    """
+    Data sources each cell of a task has completed successfully
+    
+    Args:
+        db: Database session
+        task_id: Processing task ID
+        cell_ids: Only look up these cells (default: all cells of the task)
+    
+    Returns:
+        Set of completed sources by cell ID
+    """
+    query = "SELECT cell_id, source FROM public.task_cell_checkpoints WHERE task_id = :task_id AND success"
+    params: Dict[str, Any] = {"task_id": task_id}
+    if cell_ids is not None:
+        if not cell_ids:
+            return {}
+        query += " AND cell_id = ANY(:cell_ids)"
+        params["cell_ids"] = list(cell_ids)
+    rows = db.execute(text(query), params).fetchall()
+    
+    completed: Dict[str, Set[str]] = {}
+    for cell_id, source in rows:
+        completed.setdefault(cell_id, set()).add(source)
+    return completed
+
+def count_completed(db: Session, task_id: int, sources: List[str]) -> int:
+    """Number of (cell, source) pairs of a task completed successfully for the given sources"""
+    return db.execute(text(
+        "SELECT COUNT(*) FROM public.task_cell_checkpoints "
+        "WHERE task_id = :task_id AND success AND source = ANY(:sources)"
+    ), {"task_id": task_id, "sources": list(sources)}).scalar() or 0
+
+class CheckpointWriter:
+    """
+    Buffers per-cell checkpoints of a task and commits them with its progress in batches.
+    """
+    
+    def __init__(self,
+                 db: Session,
+                 task: DataProcessingTask,
+                 results: Dict[str, Any],
+                 interval_seconds: Optional[float] = None,
+                 batch_size: Optional[int] = None,
+                 data_writer: Optional[EnvironmentalDataWriter] = None,
+                 request_budget: Optional[EERequestBudget] = None):
+        """
+        Args:
+            db: Database session (used from the calling thread only)
+            task: Task the checkpoints belong to
+            results: Result dictionary of the running task, stored as its progress on every commit
+            interval_seconds: Commit at least this often while rows are buffered (default: settings.CHECKPOINT_INTERVAL_SECONDS)
+            batch_size: Commit once this many rows are buffered (default: settings.CHECKPOINT_BATCH_SIZE)
+            data_writer: Writer of the task's environmental data, committed in the same
+                         transactions (so a checkpoint never outlives the data it stands for);
+                         a full batch of it also triggers a commit
+            request_budget: Request budget of the task, whose daily usage is written in the
+                            same transactions
+        """
+        self.db = db
+        self.task = task
+        self.results = results
+        self.interval_seconds = interval_seconds if interval_seconds is not None else settings.CHECKPOINT_INTERVAL_SECONDS
+        self.batch_size = max(int(batch_size or settings.CHECKPOINT_BATCH_SIZE), 1)
+        self.data_writer = data_writer
+        self.request_budget = request_budget
+        self.rows: List[Dict[str, Any]] = []
+        self.last_commit = time.monotonic()
+        self.commits = 0
+    
+    def add(self,
+            cell_id: str,
+            source: str,
+            success: bool,
+            result: Optional[Dict[str, Any]] = None,
+            error_message: Optional[str] = None) -> None:
+        """Buffer the outcome of one data source for one cell, committing if a batch is due"""
+        self.rows.append({
+            "task_id": self.task.id,
+            "cell_id": cell_id,
+            "source": source,
+            "success": success,
+            "result": json.dumps(result, default=str) if result is not None else None,
+            "error_message": error_message
+        })
+        
+        if (len(self.rows) >= self.batch_size
+                or (self.data_writer is not None and self.data_writer.full)
+                or time.monotonic() - self.last_commit >= self.interval_seconds):
+            self.flush()
+    
+    def flush(self) -> None:
+        """Write the buffered checkpoints, environmental data, request usage and the task's progress in one transaction"""
+        if self.data_writer is not None:
+            self.data_writer.write()
+        if self.request_budget is not None:
+            self.request_budget.write()
+        if self.rows:
+            self.db.execute(_UPSERT, self.rows)
+        
+        self.task.results = self.results
+        flag_modified(self.task, "results")
+        self.db.commit()
+        
+        logger.info(f"Checkpointed {len(self.rows)} cell results of task {self.task.id}")
+        self.rows = []
+        self.last_commit = time.monotonic()
+        self.commits += 1
@@ -9,22 +9,71 @@ import os
 import ee
 import logging
 import json
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Callable
+from shapely.geometry import Polygon
+from backend.data_processors.earth_engine.cache import get_reduction_cache
+from backend.data_processors.earth_engine.pixels import (
+    PixelArrayReducer, MATRIX_OUTPUT, lattice_shape, lattice_points, lattice_matrix
+)
+from backend.data_processors.earth_engine.batch import reduced_value
+from backend.data_processors.earth_engine.metering import get_info
 from backend.utils.config import settings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Earth Engine refuses getInfo() on collections with more elements than this
+MAX_COLLECTION_ELEMENTS = 5000
+
+def lattice_chunk_limit(shape: Tuple[int, int]) -> int:
+    """Most cells one reduceRegions request can carry along with their lattice points"""
+    return max(MAX_COLLECTION_ELEMENTS // (1 + shape[0] * shape[1]), 1)
+
+def combined_reducer(reductions: List[Dict[str, Any]]) -> ee.Reducer:
+    """
+    One reducer with the outputs of all reductions (e.g. mean and stdDev), sharing its inputs
+    
+    Lattice matrices are read from the mean of their sample points, so the
+    "matrix" output adds a mean reducer.
+    """
+    outputs = list(dict.fromkeys(
+        "mean" if output == MATRIX_OUTPUT else output
+        for reduction in reductions for output in reduction["outputs"]
+    ))
+    reducer = getattr(ee.Reducer, outputs[0])()
+    for output in outputs[1:]:
+        reducer = reducer.combine(reducer2=getattr(ee.Reducer, output)(), sharedInputs=True)
+    return reducer
+
+def create_connector() -> Any:
+    """
+    Connector for the configured raster backend
+    
+    Returns:
+        EarthEngineConnector, or LocalRasterConnector with RASTER_BACKEND=local
+    """
+    if settings.RASTER_BACKEND.lower() == "local":
+        from backend.data_processors.local_raster.connector import LocalRasterConnector
+        return LocalRasterConnector()
+    return EarthEngineConnector()
+
 class EarthEngineConnector:
     """
     Manages connections to the Google Earth Engine API and provides
     utility methods for common Earth Engine operations.
     """
     
+    is_local = False
+    
     def __init__(self):
         """Initialize the Earth Engine connector and authenticate"""
         self.initialized = False
+        self.cache = get_reduction_cache()
+        self.reduction_backend = settings.EE_REDUCTION_BACKEND.lower()
+        if self.reduction_backend not in ("reduce_regions", "pixels"):
+            raise ValueError(f"Unknown EE_REDUCTION_BACKEND: {settings.EE_REDUCTION_BACKEND}")
+        self.pixel_reducer = PixelArrayReducer() if self.reduction_backend == "pixels" else None
         try:
             self._initialize()
         except Exception as e:
@@ -107,6 +156,156 @@ class EarthEngineConnector:
         """
         return ee.Geometry.Polygon(coords)
     
+    def create_feature_collection(self, cells: Dict[str, List[List[List[float]]]]) -> ee.FeatureCollection:
+        """
+        Create one Earth Engine feature collection from many grid cells
+        
+        Args:
+            cells: Polygon coordinates by cell ID; each feature carries its cell_id property
+            
+        Returns:
+            Earth Engine FeatureCollection object
+        """
+        return ee.FeatureCollection([
+            ee.Feature(self.create_geometry(coords), {"cell_id": cell_id})
+            for cell_id, coords in cells.items()
+        ])
+    
+    def reduce_regions(self,
+                       image: ee.Image,
+                       collection: ee.FeatureCollection,
+                       reducer: ee.Reducer,
+                       scale: float) -> Dict[str, Dict[str, Any]]:
+        """
+        Reduce an image over every feature of a collection in one request
+        
+        Args:
+            image: Earth Engine image to reduce
+            collection: Features with a cell_id property (see create_feature_collection)
+            reducer: Earth Engine reducer
+            scale: Reduction scale in meters
+            
+        Returns:
+            Reduced properties by cell ID
+        """
+        reduced = get_info(image.reduceRegions(
+            collection=collection,
+            reducer=reducer,
+            scale=scale
+        ))
+        
+        return {
+            feature["properties"]["cell_id"]: feature["properties"]
+            for feature in reduced.get("features", [])
+        }
+    
+    def reduce_cells(self,
+                     cells: Dict[str, List[List[List[float]]]],
+                     reductions: List[Dict[str, Any]],
+                     scale: float,
+                     build_image: Callable[[ee.FeatureCollection], Optional[ee.Image]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Reduce an image over many grid cells with the configured backend
+        
+        With EE_REDUCTION_BACKEND=reduce_regions the cells are reduced by one
+        reduceRegions request; with "pixels" the image is downloaded as pixel
+        arrays per region tile and the statistics are computed locally.
+        
+        Reductions with the "matrix" output sample the band on a regular
+        lattice over each cell (see lattice_points); with reduceRegions the
+        lattice points are reduced as point features of the same request.
+        Every point is a feature of the result, so cells beyond
+        max_cells_per_request() are split into further requests.
+        
+        Args:
+            cells: Polygon coordinates by cell ID
+            reductions: One band_reduction() per band, giving the band names and reducer outputs
+            scale: Reduction scale in meters
+            build_image: Builds the image to reduce from the cells as features
+                         (see create_feature_collection); returns None when the data does not cover them
+            
+        Returns:
+            Reduced properties by cell ID
+        """
+        collection = self.create_feature_collection(cells)
+        image = build_image(collection)
+        if image is None:
+            return {}
+        
+        if self.pixel_reducer is not None:
+            return self.pixel_reducer.zonal_statistics(image, cells, reductions, scale)
+        
+        shape = lattice_shape(reductions)
+        if shape is None:
+            return self.reduce_regions(image, collection, combined_reducer(reductions), scale)
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        samples = {cell_id: [] for cell_id in cells}
+        cell_ids = list(cells)
+        limit = lattice_chunk_limit(shape)
+        
+        for start in range(0, len(cell_ids), limit):
+            chunk = cell_ids[start:start + limit]
+            
+            # Cells and their lattice points in one collection, told apart by lattice_index
+            polygons = [Polygon(cells[cell_id][0], cells[cell_id][1:]) for cell_id in chunk]
+            features = [ee.Feature(self.create_geometry(cells[cell_id]), {"cell_id": cell_id}) for cell_id in chunk]
+            for cell_id, points in zip(chunk, lattice_points(polygons, shape)):
+                features.extend(
+                    ee.Feature(ee.Geometry.Point([float(x), float(y)]), {"cell_id": cell_id, "lattice_index": index})
+                    for index, (x, y) in enumerate(points)
+                )
+            
+            reduced = get_info(image.reduceRegions(
+                collection=ee.FeatureCollection(features),
+                reducer=combined_reducer(reductions),
+                scale=scale
+            ))
+            
+            for feature in reduced.get("features", []):
+                properties = feature["properties"]
+                if "lattice_index" in properties:
+                    samples[properties["cell_id"]].append(properties)
+                else:
+                    results[properties["cell_id"]] = properties
+        
+        for reduction in reductions:
+            if MATRIX_OUTPUT not in reduction["outputs"]:
+                continue
+            band = reduction["band"]
+            for cell_id, properties in results.items():
+                values = [None] * (shape[0] * shape[1])
+                for sample in samples[cell_id]:
+                    values[sample["lattice_index"]] = reduced_value(sample, band, "mean")
+                properties[f"{band}_{MATRIX_OUTPUT}"] = lattice_matrix(values, shape)
+        
+        return results
+    
+    def max_cells_per_request(self, lattice: Optional[Tuple[int, int]] = None) -> Optional[int]:
+        """
+        Most cells reduce_cells can reduce in one Earth Engine request
+        
+        Args:
+            lattice: (rows, cols) of the lattice sampled per cell, if any
+        
+        Returns:
+            Cell limit, or None when the request size does not depend on the cells
+        """
+        if lattice is None or self.pixel_reducer is not None:
+            return None
+        return lattice_chunk_limit(lattice)
+    
+    def batch_reductions(self, reductions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Cache descriptions of reductions computed by reduce_cells
+        
+        Local pixel statistics weight edge pixels differently from
+        reduceRegions, so their cache entries are kept apart.
+        """
+        if self.pixel_reducer is None:
+            return reductions
+        return [dict(reduction, method="pixels") for reduction in reductions]
+    
     def export_image(self, 
                      image: ee.Image, 
                      region: ee.Geometry, 
@@ -12,16 +12,121 @@ import ee
 import numpy as np
 from datetime import datetime
 from scipy.signal import savgol_filter
-from sklearn.linear_model import LinearRegression
-from skimage.measure import shannon_entropy
+from shapely.geometry import Point, box
 
+from backend.core.phi0_collapse.stages import collapse_grid, collapse_settings
 from backend.data_processors.earth_engine.auth import authenticate_earth_engine
+from backend.data_processors.earth_engine.batch import chunked, reduced_value
+from backend.data_processors.earth_engine.cache import band_reduction, get_reduction_cache
+from backend.data_processors.earth_engine.metering import get_info
+from backend.data_processors.earth_engine.pixels import METERS_PER_DEGREE
+from backend.data_processors.earth_engine.terrain import DEM_DATASET, get_terrain_stage
 from backend.utils.config import settings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Features stacked by the fast extraction mode; FractalNDVI needs a time series
+FAST_FEATURES = ["NDVI", "NDBI", "RH100", "Slope", "Curvature", "ElevationAnomaly", "NDVI_Entropy"]
+
+# Reduced feature bands: (dataset, expression, buffer_sizes key path, scale, filterDate window)
+FEATURE_BANDS = {
+    "NDVI": ("COPERNICUS/S2_SR_HARMONIZED", "median().normalizedDifference(B8,B4)", ("ndvi",), 10, ("2023-01-01", "2023-12-31")),
+    "NDBI": ("COPERNICUS/S2_SR_HARMONIZED", "median().normalizedDifference(B11,B8)", ("ndbi",), 10, ("2023-01-01", "2023-12-31")),
+    "NDVI_Entropy": ("COPERNICUS/S2_SR_HARMONIZED", "map(normalizedDifference(B8,B4)).reduce(stdDev)", ("ndvi",), 10, ("2023-01-01", "2023-12-31")),
+    "RH100": ("LARSE/GEDI/GEDI02_A_002_MONTHLY", "median().select(rh100)", ("rh100",), 30, ("2023-01-01", "2023-12-31")),
+    "Slope": ("USGS/SRTMGL1_003", "Terrain.slope", ("slope",), 30, None),
+    "Curvature": ("USGS/SRTMGL1_003", "sqrt(slope.gradient^2 + aspect.gradient^2).x", ("curvature",), 30, None),
+    "ElevationLocal": ("USGS/SRTMGL1_003", "elevation", ("elevation", "local"), 30, None),
+    "ElevationContext": ("USGS/SRTMGL1_003", "elevation", ("elevation", "context"), 30, None)
+}
+
+# Feature bands sampled from the terrain tiles (see TerrainStage) and the terrain product each one averages
+TERRAIN_FEATURES = {
+    "Slope": "slope",
+    "Curvature": "curvature",
+    "ElevationLocal": "elevation",
+    "ElevationContext": "elevation"
+}
+
+# FractalNDVI: NDVI time series (mean over the NDVI buffer per acquisition), smoothed,
+# detrended and reduced to the entropy of its residuals
+FRACTAL_BAND = (
+    "COPERNICUS/S2_SR_HARMONIZED",
+    "toBands(normalizedDifference(B8,B4)).savgol(5,2).detrend().shannon_entropy()",
+    10,
+    ("2018-01-01", "2023-12-31")
+)
+FRACTAL_MIN_OBSERVATIONS = 10
+
+def cache_geometry(lat, lon, cell_size=None):
+    """Reduction cache geometry of a location: the point, or the square cell of cell_size degrees around it."""
+    if cell_size is None:
+        return Point(lon, lat)
+    half = cell_size / 2.0
+    return box(lon - half, lat - half, lon + half, lat + half)
+
+def fractal_ndvi_batch(series):
+    """
+    FractalNDVI of many NDVI time series at once.
+    
+    Every series is smoothed with a Savitzky-Golay filter (window 5, order 2),
+    detrended with a closed-form least-squares line (the fit of a
+    LinearRegression on the time index) and reduced to the Shannon entropy of
+    its residuals, along the time axis of a matrix. Missing observations are
+    dropped and series of equal length share one matrix. Single points go
+    through the same computation, since the entropy counts exactly equal
+    residuals and a different rounding of the fit could change it.
+    
+    Note: this keeps the original recipe (skimage's shannon_entropy of the
+    float residuals), which is degenerate: residuals are practically never
+    exactly equal, so the value is log2 of the number of observations and
+    says nothing about the series' stability. Binning the residuals would
+    make it meaningful but change every stored FractalNDVI; that is left to
+    whoever owns the feature definition.
+    
+    Args:
+        series: (points, times) NDVI in time order, NaN where missing
+    
+    Returns:
+        (points,) FractalNDVI, NaN for series with fewer than FRACTAL_MIN_OBSERVATIONS values
+    """
+    series = np.asarray(series, dtype=np.float64)
+    valid = ~np.isnan(series)
+    lengths = valid.sum(axis=1)
+    
+    # Move the observations of every series to its front, keeping their order
+    order = np.argsort(~valid, axis=1, kind="stable")
+    compact = np.take_along_axis(series, order, axis=1)
+    
+    fractal = np.full(len(series), np.nan)
+    for length in np.unique(lengths[lengths >= FRACTAL_MIN_OBSERVATIONS]):
+        rows = np.flatnonzero(lengths == length)
+        smoothed = savgol_filter(compact[rows, :length], 5, 2, axis=1)
+        
+        # Residuals of the least-squares line over time, in closed form
+        time = np.arange(length) - (length - 1) / 2.0
+        centered = smoothed - smoothed.mean(axis=1, keepdims=True)
+        slope = centered @ time / (time @ time)
+        residuals = centered - slope[:, None] * time[None, :]
+        
+        fractal[rows] = _row_entropy(residuals)
+    return fractal
+
+def _row_entropy(values):
+    """Shannon entropy (bits) of the distinct values of every row, like skimage's shannon_entropy per row"""
+    n_rows, n_values = values.shape
+    ordered = np.sort(values, axis=1)
+    starts = np.ones(ordered.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    
+    # Length of every run of equal values, and the row it belongs to
+    counts = np.bincount(np.cumsum(starts.ravel()) - 1)
+    run_rows = np.repeat(np.arange(n_rows), starts.sum(axis=1))
+    probabilities = counts / n_values
+    return -np.bincount(run_rows, weights=probabilities * np.log2(probabilities), minlength=n_rows)
+
 class EnhancedEarthEngineConnector:
     """
     Enhanced Earth Engine connector with high-resolution (500m) grid cells
@@ -38,6 +143,8 @@ class EnhancedEarthEngineConnector:
         """Initialize the enhanced Earth Engine connector."""
         self.initialized = False
         self.use_high_resolution = use_high_resolution
+        self.cache = get_reduction_cache()
+        self.terrain = get_terrain_stage()
         self.config_file = os.path.join(os.path.dirname(__file__), "config", "high_resolution_settings.json")
         
         # Try to load the high-resolution configuration
@@ -68,6 +175,10 @@ class EnhancedEarthEngineConnector:
         """Get default configuration if high-resolution config is not available."""
         return {
             "grid_resolution": {"degrees": 0.005},  # ~500m resolution
+            "adaptive_scan": {
+                "coarse_degrees": 0.04,  # Finest resolution times a power of two
+                "refine_thresholds": {"phi0_score": 0.25, "attractor_influence": 0.1, "contradiction_strength": 0.25}
+            },
             "buffer_sizes": {
                 "ndvi": 250,
                 "ndbi": 250,
@@ -109,7 +220,7 @@ class EnhancedEarthEngineConnector:
                 10
             ).get("nd")
             
-            return val.getInfo()
+            return self._cached_value("NDVI", lat, lon, val)
         except Exception as e:
             logger.error(f"Error extracting NDVI: {e}")
             return None
@@ -145,7 +256,7 @@ class EnhancedEarthEngineConnector:
                 10
             ).get("nd")
             
-            return val.getInfo()
+            return self._cached_value("NDBI", lat, lon, val)
         except Exception as e:
             logger.error(f"Error extracting NDBI: {e}")
             return None
@@ -180,7 +291,7 @@ class EnhancedEarthEngineConnector:
                 30
             ).get("rh100")
             
-            return val.getInfo()
+            return self._cached_value("RH100", lat, lon, val)
         except Exception as e:
             logger.error(f"Error extracting RH100: {e}")
             return None
@@ -200,6 +311,9 @@ class EnhancedEarthEngineConnector:
             if not self.initialized:
                 logger.error("Earth Engine not initialized")
                 return None
+            
+            if self.terrain is not None:
+                return self._terrain_value("Slope", lat, lon)
                 
             point = ee.Geometry.Point([lon, lat])
             buffer_size = self.config["buffer_sizes"]["slope"]
@@ -211,7 +325,7 @@ class EnhancedEarthEngineConnector:
                 30
             ).get("slope")
             
-            return val.getInfo()
+            return self._cached_value("Slope", lat, lon, val)
         except Exception as e:
             logger.error(f"Error extracting slope: {e}")
             return None
@@ -231,6 +345,9 @@ class EnhancedEarthEngineConnector:
             if not self.initialized:
                 logger.error("Earth Engine not initialized")
                 return None
+            
+            if self.terrain is not None:
+                return self._terrain_value("Curvature", lat, lon)
                 
             point = ee.Geometry.Point([lon, lat])
             buffer_size = self.config["buffer_sizes"]["curvature"]
@@ -246,7 +363,7 @@ class EnhancedEarthEngineConnector:
                 30
             ).values().get(0)
             
-            return val.getInfo()
+            return self._cached_value("Curvature", lat, lon, val)
         except Exception as e:
             logger.error(f"Error extracting curvature: {e}")
             return None
@@ -266,6 +383,10 @@ class EnhancedEarthEngineConnector:
             if not self.initialized:
                 logger.error("Earth Engine not initialized")
                 return None
+            
+            if self.terrain is not None:
+                # Both means are sampled from the same terrain tile
+                return self._terrain_value("ElevationLocal", lat, lon) - self._terrain_value("ElevationContext", lat, lon)
                 
             point = ee.Geometry.Point([lon, lat])
             local_buffer = self.config["buffer_sizes"]["elevation"]["local"]
@@ -276,7 +397,7 @@ class EnhancedEarthEngineConnector:
             context = dem.reduceRegion(ee.Reducer.mean(), point.buffer(context_buffer), 30).get("elevation")
             
             # Return the anomaly (difference between local and context elevation)
-            return local.getInfo() - context.getInfo()
+            return self._cached_value("ElevationLocal", lat, lon, local) - self._cached_value("ElevationContext", lat, lon, context)
         except Exception as e:
             logger.error(f"Error extracting elevation anomaly: {e}")
             return None
@@ -310,9 +431,9 @@ class EnhancedEarthEngineConnector:
                 ee.Reducer.mean(), 
                 point.buffer(buffer_size), 
                 10
-            ).get("nd")
+            ).get("nd_stdDev")
             
-            return val.getInfo()
+            return self._cached_value("NDVI_Entropy", lat, lon, val)
         except Exception as e:
             logger.error(f"Error extracting NDVI entropy: {e}")
             return None
@@ -322,7 +443,9 @@ class EnhancedEarthEngineConnector:
         Compute fractal NDVI (temporal ecological stability) for a location.
         
         This uses the Savitzky-Golay filter method from the notebook to calculate
-        temporal stability of vegetation patterns.
+        temporal stability of vegetation patterns: the 2018-2023 NDVI series
+        around the point is smoothed, detrended and reduced to the Shannon
+        entropy of its residuals (see fractal_ndvi_batch).
         
         Args:
             lat: Latitude
@@ -336,44 +459,104 @@ class EnhancedEarthEngineConnector:
                 logger.error("Earth Engine not initialized")
                 return None
                 
-            point = ee.Geometry.Point([lon, lat])
-            buffer_size = self.config["buffer_sizes"]["ndvi"]
-            
-            # Get NDVI time series from 2018-2023
-            ts = ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")\
-                .filterBounds(point)\
-                .filterDate("2018-01-01", "2023-12-31")\
-                .map(lambda img: img.normalizedDifference(["B8", "B4"]).rename("ndvi"))\
-                .select("ndvi")\
-                .sort("system:time_start")
-            
-            # Convert to Python list
-            series = ts.aggregate_array("ndvi").getInfo()
-            
-            # Skip if not enough data points
-            if len(series) < 10:
-                return None
-                
-            # Apply Savitzky-Golay filter to smooth the time series
-            series = savgol_filter(series, 5, 2)
-            
-            # Create time array for linear regression
-            time = np.arange(len(series)).reshape(-1, 1)
-            
-            # Fit linear model to remove trend
-            model = LinearRegression().fit(time, series)
-            
-            # Calculate residuals
-            residuals = series - model.predict(time)
-            
-            # Calculate Shannon entropy of residuals (measures complexity/stability)
-            entropy = shannon_entropy(residuals)
-            
-            return entropy
+            # One-point batch, so the value matches compute_fractal_ndvi_batch
+            return self.cache.cached_reduction(
+                [self._fractal_reduction()], Point(lon, lat), lambda: self._fractal_values({0: (lat, lon)})[0]
+            )["FractalNDVI_value"]
         except Exception as e:
             logger.error(f"Error computing fractal NDVI: {e}")
             return None
     
+    def compute_fractal_ndvi_batch(self, points, chunk_size=None, cell_size=None):
+        """
+        Compute FractalNDVI for many locations, one request per chunk.
+        
+        The NDVI time series of a chunk are fetched together as a points x
+        time matrix (see _ndvi_time_series) and reduced with
+        fractal_ndvi_batch; the values are those of compute_fractal_ndvi.
+        
+        Args:
+            points: List of (lat, lon) pairs
+            chunk_size: Points per request (default: settings.EE_BATCH_CHUNK_SIZE)
+            cell_size: Average over the square cells of this size in degrees centred
+                       on the points instead of around the points (see _footprint)
+        
+        Returns:
+            List of FractalNDVI values (None where not computable) in the order of points
+        """
+        reduction = self._fractal_reduction()
+        results = []
+        
+        for chunk in chunked(list(points), chunk_size):
+            values = {}
+            try:
+                values = self.cache.cached_reductions(
+                    [reduction],
+                    {i: cache_geometry(lat, lon, cell_size) for i, (lat, lon) in enumerate(chunk)},
+                    lambda missing: self._fractal_values({i: chunk[i] for i in missing}, cell_size)
+                )
+            except Exception as e:
+                logger.error(f"Error computing fractal NDVI for {len(chunk)} points: {e}")
+            
+            results.extend(values.get(i, {}).get("FractalNDVI_value") for i in range(len(chunk)))
+        
+        return results
+    
+    def _fractal_values(self, points, cell_size=None):
+        """FractalNDVI by ID of many (lat, lon) points, from one time series request."""
+        if not self.initialized:
+            logger.error("Earth Engine not initialized")
+            return {}
+        
+        fractal = fractal_ndvi_batch(self._ndvi_time_series(list(points.values()), cell_size))
+        return {
+            point_id: {"FractalNDVI": None if np.isnan(value) else float(value)}
+            for point_id, value in zip(points, fractal)
+        }
+    
+    def _ndvi_time_series(self, points, cell_size=None):
+        """
+        Sentinel-2 NDVI time series around many points with one getInfo().
+        
+        The time-sorted collection is stacked into one image with a band per
+        acquisition (toBands) and reduced over the buffered points with
+        reduceRegions; the acquisition IDs, fetched in the same request, give
+        the order of the bands.
+        
+        Args:
+            points: List of (lat, lon) pairs
+            cell_size: Reduce over the cells of this size around the points (see _footprint)
+        
+        Returns:
+            (points, acquisitions) array of mean NDVI, NaN where an acquisition has no data
+        """
+        dataset, _, scale, (start, end) = FRACTAL_BAND
+        buffer_size = self.config["buffer_sizes"]["ndvi"]
+        regions = ee.FeatureCollection([
+            ee.Feature(self._footprint(lat, lon, buffer_size, cell_size), {"point_index": i})
+            for i, (lat, lon) in enumerate(points)
+        ])
+        
+        ts = ee.ImageCollection(dataset)\
+            .filterBounds(regions)\
+            .filterDate(start, end)\
+            .sort("system:time_start")
+        ndvi = ts.map(lambda img: img.normalizedDifference(["B8", "B4"]).rename("ndvi"))
+        
+        acquisitions, reduced = get_info(ee.List([
+            ts.aggregate_array("system:index"),
+            ndvi.toBands().reduceRegions(collection=regions, reducer=ee.Reducer.mean(), scale=scale)
+        ]))
+        
+        series = np.full((len(points), len(acquisitions)), np.nan)
+        for feature in reduced.get("features", []):
+            properties = feature["properties"]
+            for t, index in enumerate(acquisitions):
+                value = reduced_value(properties, f"{index}_ndvi", "mean")
+                if value is not None:
+                    series[properties["point_index"], t] = value
+        return series
+    
     def extract_all_features(self, lat, lon):
         """
         Extract all 7D attractor dimensions for a location.
@@ -408,6 +591,278 @@ class EnhancedEarthEngineConnector:
         
         return features
     
+    def _buffer_size(self, name):
+        """Buffer size in meters of a feature band, from the configuration."""
+        buffer_size = self.config["buffer_sizes"]
+        for key in FEATURE_BANDS[name][2]:
+            buffer_size = buffer_size[key]
+        return buffer_size
+    
+    def _feature_reduction(self, name):
+        """Reduction cache description of a feature band around a point."""
+        dataset, expression, _, scale, date_window = FEATURE_BANDS[name]
+        reduction = band_reduction(name, dataset, expression, ["mean"], scale, date_window, buffer=self._buffer_size(name))
+        if self.terrain is not None and name in TERRAIN_FEATURES:
+            return self.terrain.batch_reductions([reduction])[0]
+        return reduction
+    
+    def _fractal_reduction(self):
+        """Reduction cache description of FractalNDVI around a point."""
+        dataset, expression, scale, date_window = FRACTAL_BAND
+        return band_reduction(
+            "FractalNDVI", dataset, expression, ["value"], scale, date_window,
+            buffer=self.config["buffer_sizes"]["ndvi"]
+        )
+    
+    def _cached_value(self, name, lat, lon, value):
+        """Fetch a lazily computed feature value through the reduction cache."""
+        values = self.cache.cached_reduction(
+            [self._feature_reduction(name)], Point(lon, lat), lambda: {name: get_info(value)}
+        )
+        return values[f"{name}_mean"]
+    
+    def _footprint(self, lat, lon, buffer_size, cell_size=None):
+        """
+        Earth Engine geometry a band is reduced over for a location.
+        
+        Without cell_size this is the point grown by the band's buffer. With
+        cell_size it is the square cell of that size in degrees centred on
+        the point, grown by the same buffer, so coarse cells average their
+        whole area instead of a small disc at their centre.
+        """
+        if cell_size is None:
+            return ee.Geometry.Point([lon, lat]).buffer(buffer_size)
+        half = cell_size / 2.0
+        return ee.Geometry.Rectangle([lon - half, lat - half, lon + half, lat + half]).buffer(buffer_size)
+    
+    def _terrain_values(self, points, names, cell_size=None):
+        """Buffered means of terrain feature bands at many points (or cells), from the terrain tiles."""
+        if cell_size is None:
+            return self.terrain.point_values(
+                points, {name: (TERRAIN_FEATURES[name], self._buffer_size(name)) for name in names}
+            )
+        
+        # Cells grown by the buffer, as _footprint; bands sharing a buffer are reduced together
+        values = {point_id: {} for point_id in points}
+        buffers = {}
+        for name in names:
+            buffers.setdefault(self._buffer_size(name), []).append(name)
+        for buffer_size, buffer_names in buffers.items():
+            cells = {}
+            for point_id, (lat, lon) in points.items():
+                dlat = cell_size / 2.0 + buffer_size / METERS_PER_DEGREE
+                dlon = cell_size / 2.0 + buffer_size / METERS_PER_DEGREE / max(np.cos(np.radians(lat)), 1e-6)
+                cells[point_id] = [list(box(lon - dlon, lat - dlat, lon + dlon, lat + dlat).exterior.coords)]
+            bands = list(dict.fromkeys(TERRAIN_FEATURES[name] for name in buffer_names))
+            reductions = [band_reduction(band, DEM_DATASET, band, ("mean",), self.terrain.scale) for band in bands]
+            for point_id, stats in self.terrain.cell_statistics(cells, reductions).items():
+                for name in buffer_names:
+                    values[point_id][name] = stats.get(f"{TERRAIN_FEATURES[name]}_mean")
+        return values
+    
+    def _terrain_value(self, name, lat, lon):
+        """Fetch a terrain feature value of a point through the reduction cache."""
+        values = self.cache.cached_reduction(
+            [self._feature_reduction(name)], Point(lon, lat), lambda: self._terrain_values({0: (lat, lon)}, [name])[0]
+        )
+        return values[f"{name}_mean"]
+    
+    def _feature_images(self, region):
+        """
+        Stack the fast-mode feature bands into one image per (buffer, scale).
+        
+        The bands and scales are those of the individual getters, so each
+        value matches its getter; bands sharing a buffer and scale are
+        reduced together. Terrain bands are left out when they come from the
+        terrain tiles.
+        
+        Args:
+            region: Geometry or feature collection used to filter the collections
+        
+        Returns:
+            List of (buffer_size, scale, band_names, image) tuples
+        """
+        s2 = ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")\
+            .filterBounds(region)\
+            .filterDate("2023-01-01", "2023-12-31")
+        s2_median = s2.median()
+        
+        gedi = ee.ImageCollection("LARSE/GEDI/GEDI02_A_002_MONTHLY")\
+            .filterBounds(region)\
+            .filterDate("2023-01-01", "2023-12-31")\
+            .median()
+        
+        bands = {
+            "NDVI": s2_median.normalizedDifference(["B8", "B4"]),
+            "NDBI": s2_median.normalizedDifference(["B11", "B8"]),
+            "NDVI_Entropy": s2.map(lambda img: img.normalizedDifference(["B8", "B4"])).reduce(ee.Reducer.stdDev()),
+            "RH100": gedi.select("rh100")
+        }
+        
+        if self.terrain is None:
+            dem = ee.Image("USGS/SRTMGL1_003")
+            slope = ee.Terrain.slope(dem)
+            aspect = ee.Terrain.aspect(dem)
+            # get_curvature reads the first band of the gradient magnitude, "x"
+            curvature = slope.gradient().pow(2).add(aspect.gradient().pow(2)).sqrt().select("x")
+            bands.update({
+                "Slope": slope,
+                "Curvature": curvature,
+                "ElevationLocal": dem.select("elevation"),
+                "ElevationContext": dem.select("elevation")
+            })
+        
+        groups = {}
+        for name, image in bands.items():
+            key = (self._buffer_size(name), FEATURE_BANDS[name][3])
+            names, stacked = groups.get(key, ([], None))
+            image = image.rename(name)
+            groups[key] = (names + [name], stacked.addBands(image) if stacked is not None else image)
+        
+        return [(buffer_size, scale, names, image) for (buffer_size, scale), (names, image) in groups.items()]
+    
+    def _reduce_points(self, points, cell_size=None):
+        """
+        Reduce all feature bands around many points with one getInfo().
+        
+        With the terrain stage the terrain bands are sampled from the DEM
+        tiles instead, which costs one download per tile not yet cached.
+        
+        Args:
+            points: (lat, lon) pairs by ID
+            cell_size: Reduce over the cells of this size around the points (see _footprint)
+        
+        Returns:
+            Band values by ID
+        """
+        if not self.initialized:
+            logger.error("Earth Engine not initialized")
+            return {}
+        
+        ids = list(points)
+        centers = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Point([lon, lat]), {"point_index": i})
+            for i, (lat, lon) in enumerate(points.values())
+        ])
+        
+        groups = self._feature_images(centers)
+        reduced = get_info(ee.List([
+            image.reduceRegions(
+                collection=ee.FeatureCollection([
+                    ee.Feature(self._footprint(lat, lon, buffer_size, cell_size), {"point_index": i})
+                    for i, (lat, lon) in enumerate(points.values())
+                ]),
+                reducer=ee.Reducer.mean(),
+                scale=scale
+            )
+            for buffer_size, scale, _, image in groups
+        ]))
+        
+        values = {point_id: {} for point_id in ids}
+        for (_, _, names, _), collection in zip(groups, reduced):
+            for feature in collection.get("features", []):
+                properties = feature["properties"]
+                for name in names:
+                    values[ids[properties["point_index"]]][name] = reduced_value(properties, name, "mean")
+        
+        if self.terrain is not None:
+            for point_id, terrain_values in self._terrain_values(points, list(TERRAIN_FEATURES), cell_size).items():
+                values[point_id].update(terrain_values)
+        
+        return values
+    
+    def _fast_features(self, lat, lon, values, include_fractal, fractal=None):
+        """Build an extract_all_features result from the cached band values (and FractalNDVI)."""
+        features = {
+            "latitude": lat,
+            "longitude": lon,
+            "timestamp": datetime.utcnow().isoformat(),
+            "features": {}
+        }
+        
+        for name in FAST_FEATURES:
+            if name == "ElevationAnomaly":
+                local, context = values.get("ElevationLocal_mean"), values.get("ElevationContext_mean")
+                value = local - context if local is not None and context is not None else None
+            else:
+                value = values.get(f"{name}_mean")
+            features["features"][name] = value
+        
+        if include_fractal:
+            features["features"]["FractalNDVI"] = fractal
+        
+        success_count = sum(1 for val in features["features"].values() if val is not None)
+        features["success_ratio"] = success_count / len(features["features"])
+        
+        return features
+    
+    def extract_all_features_fast(self, lat, lon, include_fractal=False):
+        """
+        Extract the 7D attractor dimensions for a location in one request.
+        
+        All feature bands are stacked and reduced with ee.Reducer.mean() over
+        their buffers, and the reductions are combined into a single
+        getInfo() instead of one or two per feature; values already in the
+        reduction cache need no request. FractalNDVI needs the full NDVI time
+        series and is only computed, with one more request, when
+        include_fractal is set.
+        
+        Args:
+            lat: Latitude
+            lon: Longitude
+            include_fractal: Also compute FractalNDVI
+        
+        Returns:
+            Dictionary with all extracted features, as extract_all_features
+        """
+        return self.extract_all_features_fast_batch([(lat, lon)], include_fractal=include_fractal)[0]
+    
+    def extract_all_features_fast_batch(self, points, chunk_size=None, include_fractal=False, cell_size=None):
+        """
+        Extract the 7D attractor dimensions for many locations, one request per chunk.
+        
+        Each (buffer, scale) group is reduced over the uncached points of a
+        chunk with reduceRegions, and the group results are fetched together
+        with one getInfo(). FractalNDVI takes one more request per chunk
+        (see compute_fractal_ndvi_batch).
+        
+        Args:
+            points: List of (lat, lon) pairs, e.g. from create_grid
+            chunk_size: Points per request (default: settings.EE_BATCH_CHUNK_SIZE)
+            include_fractal: Also compute FractalNDVI (one more request per chunk)
+            cell_size: Reduce every band over the square cell of this size in degrees
+                       centred on each point, grown by the band's buffer, instead of
+                       around the point (see _footprint); for cells much larger than
+                       the buffers, such as the coarse levels of an adaptive scan
+        
+        Returns:
+            List of feature dictionaries in the order of points, as extract_all_features
+        """
+        reductions = [self._feature_reduction(name) for name in FEATURE_BANDS]
+        results = []
+        
+        for chunk in chunked(list(points), chunk_size):
+            values = {}
+            try:
+                values = self.cache.cached_reductions(
+                    reductions,
+                    {i: cache_geometry(lat, lon, cell_size) for i, (lat, lon) in enumerate(chunk)},
+                    lambda missing: self._reduce_points({i: chunk[i] for i in missing}, cell_size)
+                )
+            except Exception as e:
+                logger.error(f"Error extracting features for {len(chunk)} points: {e}")
+            
+            fractal = (
+                self.compute_fractal_ndvi_batch(chunk, chunk_size=len(chunk), cell_size=cell_size)
+                if include_fractal else [None] * len(chunk)
+            )
+            results.extend(
+                self._fast_features(lat, lon, values.get(i, {}), include_fractal, fractal[i])
+                for i, (lat, lon) in enumerate(chunk)
+            )
+        
+        return results
+    
     def create_grid(self, min_lat, min_lon, max_lat, max_lon, resolution=None):
         """
         Create a grid of points within a bounding box.
@@ -435,3 +890,46 @@ class EnhancedEarthEngineConnector:
             lat += resolution
         
         return grid_points
+    
+    def collapse_grid(self, points, seed_site=None, include_fractal=False, chunk_size=None):
+        """
+        Extract the features of a grid and run the ψ⁰ → φ⁰ collapse stages over it.
+        
+        The seed patch around seed_site gives the ψ⁰ signature; attractor
+        boosts and the collapse threshold come from the configuration's
+        symbolic_sites, attractor_boost and collapse_threshold.
+        
+        Args:
+            points: List of (lat, lon) pairs, e.g. from create_grid
+            seed_site: Site with "lat" and "lon" (default: the first lidar site of the configuration)
+            include_fractal: Also use FractalNDVI (one more request per chunk)
+            chunk_size: Points per request (default: settings.EE_BATCH_CHUNK_SIZE)
+            
+        Returns:
+            List of feature dictionaries as extract_all_features_fast_batch, each
+            with psi0_similarity, psi0_drift, boost, phi0_core, phi0_total and
+            collapse_zone added
+        """
+        collapse = collapse_settings(self.config)
+        if seed_site is None:
+            lidar = [site for site in collapse["sites"] if site.get("type") == "lidar"]
+            if not lidar:
+                raise ValueError("No seed site given and no lidar site configured")
+            seed_site = lidar[0]
+        
+        results = self.extract_all_features_fast_batch(points, chunk_size=chunk_size, include_fractal=include_fractal)
+        if not results:
+            return results
+        names = FAST_FEATURES + (["FractalNDVI"] if include_fractal else [])
+        features = np.array([[np.nan if result["features"].get(name) is None else result["features"][name]
+                              for name in names] for result in results], dtype=np.float64)
+        lats = np.array([lat for lat, _ in points], dtype=np.float64)
+        lons = np.array([lon for _, lon in points], dtype=np.float64)
+        
+        stages = collapse_grid(lats, lons, features, seed_site, collapse["sites"],
+                               collapse["boost_rules"], threshold=collapse["threshold"])
+        for i, result in enumerate(results):
+            for key, values in stages.items():
+                result[key] = values[i].item()
+        
+        return results
@@ -8,15 +8,20 @@ features like elevation, slope, and water proximity for grid cells.
 import ee
 import numpy as np
 import pandas as pd
-import geopandas as gpd
 from shapely.geometry import Polygon, mapping, LineString
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 
-from backend.data_processors.earth_engine.connector import EarthEngineConnector
-from backend.models.database import GridCell, EnvironmentalData
+from backend.data_processors.earth_engine.connector import create_connector
+from backend.data_processors.earth_engine.batch import load_cell_polygons, chunked, reduced_value, iter_region_cell_ids
+from backend.data_processors.earth_engine.executor import is_transient
+from backend.data_processors.earth_engine.metering import get_info
+from backend.data_processors.earth_engine.cache import band_reduction
+from backend.data_processors.earth_engine.writer import EnvironmentalDataWriter
+from backend.data_processors.earth_engine.cell_context import CellContext, load_cell_context
+from backend.data_processors.earth_engine.terrain import get_terrain_stage
 from backend.utils.config import settings
 
 # Configure logging
@@ -39,34 +44,38 @@ class EnvironmentalFeatureProcessor:
             db_session: SQLAlchemy database session
         """
         self.db = db_session
-        self.ee_connector = EarthEngineConnector()
+        self.ee_connector = create_connector()
+        # Local rasters derive slope and aspect themselves
+        self.terrain = None if self.ee_connector.is_local else get_terrain_stage()
         
         # Set default parameters
         self.dem_dataset = 'USGS/SRTMGL1_003'  # 30m SRTM
         self.water_dataset = 'JRC/GSW1_3/GlobalSurfaceWater'
         
-    def calculate_terrain_features(self, cell_id: str) -> Dict[str, Any]:
+    def calculate_terrain_features(self, cell_id: str, context: Optional[CellContext] = None) -> Dict[str, Any]:
         """
         Calculate terrain features (elevation, slope) for a specific grid cell
         
         Args:
             cell_id: Grid cell ID
+            context: Preloaded cell geometry (see load_cell_contexts); loaded from the database if omitted
             
         Returns:
             Dictionary with terrain data
         """
-        # Get cell geometry from database
-        cell = self.db.query(GridCell).filter(GridCell.cell_id == cell_id).first()
-        if not cell:
-            logger.error(f"Cell {cell_id} not found in database")
-            return {"error": "Cell not found"}
-            
-        # Convert PostGIS geometry to shapely geometry
-        cell_geom = gpd.GeoSeries.from_wkb([bytes(cell.geom.data)], crs="EPSG:4326")[0]
+        # Get cell geometry from database unless the caller shares it
+        if context is None:
+            context = load_cell_context(self.db, cell_id)
+            if context is None:
+                return {"error": "Cell not found"}
+        
+        if self.ee_connector.is_local or self.terrain is not None:
+            # Local rasters and terrain tiles are reduced in batches only
+            return self.calculate_terrain_features_for_cells([cell_id], polygons={cell_id: context.coords})[cell_id]
         
-        # Create EE geometry
-        coords = [[[p[0], p[1]] for p in list(cell_geom.exterior.coords)]]
-        ee_geom = self.ee_connector.create_geometry(coords)
+        # EE geometry of the cell
+        coords = context.coords
+        ee_geom = context.ee_geometry
         
         try:
             # Get DEM data
@@ -79,26 +88,26 @@ class EnvironmentalFeatureProcessor:
             aspect = ee.Terrain.aspect(dem)
             
             # Get statistics
-            terrain_stats = ee.Dictionary.combine(
-                dem.reduceRegion(
+            terrain_stats = self.ee_connector.cache.cached_reduction(
+                self._terrain_reductions(),
+                coords,
+                lambda: get_info(dem.reduceRegion(
                     reducer=ee.Reducer.mean().combine(reducer2=ee.Reducer.stdDev(), sharedInputs=True),
                     geometry=ee_geom,
                     scale=30,
                     maxPixels=1e9
-                ),
-                slope.reduceRegion(
+                ).combine(slope.reduceRegion(
                     reducer=ee.Reducer.mean().combine(reducer2=ee.Reducer.stdDev(), sharedInputs=True),
                     geometry=ee_geom,
                     scale=30,
                     maxPixels=1e9
-                ),
-                aspect.reduceRegion(
+                )).combine(aspect.reduceRegion(
                     reducer=ee.Reducer.mean(),
                     geometry=ee_geom,
                     scale=30,
                     maxPixels=1e9
-                )
-            ).getInfo()
+                )))
+            )
             
             return {
                 "cell_id": cell_id,
@@ -106,7 +115,7 @@ class EnvironmentalFeatureProcessor:
                 "elevation_std": terrain_stats.get('elevation_stdDev'),
                 "slope_mean": terrain_stats.get('slope_mean'),
                 "slope_std": terrain_stats.get('slope_stdDev'),
-                "aspect_mean": terrain_stats.get('aspect'),
+                "aspect_mean": terrain_stats.get('aspect_mean'),
                 "source": "srtm",
                 "processing_timestamp": datetime.now().isoformat()
             }
@@ -115,35 +124,34 @@ class EnvironmentalFeatureProcessor:
             logger.error(f"Error calculating terrain features for cell {cell_id}: {e}")
             return {"error": f"Terrain feature calculation failed: {str(e)}"}
     
-    def calculate_water_proximity(self, cell_id: str) -> Dict[str, Any]:
+    def calculate_water_proximity(self, cell_id: str, context: Optional[CellContext] = None) -> Dict[str, Any]:
         """
         Calculate proximity to water features for a specific grid cell
         
         Args:
             cell_id: Grid cell ID
+            context: Preloaded cell geometry (see load_cell_contexts); loaded from the database if omitted
             
         Returns:
             Dictionary with water proximity data
         """
-        # Get cell geometry from database
-        cell = self.db.query(GridCell).filter(GridCell.cell_id == cell_id).first()
-        if not cell:
-            logger.error(f"Cell {cell_id} not found in database")
-            return {"error": "Cell not found"}
-            
-        # Convert PostGIS geometry to shapely geometry
-        cell_geom = gpd.GeoSeries.from_wkb([bytes(cell.geom.data)], crs="EPSG:4326")[0]
+        # Get cell geometry from database unless the caller shares it
+        if context is None:
+            context = load_cell_context(self.db, cell_id)
+            if context is None:
+                return {"error": "Cell not found"}
+        
+        if self.ee_connector.is_local:
+            # Local rasters are reduced in batches only
+            return self.calculate_water_proximity_for_cells([cell_id], polygons={cell_id: context.coords})[cell_id]
         
-        # Create EE geometry for cell
-        cell_coords = [[[p[0], p[1]] for p in list(cell_geom.exterior.coords)]]
-        cell_ee_geom = self.ee_connector.create_geometry(cell_coords)
+        # EE geometry of the cell
+        cell_coords = context.coords
+        cell_ee_geom = context.ee_geometry
         
-        # Create a larger buffer for water feature search
+        # Larger buffer for water feature search
         buffer_distance = 0.05  # ~5km at equator
-        buffer_coords = cell_geom.buffer(buffer_distance)
-        buffer_ee_geom = self.ee_connector.create_geometry(
-            [[[p[0], p[1]] for p in list(buffer_coords.exterior.coords)]]
-        )
+        buffer_coords, buffer_ee_geom = context.buffer(buffer_distance)
         
         try:
             # Get JRC water data - occurrence represents % of time water was present
@@ -155,26 +163,30 @@ class EnvironmentalFeatureProcessor:
             # Compute distance to water
             distance = water_mask.fastDistanceTransform().multiply(ee.Image.pixelArea().sqrt())
             
-            # Get distance statistics
-            distance_stats = distance.reduceRegion(
-                reducer=ee.Reducer.min().combine(reducer2=ee.Reducer.mean(), sharedInputs=True),
-                geometry=cell_ee_geom,
-                scale=30,
-                maxPixels=1e9
-            ).getInfo()
+            # Get distance statistics and the water coverage fraction
+            water_stats = self.ee_connector.cache.cached_reduction(
+                self._water_reductions(),
+                cell_coords,
+                lambda: get_info(distance.reduceRegion(
+                    reducer=ee.Reducer.min().combine(reducer2=ee.Reducer.mean(), sharedInputs=True),
+                    geometry=cell_ee_geom,
+                    scale=30,
+                    maxPixels=1e9
+                ).combine(water_mask.reduceRegion(
+                    reducer=ee.Reducer.mean(),
+                    geometry=cell_ee_geom,
+                    scale=30,
+                    maxPixels=1e9
+                )))
+            )
             
             # Calculate water coverage percentage
-            water_coverage = water_mask.reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=cell_ee_geom,
-                scale=30,
-                maxPixels=1e9
-            ).getInfo().get('occurrence', 0) * 100  # Convert to percentage
+            water_coverage = (water_stats.get('occurrence_mean') or 0) * 100  # Convert to percentage
             
             return {
                 "cell_id": cell_id,
-                "water_proximity": distance_stats.get('distance_min'),  # Min distance to water in meters
-                "water_mean_distance": distance_stats.get('distance_mean'),  # Mean distance to water
+                "water_proximity": water_stats.get('distance_min'),  # Min distance to water in meters
+                "water_mean_distance": water_stats.get('distance_mean'),  # Mean distance to water
                 "water_coverage_percent": water_coverage,
                 "source": "jrc_gsw",
                 "processing_timestamp": datetime.now().isoformat()
@@ -184,6 +196,161 @@ class EnvironmentalFeatureProcessor:
             logger.error(f"Error calculating water proximity for cell {cell_id}: {e}")
             return {"error": f"Water proximity calculation failed: {str(e)}"}
     
+    def calculate_terrain_features_for_cells(self,
+                                             cell_ids: List[str],
+                                             chunk_size: Optional[int] = None,
+                                             polygons: Optional[Dict[str, List[List[List[float]]]]] = None,
+                                             raise_transient: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Calculate terrain features for many grid cells in batched requests
+        
+        With the terrain stage (EE_TERRAIN_BACKEND=tiles) the DEM is fetched
+        once per region tile and elevation, slope, aspect, curvature and
+        elevation anomaly are computed and reduced locally (see TerrainStage);
+        otherwise elevation, slope and aspect are stacked into one image and
+        each chunk of cells is reduced with a single reduceRegions call.
+        
+        Args:
+            cell_ids: Grid cell IDs
+            chunk_size: Cells per Earth Engine request (default: settings.EE_BATCH_CHUNK_SIZE)
+            polygons: Preloaded cell polygons (see load_cell_polygons); loaded from the database if omitted
+            raise_transient: Re-raise transient Earth Engine errors (see is_transient) so the caller can retry or defer them
+            
+        Returns:
+            Dictionary mapping cell ID to terrain data as returned by calculate_terrain_features
+        """
+        if polygons is None:
+            polygons = load_cell_polygons(self.db, cell_ids)
+        results = {cell_id: {"error": "Cell not found"} for cell_id in cell_ids if cell_id not in polygons}
+        
+        def build_image(collection):
+            # Stack DEM, slope and aspect into one image
+            dem = ee.Image(self.dem_dataset)
+            return dem.addBands(ee.Terrain.slope(dem)).addBands(ee.Terrain.aspect(dem))
+        
+        reductions = self._terrain_reductions()
+        if self.terrain is not None:
+            cache_reductions = self.terrain.batch_reductions(reductions)
+            reduce_chunk = lambda cells: self.terrain.cell_statistics(cells, reductions)
+        else:
+            cache_reductions = self.ee_connector.batch_reductions(reductions)
+            reduce_chunk = lambda cells: self.ee_connector.reduce_cells(cells, reductions, 30, build_image)
+        
+        for chunk in chunked(list(polygons), chunk_size):
+            try:
+                terrain_stats = self.ee_connector.cache.cached_reductions(
+                    cache_reductions,
+                    {cell_id: polygons[cell_id] for cell_id in chunk},
+                    reduce_chunk
+                )
+            except Exception as e:
+                if raise_transient and is_transient(e):
+                    raise
+                logger.error(f"Error calculating terrain features for {len(chunk)} cells: {e}")
+                results.update({cell_id: {"error": f"Terrain feature calculation failed: {str(e)}"} for cell_id in chunk})
+                continue
+            
+            for cell_id in chunk:
+                stats = terrain_stats.get(cell_id, {})
+                results[cell_id] = {
+                    "cell_id": cell_id,
+                    "elevation_mean": reduced_value(stats, 'elevation', 'mean'),
+                    "elevation_std": reduced_value(stats, 'elevation', 'stdDev'),
+                    "slope_mean": reduced_value(stats, 'slope', 'mean'),
+                    "slope_std": reduced_value(stats, 'slope', 'stdDev'),
+                    "aspect_mean": reduced_value(stats, 'aspect', 'mean'),
+                    "curvature_mean": reduced_value(stats, 'curvature', 'mean'),
+                    "elevation_anomaly_mean": reduced_value(stats, 'elevation_anomaly', 'mean'),
+                    "source": "srtm",
+                    "processing_timestamp": datetime.now().isoformat()
+                }
+        
+        return results
+    
+    def calculate_water_proximity_for_cells(self,
+                                            cell_ids: List[str],
+                                            chunk_size: Optional[int] = None,
+                                            polygons: Optional[Dict[str, List[List[List[float]]]]] = None,
+                                            raise_transient: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Calculate proximity to water features for many grid cells in batched requests
+        
+        The distance-to-water image and the water mask are stacked into one
+        image, so each chunk of cells needs a single reduceRegions call
+        instead of two reductions per cell.
+        
+        Args:
+            cell_ids: Grid cell IDs
+            chunk_size: Cells per Earth Engine request (default: settings.EE_BATCH_CHUNK_SIZE)
+            polygons: Preloaded cell polygons (see load_cell_polygons); loaded from the database if omitted
+            raise_transient: Re-raise transient Earth Engine errors (see is_transient) so the caller can retry or defer them
+            
+        Returns:
+            Dictionary mapping cell ID to water proximity data as returned by calculate_water_proximity
+        """
+        if polygons is None:
+            polygons = load_cell_polygons(self.db, cell_ids)
+        results = {cell_id: {"error": "Cell not found"} for cell_id in cell_ids if cell_id not in polygons}
+        
+        def build_image(collection):
+            # Water mask (areas where water occurs >25% of the time) and distance to it
+            water_mask = ee.Image(self.water_dataset).select('occurrence').gt(25)
+            distance = water_mask.fastDistanceTransform().multiply(ee.Image.pixelArea().sqrt())
+            return distance.addBands(water_mask)
+        
+        reductions = self._water_reductions()
+        
+        for chunk in chunked(list(polygons), chunk_size):
+            try:
+                water_stats = self.ee_connector.cache.cached_reductions(
+                    self.ee_connector.batch_reductions(reductions),
+                    {cell_id: polygons[cell_id] for cell_id in chunk},
+                    lambda cells: self.ee_connector.reduce_cells(cells, reductions, 30, build_image)
+                )
+            except Exception as e:
+                if raise_transient and is_transient(e):
+                    raise
+                logger.error(f"Error calculating water proximity for {len(chunk)} cells: {e}")
+                results.update({cell_id: {"error": f"Water proximity calculation failed: {str(e)}"} for cell_id in chunk})
+                continue
+            
+            for cell_id in chunk:
+                stats = water_stats.get(cell_id, {})
+                results[cell_id] = {
+                    "cell_id": cell_id,
+                    "water_proximity": reduced_value(stats, 'distance', 'min'),  # Min distance to water in meters
+                    "water_mean_distance": reduced_value(stats, 'distance', 'mean'),  # Mean distance to water
+                    "water_coverage_percent": (reduced_value(stats, 'occurrence', 'mean') or 0) * 100,  # Convert to percentage
+                    "source": "jrc_gsw",
+                    "processing_timestamp": datetime.now().isoformat()
+                }
+        
+        return results
+    
+    def _terrain_reductions(self) -> List[Dict[str, Any]]:
+        """Reduction cache description of the terrain statistics (curvature and elevation anomaly with terrain tiles only)"""
+        reductions = [
+            band_reduction('elevation', self.dem_dataset, "elevation", ("mean", "stdDev"), 30),
+            band_reduction('slope', self.dem_dataset, "Terrain.slope", ("mean", "stdDev"), 30),
+            band_reduction('aspect', self.dem_dataset, "Terrain.aspect", ("mean",), 30)
+        ]
+        if self.terrain is not None:
+            local, context = self.terrain.anomaly_windows
+            reductions += [
+                band_reduction('curvature', self.dem_dataset, "hypot(slope.gradient.x, aspect.gradient.x)", ("mean",), 30),
+                band_reduction('elevation_anomaly', self.dem_dataset,
+                               f"elevation.mean({local:g}m) - elevation.mean({context:g}m)", ("mean",), 30)
+            ]
+        return reductions
+    
+    def _water_reductions(self) -> List[Dict[str, Any]]:
+        """Reduction cache description of the water proximity statistics"""
+        return [
+            band_reduction('distance', self.water_dataset,
+                           "occurrence.gt(25).fastDistanceTransform().multiply(pixelArea.sqrt())", ("min", "mean"), 30),
+            band_reduction('occurrence', self.water_dataset, "occurrence.gt(25)", ("mean",), 30)
+        ]
+    
     def process_cell(self, cell_id: str) -> Dict[str, Any]:
         """
         Process all environmental features for a cell
@@ -194,20 +361,31 @@ class EnvironmentalFeatureProcessor:
         Returns:
             Dictionary with all environmental features
         """
+        # Calculate terrain features and water proximity from one shared cell geometry
+        context = load_cell_context(self.db, cell_id)
+        if context is None:
+            return self._save_cell_features(cell_id, {"error": "Cell not found"}, {"error": "Cell not found"})
+        terrain_data = self.calculate_terrain_features(cell_id, context)
+        water_data = self.calculate_water_proximity(cell_id, context)
+        
+        return self._save_cell_features(cell_id, terrain_data, water_data)
+    
+    def _save_cell_features(self,
+                            cell_id: str,
+                            terrain_data: Dict[str, Any],
+                            water_data: Dict[str, Any],
+                            writer: Optional[EnvironmentalDataWriter] = None) -> Dict[str, Any]:
+        """Combine the terrain and water results of a cell and save them to the database (or buffer them in writer)"""
         results = {
             "cell_id": cell_id,
             "features": {}
         }
         
-        # Calculate terrain features
-        terrain_data = self.calculate_terrain_features(cell_id)
         if "error" not in terrain_data:
             results["features"]["terrain"] = terrain_data
         else:
             results["features"]["terrain_error"] = terrain_data["error"]
         
-        # Calculate water proximity
-        water_data = self.calculate_water_proximity(cell_id)
         if "error" not in water_data:
             results["features"]["water"] = water_data
         else:
@@ -215,7 +393,7 @@ class EnvironmentalFeatureProcessor:
         
         # Save to database
         if "terrain" in results["features"] or "water" in results["features"]:
-            self._save_features_to_database(results)
+            self._save_features_to_database(results, writer)
             results["saved"] = True
         else:
             results["saved"] = False
@@ -228,6 +406,9 @@ class EnvironmentalFeatureProcessor:
         """
         Process all cells in a region
         
+        Cells are streamed from the database and processed in batches of
+        DB_WRITE_BATCH_SIZE cells, each batch saved in one transaction.
+        
         Args:
             bounding_box: [min_lon, min_lat, max_lon, max_lat]
             max_cells: Maximum number of cells to process
@@ -235,14 +416,6 @@ class EnvironmentalFeatureProcessor:
         Returns:
             Dictionary with processing results
         """
-        # Query cells in the bounding box
-        cells = self.db.query(GridCell).filter(
-            GridCell.lon_min >= bounding_box[0],
-            GridCell.lat_min >= bounding_box[1],
-            GridCell.lon_max <= bounding_box[2],
-            GridCell.lat_max <= bounding_box[3]
-        ).limit(max_cells).all()
-        
         results = {
             "processed": 0,
             "terrain_success": 0,
@@ -251,10 +424,25 @@ class EnvironmentalFeatureProcessor:
             "cell_ids": []
         }
         
-        for cell in cells:
+        writer = EnvironmentalDataWriter(self.db, autocommit=False)
+        for batch in chunked(iter_region_cell_ids(self.db, bounding_box, max_cells), writer.batch_size):
+            terrain_results = self.calculate_terrain_features_for_cells(batch)
+            water_results = self.calculate_water_proximity_for_cells(batch)
+            
             try:
-                cell_results = self.process_cell(cell.cell_id)
-                
+                batch_results = [
+                    self._save_cell_features(cell_id, terrain_results[cell_id], water_results[cell_id], writer)
+                    for cell_id in batch
+                ]
+                writer.flush()
+            except Exception as e:
+                logger.error(f"Error saving environmental features of {len(batch)} cells: {e}")
+                self.db.rollback()
+                writer.discard()
+                results["failed"] += len(batch)
+                continue
+            
+            for cell_results in batch_results:
                 if "terrain" in cell_results["features"]:
                     results["terrain_success"] += 1
                 
@@ -263,64 +451,20 @@ class EnvironmentalFeatureProcessor:
                 
                 if cell_results["saved"]:
                     results["processed"] += 1
-                    results["cell_ids"].append(cell.cell_id)
+                    results["cell_ids"].append(cell_results["cell_id"])
                 else:
                     results["failed"] += 1
-            except Exception as e:
-                logger.error(f"Error processing cell {cell.cell_id}: {e}")
-                results["failed"] += 1
         
         return results
     
-    def _save_features_to_database(self, results: Dict[str, Any]) -> None:
-        """Save environmental features to database"""
-        cell_id = results["cell_id"]
+    def _save_features_to_database(self, results: Dict[str, Any], writer: Optional[EnvironmentalDataWriter] = None) -> None:
+        """Save environmental features to database, or buffer them in writer to be saved with its batch"""
         features = results["features"]
         
-        # Check if environmental data exists for this cell
-        env_data = self.db.query(EnvironmentalData).filter(
-            EnvironmentalData.cell_id == cell_id
-        ).first()
-        
-        if env_data:
-            # Update existing record
-            if "terrain" in features:
-                env_data.elevation_mean = features["terrain"]["elevation_mean"]
-                env_data.elevation_std = features["terrain"]["elevation_std"]
-                env_data.slope_mean = features["terrain"]["slope_mean"]
-                env_data.slope_std = features["terrain"]["slope_std"]
-                
-            if "water" in features:
-                env_data.water_proximity = features["water"]["water_proximity"]
-                
-            # Update raw data
-            if "raw_data" in env_data.__dict__ and env_data.raw_data:
-                raw_data = env_data.raw_data.copy() if isinstance(env_data.raw_data, dict) else {}
-                if "terrain" in features:
-                    raw_data["terrain"] = features["terrain"]
-                if "water" in features:
-                    raw_data["water"] = features["water"]
-                env_data.raw_data = raw_data
-            else:
-                env_data.raw_data = features
-        else:
-            # Create new record
-            env_data_dict = {
-                "cell_id": cell_id,
-                "raw_data": features
-            }
-            
-            # Add individual fields
-            if "terrain" in features:
-                env_data_dict["elevation_mean"] = features["terrain"]["elevation_mean"]
-                env_data_dict["elevation_std"] = features["terrain"]["elevation_std"]
-                env_data_dict["slope_mean"] = features["terrain"]["slope_mean"]
-                env_data_dict["slope_std"] = features["terrain"]["slope_std"]
-                
-            if "water" in features:
-                env_data_dict["water_proximity"] = features["water"]["water_proximity"]
-            
-            env_data = EnvironmentalData(**env_data_dict)
-            self.db.add(env_data)
+        batch_writer = writer or EnvironmentalDataWriter(self.db)
+        for source in ("terrain", "water"):
+            if source in features:
+                batch_writer.add(source, features[source])
         
-        self.db.commit()
+        if writer is None:
+            batch_writer.flush()
@@ -0,0 +1,323 @@
+"""
+Earth Engine Request Executor
+=============================
+Runs Earth Engine jobs concurrently within the project's request quota.
+
+Earth Engine calls are I/O bound: a getInfo() spends almost all of its time
+waiting on the server, so a bounded thread pool keeps several requests in
+flight. The rate limit and the request budget (see quota.py) are charged per
+Earth Engine request, where the job sends it (see metering.py), so a job
+may make any number of requests. Every attempt gets a timeout, and attempts
+failing with a retryable error (HTTP 429, 5xx, timeouts) are retried after a
+jittered exponential backoff. Results are yielded as jobs complete, not in
+submission order. Once the budget is used up, a job fails with
+QuotaExhaustedError at its next request and the remaining jobs fail without
+being started, so submit the most valuable jobs first.
+
+The deadline of an attempt is enforced inside it: its requests stop once it
+has passed, and the Earth Engine client aborts requests running longer than
+EE_REQUEST_TIMEOUT (see auth.py). An attempt that still overruns is
+abandoned; its thread is left to finish in a retired pool, so it cannot hold
+a worker needed by new jobs.
+
+Jobs must not touch the SQLAlchemy session: load everything they need from
+the database in the calling thread before submitting them.
+"""
+
+import re
+import time
+import heapq
+import random
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterable, Iterator, Hashable
+
+from backend.data_processors.earth_engine.quota import EERequestBudget, QuotaExhaustedError
+from backend.data_processors.earth_engine.metering import RequestMeter, metered
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_RETRYABLE_STATUS = re.compile(r"\b(429|50[0-4])\b")
+_RETRYABLE_MESSAGES = ("too many", "rate limit", "quota exceeded", "try again", "timed out", "deadline", "unavailable")
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether an Earth Engine error is transient (HTTP 429/5xx, timeouts, rate limiting)
+    
+    The status is read from HTTP errors (e.g. googleapiclient HttpError) when
+    available; ee.EEException carries it only in its message.
+    """
+    if isinstance(error, QuotaExhaustedError):
+        return False
+    if isinstance(error, TimeoutError):
+        return True
+    
+    response = getattr(error, "resp", None)
+    status = getattr(response, "status", None) or getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int):
+        return status == 429 or 500 <= status < 600
+    
+    message = str(error).lower()
+    return bool(_RETRYABLE_STATUS.search(message)) or any(text in message for text in _RETRYABLE_MESSAGES)
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a job should leave an error to the executor instead of handling it
+    
+    Retryable errors are retried, and QuotaExhaustedError defers the job
+    until the task is resumed.
+    """
+    return isinstance(error, QuotaExhaustedError) or is_retryable(error)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `capacity` saved up for bursts.
+    """
+    
+    def __init__(self,
+                 rate: float,
+                 capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: Tokens added per second; 0 or less disables limiting
+            capacity: Maximum number of saved tokens (default: one second's worth, at least 1)
+            clock: Monotonic clock in seconds
+            sleep: Sleep function
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(self.rate, 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+    
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens, waiting until they are available
+        
+        Returns:
+            Seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
+        
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+class _Attempt:
+    """One try of a job"""
+    
+    __slots__ = ("key", "func", "args", "kwargs", "number", "started")
+    
+    def __init__(self, key: Hashable, func: Callable, args: tuple, kwargs: Dict[str, Any], number: int = 0):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.number = number
+        self.started: Optional[float] = None
+    
+    def retry(self) -> "_Attempt":
+        return _Attempt(self.key, self.func, self.args, self.kwargs, self.number + 1)
+
+class EERequestExecutor:
+    """
+    Bounded thread pool for Earth Engine jobs with rate limiting, timeouts and retries.
+    """
+    
+    def __init__(self,
+                 max_workers: Optional[int] = None,
+                 requests_per_second: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 60.0,
+                 seed: Optional[int] = None,
+                 budget: Optional[EERequestBudget] = None):
+        """
+        Args:
+            max_workers: Jobs in flight at once (default: settings.EE_MAX_CONCURRENT_REQUESTS)
+            requests_per_second: Token bucket rate (default: settings.EE_REQUESTS_PER_SECOND)
+            burst: Token bucket capacity (default: one second's worth)
+            timeout: Seconds an attempt may run (default: settings.EE_REQUEST_TIMEOUT, 0 = none)
+            max_retries: Retries per job after the first attempt (default: settings.EE_MAX_RETRIES)
+            backoff_base: Backoff before the first retry in seconds, doubled per retry
+            backoff_max: Upper bound of the backoff in seconds
+            seed: Seed for the backoff jitter
+            budget: Request budget each Earth Engine request is charged to (default: unlimited)
+        """
+        self.max_workers = max(int(max_workers or settings.EE_MAX_CONCURRENT_REQUESTS), 1)
+        self.rate_limiter = TokenBucket(
+            requests_per_second if requests_per_second is not None else settings.EE_REQUESTS_PER_SECOND,
+            burst
+        )
+        self.timeout = timeout if timeout is not None else settings.EE_REQUEST_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else settings.EE_MAX_RETRIES
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.random = random.Random(seed)
+        self.budget = budget
+        self.pool = self._new_pool()
+        # Pools left with abandoned attempts, shut down without waiting for them
+        self.retired_pools: List[ThreadPoolExecutor] = []
+        self.stats = {"completed": 0, "failed": 0, "retries": 0, "timeouts": 0, "over_budget": 0,
+                      "requests": 0, "throttled_seconds": 0.0}
+        self.stats_lock = threading.Lock()
+    
+    def __enter__(self) -> "EERequestExecutor":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.shutdown()
+    
+    def shutdown(self):
+        """Stop the worker threads; attempts abandoned after a timeout are not waited for"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        for pool in self.retired_pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _new_pool(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ee-request")
+    
+    def backoff(self, retry_number: int) -> float:
+        """Full-jitter exponential backoff before retry number retry_number (1-based)"""
+        return self.random.uniform(0.0, min(self.backoff_max, self.backoff_base * 2 ** (retry_number - 1)))
+    
+    def run(self,
+            jobs: Iterable[Tuple[Hashable, Callable, tuple, Dict[str, Any]]]) -> Iterator[Tuple[Hashable, Any, Optional[BaseException]]]:
+        """
+        Run jobs and yield their outcomes as they complete
+        
+        Args:
+            jobs: (key, function, args, kwargs) tuples
+        
+        Yields:
+            (key, result, None) for successful jobs and (key, None, error) for
+            jobs that failed with a permanent error, ran out of retries or ran
+            out of request budget (QuotaExhaustedError)
+        """
+        pending = deque(_Attempt(key, func, tuple(args), dict(kwargs)) for key, func, args, kwargs in jobs)
+        retries: List[Tuple[float, int, _Attempt]] = []
+        running: Dict[Future, _Attempt] = {}
+        sequence = 0
+        
+        while pending or retries or running:
+            now = time.monotonic()
+            while retries and retries[0][0] <= now:
+                pending.appendleft(heapq.heappop(retries)[2])
+            
+            while pending and len(running) < self.max_workers:
+                attempt = pending.popleft()
+                if self.budget is not None and not self.budget.available():
+                    self._count("over_budget")
+                    yield attempt.key, None, self.budget.exhausted
+                    continue
+                running[self.pool.submit(self._call, attempt)] = attempt
+            
+            if not running:
+                if not retries:
+                    continue
+                time.sleep(max(retries[0][0] - time.monotonic(), 0.0))
+                continue
+            
+            done, _ = wait(list(running), timeout=self._next_wakeup(running, retries), return_when=FIRST_COMPLETED)
+            
+            failed = []
+            for future in done:
+                attempt = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    self._count("completed")
+                    yield attempt.key, future.result(), None
+                else:
+                    failed.append((attempt, error))
+            
+            # Abandon attempts past their timeout; their threads finish in a retired pool
+            if self.timeout:
+                now = time.monotonic()
+                abandoned = False
+                for future, attempt in list(running.items()):
+                    if attempt.started is not None and now - attempt.started > self.timeout:
+                        running.pop(future)
+                        future.cancel()
+                        abandoned = True
+                        failed.append((attempt, TimeoutError(f"Earth Engine request timed out after {self.timeout}s")))
+                if abandoned:
+                    self.retired_pools.append(self.pool)
+                    self.pool.shutdown(wait=False)
+                    self.pool = self._new_pool()
+            
+            for attempt, error in failed:
+                if isinstance(error, TimeoutError):
+                    self._count("timeouts")
+                if isinstance(error, QuotaExhaustedError):
+                    self._count("over_budget")
+                    yield attempt.key, None, error
+                elif attempt.number < self.max_retries and is_retryable(error):
+                    retry = attempt.retry()
+                    delay = self.backoff(retry.number)
+                    self._count("retries")
+                    logger.warning(f"Retrying Earth Engine job {attempt.key} in {delay:.1f}s "
+                                   f"(retry {retry.number}/{self.max_retries}): {error}")
+                    sequence += 1
+                    heapq.heappush(retries, (time.monotonic() + delay, sequence, retry))
+                else:
+                    self._count("failed")
+                    logger.error(f"Earth Engine job {attempt.key} failed: {error}")
+                    yield attempt.key, None, error
+    
+    def _call(self, attempt: _Attempt) -> Any:
+        """Run one attempt in a worker thread, metering its Earth Engine requests"""
+        def on_wait(waited: float) -> None:
+            # Time spent waiting for tokens does not count towards the timeout
+            attempt.started += waited
+            self._count("throttled_seconds", waited)
+        
+        attempt.started = time.monotonic()
+        meter = RequestMeter(
+            self.rate_limiter,
+            self.budget,
+            deadline=attempt.started + self.timeout if self.timeout else None,
+            on_wait=on_wait
+        )
+        try:
+            with metered(meter):
+                return attempt.func(*attempt.args, **attempt.kwargs)
+        finally:
+            self._count("requests", meter.requests)
+    
+    def _next_wakeup(self, running: Dict[Future, _Attempt], retries: List[Tuple[float, int, _Attempt]]) -> Optional[float]:
+        """Seconds until the next attempt times out or the next retry is due"""
+        now = time.monotonic()
+        deadlines = [retry_at for retry_at, _, _ in retries[:1]]
+        if self.timeout:
+            deadlines += [attempt.started + self.timeout for attempt in running.values() if attempt.started is not None]
+            if any(attempt.started is None for attempt in running.values()):
+                # Attempts not started by the pool yet have no deadline; check again shortly
+                deadlines.append(now + min(self.timeout, 1.0))
+        if not deadlines:
+            return None
+        return max(min(deadlines) - now, 0.0) + 0.001
+    
+    def _count(self, name: str, value: float = 1):
+        with self.stats_lock:
+            self.stats[name] += value
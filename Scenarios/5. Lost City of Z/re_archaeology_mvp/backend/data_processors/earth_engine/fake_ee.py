@@ -0,0 +1,836 @@
+"""
+Fake Earth Engine Backend
+=========================
+A local, deterministic stand-in for the subset of the `ee` API used by the
+Earth Engine processors, for offline development and tests.
+
+Datasets are synthetic fields over (longitude, latitude): smooth terrain,
+forest NDVI with periodic clearings, a mesh of rivers and a canopy height
+that follows NDVI. Images are evaluated lazily on a pixel lattice covering
+each geometry at the requested scale (capped at MAX_SAMPLES_PER_AXIS pixels
+per axis), so reductions behave like their server-side counterparts at a
+coarser resolution.
+
+Every getInfo() and data.computePixels() call counts as one round trip;
+round_trips() lets callers check how many requests a code path would have
+sent to Earth Engine.
+
+Enable it with EE_BACKEND=fake, or call install() before importing the
+processors.
+"""
+
+import sys
+import math
+import warnings
+import numpy as np
+import logging
+from typing import Dict, Any, Optional, Callable, Sequence
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE = 111320.0
+MAX_SAMPLES_PER_AXIS = 16
+DISTANCE_SEARCH_PIXELS = 48
+DISTANCE_SEARCH_STEPS = 33
+BUFFER_VERTICES = 32
+# Like Earth Engine, getInfo() on larger collections fails
+MAX_GETINFO_ELEMENTS = 5000
+
+# lon, lat, scale (meters) -> values; NaN marks masked pixels
+BandFunction = Callable[[np.ndarray, np.ndarray, float], np.ndarray]
+
+_round_trips = 0
+
+class EEException(Exception):
+    """Raised for invalid requests, like ee.EEException"""
+
+def round_trips() -> int:
+    """Number of getInfo() calls since the last reset"""
+    return _round_trips
+
+def reset_round_trips():
+    """Reset the getInfo() counter"""
+    global _round_trips
+    _round_trips = 0
+
+def install():
+    """Register this module as `ee` so that `import ee` resolves to the fake backend"""
+    sys.modules["ee"] = sys.modules[__name__]
+    logger.info("Using the fake Earth Engine backend")
+
+def Initialize(*args, **kwargs):
+    """No-op, the fake backend needs no credentials"""
+    return None
+
+def Authenticate(*args, **kwargs):
+    """No-op, the fake backend needs no credentials"""
+    return None
+
+def ServiceAccountCredentials(*args, **kwargs):
+    """Placeholder credentials"""
+    return None
+
+# ---------------------------------------------------------------------------
+# Computed values
+# ---------------------------------------------------------------------------
+
+class ComputedObject:
+    """A value computed on getInfo()"""
+    
+    def __init__(self, compute: Callable[[], Any]):
+        self._compute = compute
+    
+    def getInfo(self) -> Any:
+        global _round_trips
+        _round_trips += 1
+        return self._compute()
+    
+    def _value(self) -> Any:
+        return self._compute()
+
+def _resolve(value: Any) -> Any:
+    """Evaluate nested computed values without counting a round trip"""
+    if isinstance(value, ComputedObject):
+        return value._value()
+    if isinstance(value, (list, tuple)):
+        return [_resolve(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _resolve(item) for key, item in value.items()}
+    return value
+
+class Number(ComputedObject):
+    def __init__(self, value: Any):
+        super().__init__(lambda: _resolve(value))
+
+class List(ComputedObject):
+    def __init__(self, values: Any):
+        super().__init__(lambda: list(_resolve(values)))
+    
+    def get(self, index: int) -> ComputedObject:
+        return ComputedObject(lambda: self._value()[index])
+
+class Dictionary(ComputedObject):
+    def __init__(self, values: Any = None):
+        super().__init__(lambda: dict(_resolve(values) or {}))
+    
+    def get(self, key: str) -> ComputedObject:
+        return ComputedObject(lambda: self._value().get(key))
+    
+    def values(self) -> List:
+        return List(ComputedObject(lambda: list(self._value().values())))
+    
+    def keys(self) -> List:
+        return List(ComputedObject(lambda: list(self._value().keys())))
+    
+    def combine(self, second: "Dictionary", overwrite: bool = True) -> "Dictionary":
+        def compute():
+            combined = dict(self._value())
+            for key, value in _resolve(second).items():
+                if overwrite or key not in combined:
+                    combined[key] = value
+            return combined
+        return Dictionary(ComputedObject(compute))
+
+# ---------------------------------------------------------------------------
+# Geometry
+# ---------------------------------------------------------------------------
+
+class Geometry:
+    """Polygon or point in longitude/latitude"""
+    
+    def __init__(self, rings: Sequence[Any], point: Optional[Sequence[float]] = None):
+        self.rings = [np.asarray(ring, dtype=np.float64) for ring in rings]
+        self.point = None if point is None else (float(point[0]), float(point[1]))
+    
+    @staticmethod
+    def Polygon(coords: Any, *args, **kwargs) -> "Geometry":
+        coords = np.asarray(coords, dtype=np.float64)
+        if coords.ndim == 2:
+            coords = coords[None]
+        return Geometry([ring for ring in coords])
+    
+    @staticmethod
+    def Rectangle(coords: Sequence[float], *args, **kwargs) -> "Geometry":
+        x0, y0, x1, y1 = coords
+        return Geometry([[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]])
+    
+    @staticmethod
+    def Point(coords: Sequence[float], *args, **kwargs) -> "Geometry":
+        return Geometry([], point=coords)
+    
+    def buffer(self, distance: float, *args, **kwargs) -> "Geometry":
+        """Buffer a point by distance meters (polygons are buffered by their bounding box)"""
+        lon, lat = self.centroid_coords()
+        dlat = distance / METERS_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        if self.point is not None:
+            angles = np.linspace(0, 2 * np.pi, BUFFER_VERTICES + 1)
+            return Geometry([np.column_stack((lon + dlon * np.cos(angles), lat + dlat * np.sin(angles)))])
+        x0, y0, x1, y1 = self.bounds_coords()
+        return Geometry.Rectangle([x0 - dlon, y0 - dlat, x1 + dlon, y1 + dlat])
+    
+    def bounds_coords(self):
+        if self.point is not None:
+            return self.point[0], self.point[1], self.point[0], self.point[1]
+        points = np.vstack(self.rings)
+        return points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()
+    
+    def centroid_coords(self):
+        if self.point is not None:
+            return self.point
+        x0, y0, x1, y1 = self.bounds_coords()
+        return (x0 + x1) / 2.0, (y0 + y1) / 2.0
+    
+    def bounds(self) -> "Geometry":
+        return Geometry.Rectangle(self.bounds_coords())
+    
+    def centroid(self, *args, **kwargs) -> "Geometry":
+        return Geometry.Point(self.centroid_coords())
+    
+    def contains(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """Even-odd point-in-polygon test"""
+        inside = np.zeros(np.shape(lon), dtype=bool)
+        for ring in self.rings:
+            x0, y0 = ring[:-1, 0], ring[:-1, 1]
+            x1, y1 = ring[1:, 0], ring[1:, 1]
+            for i in range(len(x0)):
+                crosses = (y0[i] > lat) != (y1[i] > lat)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    x_cross = x0[i] + (lat - y0[i]) * (x1[i] - x0[i]) / (y1[i] - y0[i])
+                inside ^= crosses & (lon < x_cross)
+        return inside
+    
+    def pixels(self, scale: float):
+        """Pixel centres at `scale` meters covering the geometry"""
+        if self.point is not None:
+            return np.array([self.point[0]]), np.array([self.point[1]])
+        
+        x0, y0, x1, y1 = self.bounds_coords()
+        lat_step = scale / METERS_PER_DEGREE
+        lon_step = lat_step / max(math.cos(math.radians((y0 + y1) / 2.0)), 1e-6)
+        nx = int(min(max(math.ceil((x1 - x0) / lon_step), 1), MAX_SAMPLES_PER_AXIS))
+        ny = int(min(max(math.ceil((y1 - y0) / lat_step), 1), MAX_SAMPLES_PER_AXIS))
+        
+        xs = x0 + (np.arange(nx) + 0.5) * (x1 - x0) / nx
+        ys = y0 + (np.arange(ny) + 0.5) * (y1 - y0) / ny
+        lon, lat = np.meshgrid(xs, ys)
+        inside = self.contains(lon, lat)
+        if not inside.any():
+            cx, cy = self.centroid_coords()
+            return np.array([cx]), np.array([cy])
+        return lon[inside], lat[inside]
+
+# ---------------------------------------------------------------------------
+# Reducers
+# ---------------------------------------------------------------------------
+
+def _nan_stat(func: Callable[[np.ndarray], float]) -> Callable[[np.ndarray], Optional[float]]:
+    def stat(values: np.ndarray) -> Optional[float]:
+        values = values[~np.isnan(values)]
+        return float(func(values)) if values.size else None
+    return stat
+
+class Reducer:
+    """Named outputs, each a function of the unmasked pixel values"""
+    
+    def __init__(self, outputs: list):
+        self.outputs = outputs
+    
+    @staticmethod
+    def mean() -> "Reducer":
+        return Reducer([("mean", _nan_stat(np.mean))])
+    
+    @staticmethod
+    def stdDev() -> "Reducer":
+        return Reducer([("stdDev", _nan_stat(np.std))])
+    
+    @staticmethod
+    def min() -> "Reducer":
+        return Reducer([("min", _nan_stat(np.min))])
+    
+    @staticmethod
+    def max() -> "Reducer":
+        return Reducer([("max", _nan_stat(np.max))])
+    
+    @staticmethod
+    def median() -> "Reducer":
+        return Reducer([("median", _nan_stat(np.median))])
+    
+    @staticmethod
+    def sum() -> "Reducer":
+        return Reducer([("sum", _nan_stat(np.sum))])
+    
+    @staticmethod
+    def count() -> "Reducer":
+        return Reducer([("count", lambda values: int((~np.isnan(values)).sum()))])
+    
+    def combine(self, reducer2: "Reducer", outputPrefix: str = "", sharedInputs: bool = False) -> "Reducer":
+        return Reducer(self.outputs + [(outputPrefix + name, func) for name, func in reducer2.outputs])
+    
+    def apply(self, values: np.ndarray) -> Dict[str, Any]:
+        return {name: func(values) for name, func in self.outputs}
+
+# ---------------------------------------------------------------------------
+# Images
+# ---------------------------------------------------------------------------
+
+def _masked(values: np.ndarray, *inputs: np.ndarray) -> np.ndarray:
+    """Propagate masks (NaN) of the inputs into values"""
+    values = np.asarray(values, dtype=np.float64)
+    for array in inputs:
+        values = np.where(np.isnan(array), np.nan, values)
+    return values
+
+class Image:
+    """Ordered bands, each a function of (lon, lat, scale)"""
+    
+    def __init__(self, source: Any = None, bands: Optional[Dict[str, BandFunction]] = None,
+                 properties: Optional[Dict[str, Any]] = None):
+        if isinstance(source, (int, float)):
+            value = float(source)
+            bands = {"constant": lambda lon, lat, scale: np.full(np.shape(lon), value)}
+        elif isinstance(source, str):
+            bands = _dataset_image(source)
+        elif isinstance(source, Image):
+            bands, properties = source.bands, source.properties
+        self.bands: Dict[str, BandFunction] = dict(bands or {})
+        self.properties: Dict[str, Any] = dict(properties or {})
+    
+    @staticmethod
+    def constant(value: float) -> "Image":
+        return Image(value)
+    
+    @staticmethod
+    def pixelArea() -> "Image":
+        return Image(bands={"area": lambda lon, lat, scale: np.full(np.shape(lon), float(scale) ** 2)})
+    
+    def bandNames(self) -> List:
+        return List(list(self.bands))
+    
+    def get(self, name: str) -> ComputedObject:
+        return ComputedObject(lambda: self.properties.get(name))
+    
+    def set(self, name: str, value: Any) -> "Image":
+        properties = dict(self.properties)
+        properties[name] = value
+        return Image(bands=self.bands, properties=properties)
+    
+    def _first(self) -> BandFunction:
+        return next(iter(self.bands.values()))
+    
+    def select(self, *names: Any) -> "Image":
+        if len(names) == 1 and isinstance(names[0], (list, tuple)):
+            names = names[0]
+        missing = [name for name in names if name not in self.bands]
+        if missing:
+            raise EEException(f"Image.select: Pattern '{missing[0]}' did not match any bands.")
+        return Image(bands={name: self.bands[name] for name in names}, properties=self.properties)
+    
+    def rename(self, *names: Any) -> "Image":
+        if len(names) == 1 and isinstance(names[0], (list, tuple)):
+            names = names[0]
+        if len(names) != len(self.bands):
+            raise EEException("Image.rename: number of names does not match number of bands.")
+        return Image(bands=dict(zip(names, self.bands.values())), properties=self.properties)
+    
+    def addBands(self, other: "Image", names: Any = None, overwrite: bool = False) -> "Image":
+        bands = dict(self.bands)
+        for name, func in other.bands.items():
+            if name in bands and not overwrite:
+                raise EEException(f"Image.addBands: duplicate band name '{name}'.")
+            bands[name] = func
+        return Image(bands=bands, properties=self.properties)
+    
+    def _map_bands(self, op: Callable[[np.ndarray, np.ndarray], np.ndarray], other: Any) -> "Image":
+        if isinstance(other, Image):
+            other_func = other._first()
+        else:
+            value = float(_resolve(other))
+            other_func = lambda lon, lat, scale: np.full(np.shape(lon), value)
+        
+        def wrap(func):
+            def band(lon, lat, scale):
+                a, b = func(lon, lat, scale), other_func(lon, lat, scale)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    return _masked(op(np.nan_to_num(a), np.nan_to_num(b)), a, b)
+            return band
+        
+        return Image(bands={name: wrap(func) for name, func in self.bands.items()}, properties=self.properties)
+    
+    def add(self, other: Any) -> "Image":
+        return self._map_bands(np.add, other)
+    
+    def subtract(self, other: Any) -> "Image":
+        return self._map_bands(np.subtract, other)
+    
+    def multiply(self, other: Any) -> "Image":
+        return self._map_bands(np.multiply, other)
+    
+    def divide(self, other: Any) -> "Image":
+        return self._map_bands(np.divide, other)
+    
+    def pow(self, other: Any) -> "Image":
+        return self._map_bands(np.power, other)
+    
+    def gt(self, other: Any) -> "Image":
+        return self._map_bands(np.greater, other)
+    
+    def gte(self, other: Any) -> "Image":
+        return self._map_bands(np.greater_equal, other)
+    
+    def lt(self, other: Any) -> "Image":
+        return self._map_bands(np.less, other)
+    
+    def lte(self, other: Any) -> "Image":
+        return self._map_bands(np.less_equal, other)
+    
+    def eq(self, other: Any) -> "Image":
+        return self._map_bands(np.equal, other)
+    
+    def neq(self, other: Any) -> "Image":
+        return self._map_bands(np.not_equal, other)
+    
+    def And(self, other: Any) -> "Image":
+        return self._map_bands(np.logical_and, other)
+    
+    def Or(self, other: Any) -> "Image":
+        return self._map_bands(np.logical_or, other)
+    
+    def bitwiseAnd(self, other: Any) -> "Image":
+        return self._map_bands(lambda a, b: np.bitwise_and(a.astype(np.int64), b.astype(np.int64)), other)
+    
+    def sqrt(self) -> "Image":
+        return self._map_bands(lambda a, b: np.sqrt(a), 0)
+    
+    def abs(self) -> "Image":
+        return self._map_bands(lambda a, b: np.abs(a), 0)
+    
+    def toFloat(self) -> "Image":
+        return self
+    
+    def mask(self) -> "Image":
+        """1 where a band has data, 0 where it is masked"""
+        def wrap(func):
+            def band(lon, lat, scale):
+                return np.where(np.isnan(func(lon, lat, scale)), 0.0, 1.0)
+            return band
+        
+        return Image(bands={name: wrap(func) for name, func in self.bands.items()}, properties=self.properties)
+    
+    def normalizedDifference(self, bandNames: Sequence[str]) -> "Image":
+        first, second = self.bands[bandNames[0]], self.bands[bandNames[1]]
+        
+        def nd(lon, lat, scale):
+            a, b = first(lon, lat, scale), second(lon, lat, scale)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return (a - b) / (a + b)
+        
+        return Image(bands={"nd": nd}, properties=self.properties)
+    
+    def updateMask(self, mask: "Image") -> "Image":
+        mask_func = mask._first()
+        
+        def wrap(func):
+            def band(lon, lat, scale):
+                m = mask_func(lon, lat, scale)
+                return np.where(np.isnan(m) | (m == 0), np.nan, func(lon, lat, scale))
+            return band
+        
+        return Image(bands={name: wrap(func) for name, func in self.bands.items()}, properties=self.properties)
+    
+    def gradient(self) -> "Image":
+        func = self._first()
+        
+        def derivative(axis):
+            def band(lon, lat, scale):
+                dlat = scale / METERS_PER_DEGREE
+                dlon = dlat / np.maximum(np.cos(np.radians(lat)), 1e-6)
+                if axis == "x":
+                    return (func(lon + dlon, lat, scale) - func(lon - dlon, lat, scale)) / (2 * scale)
+                return (func(lon, lat + dlat, scale) - func(lon, lat - dlat, scale)) / (2 * scale)
+            return band
+        
+        return Image(bands={"x": derivative("x"), "y": derivative("y")}, properties=self.properties)
+    
+    def fastDistanceTransform(self, neighborhood: int = 256, units: str = "pixels", metric: str = "squared_euclidean") -> "Image":
+        """Squared distance in pixels to the nearest non-zero pixel (masked beyond the search radius)"""
+        func = self._first()
+        radius = min(neighborhood, DISTANCE_SEARCH_PIXELS)
+        offsets = np.linspace(-radius, radius, DISTANCE_SEARCH_STEPS)
+        ox, oy = np.meshgrid(offsets, offsets)
+        ox, oy = ox.ravel(), oy.ravel()
+        
+        def distance(lon, lat, scale):
+            lon, lat = np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+            dlat = scale / METERS_PER_DEGREE
+            dlon = dlat / np.maximum(np.cos(np.radians(lat)), 1e-6)
+            values = func(lon[..., None] + ox * dlon[..., None], lat[..., None] + oy * dlat, scale)
+            squared = np.where(np.nan_to_num(values) != 0, ox ** 2 + oy ** 2, np.inf).min(axis=-1)
+            return np.where(np.isinf(squared), np.nan, squared)
+        
+        return Image(bands={"distance": distance}, properties=self.properties)
+    
+    def _sample(self, lon: np.ndarray, lat: np.ndarray, scale: float) -> Dict[str, np.ndarray]:
+        return {name: np.asarray(func(lon, lat, scale), dtype=np.float64) for name, func in self.bands.items()}
+    
+    def _reduce(self, reducer: Reducer, geometry: Geometry, scale: float, multi_band_names: bool) -> Dict[str, Any]:
+        lon, lat = geometry.pixels(scale)
+        samples = self._sample(lon, lat, scale)
+        result = {}
+        for band, values in samples.items():
+            for output, value in reducer.apply(values).items():
+                if len(reducer.outputs) == 1:
+                    key = band if multi_band_names else output
+                elif multi_band_names:
+                    key = f"{band}_{output}"
+                else:
+                    key = output
+                result[key] = value
+        return result
+    
+    def reduceRegion(self, reducer: Reducer = None, geometry: Geometry = None, scale: float = None,
+                     maxPixels: float = None, **kwargs) -> Dictionary:
+        scale = scale or 30
+        return Dictionary(ComputedObject(lambda: self._reduce(reducer, geometry, scale, True)))
+    
+    def reduceRegions(self, collection: "FeatureCollection" = None, reducer: Reducer = None, scale: float = None,
+                      **kwargs) -> "FeatureCollection":
+        """Reduce every feature; like Earth Engine, single-band outputs are named after the reducer outputs"""
+        scale = scale or 30
+        multi_band = len(self.bands) > 1
+        
+        def compute():
+            features = []
+            for feature in collection._features():
+                properties = dict(feature.properties)
+                properties.update(self._reduce(reducer, feature.geometry, scale, multi_band))
+                features.append(Feature(feature.geometry, properties))
+            return features
+        
+        return FeatureCollection(ComputedObject(compute))
+    
+    def sampleRegions(self, collection: "FeatureCollection" = None, properties: Any = None, scale: float = None,
+                      geometries: bool = False, **kwargs) -> "FeatureCollection":
+        scale = scale or 30
+        
+        def compute():
+            features = []
+            for feature in collection._features():
+                lon, lat = feature.geometry.pixels(scale)
+                samples = self._sample(lon, lat, scale)
+                for i in range(len(lon)):
+                    values = {band: float(samples[band][i]) for band in samples if not np.isnan(samples[band][i])}
+                    if not values:
+                        continue
+                    feature_properties = dict(feature.properties)
+                    feature_properties.update(values)
+                    geometry = Geometry.Point([lon[i], lat[i]]) if geometries else None
+                    features.append(Feature(geometry, feature_properties))
+            return features
+        
+        return FeatureCollection(ComputedObject(compute))
+
+class Terrain:
+    @staticmethod
+    def slope(dem: Image) -> Image:
+        gradient = dem.gradient()
+        gx, gy = gradient.bands["x"], gradient.bands["y"]
+        return Image(bands={"slope": lambda lon, lat, scale: np.degrees(np.arctan(np.hypot(gx(lon, lat, scale), gy(lon, lat, scale))))})
+    
+    @staticmethod
+    def aspect(dem: Image) -> Image:
+        gradient = dem.gradient()
+        gx, gy = gradient.bands["x"], gradient.bands["y"]
+        return Image(bands={"aspect": lambda lon, lat, scale: np.degrees(np.arctan2(-gx(lon, lat, scale), -gy(lon, lat, scale))) % 360.0})
+
+# ---------------------------------------------------------------------------
+# Collections
+# ---------------------------------------------------------------------------
+
+class Feature:
+    def __init__(self, geometry: Optional[Geometry], properties: Optional[Dict[str, Any]] = None):
+        self.geometry = geometry
+        self.properties = dict(properties or {})
+    
+    def get(self, name: str) -> ComputedObject:
+        return ComputedObject(lambda: self.properties.get(name))
+    
+    def _info(self, index: int) -> Dict[str, Any]:
+        geometry = None
+        if self.geometry is not None and self.geometry.point is not None:
+            geometry = {"type": "Point", "coordinates": list(self.geometry.point)}
+        elif self.geometry is not None:
+            geometry = {"type": "Polygon", "coordinates": [ring.tolist() for ring in self.geometry.rings]}
+        return {"type": "Feature", "id": str(index), "geometry": geometry, "properties": self.properties}
+
+class FeatureCollection(ComputedObject):
+    def __init__(self, source: Any):
+        if isinstance(source, str):
+            raise EEException(f"Collection asset '{source}' not found in the fake backend.")
+        if isinstance(source, Feature):
+            source = [source]
+        self._source = source
+        super().__init__(self._info)
+    
+    def _info(self) -> Dict[str, Any]:
+        features = self._features()
+        if len(features) > MAX_GETINFO_ELEMENTS:
+            raise EEException(f"Collection query aborted after accumulating over {MAX_GETINFO_ELEMENTS} elements.")
+        return {
+            "type": "FeatureCollection",
+            "features": [feature._info(i) for i, feature in enumerate(features)]
+        }
+    
+    def _features(self) -> list:
+        return list(_resolve(self._source))
+    
+    @staticmethod
+    def randomPoints(region: Geometry, points: int = 1000, seed: int = 0, maxError: Any = None) -> "FeatureCollection":
+        def compute():
+            x0, y0, x1, y1 = region.bounds_coords()
+            rng = np.random.default_rng(seed)
+            found = []
+            while len(found) < points:
+                lon = rng.uniform(x0, x1, points)
+                lat = rng.uniform(y0, y1, points)
+                inside = region.contains(lon, lat)
+                found.extend(zip(lon[inside], lat[inside]))
+            return [Feature(Geometry.Point(p)) for p in found[:points]]
+        return FeatureCollection(ComputedObject(compute))
+    
+    def size(self) -> Number:
+        return Number(ComputedObject(lambda: len(self._features())))
+    
+    def geometry(self, *args, **kwargs) -> Geometry:
+        features = self._features()
+        boxes = np.array([f.geometry.bounds_coords() for f in features])
+        return Geometry.Rectangle([boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()])
+    
+    def filterBounds(self, geometry: Any) -> "FeatureCollection":
+        return self
+    
+    def aggregate_array(self, name: str) -> List:
+        return List(ComputedObject(lambda: [f.properties[name] for f in self._features() if name in f.properties]))
+
+class ImageCollection:
+    def __init__(self, source: Any):
+        if isinstance(source, str):
+            source = _dataset_collection(source)
+        self.images = list(source)
+    
+    def filterDate(self, start: Any, end: Any = None) -> "ImageCollection":
+        return ImageCollection(self.images)
+    
+    def filterBounds(self, geometry: Any) -> "ImageCollection":
+        return ImageCollection(self.images)
+    
+    def filter(self, *args, **kwargs) -> "ImageCollection":
+        return ImageCollection(self.images)
+    
+    def sort(self, *args, **kwargs) -> "ImageCollection":
+        return ImageCollection(sorted(self.images, key=lambda image: image.properties.get("system:time_start", 0)))
+    
+    def map(self, func: Callable[[Image], Image]) -> "ImageCollection":
+        return ImageCollection([func(image) for image in self.images])
+    
+    def select(self, *names: Any) -> "ImageCollection":
+        return ImageCollection([image.select(*names) for image in self.images])
+    
+    def size(self) -> Number:
+        return Number(len(self.images))
+    
+    def first(self) -> Image:
+        return self.images[0]
+    
+    def _composite(self, combine: Callable[[np.ndarray], np.ndarray]) -> Image:
+        if not self.images:
+            return Image(bands={})
+        names = list(self.images[0].bands)
+        
+        def band(name):
+            def composite(lon, lat, scale):
+                stack = np.stack([image.bands[name](lon, lat, scale) for image in self.images])
+                with warnings.catch_warnings():
+                    # All-masked pixels stay masked
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    return combine(stack)
+            return composite
+        
+        return Image(bands={name: band(name) for name in names})
+    
+    def mean(self) -> Image:
+        return self._composite(lambda stack: np.nanmean(stack, axis=0))
+    
+    def median(self) -> Image:
+        return self._composite(lambda stack: np.nanmedian(stack, axis=0))
+    
+    def reduce(self, reducer: Reducer) -> Image:
+        """Per-pixel reduction over time, bands named <band>_<output>"""
+        if not self.images:
+            return Image(bands={})
+        
+        def band(name, func):
+            def reduced(lon, lat, scale):
+                stack = np.stack([image.bands[name](lon, lat, scale) for image in self.images])
+                flat = stack.reshape(len(self.images), -1)
+                values = [func(flat[:, i]) for i in range(flat.shape[1])]
+                return np.array([np.nan if v is None else v for v in values], dtype=np.float64).reshape(stack.shape[1:])
+            return reduced
+        
+        return Image(bands={
+            f"{name}_{output}": band(name, func)
+            for name in self.images[0].bands for output, func in reducer.outputs
+        })
+    
+    def toBands(self) -> Image:
+        """One image with the bands of every image, named <system:index>_<band>"""
+        bands = {}
+        for i, image in enumerate(self.images):
+            index = image.properties.get("system:index", str(i))
+            for name, func in image.bands.items():
+                bands[f"{index}_{name}"] = func
+        return Image(bands=bands)
+    
+    def aggregate_array(self, name: str) -> List:
+        return List([image.properties[name] for image in self.images if name in image.properties])
+
+class Task:
+    """Export task that completes immediately without writing anything"""
+    
+    def __init__(self, description: str = ""):
+        self.description = description
+        self.state = "UNSUBMITTED"
+    
+    def start(self):
+        self.state = "COMPLETED"
+    
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "description": self.description}
+
+class _ImageExport:
+    @staticmethod
+    def toDrive(image: Image = None, description: str = "", **kwargs) -> Task:
+        return Task(description)
+
+class _Export:
+    image = _ImageExport
+
+class batch:
+    Task = Task
+    Export = _Export
+
+# Pixels evaluated per block by computePixels, to bound memory
+PIXEL_BLOCK = 4096
+
+class data:
+    # Request deadline in milliseconds; requests of the fake backend are local and never run into it
+    deadline_ms: Optional[int] = None
+    
+    @staticmethod
+    def setDeadline(milliseconds: int) -> None:
+        """Set the request deadline, like ee.data.setDeadline"""
+        data.deadline_ms = milliseconds
+    
+    @staticmethod
+    def computePixels(params: Dict[str, Any]) -> np.ndarray:
+        """Evaluate an image on an EPSG:4326 pixel grid, as a structured array with one field per band"""
+        global _round_trips
+        _round_trips += 1
+        
+        image = params["expression"]
+        grid = params["grid"]
+        width, height = grid["dimensions"]["width"], grid["dimensions"]["height"]
+        transform = grid["affineTransform"]
+        lon, lat = np.meshgrid(
+            transform["translateX"] + (np.arange(width) + 0.5) * transform["scaleX"],
+            transform["translateY"] + (np.arange(height) + 0.5) * transform["scaleY"]
+        )
+        lon, lat = lon.ravel(), lat.ravel()
+        scale = abs(transform["scaleY"]) * METERS_PER_DEGREE
+        
+        result = np.zeros((height, width), dtype=[(name, np.float64) for name in image.bands])
+        for name, func in image.bands.items():
+            values = np.concatenate([
+                np.asarray(func(lon[i:i + PIXEL_BLOCK], lat[i:i + PIXEL_BLOCK], scale), dtype=np.float64)
+                for i in range(0, lon.size, PIXEL_BLOCK)
+            ]) if lon.size else np.zeros(0)
+            result[name] = values.reshape(height, width)
+        return result
+
+# ---------------------------------------------------------------------------
+# Synthetic datasets
+# ---------------------------------------------------------------------------
+
+def _elevation(lon, lat, scale):
+    return 250.0 + 40.0 * np.sin(lon * 40.0) * np.cos(lat * 35.0) + 6.0 * np.sin(lon * 170.0 + lat * 130.0)
+
+def _ndvi(lon, lat, t=0.0):
+    forest = 0.78 + 0.08 * np.sin(lon * 90.0) * np.cos(lat * 70.0) + 0.03 * np.sin(t + lon * 10.0)
+    # Periodic clearings, like earthworks under the canopy
+    clearing = (np.sin(lon * 700.0) * np.sin(lat * 700.0)) > 0.97
+    return np.where(clearing, forest - 0.35, forest)
+
+def _ndbi(lon, lat, t=0.0):
+    return -0.3 + 0.1 * np.sin(lon * 55.0 + lat * 45.0) + 0.02 * np.cos(t)
+
+def _water(lon, lat, scale):
+    # A river every 0.02 degrees of latitude, meandering with longitude, ~45 m wide
+    phase = (lat + 0.005 * np.sin(lon * 60.0)) / 0.02
+    return np.where(np.abs(phase - np.round(phase)) * 0.02 * METERS_PER_DEGREE < 22.0, 85.0, 0.0)
+
+def _canopy(lon, lat, scale):
+    return np.clip(35.0 * (_ndvi(lon, lat) - 0.2) / 0.7, 0.0, None)
+
+def _red_band(nir: float, ndvi: Callable) -> BandFunction:
+    """Red band whose normalized difference with the NIR band equals ndvi"""
+    return lambda lon, lat, scale: nir * (1.0 - ndvi(lon, lat)) / (1.0 + ndvi(lon, lat))
+
+def _swir_band(nir: float, ndbi: Callable) -> BandFunction:
+    """SWIR band whose normalized difference with the NIR band equals ndbi"""
+    return lambda lon, lat, scale: nir * (1.0 + ndbi(lon, lat)) / (1.0 - ndbi(lon, lat))
+
+def _optical_image(t: int, nir_band: str, red_band: str, swir_band: str, qa_band: str) -> Image:
+    nir = 3000.0
+    ndvi = lambda lon, lat: _ndvi(lon, lat, t)
+    ndbi = lambda lon, lat: _ndbi(lon, lat, t)
+    cloudy = t % 4 == 3
+    bands = {
+        nir_band: lambda lon, lat, scale: np.full(np.shape(lon), nir),
+        red_band: _red_band(nir, ndvi),
+        swir_band: _swir_band(nir, ndbi)
+    }
+    if qa_band == "SCL":
+        # Scene classification: 4 = vegetation, 9 = cloud high probability
+        bands["SCL"] = lambda lon, lat, scale: np.where(cloudy & (np.sin(lon * 300.0) > 0.5), 9.0, 4.0) * np.ones(np.shape(lon))
+    else:
+        bands[qa_band] = lambda lon, lat, scale: np.zeros(np.shape(lon))
+    return Image(bands=bands, properties={"system:index": f"T{t:03d}", "system:time_start": 1514764800000 + t * 2629800000})
+
+def _gedi_image(t: int, bands: Sequence[str]) -> Image:
+    height = lambda lon, lat, scale: _canopy(lon, lat, scale) + 0.5 * np.sin(t + lon * 20.0)
+    return Image(
+        bands={band: height for band in bands},
+        properties={"system:index": f"T{t:03d}", "system:time_start": 1514764800000 + t * 2629800000}
+    )
+
+def _dataset_image(dataset_id: str) -> Dict[str, BandFunction]:
+    if dataset_id == "USGS/SRTMGL1_003":
+        return {"elevation": _elevation}
+    if dataset_id.startswith("JRC/GSW1"):
+        return {"occurrence": _water}
+    if dataset_id == "ETH/TREE_CANOPY_HEIGHT/V1":
+        return {"b1": _canopy}
+    raise EEException(f"Image asset '{dataset_id}' not found in the fake backend.")
+
+def _dataset_collection(dataset_id: str) -> list:
+    if dataset_id.startswith("COPERNICUS/S2"):
+        return [_optical_image(t, "B8", "B4", "B11", "SCL") for t in range(12)]
+    if dataset_id.startswith("LANDSAT/LC08"):
+        return [_optical_image(t, "SR_B5", "SR_B4", "SR_B6", "QA_PIXEL") for t in range(8)]
+    if dataset_id == "LARSE/GEDI/GEDI04_A_002":
+        return [_gedi_image(t, ("rh95",)) for t in range(6)]
+    if "GEDI02_A_002_MONTHLY" in dataset_id:
+        return [_gedi_image(t, ("rh95", "rh100")) for t in range(6)]
+    raise EEException(f"Collection asset '{dataset_id}' not found in the fake backend.")
@@ -0,0 +1,106 @@
+"""
+Earth Engine Request Metering
+=============================
+Charges the rate limit and the request budget per Earth Engine request.
+
+Every request sent to Earth Engine (a getInfo() or data.computePixels()
+call) goes through ee_request(). Inside a job of the request executor (see
+executor.py) the job's RequestMeter first checks the job's deadline, takes
+one request from its budget (see quota.py) and waits for a token of the rate
+limiter. A job making several requests pays for each of them, and a job
+served from the reduction cache pays nothing. Requests made outside an
+executor job are sent unmetered.
+"""
+
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Iterator, TypeVar
+
+import ee
+
+from backend.data_processors.earth_engine.quota import EERequestBudget, QuotaExhaustedError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_local = threading.local()
+
+class RequestMeter:
+    """
+    Rate limiter, request budget and deadline of the job running in one thread.
+    """
+    
+    def __init__(self,
+                 rate_limiter: Optional[Any] = None,
+                 budget: Optional[EERequestBudget] = None,
+                 deadline: Optional[float] = None,
+                 on_wait: Optional[Callable[[float], None]] = None):
+        """
+        Args:
+            rate_limiter: Token bucket each request takes a token from (see TokenBucket)
+            budget: Request budget each request is charged to
+            deadline: time.monotonic() time after which the job sends no further request;
+                      moved back by the time spent waiting for tokens
+            on_wait: Called with the seconds each request waited for a token
+        """
+        self.rate_limiter = rate_limiter
+        self.budget = budget
+        self.deadline = deadline
+        self.on_wait = on_wait
+        self.requests = 0
+    
+    def acquire(self) -> None:
+        """
+        Admit one request
+        
+        Raises:
+            TimeoutError: The job's deadline has passed
+            QuotaExhaustedError: The job's or the day's request budget is used up
+        """
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise TimeoutError("Earth Engine job timed out before its next request")
+        if self.budget is not None and not self.budget.acquire():
+            exhausted = self.budget.exhausted
+            raise QuotaExhaustedError(exhausted.scope, exhausted.limit)
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire()
+            if waited:
+                if self.deadline is not None:
+                    self.deadline += waited
+                if self.on_wait is not None:
+                    self.on_wait(waited)
+        self.requests += 1
+
+@contextmanager
+def metered(meter: RequestMeter) -> Iterator[RequestMeter]:
+    """Meter the Earth Engine requests made by the current thread"""
+    previous = getattr(_local, "meter", None)
+    _local.meter = meter
+    try:
+        yield meter
+    finally:
+        _local.meter = previous
+
+def current_meter() -> Optional[RequestMeter]:
+    """Meter of the job running in the current thread, if any"""
+    return getattr(_local, "meter", None)
+
+def ee_request(send: Callable[[], T]) -> T:
+    """Send one Earth Engine request once the current job's meter admits it"""
+    meter = current_meter()
+    if meter is not None:
+        meter.acquire()
+    return send()
+
+def get_info(value: Any) -> Any:
+    """value.getInfo() as one metered request"""
+    return ee_request(value.getInfo)
+
+def compute_pixels(params: Dict[str, Any]) -> Any:
+    """ee.data.computePixels(params) as one metered request"""
+    return ee_request(lambda: ee.data.computePixels(params))
@@ -6,17 +6,19 @@ data for grid cells in the study area.
 """
 
 import ee
-import numpy as np
 import pandas as pd
-import geopandas as gpd
 from shapely.geometry import Polygon, mapping
 import logging
 from typing import Dict, List, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.orm import Session
 
-from backend.data_processors.earth_engine.connector import EarthEngineConnector
-from backend.models.database import GridCell, EnvironmentalData
+from backend.data_processors.earth_engine.connector import create_connector
+from backend.data_processors.earth_engine.batch import load_cell_polygons, chunked, reduced_value, iter_region_cell_ids
+from backend.data_processors.earth_engine.executor import is_transient
+from backend.data_processors.earth_engine.cache import band_reduction, monthly_date_window
+from backend.data_processors.earth_engine.writer import EnvironmentalDataWriter
+from backend.data_processors.earth_engine.cell_context import CellContext, load_cell_context
 from backend.utils.config import settings
 
 # Configure logging
@@ -39,144 +41,211 @@ class NDVIProcessor:
             db_session: SQLAlchemy database session
         """
         self.db = db_session
-        self.ee_connector = EarthEngineConnector()
+        self.ee_connector = create_connector()
         
         # Set default parameters
         self.sentinel2_collection = 'COPERNICUS/S2_SR'
         self.landsat8_collection = 'LANDSAT/LC08/C02/T1_L2'
         self.time_window_months = 24  # Use 2 years of data for stability
+        self.matrix_shape = (10, 10)  # NDVI matrix (rows, cols) for pattern analysis
     
-    def calculate_ndvi_for_cell(self, cell_id: str) -> Dict[str, Any]:
+    def calculate_ndvi_for_cell(self, cell_id: str, context: Optional[CellContext] = None) -> Dict[str, Any]:
         """
         Calculate NDVI statistics for a specific grid cell
         
         Args:
             cell_id: Grid cell ID
+            context: Preloaded cell geometry (see load_cell_contexts); loaded from the database if omitted
             
         Returns:
             Dictionary with NDVI data (mean, std, etc.)
         """
-        # Get cell geometry from database
-        cell = self.db.query(GridCell).filter(GridCell.cell_id == cell_id).first()
-        if not cell:
-            logger.error(f"Cell {cell_id} not found in database")
-            return {"error": "Cell not found"}
-            
-        # Convert PostGIS geometry to shapely geometry
-        cell_geom = gpd.GeoSeries.from_wkb([bytes(cell.geom.data)], crs="EPSG:4326")[0]
+        # Get cell geometry from database unless the caller shares it
+        if context is None:
+            context = load_cell_context(self.db, cell_id)
+            if context is None:
+                return {"error": "Cell not found"}
         
-        # Create EE geometry
-        coords = [[[p[0], p[1]] for p in list(cell_geom.exterior.coords)]]
-        ee_geom = self.ee_connector.create_geometry(coords)
+        # Statistics and NDVI matrix come from one batched request
+        return self.calculate_ndvi_for_cells([cell_id], polygons={cell_id: context.coords})[cell_id]
+    
+    def calculate_ndvi_for_cells(self,
+                                 cell_ids: List[str],
+                                 chunk_size: Optional[int] = None,
+                                 polygons: Optional[Dict[str, List[List[List[float]]]]] = None,
+                                 raise_transient: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Calculate NDVI statistics for many grid cells in batched requests
         
-        # Set time window
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30*self.time_window_months)
+        Each chunk of cells is reduced with one reduceRegions call on the
+        Sentinel-2 NDVI composite; cells without Sentinel-2 values fall back to
+        Landsat 8 with one further call per chunk. The same call samples each
+        cell's NDVI matrix on a regular lattice (matrix_shape), so matrices
+        are deterministic and always have the same shape. Chunks are capped
+        at max_chunk_size() cells.
         
-        # Get Sentinel-2 imagery
-        try:
-            s2_collection = self.ee_connector.get_image_collection(self.sentinel2_collection)
-            if not s2_collection:
-                raise Exception("Failed to get Sentinel-2 collection")
-                
-            # Filter by date and location
-            s2_filtered = s2_collection.filterDate(start_date.strftime('%Y-%m-%d'), 
-                                                  end_date.strftime('%Y-%m-%d')) \
-                                      .filterBounds(ee_geom)
-            
-            # Cloud masking
-            s2_filtered = self._apply_cloud_mask(s2_filtered)
-            
-            # Calculate NDVI
-            s2_with_ndvi = s2_filtered.map(self._calculate_ndvi_sentinel2)
+        Args:
+            cell_ids: Grid cell IDs
+            chunk_size: Cells per Earth Engine request (default: settings.EE_BATCH_CHUNK_SIZE)
+            polygons: Preloaded cell polygons (see load_cell_polygons); loaded from the database if omitted
+            raise_transient: Re-raise transient Earth Engine errors (see is_transient) so the caller can retry or defer them
             
-            # Reduce to get statistics
-            ndvi_stats = s2_with_ndvi.select('NDVI') \
-                                    .reduceRegion(
-                                        reducer=ee.Reducer.mean().combine(
-                                            reducer2=ee.Reducer.stdDev(),
-                                            sharedInputs=True
-                                        ),
-                                        geometry=ee_geom,
-                                        scale=10,
-                                        maxPixels=1e9
-                                    ).getInfo()
+        Returns:
+            Dictionary mapping cell ID to NDVI data as returned by calculate_ndvi_for_cell
+        """
+        if polygons is None:
+            polygons = load_cell_polygons(self.db, cell_ids)
+        results = {cell_id: {"error": "Cell not found"} for cell_id in cell_ids if cell_id not in polygons}
+        
+        # Set time window (whole months, so cache keys stay stable within a month)
+        start_date, end_date = monthly_date_window(self.time_window_months)
+        
+        for chunk in chunked(list(polygons), self.chunk_size(chunk_size)):
+            results.update(self._calculate_ndvi_chunk(
+                {cell_id: polygons[cell_id] for cell_id in chunk}, start_date, end_date, raise_transient
+            ))
+        
+        return results
+    
+    def max_chunk_size(self) -> Optional[int]:
+        """
+        Most cells one Earth Engine request can carry with their NDVI matrix lattice
+        
+        Returns:
+            Cell limit, or None if the connector has none
+        """
+        return self.ee_connector.max_cells_per_request(tuple(self.matrix_shape))
+    
+    def chunk_size(self, chunk_size: Optional[int] = None) -> int:
+        """Cells per request: chunk_size (default: settings.EE_BATCH_CHUNK_SIZE) capped at max_chunk_size()"""
+        chunk_size = max(int(chunk_size or settings.EE_BATCH_CHUNK_SIZE), 1)
+        limit = self.max_chunk_size()
+        return chunk_size if limit is None else min(chunk_size, limit)
+    
+    def _calculate_ndvi_chunk(self,
+                              cells: Dict[str, List[List[List[float]]]],
+                              start_date: datetime,
+                              end_date: datetime,
+                              raise_transient: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Reduce one chunk of cells, Sentinel-2 first and Landsat 8 for the cells left without values"""
+        sources = [
+            ("sentinel2", self._sentinel2_ndvi_collection, 10),
+            ("landsat8", self._landsat8_ndvi_collection, 30)
+        ]
+        time_window = f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+        
+        results = {}
+        remaining = dict(cells)
+        error = None
+        
+        for i, (source, build_collection, scale) in enumerate(sources):
+            def build_image(collection, build_collection=build_collection, source=source):
+                with_ndvi = build_collection(collection, start_date, end_date)
+                if with_ndvi is None:
+                    raise Exception(f"Failed to get {source} collection")
+                return with_ndvi.select('NDVI').mean()
             
-            # Get NDVI matrix for pattern analysis (simplified)
-            ndvi_image = s2_with_ndvi.select('NDVI').mean()
-            ndvi_matrix = self._get_ndvi_matrix(ndvi_image, ee_geom, 10, 10)
+            reductions = self._ndvi_reductions(source, scale, start_date, end_date)
+            try:
+                ndvi_stats = self.ee_connector.cache.cached_reductions(
+                    self.ee_connector.batch_reductions(reductions),
+                    remaining,
+                    lambda cells: self.ee_connector.reduce_cells(cells, reductions, scale, build_image)
+                )
+            except Exception as e:
+                if raise_transient and is_transient(e):
+                    raise
+                logger.error(f"Error calculating {source} NDVI for {len(remaining)} cells: {e}")
+                error = e
+                continue
             
-            return {
-                "cell_id": cell_id,
-                "ndvi_mean": ndvi_stats.get('NDVI_mean'),
-                "ndvi_std": ndvi_stats.get('NDVI_stdDev'),
-                "ndvi_matrix": ndvi_matrix.tolist() if ndvi_matrix is not None else None,
-                "source": "sentinel2",
-                "time_window": f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-                "processing_timestamp": datetime.now().isoformat()
-            }
+            is_last = i == len(sources) - 1
+            for cell_id in list(remaining):
+                stats = ndvi_stats.get(cell_id, {})
+                ndvi_mean = reduced_value(stats, 'NDVI', 'mean')
+                if ndvi_mean is None and not is_last:
+                    continue
+                
+                results[cell_id] = {
+                    "cell_id": cell_id,
+                    "ndvi_mean": ndvi_mean,
+                    "ndvi_std": reduced_value(stats, 'NDVI', 'stdDev'),
+                    "ndvi_matrix": stats.get('NDVI_matrix'),
+                    "source": source,
+                    "time_window": time_window,
+                    "processing_timestamp": datetime.now().isoformat()
+                }
+                del remaining[cell_id]
             
-        except Exception as e:
-            logger.error(f"Error calculating NDVI for cell {cell_id}: {e}")
-            # Fall back to Landsat if Sentinel fails
-            try:
-                return self._calculate_ndvi_landsat(cell_id, ee_geom, start_date, end_date)
-            except Exception as e2:
-                logger.error(f"Landsat fallback also failed for {cell_id}: {e2}")
-                return {"error": f"NDVI calculation failed: {str(e2)}"}
+            if not remaining:
+                break
+        
+        for cell_id in remaining:
+            results[cell_id] = {"error": f"NDVI calculation failed: {str(error)}"}
+        
+        return results
     
-    def _calculate_ndvi_sentinel2(self, image: ee.Image) -> ee.Image:
-        """Calculate NDVI from Sentinel-2 image"""
-        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-        return image.addBands(ndvi)
+    def _sentinel2_ndvi_collection(self,
+                                   region: Any,
+                                   start_date: datetime,
+                                   end_date: datetime) -> Optional[ee.ImageCollection]:
+        """Cloud-masked Sentinel-2 collection with an NDVI band over a geometry or feature collection"""
+        s2_collection = self.ee_connector.get_image_collection(self.sentinel2_collection)
+        if not s2_collection:
+            raise Exception("Failed to get Sentinel-2 collection")
+            
+        # Filter by date and location
+        s2_filtered = s2_collection.filterDate(start_date.strftime('%Y-%m-%d'), 
+                                              end_date.strftime('%Y-%m-%d')) \
+                                  .filterBounds(region)
+        
+        # Cloud masking
+        s2_filtered = self._apply_cloud_mask(s2_filtered)
+        
+        # Calculate NDVI
+        return s2_filtered.map(self._calculate_ndvi_sentinel2)
     
-    def _calculate_ndvi_landsat(self, 
-                              cell_id: str, 
-                              ee_geom: ee.Geometry, 
-                              start_date: datetime, 
-                              end_date: datetime) -> Dict[str, Any]:
-        """Calculate NDVI using Landsat 8 as a fallback"""
+    def _landsat8_ndvi_collection(self,
+                                  region: Any,
+                                  start_date: datetime,
+                                  end_date: datetime) -> Optional[ee.ImageCollection]:
+        """Cloud-masked Landsat 8 collection with an NDVI band over a geometry or feature collection"""
         collection = self.ee_connector.get_image_collection(self.landsat8_collection)
         if not collection:
-            return {"error": "Failed to get Landsat 8 collection"}
+            return None
             
         # Filter by date and location
         filtered = collection.filterDate(start_date.strftime('%Y-%m-%d'), 
                                        end_date.strftime('%Y-%m-%d')) \
-                           .filterBounds(ee_geom)
+                           .filterBounds(region)
         
         # Apply cloud masking
         filtered = filtered.map(lambda img: img.updateMask(img.select('QA_PIXEL').bitwiseAnd(1 << 3).eq(0)))
         
         # Calculate NDVI
-        with_ndvi = filtered.map(lambda img: 
+        return filtered.map(lambda img: 
             img.addBands(img.normalizedDifference(['SR_B5', 'SR_B4']).rename('NDVI')))
-        
-        # Reduce to get statistics
-        ndvi_stats = with_ndvi.select('NDVI') \
-                            .reduceRegion(
-                                reducer=ee.Reducer.mean().combine(
-                                    reducer2=ee.Reducer.stdDev(),
-                                    sharedInputs=True
-                                ),
-                                geometry=ee_geom,
-                                scale=30,
-                                maxPixels=1e9
-                            ).getInfo()
-        
-        # Get NDVI matrix (simplified)
-        ndvi_image = with_ndvi.select('NDVI').mean()
-        ndvi_matrix = self._get_ndvi_matrix(ndvi_image, ee_geom, 10, 10)
-        
-        return {
-            "cell_id": cell_id,
-            "ndvi_mean": ndvi_stats.get('NDVI_mean'),
-            "ndvi_std": ndvi_stats.get('NDVI_stdDev'),
-            "ndvi_matrix": ndvi_matrix.tolist() if ndvi_matrix is not None else None,
-            "source": "landsat8",
-            "time_window": f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-            "processing_timestamp": datetime.now().isoformat()
-        }
+    
+    def _calculate_ndvi_sentinel2(self, image: ee.Image) -> ee.Image:
+        """Calculate NDVI from Sentinel-2 image"""
+        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+        return image.addBands(ndvi)
+    
+    def _ndvi_reductions(self,
+                         source: str,
+                         scale: float,
+                         start_date: datetime,
+                         end_date: datetime) -> List[Dict[str, Any]]:
+        """Reduction cache descriptions of the NDVI statistics and matrix of a source's composite"""
+        dataset, expression = {
+            "sentinel2": (self.sentinel2_collection, "scl_cloud_mask.normalizedDifference(B8,B4).mean()"),
+            "landsat8": (self.landsat8_collection, "qa_pixel_cloud_mask.normalizedDifference(SR_B5,SR_B4).mean()")
+        }[source]
+        date_window = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        return [
+            band_reduction('NDVI', dataset, expression, ("mean", "stdDev"), scale, date_window),
+            band_reduction('NDVI', dataset, expression, ("matrix",), scale, date_window, lattice=list(self.matrix_shape))
+        ]
     
     def _apply_cloud_mask(self, collection: ee.ImageCollection) -> ee.ImageCollection:
         """Apply cloud masking to Sentinel-2 collection"""
@@ -188,51 +257,15 @@ class NDVIProcessor:
             
         return collection.map(mask_clouds)
     
-    def _get_ndvi_matrix(self, 
-                       ndvi_image: ee.Image, 
-                       region: ee.Geometry, 
-                       rows: int, 
-                       cols: int) -> Optional[np.ndarray]:
-        """
-        Get NDVI matrix for a region (used for pattern detection)
-        
-        Args:
-            ndvi_image: Earth Engine image with NDVI band
-            region: Region to sample
-            rows: Number of rows in output matrix
-            cols: Number of columns in output matrix
-            
-        Returns:
-            NumPy array with NDVI values
-        """
-        try:
-            # Sample points in grid
-            points = ee.FeatureCollection.randomPoints(region, rows*cols)
-            
-            # Sample NDVI values at points
-            samples = ndvi_image.sampleRegions(
-                collection=points,
-                scale=10,
-                geometries=True
-            ).getInfo()
-            
-            # Convert to matrix
-            if 'features' in samples:
-                values = [f['properties']['NDVI'] for f in samples['features'] if 'NDVI' in f['properties']]
-                if len(values) >= rows*cols:
-                    return np.array(values[:rows*cols]).reshape(rows, cols)
-            
-            return None
-        except Exception as e:
-            logger.error(f"Error getting NDVI matrix: {e}")
-            return None
-    
     def process_region(self, 
                      bounding_box: List[float], 
                      max_cells: int = 100) -> Dict[str, Any]:
         """
         Process all cells in a region
         
+        Cells are streamed from the database and processed in batches of
+        DB_WRITE_BATCH_SIZE cells, each batch saved in one transaction.
+        
         Args:
             bounding_box: [min_lon, min_lat, max_lon, max_lat]
             max_cells: Maximum number of cells to process
@@ -240,63 +273,35 @@ class NDVIProcessor:
         Returns:
             Dictionary with processing results
         """
-        # Query cells in the bounding box
-        cells = self.db.query(GridCell).filter(
-            GridCell.lon_min >= bounding_box[0],
-            GridCell.lat_min >= bounding_box[1],
-            GridCell.lon_max <= bounding_box[2],
-            GridCell.lat_max <= bounding_box[3]
-        ).limit(max_cells).all()
-        
         results = {
             "processed": 0,
             "failed": 0,
             "cell_ids": []
         }
         
-        for cell in cells:
+        writer = EnvironmentalDataWriter(self.db, autocommit=False)
+        for batch in chunked(iter_region_cell_ids(self.db, bounding_box, max_cells), writer.batch_size):
+            ndvi_results = self.calculate_ndvi_for_cells(batch)
+            saved = [cell_id for cell_id in batch if "error" not in ndvi_results[cell_id]]
+            
             try:
-                ndvi_data = self.calculate_ndvi_for_cell(cell.cell_id)
-                if "error" not in ndvi_data:
-                    # Save to database
-                    self._save_ndvi_to_database(ndvi_data)
-                    results["processed"] += 1
-                    results["cell_ids"].append(cell.cell_id)
-                else:
-                    results["failed"] += 1
+                # Save to database
+                for cell_id in saved:
+                    writer.add("ndvi", ndvi_results[cell_id])
+                writer.flush()
+                results["processed"] += len(saved)
+                results["failed"] += len(batch) - len(saved)
+                results["cell_ids"].extend(saved)
             except Exception as e:
-                logger.error(f"Error processing cell {cell.cell_id}: {e}")
-                results["failed"] += 1
+                logger.error(f"Error saving NDVI data of {len(batch)} cells: {e}")
+                self.db.rollback()
+                writer.discard()
+                results["failed"] += len(batch)
         
         return results
     
     def _save_ndvi_to_database(self, ndvi_data: Dict[str, Any]) -> None:
         """Save NDVI data to database"""
-        cell_id = ndvi_data["cell_id"]
-        
-        # Check if environmental data exists for this cell
-        env_data = self.db.query(EnvironmentalData).filter(
-            EnvironmentalData.cell_id == cell_id
-        ).first()
-        
-        if env_data:
-            # Update existing record
-            env_data.ndvi_mean = ndvi_data["ndvi_mean"]
-            env_data.ndvi_std = ndvi_data["ndvi_std"]
-            if "raw_data" in env_data.__dict__ and env_data.raw_data:
-                raw_data = env_data.raw_data.copy() if isinstance(env_data.raw_data, dict) else {}
-                raw_data["ndvi"] = ndvi_data
-                env_data.raw_data = raw_data
-            else:
-                env_data.raw_data = {"ndvi": ndvi_data}
-        else:
-            # Create new record
-            env_data = EnvironmentalData(
-                cell_id=cell_id,
-                ndvi_mean=ndvi_data["ndvi_mean"],
-                ndvi_std=ndvi_data["ndvi_std"],
-                raw_data={"ndvi": ndvi_data}
-            )
-            self.db.add(env_data)
-        
-        self.db.commit()
+        writer = EnvironmentalDataWriter(self.db)
+        writer.add("ndvi", ndvi_data)
+        writer.flush()
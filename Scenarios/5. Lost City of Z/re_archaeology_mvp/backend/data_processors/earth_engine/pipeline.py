@@ -6,15 +6,25 @@ managing the flow of data extraction and processing tasks.
 """
 
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Set, Iterable, Iterator, Callable
+from collections import deque
 from datetime import datetime
 import time
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
 
-from backend.data_processors.earth_engine.connector import EarthEngineConnector
+from backend.data_processors.earth_engine.connector import create_connector
 from backend.data_processors.earth_engine.ndvi_processor import NDVIProcessor
 from backend.data_processors.earth_engine.canopy_processor import CanopyProcessor
 from backend.data_processors.earth_engine.env_features_processor import EnvironmentalFeatureProcessor
+from backend.data_processors.earth_engine.cell_context import load_cell_context
+from backend.data_processors.earth_engine.batch import load_cell_polygons, chunked, iter_region_cell_ids, count_region_cells
+from backend.data_processors.earth_engine.executor import EERequestExecutor
+from backend.data_processors.earth_engine.cache import get_reduction_cache
+from backend.data_processors.earth_engine.checkpoints import CheckpointWriter, completed_sources, count_completed
+from backend.data_processors.earth_engine.writer import EnvironmentalDataWriter
+from backend.data_processors.earth_engine.scheduler import CellPriorityScheduler
+from backend.data_processors.earth_engine.quota import EERequestBudget, QuotaExhaustedError
 from backend.models.database import GridCell, EnvironmentalData, DataProcessingTask
 from backend.utils.config import settings
 from backend.core.agent_self_model.model import REAgentSelfModel
@@ -42,7 +52,7 @@ class EarthEnginePipeline:
         """
         self.db = db_session
         self.agent = agent_model
-        self.ee_connector = EarthEngineConnector()
+        self.ee_connector = create_connector()
         
         # Initialize processors
         self.ndvi_processor = NDVIProcessor(db_session)
@@ -71,12 +81,13 @@ class EarthEnginePipeline:
             logger.error(f"Database connection failed: {e}")
             return False
     
-    def process_cell_complete(self, cell_id: str) -> Dict[str, Any]:
+    def process_cell_complete(self, cell_id: str, task_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Process a single cell with all available data sources
         
         Args:
             cell_id: Grid cell ID
+            task_id: Queued full_cell_processing task to record the run in (default: create one)
             
         Returns:
             Dictionary with processing results
@@ -87,36 +98,49 @@ class EarthEnginePipeline:
             "tasks": {}
         }
         
-        # Create task record
-        task = DataProcessingTask(
-            task_type="full_cell_processing",
-            status="running",
-            cell_id=cell_id,
-            params={"sources": ["ndvi", "canopy", "terrain", "water"]},
-            started_at=datetime.now()
-        )
-        self.db.add(task)
+        # Create task record, or take over the queued one
+        if task_id is not None:
+            task = self.db.query(DataProcessingTask).filter(DataProcessingTask.id == task_id).first()
+            if task is None:
+                logger.error(f"Task {task_id} not found")
+                return {"cell_id": cell_id, "task_id": task_id, "error": "Task not found"}
+            task.status = "running"
+            task.started_at = datetime.now()
+        else:
+            task = DataProcessingTask(
+                task_type="full_cell_processing",
+                status="running",
+                cell_id=cell_id,
+                params={"sources": ["ndvi", "canopy", "terrain", "water"]},
+                started_at=datetime.now()
+            )
+            self.db.add(task)
         self.db.commit()
         
         try:
+            # Load the cell geometry once and share it with all processors
+            context = load_cell_context(self.db, cell_id)
+            if context is None:
+                raise ValueError(f"Cell {cell_id} not found")
+            
             # Process NDVI
             logger.info(f"Processing NDVI for cell {cell_id}")
-            ndvi_result = self.ndvi_processor.calculate_ndvi_for_cell(cell_id)
+            ndvi_result = self.ndvi_processor.calculate_ndvi_for_cell(cell_id, context)
             results["tasks"]["ndvi"] = {"success": "error" not in ndvi_result}
             
             # Process canopy height
             logger.info(f"Processing canopy height for cell {cell_id}")
-            canopy_result = self.canopy_processor.calculate_canopy_height_for_cell(cell_id)
+            canopy_result = self.canopy_processor.calculate_canopy_height_for_cell(cell_id, context)
             results["tasks"]["canopy"] = {"success": "error" not in canopy_result}
             
             # Process terrain features
             logger.info(f"Processing terrain features for cell {cell_id}")
-            terrain_result = self.env_processor.calculate_terrain_features(cell_id)
+            terrain_result = self.env_processor.calculate_terrain_features(cell_id, context)
             results["tasks"]["terrain"] = {"success": "error" not in terrain_result}
             
             # Process water proximity
             logger.info(f"Processing water proximity for cell {cell_id}")
-            water_result = self.env_processor.calculate_water_proximity(cell_id)
+            water_result = self.env_processor.calculate_water_proximity(cell_id, context)
             results["tasks"]["water"] = {"success": "error" not in water_result}
             
             # Update task record
@@ -152,38 +176,51 @@ class EarthEnginePipeline:
     def process_region(self,
                      bounding_box: List[float],
                      data_sources: List[str] = None,
-                     max_cells: int = 100) -> Dict[str, Any]:
+                     max_cells: int = 100,
+                     prioritize: bool = True,
+                     ee_request_budget: Optional[int] = None) -> Dict[str, Any]:
         """
         Process all cells in a region with selected data sources
         
+        Cells are streamed through the pipeline (see _stream_cells) and their
+        data written in batches. Progress is checkpointed per cell while the
+        task runs, so an interrupted or paused task can be continued with
+        resume().
+        
+        With prioritize, the cells of the region are ranked by expected value
+        (see CellPriorityScheduler) and the max_cells most promising ones are
+        processed, best first; otherwise the first max_cells cells in id order
+        are streamed, so memory stays flat regardless of region size. The task
+        is paused once it exhausts its Earth Engine request budget or the
+        day's (see quota.py).
+        
         Args:
             bounding_box: [min_lon, min_lat, max_lon, max_lat]
             data_sources: List of data sources to process ("ndvi", "canopy", "terrain", "water")
             max_cells: Maximum number of cells to process
+            prioritize: Process the most promising cells first
+            ee_request_budget: Earth Engine requests the task may make (default: settings.EE_JOB_REQUEST_BUDGET, 0 = unlimited)
             
         Returns:
             Dictionary with processing results
         """
         if data_sources is None:
             data_sources = ["ndvi", "canopy", "terrain", "water"]
-            
-        # Query cells in the bounding box
-        cells = self.db.query(GridCell).filter(
-            GridCell.lon_min >= bounding_box[0],
-            GridCell.lat_min >= bounding_box[1],
-            GridCell.lon_max <= bounding_box[2],
-            GridCell.lat_max <= bounding_box[3]
-        ).limit(max_cells).all()
+        
+        params = {
+            "bounding_box": bounding_box,
+            "data_sources": data_sources,
+            "max_cells": max_cells,
+            "prioritize": prioritize,
+            "ee_request_budget": ee_request_budget
+        }
+        total_cells, cell_ids = self._task_cell_ids("region_processing", params)
         
         # Create task record
         task = DataProcessingTask(
             task_type="region_processing",
             status="running",
-            params={
-                "bounding_box": bounding_box,
-                "data_sources": data_sources,
-                "max_cells": max_cells
-            },
+            params=params,
             started_at=datetime.now()
         )
         self.db.add(task)
@@ -193,98 +230,54 @@ class EarthEnginePipeline:
             "task_id": task.id,
             "bounding_box": bounding_box,
             "data_sources": data_sources,
-            "total_cells": len(cells),
+            "total_cells": total_cells,
             "processed_cells": 0,
             "errors": 0,
+            "deferred_cells": 0,
             "cell_results": {}
         }
         
-        try:
-            # Process each cell with requested data sources
-            for cell in cells:
-                cell_result = {"cell_id": cell.cell_id, "sources": {}}
-                
-                try:
-                    if "ndvi" in data_sources:
-                        ndvi_result = self.ndvi_processor.calculate_ndvi_for_cell(cell.cell_id)
-                        cell_result["sources"]["ndvi"] = {"success": "error" not in ndvi_result}
-                        
-                    if "canopy" in data_sources:
-                        canopy_result = self.canopy_processor.calculate_canopy_height_for_cell(cell.cell_id)
-                        cell_result["sources"]["canopy"] = {"success": "error" not in canopy_result}
-                        
-                    if "terrain" in data_sources:
-                        terrain_result = self.env_processor.calculate_terrain_features(cell.cell_id)
-                        cell_result["sources"]["terrain"] = {"success": "error" not in terrain_result}
-                        
-                    if "water" in data_sources:
-                        water_result = self.env_processor.calculate_water_proximity(cell.cell_id)
-                        cell_result["sources"]["water"] = {"success": "error" not in water_result}
-                    
-                    results["processed_cells"] += 1
-                except Exception as e:
-                    logger.error(f"Error processing cell {cell.cell_id}: {e}")
-                    cell_result["error"] = str(e)
-                    results["errors"] += 1
-                
-                results["cell_results"][cell.cell_id] = cell_result
-            
-            # Update task record
-            task.status = "completed"
-            task.completed_at = datetime.now()
-            task.results = results
-            self.db.commit()
-            
-            # If agent model is available, record the processing
-            if self.agent:
-                self.agent.add_action({
-                    "action": "process_region",
-                    "bounding_box": bounding_box,
-                    "sources": data_sources,
-                    "cells_processed": results["processed_cells"]
-                })
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"Error in region processing pipeline: {e}")
-            # Update task record with error
-            task.status = "failed"
-            task.error_message = str(e)
-            task.completed_at = datetime.now()
-            task.results = results
-            self.db.commit()
-            
-            return {
-                "task_id": task.id,
-                "error": f"Processing pipeline failed: {str(e)}",
-                "partial_results": results
-            }
+        return self._run_task(task, cell_ids, data_sources, results)
     
     def process_cells_batch(self, 
                           cell_ids: List[str], 
-                          data_sources: List[str] = None) -> Dict[str, Any]:
+                          data_sources: List[str] = None,
+                          prioritize: bool = True,
+                          ee_request_budget: Optional[int] = None) -> Dict[str, Any]:
         """
         Process a batch of specific cells with selected data sources
         
+        Cells are streamed through the pipeline (see _stream_cells) and their
+        data written in batches. Progress is checkpointed per cell while the
+        task runs, so an interrupted or paused task can be continued with
+        resume(). The task is paused once it exhausts its Earth Engine request
+        budget or the day's (see quota.py).
+        
         Args:
             cell_ids: List of cell IDs to process
             data_sources: List of data sources to process ("ndvi", "canopy", "terrain", "water")
+            prioritize: Process the most promising cells first (see CellPriorityScheduler)
+            ee_request_budget: Earth Engine requests the task may make (default: settings.EE_JOB_REQUEST_BUDGET, 0 = unlimited)
             
         Returns:
             Dictionary with processing results
         """
         if data_sources is None:
             data_sources = ["ndvi", "canopy", "terrain", "water"]
-            
+        
+        params = {
+            "cell_ids": cell_ids,
+            "data_sources": data_sources,
+            "prioritize": prioritize,
+            "ee_request_budget": ee_request_budget
+        }
+        total_cells, ordered_ids = self._task_cell_ids("batch_processing", params)
+        
         # Create task record
         task = DataProcessingTask(
             task_type="batch_processing",
             status="running",
-            params={
-                "cell_ids": cell_ids,
-                "data_sources": data_sources
-            },
+            params=params,
             started_at=datetime.now()
         )
         self.db.add(task)
@@ -293,57 +286,241 @@ class EarthEnginePipeline:
         results = {
             "task_id": task.id,
             "data_sources": data_sources,
-            "total_cells": len(cell_ids),
+            "total_cells": total_cells,
+            "processed_cells": 0,
+            "errors": 0,
+            "deferred_cells": 0,
+            "cell_results": {}
+        }
+        
+        return self._run_task(task, ordered_ids, data_sources, results)
+    
+    def run_task(self, task_id: int) -> Dict[str, Any]:
+        """
+        Run a queued region or batch processing task, e.g. one created by the API
+        
+        The cells, data sources and request budget are taken from the task's
+        parameters. A task that has already run is resumed (see resume()), so
+        running a job again, e.g. after its worker was lost, continues from
+        the task's checkpoints instead of starting over.
+        
+        Args:
+            task_id: ID of a region_processing or batch_processing task
+            
+        Returns:
+            Dictionary with processing results
+        """
+        return self.resume(task_id)
+    
+    def resume(self, task_id: int, ee_request_budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Continue an interrupted, failed or paused region or batch processing task
+        
+        The task's cells are determined again from its parameters; data sources
+        a cell has already completed successfully (see task_cell_checkpoints)
+        are skipped, so only the missing and failed work is redone. Requests
+        made in earlier runs count towards the task's request budget.
+        
+        Args:
+            task_id: ID of a region_processing or batch_processing task
+            ee_request_budget: New Earth Engine request budget of the task (default: keep it)
+            
+        Returns:
+            Dictionary with processing results of the whole task
+        """
+        task = self.db.query(DataProcessingTask).filter(DataProcessingTask.id == task_id).first()
+        if not task:
+            logger.error(f"Task {task_id} not found")
+            return {"task_id": task_id, "error": "Task not found"}
+        
+        if task.task_type not in ("region_processing", "batch_processing"):
+            return {"task_id": task_id, "error": f"Tasks of type {task.task_type} cannot be resumed"}
+        
+        params = dict(task.params or {})
+        if ee_request_budget is not None:
+            params["ee_request_budget"] = ee_request_budget
+            task.params = params
+        data_sources = params.get("data_sources") or ["ndvi", "canopy", "terrain", "water"]
+        total_cells, cell_ids = self._task_cell_ids(task.task_type, params)
+        
+        if task.status == "queued":
+            skipped = 0
+            task.started_at = datetime.now()
+            logger.info(f"Starting task {task_id}: {total_cells} cells")
+        else:
+            skipped = count_completed(self.db, task_id, data_sources)
+            logger.info(f"Resuming task {task_id}: {skipped} of {total_cells * len(data_sources)} cell sources already completed")
+        
+        previous = task.results if isinstance(task.results, dict) else {}
+        task.status = "running"
+        task.error_message = None
+        task.completed_at = None
+        self.db.commit()
+        
+        results = {
+            "task_id": task.id,
+            "data_sources": data_sources,
+            "total_cells": total_cells,
             "processed_cells": 0,
             "errors": 0,
+            "deferred_cells": 0,
+            "resumed_sources": skipped,
+            "ee_requests": previous.get("ee_requests", 0),
             "cell_results": {}
         }
+        if "bounding_box" in params:
+            results["bounding_box"] = params["bounding_box"]
+        
+        return self._run_task(task, cell_ids, data_sources, results, resume=True)
+    
+    def _task_cell_ids(self, task_type: str, params: Dict[str, Any]) -> Tuple[int, Iterable[str]]:
+        """
+        Cells of a region or batch processing task, in processing order
+        
+        Args:
+            task_type: "region_processing" or "batch_processing"
+            params: Task parameters
+        
+        Returns:
+            (number of cells, cell IDs); region cells not ranked by priority are
+            streamed lazily
+        """
+        prioritize = params.get("prioritize", False)
+        if task_type == "region_processing":
+            bounding_box = params["bounding_box"]
+            max_cells = params.get("max_cells", 100)
+            if prioritize:
+                cell_ids = CellPriorityScheduler(self.db).rank_region(bounding_box, max_cells)
+                return len(cell_ids), cell_ids
+            return count_region_cells(self.db, bounding_box, max_cells), iter_region_cell_ids(self.db, bounding_box, max_cells)
+        
+        cell_ids = params["cell_ids"]
+        if prioritize:
+            cell_ids = CellPriorityScheduler(self.db).rank_cells(cell_ids)
+        return len(cell_ids), cell_ids
+    
+    def _request_budget(self, task: DataProcessingTask, results: Dict[str, Any]) -> Optional[EERequestBudget]:
+        """Earth Engine request budget of a task run (None for local rasters, which need no requests)"""
+        if self.ee_connector.is_local:
+            return None
+        
+        job_limit = (task.params or {}).get("ee_request_budget")
+        return EERequestBudget(
+            self.db,
+            job_limit=job_limit if job_limit is not None else settings.EE_JOB_REQUEST_BUDGET,
+            daily_limit=settings.EE_DAILY_REQUEST_BUDGET,
+            job_used=results.get("ee_requests", 0)
+        )
+    
+    def _run_task(self,
+                  task: DataProcessingTask,
+                  cell_ids: Iterable[str],
+                  data_sources: List[str],
+                  results: Dict[str, Any],
+                  resume: bool = False) -> Dict[str, Any]:
+        """
+        Process the cells of a task, write their results and record its outcome
+        
+        This is the writer stage of the pipeline: cells coming out of
+        _stream_cells are saved to environmental_data and checkpointed in
+        batches, each batch committed in one transaction together with the
+        task's progress. Only the first TASK_CELL_RESULTS_LIMIT cells are kept
+        in results["cell_results"]; the outcomes of all cells are in
+        task_cell_checkpoints.
+        
+        When the task's or the day's Earth Engine request budget runs out, the
+        sources not requested yet are left unchecked (counted as deferred) and
+        the task is paused, with the reason in results["paused"].
+        
+        Args:
+            task: Running task record
+            cell_ids: IDs of the cells to process (may be a lazy iterator)
+            data_sources: List of data sources to process
+            results: Result dictionary of the task, updated in place
+            resume: Skip the sources cells already completed in an earlier run of the task
+            
+        Returns:
+            Dictionary with processing results
+        """
+        writer = EnvironmentalDataWriter(self.db, autocommit=False)
+        budget = self._request_budget(task, results)
+        checkpoints = CheckpointWriter(self.db, task, results, data_writer=writer, request_budget=budget)
         
         try:
-            # Process each cell with requested data sources
-            for cell_id in cell_ids:
-                cell_result = {"cell_id": cell_id, "sources": {}}
+            for cell_result, outcomes in self._stream_cells(cell_ids, data_sources, results, task.id if resume else None, budget):
+                cell_id = cell_result["cell_id"]
+                if budget is not None:
+                    results["ee_requests"] = budget.job_used
+                for source, success, data, error_message in outcomes:
+                    if success:
+                        writer.add(source, data)
+                    checkpoints.add(cell_id, source, success, data, error_message)
                 
-                try:
-                    if "ndvi" in data_sources:
-                        ndvi_result = self.ndvi_processor.calculate_ndvi_for_cell(cell_id)
-                        cell_result["sources"]["ndvi"] = {"success": "error" not in ndvi_result}
-                        
-                    if "canopy" in data_sources:
-                        canopy_result = self.canopy_processor.calculate_canopy_height_for_cell(cell_id)
-                        cell_result["sources"]["canopy"] = {"success": "error" not in canopy_result}
-                        
-                    if "terrain" in data_sources:
-                        terrain_result = self.env_processor.calculate_terrain_features(cell_id)
-                        cell_result["sources"]["terrain"] = {"success": "error" not in terrain_result}
-                        
-                    if "water" in data_sources:
-                        water_result = self.env_processor.calculate_water_proximity(cell_id)
-                        cell_result["sources"]["water"] = {"success": "error" not in water_result}
-                    
-                    results["processed_cells"] += 1
-                except Exception as e:
-                    logger.error(f"Error processing cell {cell_id}: {e}")
-                    cell_result["error"] = str(e)
+                if "error" in cell_result:
                     results["errors"] += 1
+                elif "deferred" in cell_result:
+                    results["deferred_cells"] += 1
+                else:
+                    results["processed_cells"] += 1
                 
-                results["cell_results"][cell_id] = cell_result
+                if len(results["cell_results"]) < settings.TASK_CELL_RESULTS_LIMIT:
+                    results["cell_results"][cell_id] = cell_result
+                else:
+                    results["cell_results_truncated"] = True
+            
+            if budget is not None:
+                results["ee_requests"] = budget.job_used
+                results["ee_request_budget"] = budget.status()
+            checkpoints.flush()
+            
+            if budget is not None and budget.exhausted is not None:
+                resume_after = budget.resume_after()
+                results["paused"] = {
+                    "reason": str(budget.exhausted),
+                    "budget": budget.exhausted.scope,
+                    "resume_after": resume_after.isoformat() if resume_after else None
+                }
+                logger.warning(f"Pausing task {task.id}: {budget.exhausted}")
+                task.status = "paused"
+                task.results = results
+                flag_modified(task, "results")
+                self.db.commit()
+                return results
             
             # Update task record
             task.status = "completed"
             task.completed_at = datetime.now()
             task.results = results
+            flag_modified(task, "results")
             self.db.commit()
             
+            # If agent model is available, record the processing
+            if self.agent and task.task_type == "region_processing":
+                self.agent.add_action({
+                    "action": "process_region",
+                    "bounding_box": results.get("bounding_box"),
+                    "sources": data_sources,
+                    "cells_processed": results["processed_cells"]
+                })
+            
             return results
             
         except Exception as e:
-            logger.error(f"Error in batch processing pipeline: {e}")
+            logger.error(f"Error in {task.task_type} pipeline: {e}")
+            # Keep the outcomes and request usage gathered so far for resume()
+            if checkpoints.rows or writer.pending or (budget is not None and budget.unsaved):
+                try:
+                    checkpoints.flush()
+                except Exception as flush_error:
+                    logger.error(f"Error writing checkpoints: {flush_error}")
+            
             # Update task record with error
+            self.db.rollback()
             task.status = "failed"
             task.error_message = str(e)
             task.completed_at = datetime.now()
             task.results = results
+            flag_modified(task, "results")
             self.db.commit()
             
             return {
@@ -351,3 +528,148 @@ class EarthEnginePipeline:
                 "error": f"Processing pipeline failed: {str(e)}",
                 "partial_results": results
             }
+    
+    def _stream_cells(self,
+                      cell_ids: Iterable[str],
+                      data_sources: List[str],
+                      stats: Dict[str, Any],
+                      resume_task_id: Optional[int] = None,
+                      budget: Optional[EERequestBudget] = None) -> Iterator[Tuple[Dict[str, Any], List[Tuple[str, bool, Optional[Dict[str, Any]], Optional[str]]]]]:
+        """
+        Stream cells through the fetch and transform stages of the pipeline
+        
+        Cell IDs are read from cell_ids in windows of PIPELINE_WINDOW_SIZE
+        cells. For each window the cell geometries are loaded with one query in
+        this thread, so jobs never touch the session, and the work is split
+        into (source, chunk of cells) jobs, each one Earth Engine request per
+        data source tried, run concurrently through the rate-limited request
+        executor. Reductions already in the reduction cache are not requested
+        again. A cell is yielded as soon as all its sources are done, so at
+        most one window of cells is held in memory.
+        
+        Cells are processed in the order given and the jobs of a window are
+        submitted chunk by chunk, so with a request budget the first cells are
+        the ones completed. The budget's daily usage is read again before each
+        window; no further window is started once it is exhausted.
+        
+        Args:
+            cell_ids: IDs of the cells to process (may be a lazy iterator)
+            data_sources: List of data sources to process ("ndvi", "canopy", "terrain", "water")
+            stats: Dictionary the executor and reduction cache statistics are stored in
+            resume_task_id: Task whose completed sources (see task_cell_checkpoints) are
+                            skipped; they count as successful
+            budget: Earth Engine request budget of the task (default: unlimited)
+            
+        Yields:
+            (cell result, outcomes) per cell, where the outcomes are
+            (source, success, data, error message) of the sources processed in this run;
+            sources not requested because the budget ran out are listed in the cell
+            result's "deferred" and have no outcome
+        """
+        calculators = {
+            "ndvi": self.ndvi_processor.calculate_ndvi_for_cells,
+            "canopy": self.canopy_processor.calculate_canopy_height_for_cells,
+            "terrain": self.env_processor.calculate_terrain_features_for_cells,
+            "water": self.env_processor.calculate_water_proximity_for_cells
+        }
+        sources = [source for source in data_sources if source in calculators]
+        
+        cache = get_reduction_cache()
+        cache_metrics = dict(cache.metrics)
+        
+        # Local raster reads are not subject to the Earth Engine request quota
+        with EERequestExecutor(requests_per_second=0 if self.ee_connector.is_local else None, budget=budget) as executor:
+            for window in chunked(cell_ids, settings.PIPELINE_WINDOW_SIZE):
+                if budget is not None:
+                    budget.refresh()
+                    if budget.exhausted is not None:
+                        break
+                completed = completed_sources(self.db, resume_task_id, window) if resume_task_id is not None else {}
+                yield from self._stream_window(window, sources, calculators, completed, executor)
+            
+            stats["executor_stats"] = dict(executor.stats)
+        
+        # Reduction cache activity of this run
+        stats["cache_stats"] = {name: cache.metrics[name] - cache_metrics[name] for name in cache_metrics}
+    
+    def _stream_window(self,
+                       window: List[str],
+                       sources: List[str],
+                       calculators: Dict[str, Callable],
+                       completed: Dict[str, Set[str]],
+                       executor: EERequestExecutor) -> Iterator[Tuple[Dict[str, Any], List[Tuple[str, bool, Optional[Dict[str, Any]], Optional[str]]]]]:
+        """Fetch and transform the results of one window of cells, yielding each cell once it is done"""
+        polygons = load_cell_polygons(self.db, window)
+        if "terrain" in sources and self.env_processor.terrain is not None:
+            # Keep every DEM tile of the window cached while its chunks are reduced
+            self.env_processor.terrain.plan_window(polygons)
+        # NDVI chunks are capped so that their matrix lattices fit in one request
+        chunk_sizes = {"ndvi": self.ndvi_processor.chunk_size()}
+        chunks = {
+            source: list(chunked(
+                [cell_id for cell_id in polygons if source not in completed.get(cell_id, ())],
+                chunk_sizes.get(source)
+            ))
+            for source in sources
+        }
+        # Chunk by chunk, so the cells at the front of the window are completed first
+        jobs = [
+            ((source, i), calculators[source], (chunks[source][i],), {
+                "chunk_size": len(chunks[source][i]),
+                "polygons": {cell_id: polygons[cell_id] for cell_id in chunks[source][i]},
+                "raise_transient": True
+            })
+            for i in range(max((len(source_chunks) for source_chunks in chunks.values()), default=0))
+            for source in sources if i < len(chunks[source])
+        ]
+        
+        cell_results = {cell_id: {"cell_id": cell_id, "sources": {}} for cell_id in window}
+        cell_outcomes: Dict[str, List[Tuple[str, bool, Optional[Dict[str, Any]], Optional[str]]]] = {cell_id: [] for cell_id in window}
+        cell_errors: Dict[str, List[str]] = {}
+        outstanding = {cell_id: max(len(sources), 1) for cell_id in window}
+        done = deque()
+        
+        def source_done(cell_id: str) -> None:
+            outstanding[cell_id] -= 1
+            if outstanding[cell_id] > 0:
+                return
+            
+            cell_result = cell_results.pop(cell_id)
+            if cell_id in cell_errors:
+                cell_result["error"] = "; ".join(cell_errors.pop(cell_id))
+            done.append((cell_result, cell_outcomes.pop(cell_id)))
+        
+        for cell_id in window:
+            if not sources:
+                source_done(cell_id)
+            for source in sources:
+                if cell_id not in polygons:
+                    cell_results[cell_id]["sources"][source] = {"success": False}
+                    source_done(cell_id)
+                elif source in completed.get(cell_id, ()):
+                    cell_results[cell_id]["sources"][source] = {"success": True}
+                    source_done(cell_id)
+        
+        while done:
+            yield done.popleft()
+        
+        if jobs:
+            logger.info(f"Processing {', '.join(sources)} for {len(window)} cells in {len(jobs)} jobs")
+        for (source, i), source_result, error in executor.run(jobs):
+            for cell_id in chunks[source][i]:
+                if isinstance(error, QuotaExhaustedError):
+                    # Not requested; left unchecked so resume() processes it
+                    cell_results[cell_id]["sources"][source] = {"success": False, "deferred": True}
+                    cell_results[cell_id].setdefault("deferred", []).append(source)
+                elif error is not None:
+                    cell_errors.setdefault(cell_id, []).append(f"{source}: {error}")
+                    cell_outcomes[cell_id].append((source, False, None, str(error)))
+                elif cell_id in source_result:
+                    data = source_result[cell_id]
+                    success = "error" not in data
+                    cell_results[cell_id]["sources"][source] = {"success": success}
+                    cell_outcomes[cell_id].append((source, success, data, data.get("error")))
+                source_done(cell_id)
+            
+            while done:
+                yield done.popleft()
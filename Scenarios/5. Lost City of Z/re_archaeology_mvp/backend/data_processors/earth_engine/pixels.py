@@ -0,0 +1,444 @@
+"""
+Pixel Array Zonal Statistics
+============================
+Alternative to reduceRegions for dense grids: each data layer is downloaded
+once per region tile as a NumPy array (ee.data.computePixels) and the grid
+cell statistics are computed locally.
+
+The cell polygons are rasterized to a label image (a pixel belongs to a
+cell when its centre lies inside the polygon) and per-cell sums are
+accumulated with np.bincount, so a tile of thousands of cells costs one
+request instead of one reduction per cell. Tiles sit on a lattice snapped
+to the pixel size, so the same region always maps to the same tiles, and
+only tiles that contain cells are downloaded.
+
+Downloaded tiles can be recorded to .npz files and replayed offline
+(EE_PIXEL_FIXTURE_DIR / EE_PIXEL_FIXTURE_MODE), which makes recorded arrays
+usable as fixtures without Earth Engine access.
+
+Reductions with the "matrix" output also sample each cell on a regular
+rows x cols lattice over its bounding box (the pixel under each lattice
+point), giving fixed-shape matrices from the same tiles.
+"""
+
+import os
+import json
+import math
+import hashlib
+import numpy as np
+import shapely
+import logging
+from typing import Dict, List, Any, Optional, Hashable, Tuple
+from shapely.geometry import Polygon
+
+import ee
+
+from backend.data_processors.earth_engine.metering import compute_pixels
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE = 111320.0
+
+SUPPORTED_OUTPUTS = ("mean", "stdDev", "min", "max", "sum", "count")
+
+# Output of a reduction sampling the band on a regular lattice over each cell
+# (the reduction's "lattice" gives [rows, cols])
+MATRIX_OUTPUT = "matrix"
+
+def lattice_shape(reductions: List[Dict[str, Any]]) -> Optional[Tuple[int, int]]:
+    """
+    Lattice shape of the reductions with the "matrix" output
+    
+    Args:
+        reductions: band_reduction() descriptions
+    
+    Returns:
+        (rows, cols), or None if no reduction samples a lattice
+    """
+    shapes = {tuple(reduction["lattice"]) for reduction in reductions if MATRIX_OUTPUT in reduction["outputs"]}
+    if len(shapes) > 1:
+        raise ValueError(f"Reductions sample lattices of different shapes: {sorted(shapes)}")
+    return shapes.pop() if shapes else None
+
+def lattice_points(polygons: List[Polygon], shape: Tuple[int, int]) -> np.ndarray:
+    """
+    Regular lattice of sample points over each polygon's bounding box
+    
+    The points are the centres of a rows x cols subdivision of the bounding
+    box, row 0 at the north edge, so a cell is always sampled at the same
+    places.
+    
+    Args:
+        polygons: Cell polygons
+        shape: (rows, cols) of the lattice
+    
+    Returns:
+        (n_polygons, rows * cols, 2) array of x/y coordinates in row-major order
+    """
+    rows, cols = shape
+    bounds = np.array([polygon.bounds for polygon in polygons], dtype=np.float64).reshape(-1, 4)
+    fx = (np.arange(cols) + 0.5) / cols
+    fy = (np.arange(rows) + 0.5) / rows
+    xs = bounds[:, 0, None] + fx[None, :] * (bounds[:, 2] - bounds[:, 0])[:, None]
+    ys = bounds[:, 3, None] - fy[None, :] * (bounds[:, 3] - bounds[:, 1])[:, None]
+    
+    n_polygons = len(bounds)
+    points = np.empty((n_polygons, rows, cols, 2))
+    points[..., 0] = xs[:, None, :]
+    points[..., 1] = ys[:, :, None]
+    return points.reshape(n_polygons, rows * cols, 2)
+
+def lattice_matrix(values: Any, shape: Tuple[int, int]) -> Optional[List[List[Optional[float]]]]:
+    """
+    Lattice samples of one cell as a float32 matrix
+    
+    Args:
+        values: rows * cols samples in row-major order, NaN or None where masked
+        shape: (rows, cols) of the lattice
+    
+    Returns:
+        Nested rows of float32 values, None where masked (JSON has no NaN);
+        None if every sample is masked
+    """
+    matrix = np.array([np.nan if value is None else value for value in values], dtype=np.float32).reshape(shape)
+    if np.isnan(matrix).all():
+        return None
+    return [[None if np.isnan(value) else float(value) for value in row] for row in matrix]
+
+def rasterize_cells(polygons: List[Polygon],
+                    x0: float,
+                    y0: float,
+                    pixel_size: float,
+                    width: int,
+                    height: int) -> np.ndarray:
+    """
+    Label image of the pixels whose centres lie inside each polygon
+    
+    Args:
+        polygons: Cell polygons in longitude/latitude
+        x0: West edge of the image
+        y0: North edge of the image
+        pixel_size: Pixel size in degrees
+        width: Image width in pixels
+        height: Image height in pixels
+    
+    Returns:
+        (height, width) int array with the polygon index per pixel, -1 outside all polygons
+    """
+    labels = np.full((height, width), -1, dtype=np.int64)
+    for index, polygon in enumerate(polygons):
+        minx, miny, maxx, maxy = polygon.bounds
+        col0 = max(int(math.floor((minx - x0) / pixel_size - 0.5)), 0)
+        col1 = min(int(math.ceil((maxx - x0) / pixel_size - 0.5)) + 1, width)
+        row0 = max(int(math.floor((y0 - maxy) / pixel_size - 0.5)), 0)
+        row1 = min(int(math.ceil((y0 - miny) / pixel_size - 0.5)) + 1, height)
+        if col0 >= col1 or row0 >= row1:
+            continue
+        
+        xs = x0 + (np.arange(col0, col1) + 0.5) * pixel_size
+        ys = y0 - (np.arange(row0, row1) + 0.5) * pixel_size
+        lon, lat = np.meshgrid(xs, ys)
+        inside = shapely.contains_xy(polygon, lon, lat)
+        labels[row0:row1, col0:col1][inside] = index
+    return labels
+
+def tile_cells(bounds: np.ndarray,
+               x0: float,
+               y0: float,
+               pixel_size: float,
+               width: int,
+               height: int,
+               tile_pixels: int) -> Dict[Tuple[int, int], np.ndarray]:
+    """
+    Group cells by the tiles their pixels fall in
+    
+    A cell belongs to every tile its bounding box touches, widened by half a
+    pixel as in rasterize_cells, which also covers its centroid and lattice
+    points. Tiles no cell touches are left out, so they are never fetched.
+    
+    Args:
+        bounds: (n_cells, 4) cell bounds (minx, miny, maxx, maxy) in degrees
+        x0: West edge of the image
+        y0: North edge of the image
+        pixel_size: Pixel size in degrees
+        width: Image width in pixels
+        height: Image height in pixels
+        tile_pixels: Tile width and height in pixels
+    
+    Returns:
+        Cell indices by (tile row, tile column), in row-major tile order
+    """
+    col0 = np.clip(np.floor((bounds[:, 0] - x0) / pixel_size - 0.5), 0, width - 1).astype(np.int64) // tile_pixels
+    col1 = np.clip(np.ceil((bounds[:, 2] - x0) / pixel_size - 0.5), 0, width - 1).astype(np.int64) // tile_pixels
+    row0 = np.clip(np.floor((y0 - bounds[:, 3]) / pixel_size - 0.5), 0, height - 1).astype(np.int64) // tile_pixels
+    row1 = np.clip(np.ceil((y0 - bounds[:, 1]) / pixel_size - 0.5), 0, height - 1).astype(np.int64) // tile_pixels
+    
+    tiles: Dict[Tuple[int, int], List[int]] = {}
+    for index in range(len(bounds)):
+        for tile_row in range(row0[index], row1[index] + 1):
+            for tile_col in range(col0[index], col1[index] + 1):
+                tiles.setdefault((int(tile_row), int(tile_col)), []).append(index)
+    return {tile: np.array(tiles[tile], dtype=np.int64) for tile in sorted(tiles)}
+
+class ZonalAccumulator:
+    """
+    Per-zone count, sum, sum of squares, min and max, accumulated over tiles.
+    """
+    
+    def __init__(self, n_zones: int):
+        self.count = np.zeros(n_zones)
+        self.sum = np.zeros(n_zones)
+        self.sum_squares = np.zeros(n_zones)
+        self.min = np.full(n_zones, np.inf)
+        self.max = np.full(n_zones, -np.inf)
+    
+    def add(self, values: np.ndarray, labels: np.ndarray) -> None:
+        """Add the pixels of a tile; NaN values and pixels labelled -1 are skipped"""
+        valid = (labels >= 0) & ~np.isnan(values)
+        zones, values = labels[valid], values[valid]
+        n_zones = len(self.count)
+        
+        self.count += np.bincount(zones, minlength=n_zones)
+        self.sum += np.bincount(zones, weights=values, minlength=n_zones)
+        self.sum_squares += np.bincount(zones, weights=values * values, minlength=n_zones)
+        np.minimum.at(self.min, zones, values)
+        np.maximum.at(self.max, zones, values)
+    
+    def result(self, output: str) -> np.ndarray:
+        """Statistic per zone, NaN for zones without pixels"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            empty = self.count == 0
+            mean = self.sum / self.count
+            if output == "mean":
+                values = mean
+            elif output == "stdDev":
+                # Population standard deviation, like ee.Reducer.stdDev()
+                values = np.sqrt(np.maximum(self.sum_squares / self.count - mean * mean, 0.0))
+            elif output == "min":
+                values = self.min.copy()
+            elif output == "max":
+                values = self.max.copy()
+            elif output == "sum":
+                values = self.sum.copy()
+            elif output == "count":
+                return self.count.copy()
+            else:
+                raise ValueError(f"Unsupported zonal statistic: {output} (supported: {', '.join(SUPPORTED_OUTPUTS)})")
+        values[empty] = np.nan
+        return values
+
+def zonal_results(cell_ids: List[Hashable],
+                  reductions: List[Dict[str, Any]],
+                  accumulators: Dict[str, ZonalAccumulator],
+                  centroid_values: Dict[str, np.ndarray],
+                  lattice_values: Optional[Dict[str, np.ndarray]] = None) -> Dict[Hashable, Dict[str, Any]]:
+    """
+    Reducer outputs per cell from accumulated pixels
+    
+    Cells without pixel centres take the value of the pixel under their
+    centroid, as Earth Engine does for regions smaller than a pixel.
+    
+    Args:
+        cell_ids: Cell IDs in zone order
+        reductions: One band_reduction() per band, giving the band name and outputs
+        accumulators: Accumulated pixels by band
+        centroid_values: Value of the pixel under each cell centroid by band, NaN where unknown
+        lattice_values: (n_cells, rows * cols) values of the pixels under the lattice points
+                        by band, for reductions with the "matrix" output
+    
+    Returns:
+        {"<band>_<output>": value} dictionaries by cell ID, None for cells without data
+    """
+    results = {cell_id: {} for cell_id in cell_ids}
+    for reduction in reductions:
+        band = reduction["band"]
+        outputs = [output for output in reduction["outputs"] if output != MATRIX_OUTPUT]
+        if len(outputs) < len(reduction["outputs"]):
+            for cell_id, values in zip(cell_ids, lattice_values[band]):
+                results[cell_id][f"{band}_{MATRIX_OUTPUT}"] = lattice_matrix(values, reduction["lattice"])
+        if not outputs:
+            continue
+        
+        accumulator = accumulators[band]
+        fallback = accumulator.count == 0
+        if fallback.any():
+            single = ZonalAccumulator(len(cell_ids))
+            single.add(centroid_values[band], np.where(fallback, np.arange(len(cell_ids)), -1))
+            accumulator = _merge(accumulator, single)
+        
+        for output in outputs:
+            values = accumulator.result(output)
+            for cell_id, value in zip(cell_ids, values):
+                results[cell_id][f"{band}_{output}"] = None if np.isnan(value) else float(value)
+    
+    return results
+
+class PixelArrayReducer:
+    """
+    Computes grid cell statistics from downloaded pixel arrays.
+    """
+    
+    def __init__(self,
+                 tile_pixels: Optional[int] = None,
+                 fixture_dir: Optional[str] = None,
+                 fixture_mode: Optional[str] = None):
+        """
+        Args:
+            tile_pixels: Maximum tile width and height in pixels (default: settings.EE_PIXEL_TILE_SIZE)
+            fixture_dir: Directory of recorded tiles (default: settings.EE_PIXEL_FIXTURE_DIR)
+            fixture_mode: "record" to save downloaded tiles, "replay" to read them
+                          instead of calling Earth Engine (default: settings.EE_PIXEL_FIXTURE_MODE)
+        """
+        self.tile_pixels = max(int(tile_pixels or settings.EE_PIXEL_TILE_SIZE), 1)
+        self.fixture_dir = fixture_dir if fixture_dir is not None else settings.EE_PIXEL_FIXTURE_DIR
+        self.fixture_mode = (fixture_mode if fixture_mode is not None else settings.EE_PIXEL_FIXTURE_MODE).lower()
+        if self.fixture_mode and self.fixture_mode not in ("record", "replay"):
+            raise ValueError(f"Unknown pixel fixture mode: {self.fixture_mode}")
+        if self.fixture_mode and not self.fixture_dir:
+            raise ValueError("EE_PIXEL_FIXTURE_DIR is required with a pixel fixture mode")
+    
+    def zonal_statistics(self,
+                         image: ee.Image,
+                         cells: Dict[Hashable, List[List[List[float]]]],
+                         reductions: List[Dict[str, Any]],
+                         scale: float) -> Dict[Hashable, Dict[str, Any]]:
+        """
+        Reduce the bands of an image over many grid cells locally
+        
+        Args:
+            image: Earth Engine image with the reduced bands
+            cells: Earth Engine polygon coordinates by cell ID
+            reductions: One band_reduction() per band, giving the band name and outputs
+            scale: Pixel size in meters
+        
+        Returns:
+            {"<band>_<output>": value} dictionaries by cell ID
+        """
+        if not cells:
+            return {}
+        shape = lattice_shape(reductions)
+        bands = list(dict.fromkeys(reduction["band"] for reduction in reductions))
+        cell_ids = list(cells)
+        polygons = [Polygon(coords[0], coords[1:]) for coords in cells.values()]
+        centroids = np.array([polygon.centroid.coords[0] for polygon in polygons])
+        points = lattice_points(polygons, shape) if shape else np.empty((len(polygons), 0, 2))
+        
+        pixel_size = scale / METERS_PER_DEGREE
+        bounds = np.array([polygon.bounds for polygon in polygons])
+        x0 = math.floor(bounds[:, 0].min() / pixel_size) * pixel_size
+        y0 = math.ceil(bounds[:, 3].max() / pixel_size) * pixel_size
+        width = max(int(math.ceil((bounds[:, 2].max() - x0) / pixel_size)), 1)
+        height = max(int(math.ceil((y0 - bounds[:, 1].min()) / pixel_size)), 1)
+        
+        accumulators = {band: ZonalAccumulator(len(cell_ids)) for band in bands}
+        centroid_values = {band: np.full(len(cell_ids), np.nan) for band in bands}
+        lattice_values = {band: np.full(points.shape[:2], np.nan) for band in bands}
+        
+        # Only tiles with cells in them are fetched; scattered cells would
+        # otherwise pull every tile of their bounding box
+        for (tile_row, tile_col), members in tile_cells(bounds, x0, y0, pixel_size, width, height, self.tile_pixels).items():
+            row, col = tile_row * self.tile_pixels, tile_col * self.tile_pixels
+            tile_x0 = x0 + col * pixel_size
+            tile_y0 = y0 - row * pixel_size
+            tile_width = min(self.tile_pixels, width - col)
+            tile_height = min(self.tile_pixels, height - row)
+            
+            tile = self.fetch_tile(image, bands, reductions, tile_x0, tile_y0, pixel_size, tile_width, tile_height)
+            labels = rasterize_cells([polygons[i] for i in members], tile_x0, tile_y0, pixel_size, tile_width, tile_height)
+            labels = np.where(labels >= 0, members[labels], -1)
+            
+            # Pixels under the centroids, for cells without pixel centres
+            cols = np.floor((centroids[members, 0] - tile_x0) / pixel_size).astype(np.int64)
+            rows = np.floor((tile_y0 - centroids[members, 1]) / pixel_size).astype(np.int64)
+            in_tile = (cols >= 0) & (cols < tile_width) & (rows >= 0) & (rows < tile_height)
+            
+            # Pixels under the lattice points
+            point_cols = np.floor((points[members, :, 0] - tile_x0) / pixel_size).astype(np.int64)
+            point_rows = np.floor((tile_y0 - points[members, :, 1]) / pixel_size).astype(np.int64)
+            points_in_tile = (point_cols >= 0) & (point_cols < tile_width) & (point_rows >= 0) & (point_rows < tile_height)
+            
+            for band in bands:
+                accumulators[band].add(tile[band], labels)
+                centroid_values[band][members[in_tile]] = tile[band][rows[in_tile], cols[in_tile]]
+                band_lattice = lattice_values[band][members]
+                band_lattice[points_in_tile] = tile[band][point_rows[points_in_tile], point_cols[points_in_tile]]
+                lattice_values[band][members] = band_lattice
+        
+        return zonal_results(cell_ids, reductions, accumulators, centroid_values, lattice_values)
+    
+    def fetch_tile(self,
+                   image: ee.Image,
+                   bands: List[str],
+                   reductions: List[Dict[str, Any]],
+                   x0: float,
+                   y0: float,
+                   pixel_size: float,
+                   width: int,
+                   height: int) -> Dict[str, np.ndarray]:
+        """
+        Download one tile of an image, with masked pixels as NaN
+        
+        Args:
+            image: Earth Engine image with the bands
+            bands: Band names to download
+            reductions: Band descriptions, identifying the image for recorded fixtures
+            x0: West edge in degrees
+            y0: North edge in degrees
+            pixel_size: Pixel size in degrees
+            width: Tile width in pixels
+            height: Tile height in pixels
+        
+        Returns:
+            (height, width) float arrays by band name
+        """
+        grid = {
+            "dimensions": {"width": width, "height": height},
+            "affineTransform": {
+                "scaleX": pixel_size, "shearX": 0, "translateX": x0,
+                "shearY": 0, "scaleY": -pixel_size, "translateY": y0
+            },
+            "crsCode": "EPSG:4326"
+        }
+        
+        fixture = None
+        if self.fixture_mode:
+            key = json.dumps({"reductions": reductions, "bands": bands, "grid": grid}, sort_keys=True)
+            fixture = os.path.join(self.fixture_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".npz")
+            if self.fixture_mode == "replay":
+                if not os.path.exists(fixture):
+                    raise FileNotFoundError(f"No recorded pixel tile {fixture} for bands {bands}")
+                with np.load(fixture) as recorded:
+                    return {band: recorded[band] for band in bands}
+        
+        # Masks travel as extra bands, since masked pixels have no value in the array
+        stacked = image.select(bands).toFloat()
+        for band in bands:
+            stacked = stacked.addBands(image.select(band).mask().rename(f"{band}_mask").toFloat())
+        
+        pixels = compute_pixels({
+            "expression": stacked,
+            "fileFormat": "NUMPY_NDARRAY",
+            "grid": grid
+        })
+        tile = {
+            band: np.where(np.asarray(pixels[f"{band}_mask"]) > 0, np.asarray(pixels[band], dtype=np.float64), np.nan)
+            for band in bands
+        }
+        
+        if self.fixture_mode == "record":
+            os.makedirs(self.fixture_dir, exist_ok=True)
+            np.savez_compressed(fixture, **tile)
+        return tile
+
+def _merge(first: ZonalAccumulator, second: ZonalAccumulator) -> ZonalAccumulator:
+    """Combine the sums of two accumulators over the same zones"""
+    merged = ZonalAccumulator(len(first.count))
+    merged.count = first.count + second.count
+    merged.sum = first.sum + second.sum
+    merged.sum_squares = first.sum_squares + second.sum_squares
+    merged.min = np.minimum(first.min, second.min)
+    merged.max = np.maximum(first.max, second.max)
+    return merged
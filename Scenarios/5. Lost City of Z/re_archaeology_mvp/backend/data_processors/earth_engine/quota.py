@@ -0,0 +1,169 @@
+"""
+Earth Engine Request Budget
+===========================
+Per-job and per-day quota budgets for the Earth Engine requests of
+processing tasks.
+
+Every Earth Engine request a job of the request executor sends (retries
+included) takes one unit of the budget (see metering.py); once the job's or
+the day's budget is used up, jobs fail with QuotaExhaustedError at their next
+request and the remaining jobs are not started, and the pipeline pauses the
+task so it can be resumed later (e.g. the next UTC day, or with a larger job
+budget).
+
+The day's usage is shared by all tasks through the ee_request_usage table.
+It is read again at the start of every pipeline window and written together
+with the task's checkpoints (see CheckpointWriter), so concurrent tasks may
+overshoot the daily budget by at most one window each.
+"""
+
+import threading
+import logging
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Dict, Any, Optional, Callable
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_SELECT_USAGE = text("SELECT requests FROM public.ee_request_usage WHERE usage_date = :usage_date")
+
+_UPSERT_USAGE = text(
+    "INSERT INTO public.ee_request_usage (usage_date, requests, updated_at) "
+    "VALUES (:usage_date, :requests, NOW()) "
+    "ON CONFLICT (usage_date) DO UPDATE SET "
+    "requests = ee_request_usage.requests + EXCLUDED.requests, updated_at = EXCLUDED.updated_at"
+)
+
+def utc_today() -> date:
+    """Current UTC day, the period of the daily budget"""
+    return datetime.now(timezone.utc).date()
+
+class QuotaExhaustedError(Exception):
+    """Raised for Earth Engine requests not sent because the request budget is used up"""
+    
+    def __init__(self, scope: str, limit: int):
+        """
+        Args:
+            scope: Exhausted budget, "job" or "daily"
+            limit: Requests allowed by that budget
+        """
+        super().__init__(f"{scope.capitalize()} Earth Engine request budget of {limit} requests exhausted")
+        self.scope = scope
+        self.limit = limit
+
+class EERequestBudget:
+    """
+    Thread-safe per-job and per-day Earth Engine request budget.
+    """
+    
+    def __init__(self,
+                 db: Session,
+                 job_limit: Optional[int] = None,
+                 daily_limit: Optional[int] = None,
+                 job_used: int = 0,
+                 today: Callable[[], date] = utc_today):
+        """
+        Args:
+            db: Database session (used from the calling thread only)
+            job_limit: Requests the job may make in total, over all its runs (None or 0 = unlimited)
+            daily_limit: Requests all jobs may make per UTC day (None or 0 = unlimited)
+            job_used: Requests the job made in earlier runs
+            today: Function returning the current day
+        """
+        self.db = db
+        self.job_limit = job_limit or None
+        self.daily_limit = daily_limit or None
+        self.job_used = int(job_used)
+        self.today = today
+        self.day = today()
+        self.day_used = 0  # Usage of the day as last read from the database, plus unsaved
+        self.unsaved = 0
+        self.exhausted: Optional[QuotaExhaustedError] = None
+        self.lock = threading.Lock()
+    
+    @property
+    def remaining(self) -> Optional[int]:
+        """Requests left before a budget is exhausted (None = unlimited)"""
+        left = []
+        if self.job_limit is not None:
+            left.append(self.job_limit - self.job_used)
+        if self.daily_limit is not None:
+            left.append(self.daily_limit - self.day_used)
+        return max(min(left), 0) if left else None
+    
+    def refresh(self) -> None:
+        """Read the day's usage of all tasks from the database and re-check the budgets"""
+        with self.lock:
+            day = self.today()
+            if day != self.day:
+                # Stage the previous day's requests before switching days
+                self._write()
+                self.day = day
+            stored = self.db.execute(_SELECT_USAGE, {"usage_date": self.day}).scalar() or 0
+            self.day_used = stored + self.unsaved
+            self.exhausted = None
+            self._check()
+    
+    def available(self) -> bool:
+        """
+        Whether a request can still be taken from the budget, without taking it
+        
+        Returns:
+            False (and sets exhausted) if the job's or the day's budget is used up
+        """
+        with self.lock:
+            return self.exhausted is None and not self._check()
+    
+    def acquire(self) -> bool:
+        """
+        Take one request from the budget
+        
+        Returns:
+            False (and sets exhausted) if the job's or the day's budget is used up
+        """
+        with self.lock:
+            if self.exhausted is not None or self._check():
+                return False
+            self.job_used += 1
+            self.day_used += 1
+            self.unsaved += 1
+            return True
+    
+    def write(self) -> None:
+        """Stage the requests made since the last write in the session without committing"""
+        with self.lock:
+            self._write()
+    
+    def resume_after(self) -> Optional[datetime]:
+        """Earliest time a task paused on this budget can make progress, if it is the daily budget"""
+        if self.exhausted is None or self.exhausted.scope != "daily":
+            return None
+        return datetime.combine(self.day + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    
+    def status(self) -> Dict[str, Any]:
+        """Limits and usage of the budget"""
+        return {
+            "job_limit": self.job_limit,
+            "job_used": self.job_used,
+            "daily_limit": self.daily_limit,
+            "day": self.day.isoformat(),
+            "day_used": self.day_used
+        }
+    
+    def _check(self) -> bool:
+        """Set exhausted if a budget is used up; the caller holds the lock"""
+        if self.job_limit is not None and self.job_used >= self.job_limit:
+            self.exhausted = QuotaExhaustedError("job", self.job_limit)
+        elif self.daily_limit is not None and self.day_used >= self.daily_limit:
+            self.exhausted = QuotaExhaustedError("daily", self.daily_limit)
+        return self.exhausted is not None
+    
+    def _write(self) -> None:
+        """Stage the unsaved requests of the current day; the caller holds the lock"""
+        if not self.unsaved:
+            return
+        self.db.execute(_UPSERT_USAGE, {"usage_date": self.day, "requests": self.unsaved})
+        self.unsaved = 0
@@ -0,0 +1,435 @@
+"""
+Terrain Stage
+=============
+Terrain products derived locally from one SRTM DEM download per region tile,
+instead of ee.Terrain graphs reduced per grid cell or point.
+
+The DEM is fetched as a pixel array (ee.data.computePixels, see
+PixelArrayReducer.fetch_tile) on a lattice of tiles snapped to the pixel
+size, each with a halo wide enough for the largest moving window, and the
+products are computed with NumPy and scipy.ndimage:
+
+- slope and aspect (degrees) from central-difference kernels, like
+  ee.Terrain.slope / ee.Terrain.aspect (4-connected neighbours)
+- curvature: magnitude of the x gradients of slope and aspect, the band
+  EnhancedEarthEngineConnector.get_curvature reads
+- elevation anomaly: mean elevation over the local window (25 m) minus the
+  mean over the context window (1 km)
+
+Moving-window means use uniform_filter over the square with the area of the
+circular buffer they stand in for. Only the tiles holding cells or points
+are fetched, and each one is sampled for just the cells and points in it.
+Terrain is static, so computed tiles are kept in an LRU sized to hold the
+tiles of a whole pipeline window (see plan_window), and every cell or point
+falling in a tile is sampled from the same arrays.
+"""
+
+import math
+import threading
+import logging
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Hashable, Tuple
+from scipy import ndimage
+from shapely.geometry import Polygon
+
+import ee
+
+from backend.data_processors.earth_engine.cache import band_reduction
+from backend.data_processors.earth_engine.pixels import (
+    PixelArrayReducer, ZonalAccumulator, zonal_results, rasterize_cells, MATRIX_OUTPUT, METERS_PER_DEGREE
+)
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEM_DATASET = "USGS/SRTMGL1_003"
+
+# Products of a terrain tile
+TERRAIN_BANDS = ("elevation", "slope", "aspect", "curvature", "elevation_anomaly")
+
+# Local and context windows of the elevation anomaly, in meters (buffer radii)
+ANOMALY_WINDOWS = (25, 1000)
+
+# Central-difference kernel; divided by the pixel spacing it gives the derivative
+_CENTRAL_DIFFERENCE = np.array([-0.5, 0.0, 0.5])
+
+def window_pixels(meters: float, pixel_size_meters: float) -> int:
+    """
+    Odd window width in pixels of a square with the area of a circular buffer
+    
+    Args:
+        meters: Buffer radius
+        pixel_size_meters: Pixel spacing along the axis
+    
+    Returns:
+        Window width, at least 1
+    """
+    side = math.sqrt(math.pi) * meters / pixel_size_meters
+    return max(int(math.floor(side / 2.0)) * 2 + 1, 1)
+
+def nan_uniform_filter(values: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Moving-window mean ignoring NaN pixels, NaN where the window has none"""
+    valid = ~np.isnan(values)
+    sums = ndimage.uniform_filter(np.where(valid, values, 0.0), size=size, mode="constant", cval=0.0)
+    counts = ndimage.uniform_filter(valid.astype(np.float64), size=size, mode="constant", cval=0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Counts are fractions of the window; guard against round-off around zero
+        return np.where(counts > 1e-9, sums / counts, np.nan)
+
+class TerrainTile:
+    """
+    DEM of one lattice tile with its halo, and the terrain products derived from it.
+    """
+    
+    def __init__(self,
+                 elevation: np.ndarray,
+                 x0: float,
+                 y0: float,
+                 pixel_size: float,
+                 halo: Tuple[int, int],
+                 anomaly_windows: Tuple[float, float] = ANOMALY_WINDOWS):
+        """
+        Args:
+            elevation: (height, width) DEM including the halo, NaN where masked
+            x0: West edge of the array in degrees
+            y0: North edge of the array in degrees
+            pixel_size: Pixel size in degrees
+            halo: (rows, cols) of halo pixels on each side around the tile
+            anomaly_windows: Local and context buffer radii of the elevation anomaly in meters
+        """
+        self.elevation = elevation
+        self.x0 = x0
+        self.y0 = y0
+        self.pixel_size = pixel_size
+        self.halo = halo
+        self.anomaly_windows = anomaly_windows
+        self.bands: Dict[str, np.ndarray] = {"elevation": elevation}
+        self.means: Dict[Tuple[str, float], np.ndarray] = {}
+        
+        # Pixel spacing in meters: height is constant, width shrinks with latitude
+        latitudes = y0 - (np.arange(elevation.shape[0]) + 0.5) * pixel_size
+        self.pixel_height = pixel_size * METERS_PER_DEGREE
+        self.pixel_width = (self.pixel_height * np.cos(np.radians(latitudes)))[:, None]
+        self.mean_pixel_width = float(np.median(self.pixel_width))
+    
+    @property
+    def core_bounds(self) -> Tuple[float, float, int, int]:
+        """West edge, north edge, width and height of the tile without its halo"""
+        rows, cols = self.halo
+        height, width = self.elevation.shape
+        return (self.x0 + cols * self.pixel_size, self.y0 - rows * self.pixel_size, width - 2 * cols, height - 2 * rows)
+    
+    def core(self, values: np.ndarray) -> np.ndarray:
+        """Pixels of an array inside the tile, without the halo"""
+        rows, cols = self.halo
+        height, width = values.shape
+        return values[rows:height - rows, cols:width - cols]
+    
+    def band(self, name: str) -> np.ndarray:
+        """
+        Terrain product over the tile and its halo
+        
+        Args:
+            name: One of TERRAIN_BANDS
+        
+        Returns:
+            (height, width) values, NaN where unknown
+        """
+        if name in self.bands:
+            return self.bands[name]
+        
+        if name in ("slope", "aspect"):
+            east, north = self._gradient(self.elevation)
+            self.bands["slope"] = np.degrees(np.arctan(np.hypot(east, north)))
+            # Downslope direction, clockwise from north like ee.Terrain.aspect
+            self.bands["aspect"] = np.degrees(np.arctan2(-east, -north)) % 360
+        elif name == "curvature":
+            slope_east, _ = self._gradient(self.band("slope"))
+            aspect_east, _ = self._gradient(self.band("aspect"))
+            self.bands["curvature"] = np.hypot(slope_east, aspect_east)
+        elif name == "elevation_anomaly":
+            local, context = self.anomaly_windows
+            self.bands["elevation_anomaly"] = self.window_mean("elevation", local) - self.window_mean("elevation", context)
+        else:
+            raise ValueError(f"Unknown terrain band: {name} (available: {', '.join(TERRAIN_BANDS)})")
+        return self.bands[name]
+    
+    def window_mean(self, name: str, meters: float) -> np.ndarray:
+        """
+        Mean of a terrain product over a moving window standing in for a circular buffer
+        
+        Args:
+            name: One of TERRAIN_BANDS
+            meters: Buffer radius
+        
+        Returns:
+            (height, width) window means; windows reaching past the halo only
+            average the pixels inside the array
+        """
+        key = (name, float(meters))
+        if key not in self.means:
+            size = (window_pixels(meters, self.pixel_height), window_pixels(meters, self.mean_pixel_width))
+            values = self.band(name)
+            self.means[key] = values if size == (1, 1) else nan_uniform_filter(values, size)
+        return self.means[key]
+    
+    def _gradient(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Eastward and northward derivative per meter"""
+        east = ndimage.correlate1d(values, _CENTRAL_DIFFERENCE, axis=1, mode="nearest") / self.pixel_width
+        # Rows run southward
+        north = -ndimage.correlate1d(values, _CENTRAL_DIFFERENCE, axis=0, mode="nearest") / self.pixel_height
+        return east, north
+
+class TerrainStage:
+    """
+    Fetches DEM tiles once and samples terrain products for grid cells and points.
+    """
+    
+    def __init__(self,
+                 scale: Optional[float] = None,
+                 tile_pixels: Optional[int] = None,
+                 cached_tiles: Optional[int] = None,
+                 anomaly_windows: Tuple[float, float] = ANOMALY_WINDOWS,
+                 pixel_reducer: Optional[PixelArrayReducer] = None):
+        """
+        Args:
+            scale: DEM pixel size in meters (default: settings.EE_TERRAIN_SCALE)
+            tile_pixels: Tile width and height in pixels, halo included (default: settings.EE_PIXEL_TILE_SIZE)
+            cached_tiles: Computed tiles kept in memory (default: settings.EE_TERRAIN_CACHED_TILES)
+            anomaly_windows: Local and context buffer radii of the elevation anomaly in meters;
+                             the context window also sets the halo of every tile
+            pixel_reducer: Downloads the DEM tiles, recording or replaying them as
+                           fixtures (default: a new PixelArrayReducer)
+        """
+        self.scale = float(scale or settings.EE_TERRAIN_SCALE)
+        self.anomaly_windows = tuple(float(meters) for meters in anomaly_windows)
+        self.pixel_reducer = pixel_reducer or PixelArrayReducer(tile_pixels=tile_pixels)
+        self.pixel_size = self.scale / METERS_PER_DEGREE
+        
+        # Halo rows: half the widest window plus the two pixels of the curvature kernels
+        self.halo_rows = window_pixels(max(self.anomaly_windows), self.scale) // 2 + 2
+        self.core_pixels = max(self.pixel_reducer.tile_pixels - 2 * self.halo_rows, 1)
+        self.cached_tiles = max(int(cached_tiles or settings.EE_TERRAIN_CACHED_TILES), 1)
+        
+        # Tiles of the current pipeline window, kept even beyond cached_tiles
+        self.window_tiles = 0
+        
+        self.tiles: "OrderedDict[Tuple[int, int], TerrainTile]" = OrderedDict()
+        self.tile_locks: Dict[Tuple[int, int], threading.Lock] = {}
+        self.lock = threading.Lock()
+        self.fetched = 0
+    
+    def batch_reductions(self, reductions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Cache descriptions of values computed by the terrain stage
+        
+        Locally derived products differ slightly from server-side
+        reductions, so their cache entries are kept apart.
+        """
+        return [
+            dict(reduction, method="terrain_tiles", anomaly_windows=list(self.anomaly_windows))
+            for reduction in reductions
+        ]
+    
+    def plan_window(self, cells: Dict[Hashable, List[List[List[float]]]]) -> int:
+        """
+        Size the tile cache to hold every tile under a window of cells
+        
+        The chunks of a pipeline window are reduced concurrently and in any
+        order; with fewer cached tiles than the window touches, tiles shared
+        by several chunks would be fetched again.
+        
+        Args:
+            cells: Earth Engine polygon coordinates by cell ID
+        
+        Returns:
+            Number of tiles under the cells
+        """
+        bounds = np.array([Polygon(coords[0], coords[1:]).bounds for coords in cells.values()]).reshape(-1, 4)
+        tiles = len(self._cell_tiles(bounds))
+        with self.lock:
+            self.window_tiles = tiles
+        return tiles
+    
+    def cell_statistics(self,
+                        cells: Dict[Hashable, List[List[List[float]]]],
+                        reductions: List[Dict[str, Any]]) -> Dict[Hashable, Dict[str, Any]]:
+        """
+        Reduce terrain products over many grid cells
+        
+        Args:
+            cells: Earth Engine polygon coordinates by cell ID
+            reductions: One band_reduction() per band of TERRAIN_BANDS, giving the band name and outputs
+        
+        Returns:
+            {"<band>_<output>": value} dictionaries by cell ID
+        """
+        if not cells:
+            return {}
+        bands = list(dict.fromkeys(reduction["band"] for reduction in reductions))
+        for reduction in reductions:
+            if MATRIX_OUTPUT in reduction["outputs"]:
+                raise ValueError(f"The terrain stage does not sample lattices (band {reduction['band']})")
+        
+        cell_ids = list(cells)
+        polygons = [Polygon(coords[0], coords[1:]) for coords in cells.values()]
+        bounds = np.array([polygon.bounds for polygon in polygons])
+        centroids = np.array([polygon.centroid.coords[0] for polygon in polygons])
+        
+        accumulators = {band: ZonalAccumulator(len(cell_ids)) for band in bands}
+        centroid_values = {band: np.full(len(cell_ids), np.nan) for band in bands}
+        
+        # Only tiles with cells in them are fetched, and only their own cells are rasterized
+        for key, members in self._cell_tiles(bounds).items():
+            tile = self.tile(key)
+            x0, y0, width, height = tile.core_bounds
+            labels = rasterize_cells([polygons[i] for i in members], x0, y0, self.pixel_size, width, height)
+            labels = np.where(labels >= 0, members[labels], -1)
+            
+            # Pixels under the centroids, for cells without pixel centres
+            cols = np.floor((centroids[members, 0] - x0) / self.pixel_size).astype(np.int64)
+            rows = np.floor((y0 - centroids[members, 1]) / self.pixel_size).astype(np.int64)
+            in_tile = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+            
+            for band in bands:
+                values = tile.core(tile.band(band))
+                accumulators[band].add(values, labels)
+                centroid_values[band][members[in_tile]] = values[rows[in_tile], cols[in_tile]]
+        
+        return zonal_results(cell_ids, reductions, accumulators, centroid_values)
+    
+    def point_values(self,
+                     points: Dict[Hashable, Tuple[float, float]],
+                     windows: Dict[str, Tuple[str, float]]) -> Dict[Hashable, Dict[str, Optional[float]]]:
+        """
+        Sample buffered means of terrain products at many points
+        
+        Args:
+            points: (lat, lon) pairs by ID
+            windows: (terrain band, buffer radius in meters) by output name
+        
+        Returns:
+            {output name: value} dictionaries by ID, None where unknown
+        """
+        if not points:
+            return {}
+        ids = list(points)
+        coords = np.array(list(points.values()), dtype=np.float64).reshape(-1, 2)
+        lats, lons = coords[:, 0], coords[:, 1]
+        values = {name: np.full(len(ids), np.nan) for name in windows}
+        
+        # Every point lies in exactly one tile; tiles without points are not fetched
+        for key, members in self._cell_tiles(np.column_stack((lons, lats, lons, lats))).items():
+            tile = self.tile(key)
+            x0, y0, width, height = tile.core_bounds
+            cols = np.floor((lons[members] - x0) / self.pixel_size).astype(np.int64)
+            rows = np.floor((y0 - lats[members]) / self.pixel_size).astype(np.int64)
+            in_tile = (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+            
+            for name, (band, meters) in windows.items():
+                sampled = tile.core(tile.window_mean(band, meters))
+                values[name][members[in_tile]] = sampled[rows[in_tile], cols[in_tile]]
+        
+        return {
+            point_id: {name: None if np.isnan(values[name][i]) else float(values[name][i]) for name in windows}
+            for i, point_id in enumerate(ids)
+        }
+    
+    def tile(self, key: Tuple[int, int]) -> TerrainTile:
+        """
+        Computed tile of the lattice, fetched at most once while it stays cached
+        
+        Args:
+            key: (column, row) of the tile; row 0 starts at the equator and grows northward
+        
+        Returns:
+            Terrain tile
+        """
+        with self.lock:
+            if key in self.tiles:
+                self.tiles.move_to_end(key)
+                return self.tiles[key]
+            tile_lock = self.tile_locks.setdefault(key, threading.Lock())
+        
+        # Other threads wait for a tile being fetched instead of fetching it again
+        with tile_lock:
+            with self.lock:
+                if key in self.tiles:
+                    self.tiles.move_to_end(key)
+                    return self.tiles[key]
+            tile = self._fetch(key)
+            with self.lock:
+                self.tiles[key] = tile
+                while len(self.tiles) > max(self.cached_tiles, self.window_tiles):
+                    evicted, _ = self.tiles.popitem(last=False)
+                    self.tile_locks.pop(evicted, None)
+            return tile
+    
+    def _cell_tiles(self, bounds: np.ndarray) -> Dict[Tuple[int, int], np.ndarray]:
+        """
+        Group cells by the lattice tiles their bounding boxes touch
+        
+        Boxes are widened by half a pixel as in rasterize_cells, so the tiles
+        also cover the centroids and every pixel centre inside a cell.
+        
+        Args:
+            bounds: (n_cells, 4) cell bounds (minx, miny, maxx, maxy) in degrees
+        
+        Returns:
+            Cell indices by tile key, in row-major tile order
+        """
+        size = self.core_pixels * self.pixel_size
+        margin = self.pixel_size / 2.0
+        col0 = np.floor((bounds[:, 0] - margin) / size).astype(np.int64)
+        col1 = np.floor((bounds[:, 2] + margin) / size).astype(np.int64)
+        row0 = np.floor((bounds[:, 1] - margin) / size).astype(np.int64)
+        row1 = np.floor((bounds[:, 3] + margin) / size).astype(np.int64)
+        
+        tiles: Dict[Tuple[int, int], List[int]] = {}
+        for index in range(len(bounds)):
+            for row in range(row0[index], row1[index] + 1):
+                for col in range(col0[index], col1[index] + 1):
+                    tiles.setdefault((int(col), int(row)), []).append(index)
+        return {key: np.array(tiles[key], dtype=np.int64) for key in sorted(tiles, key=lambda key: (key[1], key[0]))}
+    
+    def _fetch(self, key: Tuple[int, int]) -> TerrainTile:
+        """Download the DEM of a lattice tile with its halo"""
+        col, row = key
+        size = self.core_pixels * self.pixel_size
+        north = (row + 1) * size
+        
+        # Halo columns cover the same distance as the halo rows where the tile's pixels are narrowest
+        latitude = max(abs(north), abs(north - size))
+        halo_cols = int(math.ceil(self.halo_rows / max(math.cos(math.radians(latitude)), 1e-6)))
+        halo = (self.halo_rows, halo_cols)
+        x0 = col * size - halo_cols * self.pixel_size
+        y0 = north + self.halo_rows * self.pixel_size
+        
+        dem = ee.Image(DEM_DATASET).select("elevation")
+        reduction = band_reduction("elevation", DEM_DATASET, "elevation", ("value",), self.scale)
+        pixels = self.pixel_reducer.fetch_tile(
+            dem, ["elevation"], [reduction], x0, y0, self.pixel_size,
+            self.core_pixels + 2 * halo_cols, self.core_pixels + 2 * self.halo_rows
+        )
+        self.fetched += 1
+        logger.info(f"Fetched DEM tile {key} ({self.core_pixels}px + halo {halo[0]}x{halo[1]}px)")
+        return TerrainTile(pixels["elevation"], x0, y0, self.pixel_size, halo, self.anomaly_windows)
+
+_stage = None
+_stage_lock = threading.Lock()
+
+def get_terrain_stage() -> Optional[TerrainStage]:
+    """Process-wide terrain stage configured from settings, None with EE_TERRAIN_BACKEND=reduce_regions"""
+    global _stage
+    backend = settings.EE_TERRAIN_BACKEND.lower()
+    if backend == "reduce_regions":
+        return None
+    if backend != "tiles":
+        raise ValueError(f"Unknown Earth Engine terrain backend: {settings.EE_TERRAIN_BACKEND}")
+    with _stage_lock:
+        if _stage is None:
+            _stage = TerrainStage()
+        return _stage
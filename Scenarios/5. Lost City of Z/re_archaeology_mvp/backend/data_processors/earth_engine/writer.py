@@ -0,0 +1,133 @@
+"""
+Batched Environmental Data Writer
+=================================
+Writes processor results to environmental_data in batches.
+
+Results are buffered per cell, merging the data sources of a cell into one
+row update. A batch looks up the existing rows of all its cells with one
+query and is written in a single transaction, instead of a SELECT and a
+commit per cell and data source.
+"""
+
+import logging
+from typing import Dict, List, Any, Optional
+from sqlalchemy.orm import Session
+
+from backend.models.database import EnvironmentalData
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns set from each data source's result; the full result is kept in raw_data[source]
+SOURCE_FIELDS = {
+    "ndvi": ("ndvi_mean", "ndvi_std"),
+    "canopy": ("canopy_height_mean", "canopy_height_std"),
+    "terrain": ("elevation_mean", "elevation_std", "slope_mean", "slope_std"),
+    "water": ("water_proximity",)
+}
+
+class EnvironmentalDataWriter:
+    """
+    Buffers processor results and writes them to environmental_data in batches of cells.
+    """
+    
+    def __init__(self,
+                 db: Session,
+                 batch_size: Optional[int] = None,
+                 autocommit: bool = True):
+        """
+        Args:
+            db: Database session (used from the calling thread only)
+            batch_size: Cells per batch (default: settings.DB_WRITE_BATCH_SIZE)
+            autocommit: Commit a batch as soon as it is full; otherwise the
+                        owner calls write() or flush() (e.g. to commit the
+                        batch together with other rows)
+        """
+        self.db = db
+        self.batch_size = max(int(batch_size or settings.DB_WRITE_BATCH_SIZE), 1)
+        self.autocommit = autocommit
+        self.pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.written = 0
+    
+    @property
+    def full(self) -> bool:
+        """Whether a batch worth of cells is buffered"""
+        return len(self.pending) >= self.batch_size
+    
+    def add(self, source: str, data: Dict[str, Any]) -> None:
+        """
+        Buffer the successful result of one data source for one cell
+        
+        Args:
+            source: "ndvi", "canopy", "terrain" or "water"
+            data: Processor result, including its "cell_id"
+        """
+        if source not in SOURCE_FIELDS:
+            raise ValueError(f"Unknown data source: {source}")
+        
+        self.pending.setdefault(data["cell_id"], {})[source] = data
+        if self.autocommit and self.full:
+            self.flush()
+    
+    def write(self) -> int:
+        """
+        Stage the buffered results in the session without committing
+        
+        Returns:
+            Number of cells written
+        """
+        if not self.pending:
+            return 0
+        
+        cell_ids = list(self.pending)
+        existing: Dict[str, EnvironmentalData] = {}
+        for row in self.db.query(EnvironmentalData).filter(EnvironmentalData.cell_id.in_(cell_ids)).all():
+            existing.setdefault(row.cell_id, row)
+        
+        created: List[EnvironmentalData] = []
+        for cell_id in cell_ids:
+            sources = self.pending[cell_id]
+            env_data = existing.get(cell_id)
+            if env_data is None:
+                env_data = EnvironmentalData(cell_id=cell_id, raw_data={})
+                created.append(env_data)
+            
+            for source, data in sources.items():
+                for field in SOURCE_FIELDS[source]:
+                    setattr(env_data, field, data.get(field))
+            
+            # Assign a new dictionary so the JSONB change is detected
+            raw_data = dict(env_data.raw_data) if isinstance(env_data.raw_data, dict) else {}
+            raw_data.update(sources)
+            if "ndvi" in sources:
+                # Read from raw_data->'ndvi_matrix' by the scoring engine and the phi0 API
+                raw_data["ndvi_matrix"] = sources["ndvi"].get("ndvi_matrix")
+            env_data.raw_data = raw_data
+        
+        self.db.add_all(created)
+        self.db.flush()
+        
+        self.written += len(cell_ids)
+        self.pending = {}
+        return len(cell_ids)
+    
+    def discard(self) -> int:
+        """
+        Drop the buffered results without writing them, e.g. after the
+        transaction they were written in has been rolled back
+        
+        Returns:
+            Number of cells dropped
+        """
+        count = len(self.pending)
+        self.pending = {}
+        return count
+    
+    def flush(self) -> None:
+        """Write the buffered results in one transaction"""
+        count = self.write()
+        self.db.commit()
+        if count:
+            logger.info(f"Saved environmental data of {count} cells")
@@ -0,0 +1 @@
+# Local raster data processors package
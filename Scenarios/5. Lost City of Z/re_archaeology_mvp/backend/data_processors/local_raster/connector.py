@@ -0,0 +1,411 @@
+"""
+Local Raster Connector
+======================
+Offline counterpart of EarthEngineConnector over local GeoTIFF/COG files: a
+DEM, an NDVI composite, a canopy height model and surface water occurrence.
+
+The processors reduce grid cells through the same reduce_cells /
+batch_reductions interface; with RASTER_BACKEND=local each band they ask
+for is read from its layer (see BANDS) instead of being computed by Earth
+Engine. The cells of a chunk are grouped by the read tile (a square of
+whole internal blocks, see READ_TILE_PIXELS) their centroid lies in, and
+only the block-aligned window around each group is read, so cells scattered
+over a large area do not pull in the raster between them. An overview is picked from the reduction scale and
+the cell size, and every worker thread keeps its own open dataset handles,
+since rasterio datasets must not be shared between threads.
+"""
+
+import os
+import math
+import threading
+import numpy as np
+import logging
+from typing import Dict, List, Any, Optional, Tuple, Callable
+from shapely.geometry import Polygon, mapping
+
+import rasterio
+from rasterio import Affine
+from rasterio.enums import Resampling
+from rasterio.features import rasterize
+from rasterio.warp import transform as transform_coordinates
+from rasterio.windows import Window, from_bounds
+from scipy import ndimage
+
+from backend.data_processors.earth_engine.cache import get_reduction_cache
+from backend.data_processors.earth_engine.pixels import (
+    ZonalAccumulator, zonal_results, lattice_shape, lattice_points, METERS_PER_DEGREE
+)
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Layer files: setting with the path and default file name in LOCAL_RASTER_DIR
+LAYERS = {
+    "dem": ("LOCAL_DEM_PATH", "dem.tif"),
+    "ndvi": ("LOCAL_NDVI_PATH", "ndvi.tif"),
+    "canopy_height": ("LOCAL_CANOPY_PATH", "canopy_height.tif"),
+    "water_occurrence": ("LOCAL_WATER_PATH", "water_occurrence.tif")
+}
+
+# Bands of the processors' reductions: layer and how the band is derived from it.
+# The canopy layer stands in for the global canopy model ('b1'); the GEDI
+# sources ('rh95') have no local layer, so the processor falls through to it.
+BANDS = {
+    "elevation": ("dem", "value"),
+    "slope": ("dem", "slope"),
+    "aspect": ("dem", "aspect"),
+    "NDVI": ("ndvi", "value"),
+    "b1": ("canopy_height", "value"),
+    "occurrence": ("water_occurrence", "water"),
+    "distance": ("water_occurrence", "distance")
+}
+
+# Water is where occurrence exceeds this percentage, as in EnvironmentalFeatureProcessor
+WATER_OCCURRENCE_THRESHOLD = 25
+
+# Pixels around the cells searched for water, like fastDistanceTransform's default neighborhood
+WATER_SEARCH_PIXELS = 256
+
+# Side of the tiles cells are grouped by for reading, in pixels at the read resolution
+# (rounded up to whole blocks)
+READ_TILE_PIXELS = 1024
+
+class LocalRasterConnector:
+    """
+    Reduces grid cells over local GeoTIFF/COG layers with the interface of EarthEngineConnector.
+    """
+    
+    is_local = True
+    
+    def __init__(self,
+                 paths: Optional[Dict[str, str]] = None,
+                 pixels_per_cell: Optional[int] = None):
+        """
+        Args:
+            paths: Layer files by layer name (default: settings.LOCAL_*_PATH or the files in settings.LOCAL_RASTER_DIR)
+            pixels_per_cell: Minimum pixels across a cell when reading from overviews
+                             (default: settings.LOCAL_RASTER_PIXELS_PER_CELL)
+        """
+        directory = settings.LOCAL_RASTER_DIR or os.path.join(settings.DATA_DIR, "rasters")
+        self.paths = {
+            layer: getattr(settings, setting) or os.path.join(directory, filename)
+            for layer, (setting, filename) in LAYERS.items()
+        }
+        self.paths.update(paths or {})
+        self.pixels_per_cell = max(int(pixels_per_cell or settings.LOCAL_RASTER_PIXELS_PER_CELL), 1)
+        self.cache = get_reduction_cache()
+        self.handles = threading.local()
+        
+        available = [layer for layer, path in self.paths.items() if os.path.exists(path)]
+        self.initialized = bool(available)
+        if available:
+            logger.info(f"Local rasters available: {', '.join(available)}")
+        else:
+            logger.error(f"No local rasters found (looked for {', '.join(self.paths.values())})")
+    
+    def check_connection(self) -> bool:
+        """Check if at least one layer can be opened"""
+        for layer, path in self.paths.items():
+            if not os.path.exists(path):
+                continue
+            try:
+                self.dataset(layer)
+                return True
+            except Exception as e:
+                logger.error(f"Failed to open local raster {path}: {e}")
+        return False
+    
+    def dataset(self, layer: str) -> rasterio.DatasetReader:
+        """
+        Open dataset of a layer for the calling thread
+        
+        Handles are kept per thread and process, so pool workers and forked
+        task workers each open a file once and never share a handle.
+        """
+        handles = getattr(self.handles, "datasets", None)
+        if handles is None or self.handles.pid != os.getpid():
+            handles = self.handles.datasets = {}
+            self.handles.pid = os.getpid()
+        
+        if layer not in handles:
+            handles[layer] = rasterio.open(self.paths[layer])
+        return handles[layer]
+    
+    def close(self):
+        """Close the dataset handles of the calling thread"""
+        for dataset in getattr(self.handles, "datasets", {}).values():
+            dataset.close()
+        self.handles.datasets = {}
+    
+    def max_cells_per_request(self, lattice: Optional[Tuple[int, int]] = None) -> Optional[int]:
+        """Local reads take any number of cells at once (see EarthEngineConnector.max_cells_per_request)"""
+        return None
+    
+    def batch_reductions(self, reductions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Cache descriptions of reductions computed by reduce_cells
+        
+        Entries are tied to the size and modification time of the layer file,
+        so replacing a file invalidates its cached values.
+        """
+        return [
+            dict(reduction, method="local", file=self._file_version(BANDS.get(reduction["band"], (None,))[0]))
+            for reduction in reductions
+        ]
+    
+    def reduce_cells(self,
+                     cells: Dict[str, List[List[List[float]]]],
+                     reductions: List[Dict[str, Any]],
+                     scale: float,
+                     build_image: Optional[Callable] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Reduce local rasters over many grid cells
+        
+        Args:
+            cells: Polygon coordinates by cell ID
+            reductions: One band_reduction() per band, giving the band names and reducer outputs
+            scale: Reduction scale in meters
+            build_image: Earth Engine image builder of the processors; not used
+        
+        Returns:
+            {"<band>_<output>": value} dictionaries by cell ID; empty if a band
+            has no local layer, and cells without data are left out
+        """
+        by_layer: Dict[str, List[Dict[str, Any]]] = {}
+        for reduction in reductions:
+            layer = BANDS.get(reduction["band"], (None,))[0]
+            if layer is None or not os.path.exists(self.paths[layer]):
+                return {}
+            by_layer.setdefault(layer, []).append(reduction)
+        
+        cell_ids = list(cells)
+        polygons = [Polygon(coords[0], coords[1:]) for coords in cells.values()]
+        results = {cell_id: {} for cell_id in cell_ids}
+        
+        for layer, layer_reductions in by_layer.items():
+            values = self._zonal_statistics(layer, polygons, layer_reductions, scale)
+            for index, cell_id in enumerate(cell_ids):
+                results[cell_id].update(values[index])
+        
+        return {
+            cell_id: properties for cell_id, properties in results.items()
+            if any(value is not None for value in properties.values())
+        }
+    
+    def _zonal_statistics(self,
+                          layer: str,
+                          polygons: List[Polygon],
+                          reductions: List[Dict[str, Any]],
+                          scale: float) -> Dict[int, Dict[str, Any]]:
+        """Reduce the bands of one layer over the polygons, by polygon index"""
+        dataset = self.dataset(layer)
+        bands = list(dict.fromkeys(reduction["band"] for reduction in reductions))
+        shapes = self._to_dataset_crs(dataset, polygons)
+        
+        # Lattice points are laid out over the cells in EPSG:4326, like Earth Engine's
+        shape = lattice_shape(reductions)
+        points = lattice_points(polygons, shape) if shape else np.empty((len(polygons), 0, 2))
+        points = self._points_to_dataset_crs(dataset, points)
+        
+        derivations = {BANDS[band][1] for band in bands}
+        pad = 0
+        if derivations & {"slope", "aspect"}:
+            pad = 1
+        if "distance" in derivations:
+            pad = WATER_SEARCH_PIXELS
+        
+        bounds = np.array([shape.bounds for shape in shapes])
+        centroids = np.array([shape.centroid.coords[0] for shape in shapes])
+        factor = self._overview_factor(dataset, bounds, scale)
+        geographic = dataset.crs is None or dataset.crs.is_geographic
+        
+        accumulators = {band: ZonalAccumulator(len(shapes)) for band in bands}
+        centroid_values = {band: np.full(len(shapes), np.nan) for band in bands}
+        lattice_values = {band: np.full(points.shape[:2], np.nan) for band in bands}
+        
+        # Every cell is reduced from the window of its own group, which covers the whole cell
+        for members in self._read_groups(dataset, centroids, factor):
+            group = bounds[members]
+            values, transform = self._read(
+                dataset, (group[:, 0].min(), group[:, 1].min(), group[:, 2].max(), group[:, 3].max()), factor, pad
+            )
+            if values is None:
+                continue
+            labels = rasterize(
+                [(mapping(shapes[index]), position) for position, index in enumerate(members)],
+                out_shape=values.shape,
+                transform=transform,
+                fill=-1,
+                dtype="int32"
+            )
+            labels = np.where(labels >= 0, members[labels], -1)
+            
+            # Pixels under the centroids, for cells without pixel centres
+            cols, rows = ~transform * (centroids[members, 0], centroids[members, 1])
+            cols, rows = np.floor(cols).astype(np.int64), np.floor(rows).astype(np.int64)
+            inside = (cols >= 0) & (cols < values.shape[1]) & (rows >= 0) & (rows < values.shape[0])
+            
+            # Pixels under the lattice points
+            point_cols, point_rows = ~transform * (points[members, :, 0], points[members, :, 1])
+            point_cols, point_rows = np.floor(point_cols).astype(np.int64), np.floor(point_rows).astype(np.int64)
+            points_inside = (point_cols >= 0) & (point_cols < values.shape[1]) & (point_rows >= 0) & (point_rows < values.shape[0])
+            
+            for band in bands:
+                band_values = _derive(BANDS[band][1], values, transform, geographic)
+                accumulators[band].add(band_values, labels)
+                centroid_values[band][members[inside]] = band_values[rows[inside], cols[inside]]
+                group_lattice = lattice_values[band][members]
+                group_lattice[points_inside] = band_values[point_rows[points_inside], point_cols[points_inside]]
+                lattice_values[band][members] = group_lattice
+        
+        return zonal_results(list(range(len(shapes))), reductions, accumulators, centroid_values, lattice_values)
+    
+    def _read_groups(self, dataset: rasterio.DatasetReader, centroids: np.ndarray, factor: int) -> List[np.ndarray]:
+        """
+        Indices of the cells by the read tile their centroid lies in
+        
+        Read tiles are READ_TILE_PIXELS pixels at the read resolution, rounded
+        up to whole blocks of the file, so groups do not share blocks
+        except for the cells and padding reaching past their tile.
+        """
+        block_height, block_width = dataset.block_shapes[0]
+        tile_width = -(-READ_TILE_PIXELS * factor // block_width) * block_width
+        tile_height = -(-READ_TILE_PIXELS * factor // block_height) * block_height
+        
+        cols, rows = ~dataset.transform * (centroids[:, 0], centroids[:, 1])
+        keys = np.column_stack((np.floor(np.asarray(rows) / tile_height), np.floor(np.asarray(cols) / tile_width)))
+        _, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        return np.split(order, np.flatnonzero(np.diff(inverse[order])) + 1)
+    
+    def _overview_factor(self, dataset: rasterio.DatasetReader, bounds: np.ndarray, scale: float) -> int:
+        """
+        Decimation to read at: the coarsest overview that is no coarser than
+        the reduction scale and still leaves pixels_per_cell pixels across a cell
+        """
+        resolution = abs(dataset.res[1])
+        native_meters = resolution * (METERS_PER_DEGREE if dataset.crs is None or dataset.crs.is_geographic else 1.0)
+        cell_pixels = float(np.median(np.minimum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]))) / resolution
+        limit = min(scale / native_meters, cell_pixels / self.pixels_per_cell)
+        return max([factor for factor in dataset.overviews(1) if factor <= limit], default=1)
+    
+    def _read(self,
+              dataset: rasterio.DatasetReader,
+              bounds: Tuple[float, float, float, float],
+              factor: int,
+              pad: int) -> Tuple[Optional[np.ndarray], Optional[Affine]]:
+        """
+        Read the block-aligned window around bounds, decimated by factor
+        
+        Args:
+            dataset: Open dataset
+            bounds: (west, south, east, north) in the dataset CRS
+            factor: Decimation factor (an overview factor, or 1)
+            pad: Extra pixels to read around the bounds, at the decimated resolution
+        
+        Returns:
+            Values with nodata as NaN and their transform, or (None, None) if the bounds miss the raster
+        """
+        window = from_bounds(*bounds, transform=dataset.transform)
+        block_height, block_width = dataset.block_shapes[0]
+        
+        col_start = math.floor(window.col_off) - pad * factor
+        row_start = math.floor(window.row_off) - pad * factor
+        col_stop = math.ceil(window.col_off + window.width) + pad * factor
+        row_stop = math.ceil(window.row_off + window.height) + pad * factor
+        
+        # Whole blocks only, so no block is decoded twice for neighbouring chunks
+        col_start = max(col_start // block_width * block_width, 0)
+        row_start = max(row_start // block_height * block_height, 0)
+        col_stop = min(-(-col_stop // block_width) * block_width, dataset.width)
+        row_stop = min(-(-row_stop // block_height) * block_height, dataset.height)
+        if col_start >= col_stop or row_start >= row_stop:
+            return None, None
+        
+        window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+        out_shape = (math.ceil(window.height / factor), math.ceil(window.width / factor))
+        data = dataset.read(1, window=window, out_shape=out_shape, masked=True, resampling=Resampling.nearest)
+        
+        transform = dataset.window_transform(window) * Affine.scale(
+            window.width / out_shape[1], window.height / out_shape[0]
+        )
+        return data.astype(np.float64).filled(np.nan), transform
+    
+    def _to_dataset_crs(self, dataset: rasterio.DatasetReader, polygons: List[Polygon]) -> List[Polygon]:
+        """Polygons in the CRS of a dataset (cells are in EPSG:4326)"""
+        if dataset.crs is None or dataset.crs.to_epsg() == 4326:
+            return polygons
+        
+        transformed = []
+        for polygon in polygons:
+            xs, ys = polygon.exterior.coords.xy
+            transformed.append(Polygon(zip(*transform_coordinates("EPSG:4326", dataset.crs, list(xs), list(ys)))))
+        return transformed
+    
+    def _points_to_dataset_crs(self, dataset: rasterio.DatasetReader, points: np.ndarray) -> np.ndarray:
+        """Points (..., 2) in the CRS of a dataset"""
+        if dataset.crs is None or dataset.crs.to_epsg() == 4326 or not points.size:
+            return points
+        
+        xs, ys = transform_coordinates("EPSG:4326", dataset.crs, points[..., 0].ravel().tolist(), points[..., 1].ravel().tolist())
+        return np.stack([np.asarray(xs), np.asarray(ys)], axis=-1).reshape(points.shape)
+    
+    def _file_version(self, layer: Optional[str]) -> Optional[str]:
+        if layer is None or not os.path.exists(self.paths[layer]):
+            return None
+        stat = os.stat(self.paths[layer])
+        return f"{os.path.basename(self.paths[layer])}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def _pixel_sizes(transform: Affine, shape: Tuple[int, int], geographic: bool) -> Tuple[np.ndarray, float]:
+    """Pixel width per row and pixel height in meters"""
+    width, height = abs(transform.a), abs(transform.e)
+    if not geographic:
+        return np.full((shape[0], 1), width), height
+    
+    latitudes = transform.f + transform.e * (np.arange(shape[0]) + 0.5)
+    return (width * METERS_PER_DEGREE * np.cos(np.radians(latitudes)))[:, None], height * METERS_PER_DEGREE
+
+def _derive(derivation: str, values: np.ndarray, transform: Affine, geographic: bool) -> np.ndarray:
+    """
+    Band values from a layer's pixels
+    
+    Args:
+        derivation: "value", "slope" and "aspect" (degrees, from elevation),
+                    "water" (1 where water, 0 elsewhere) or "distance" (meters to the nearest water pixel)
+        values: Layer pixels with nodata as NaN
+        transform: Affine transform of the pixels
+        geographic: Whether the transform is in degrees
+    
+    Returns:
+        Band values, NaN where unknown
+    """
+    if derivation == "value":
+        return values
+    
+    if derivation in ("slope", "aspect"):
+        if min(values.shape) < 2:
+            return np.full(values.shape, np.nan)
+        pixel_width, pixel_height = _pixel_sizes(transform, values.shape, geographic)
+        d_row, d_col = np.gradient(values)
+        east = d_col / pixel_width
+        north = -d_row / pixel_height
+        if derivation == "slope":
+            return np.degrees(np.arctan(np.hypot(east, north)))
+        # Downslope direction, clockwise from north like ee.Terrain.aspect
+        return np.degrees(np.arctan2(-east, -north)) % 360
+    
+    with np.errstate(invalid="ignore"):
+        water = values > WATER_OCCURRENCE_THRESHOLD
+    if derivation == "water":
+        return np.where(np.isnan(values), np.nan, water.astype(np.float64))
+    
+    if derivation == "distance":
+        if not water.any():
+            return np.full(values.shape, np.nan)
+        pixel_width, pixel_height = _pixel_sizes(transform, values.shape, geographic)
+        return ndimage.distance_transform_edt(~water, sampling=(pixel_height, float(np.median(pixel_width))))
+    
+    raise ValueError(f"Unknown band derivation: {derivation}")
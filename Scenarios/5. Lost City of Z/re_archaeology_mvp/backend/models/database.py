@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
@@ -49,8 +49,30 @@ class Phi0Result(Base):
     site_type_prediction = Column(String(50))
     contradiction_patterns = Column(JSONB)
     calculation_metadata = Column(JSONB)
+    fingerprint = Column(String(64), index=True)  # Hash of the inputs, see resonance_calculation/fingerprint.py
     calculated_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class Phi0RescoreQueue(Base):
+    __tablename__ = 'phi0_rescore_queue'
+    __table_args__ = {'schema': 'public'}
+    
+    cell_id = Column(String(50), ForeignKey('public.grid_cells.cell_id'), primary_key=True)
+    reason = Column(String(100))
+    enqueued_at = Column(DateTime(timezone=True), server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True))  # Set while a rescore holds the cell, see DirtyRegionTracker.drain
+
+class Phi0DirtyRegion(Base):
+    __tablename__ = 'phi0_dirty_regions'
+    __table_args__ = {'schema': 'public'}
+    
+    id = Column(Integer, primary_key=True)
+    lon = Column(Float, nullable=False)
+    lat = Column(Float, nullable=False)
+    radius_km = Column(Float, nullable=False)
+    reason = Column(String(100))
+    attractor_id = Column(Integer)
+    marked_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class SeedSite(Base):
     __tablename__ = 'seed_sites'
     __table_args__ = {'schema': 'public'}
@@ -139,3 +161,23 @@ class DataProcessingTask(Base):
     started_at = Column(DateTime(timezone=True))
     completed_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TaskCellCheckpoint(Base):
+    __tablename__ = 'task_cell_checkpoints'
+    __table_args__ = {'schema': 'public'}
+    
+    task_id = Column(Integer, ForeignKey('public.data_processing_tasks.id', ondelete='CASCADE'), primary_key=True)
+    cell_id = Column(String(50), primary_key=True)
+    source = Column(String(20), primary_key=True)  # 'ndvi', 'canopy', 'terrain', 'water'
+    success = Column(Boolean, nullable=False)
+    result = Column(JSONB)
+    error_message = Column(Text)
+    checkpointed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class EERequestUsage(Base):
+    __tablename__ = 'ee_request_usage'
+    __table_args__ = {'schema': 'public'}
+    
+    usage_date = Column(Date, primary_key=True)  # UTC day
+    requests = Column(Integer, nullable=False, default=0)  # Earth Engine requests made by processing tasks
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -54,6 +54,10 @@ def init_db():
         with engine.connect() as connection:
             connection.execute(text("DROP TABLE IF EXISTS public.environmental_data CASCADE"))
             connection.execute(text("DROP TABLE IF EXISTS public.phi0_results CASCADE"))
+            connection.execute(text("DROP TABLE IF EXISTS public.phi0_rescore_queue CASCADE"))
+            connection.execute(text("DROP TABLE IF EXISTS public.phi0_dirty_regions CASCADE"))
+            connection.execute(text("DROP TABLE IF EXISTS public.task_cell_checkpoints CASCADE"))
+            connection.execute(text("DROP TABLE IF EXISTS public.ee_request_usage CASCADE"))
             connection.execute(text("DROP TABLE IF EXISTS public.data_processing_tasks CASCADE"))
             connection.execute(text("DROP TABLE IF EXISTS public.grid_cells CASCADE"))
             connection.execute(text("DROP TABLE IF EXISTS public.discussions CASCADE"))
@@ -45,6 +45,15 @@ def update_ee_resolution_settings():
                 "degrees": 0.005,  # ~500m resolution instead of previous 0.05 (5km)
                 "description": "High-resolution 500m grid cells for more precise archaeological site detection"
             },
+            "adaptive_scan": {
+                "coarse_degrees": 0.04,  # Score at ~4km first, split down to grid_resolution where interesting
+                "description": "Adaptive quadtree scan: cells are scored at 0.04° and split down to grid_resolution only where a score reaches its refine threshold",
+                "refine_thresholds": {
+                    "phi0_score": 0.25,
+                    "attractor_influence": 0.1,
+                    "contradiction_strength": 0.25
+                }
+            },
             "buffer_sizes": {
                 "ndvi": 250,       # 250m buffer for NDVI calculation (was 500m)
                 "ndbi": 250,       # 250m buffer for NDBI calculation (new)
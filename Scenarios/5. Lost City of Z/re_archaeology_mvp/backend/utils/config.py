@@ -26,11 +26,52 @@ class Settings(BaseSettings):
     # Redis configuration
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     
+    # Celery worker configuration (Earth Engine processing jobs)
+    CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))  # "memory://" for tests
+    CELERY_RESULT_BACKEND: str = os.getenv("CELERY_RESULT_BACKEND", os.getenv("REDIS_URL", "redis://localhost:6379/0"))  # "cache+memory://" for tests
+    CELERY_TASK_ALWAYS_EAGER: bool = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() in ("1", "true", "yes")  # run jobs in the calling process
+    CELERY_VISIBILITY_TIMEOUT: int = int(os.getenv("CELERY_VISIBILITY_TIMEOUT", str(12 * 3600)))  # seconds before an unacknowledged job is redelivered
+    
     # Earth Engine configuration
     EE_AUTH_METHOD: str = os.getenv("EE_AUTH_METHOD", "application_default")
     EE_SERVICE_ACCOUNT: str = os.getenv("EE_SERVICE_ACCOUNT", "")
     EE_PRIVATE_KEY_FILE: str = os.getenv("EE_PRIVATE_KEY_FILE", "")
     EE_PROJECT_ID: str = os.getenv("EE_PROJECT_ID", "")
+    EE_BACKEND: str = os.getenv("EE_BACKEND", "earthengine")  # or "fake" for offline runs
+    EE_BATCH_CHUNK_SIZE: int = int(os.getenv("EE_BATCH_CHUNK_SIZE", "250"))  # cells per reduceRegions request
+    EE_MAX_CONCURRENT_REQUESTS: int = int(os.getenv("EE_MAX_CONCURRENT_REQUESTS", "8"))
+    EE_REQUESTS_PER_SECOND: float = float(os.getenv("EE_REQUESTS_PER_SECOND", "10"))  # token bucket rate, 0 = unlimited
+    EE_REQUEST_TIMEOUT: float = float(os.getenv("EE_REQUEST_TIMEOUT", "300"))  # seconds per attempt, 0 = none
+    EE_MAX_RETRIES: int = int(os.getenv("EE_MAX_RETRIES", "5"))  # retries on 429/5xx/timeouts
+    EE_CACHE_PATH: str = os.getenv("EE_CACHE_PATH") or os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "re_archaeology", "ee_cache.sqlite"
+    )  # reduction cache SQLite file, kept out of the source tree
+    EE_CACHE_MAX_BYTES: int = int(os.getenv("EE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))  # LRU eviction beyond this, 0 = unlimited
+    EE_CACHE_TTL_SECONDS: float = float(os.getenv("EE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))  # 0 = never expire
+    EE_CACHE_BYPASS: bool = os.getenv("EE_CACHE_BYPASS", "false").lower() in ("1", "true", "yes")
+    EE_REDUCTION_BACKEND: str = os.getenv("EE_REDUCTION_BACKEND", "reduce_regions")  # or "pixels" for local zonal statistics
+    EE_PIXEL_TILE_SIZE: int = int(os.getenv("EE_PIXEL_TILE_SIZE", "512"))  # max tile width/height in pixels per computePixels request
+    EE_PIXEL_FIXTURE_DIR: str = os.getenv("EE_PIXEL_FIXTURE_DIR", "")  # recorded pixel tiles (.npz)
+    EE_PIXEL_FIXTURE_MODE: str = os.getenv("EE_PIXEL_FIXTURE_MODE", "")  # "record", "replay" or empty
+    EE_TERRAIN_BACKEND: str = os.getenv("EE_TERRAIN_BACKEND", "tiles")  # or "reduce_regions" for ee.Terrain reductions
+    EE_TERRAIN_SCALE: float = float(os.getenv("EE_TERRAIN_SCALE", "30"))  # DEM pixel size in meters of the terrain tiles
+    EE_TERRAIN_CACHED_TILES: int = int(os.getenv("EE_TERRAIN_CACHED_TILES", "4"))  # computed terrain tiles kept in memory, at least those of the current pipeline window
+    RASTER_BACKEND: str = os.getenv("RASTER_BACKEND", "earthengine")  # or "local" for GeoTIFF/COG files
+    LOCAL_RASTER_DIR: str = os.getenv("LOCAL_RASTER_DIR", "")  # default DATA_DIR/rasters
+    LOCAL_DEM_PATH: str = os.getenv("LOCAL_DEM_PATH", "")  # default LOCAL_RASTER_DIR/dem.tif
+    LOCAL_NDVI_PATH: str = os.getenv("LOCAL_NDVI_PATH", "")  # default LOCAL_RASTER_DIR/ndvi.tif
+    LOCAL_CANOPY_PATH: str = os.getenv("LOCAL_CANOPY_PATH", "")  # default LOCAL_RASTER_DIR/canopy_height.tif
+    LOCAL_WATER_PATH: str = os.getenv("LOCAL_WATER_PATH", "")  # default LOCAL_RASTER_DIR/water_occurrence.tif
+    LOCAL_RASTER_PIXELS_PER_CELL: int = int(os.getenv("LOCAL_RASTER_PIXELS_PER_CELL", "16"))  # min pixels across a cell when picking overviews
+    CHECKPOINT_INTERVAL_SECONDS: float = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", "30"))  # commit task progress at least this often
+    CHECKPOINT_BATCH_SIZE: int = int(os.getenv("CHECKPOINT_BATCH_SIZE", "1000"))  # or once this many cell results are buffered
+    PIPELINE_WINDOW_SIZE: int = int(os.getenv("PIPELINE_WINDOW_SIZE", "2000"))  # cells read and fetched per pipeline window
+    DB_WRITE_BATCH_SIZE: int = int(os.getenv("DB_WRITE_BATCH_SIZE", "500"))  # cells per environmental_data write transaction
+    TASK_CELL_RESULTS_LIMIT: int = int(os.getenv("TASK_CELL_RESULTS_LIMIT", "1000"))  # per-cell entries kept in task results
+    EE_JOB_REQUEST_BUDGET: int = int(os.getenv("EE_JOB_REQUEST_BUDGET", "0"))  # EE requests per processing task, 0 = unlimited
+    EE_DAILY_REQUEST_BUDGET: int = int(os.getenv("EE_DAILY_REQUEST_BUDGET", "0"))  # EE requests of all tasks per UTC day, 0 = unlimited
+    PRIORITY_COARSE_DEGREES: float = float(os.getenv("PRIORITY_COARSE_DEGREES", "0.04"))  # block size of the coarse phi0 priority signal
+    PRIORITY_SEED_DISTANCE_KM: float = float(os.getenv("PRIORITY_SEED_DISTANCE_KM", "10"))  # decay distance of the seed site priority signal
     
     # Data paths
     DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data"))
@@ -40,6 +81,8 @@ class Settings(BaseSettings):
     
     # Contradiction detection parameters
     NDVI_CANOPY_CONTRADICTION_THRESHOLD: float = 0.3
+    GEOMETRIC_DETECTION_STRATEGY: str = os.getenv("GEOMETRIC_DETECTION_STRATEGY", "edge_density")  # or "spectral_hough"
+    GEOMETRIC_DETECTION_WORKERS: int = int(os.getenv("GEOMETRIC_DETECTION_WORKERS", "0"))  # 0 = one per CPU
     
     # Agent configuration
     AGENT_MEMORY_SIZE: int = 1000
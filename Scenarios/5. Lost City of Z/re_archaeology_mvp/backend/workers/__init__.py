@@ -0,0 +1 @@
+# Celery worker package for Earth Engine processing jobs
@@ -0,0 +1,53 @@
+"""
+Celery Application
+==================
+Celery app of the worker tier that runs Earth Engine processing jobs outside
+the API process.
+
+The API creates a queued DataProcessingTask and enqueues its ID (see
+backend.workers.tasks); workers on any number of nodes pick the jobs up:
+
+    celery -A backend.workers.celery_app worker --loglevel=info -Q earth_engine
+
+Jobs run for hours, so a worker reserves one job at a time and acknowledges
+it only when it is done. A job lost with its worker is delivered again and
+continues from the task's checkpoints. The broker and result backend default
+to REDIS_URL; tests can use CELERY_BROKER_URL=memory:// and
+CELERY_RESULT_BACKEND=cache+memory://, or run jobs in the calling process
+with CELERY_TASK_ALWAYS_EAGER.
+"""
+
+import logging
+from celery import Celery
+
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EARTH_ENGINE_QUEUE = "earth_engine"
+
+celery_app = Celery(
+    "re_archaeology",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["backend.workers.tasks"]
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    task_default_queue=EARTH_ENGINE_QUEUE,
+    task_track_started=True,
+    # Long jobs: acknowledge when done, redeliver if the worker is lost, reserve one at a time
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    broker_transport_options={"visibility_timeout": settings.CELERY_VISIBILITY_TIMEOUT},
+    broker_connection_retry_on_startup=True,
+    result_expires=86400,
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_eager_propagates=True
+)
@@ -0,0 +1,116 @@
+"""
+Earth Engine Worker Tasks
+=========================
+Celery tasks for region, batch and single cell processing.
+
+The API creates a DataProcessingTask with status "queued" and enqueues its
+ID; the pipeline records progress, results and errors on that task record.
+Every job opens its own database session and closes it when done, so no
+session outlives the request or job that opened it. The outcome is also
+stored in Redis under earth_engine:task:<id>, where the task status endpoint
+looks first. Only a summary is returned to the Celery result backend.
+"""
+
+import logging
+import redis
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Iterator
+from sqlalchemy.orm import Session
+
+from backend.workers.celery_app import celery_app
+from backend.api.database import SessionLocal
+from backend.data_processors.earth_engine.pipeline import EarthEnginePipeline
+from backend.core.agent_self_model.model import REAgentSelfModel
+from backend.utils.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds task outcomes are kept in Redis
+RESULT_TTL_SECONDS = 86400
+
+_redis_client: Optional[redis.Redis] = None
+
+def _redis() -> redis.Redis:
+    """Redis client of this worker process"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+@contextmanager
+def task_session() -> Iterator[Session]:
+    """Database session owned by one job"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _agent_model(db: Session) -> Optional[REAgentSelfModel]:
+    try:
+        return REAgentSelfModel(db, _redis())
+    except Exception as e:
+        logger.error(f"Failed to initialize agent model: {e}")
+        return None
+
+def _store_outcome(task_id: int, outcome: Dict[str, Any]) -> None:
+    """Store a job's outcome in Redis for the task status endpoint"""
+    try:
+        _redis().setex(f"earth_engine:task:{task_id}", RESULT_TTL_SECONDS, str(outcome))
+    except Exception as e:
+        logger.warning(f"Could not store the outcome of task {task_id} in Redis: {e}")
+
+def _run_job(task_id: int, job: Callable[[EarthEnginePipeline], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run a job on a pipeline with its own session and store its outcome
+    
+    Args:
+        task_id: DataProcessingTask the job belongs to
+        job: Function running the job on the pipeline
+    
+    Returns:
+        Summary of the outcome
+    """
+    try:
+        with task_session() as db:
+            results = job(EarthEnginePipeline(db, _agent_model(db)))
+    except Exception as e:
+        logger.error(f"Job of task {task_id} failed: {e}")
+        _store_outcome(task_id, {"error": str(e)})
+        raise
+    
+    _store_outcome(task_id, results)
+    
+    if "error" in results:
+        status = "failed"
+    elif "paused" in results:
+        status = "paused"
+    else:
+        status = "completed"
+    summary = {"task_id": task_id, "status": status}
+    for key in ("total_cells", "processed_cells", "errors", "deferred_cells", "ee_requests", "error", "paused"):
+        if key in results:
+            summary[key] = results[key]
+    return summary
+
+@celery_app.task(name="earth_engine.process_region")
+def process_region_task(task_id: int) -> Dict[str, Any]:
+    """Run a queued region_processing task"""
+    return _run_job(task_id, lambda pipeline: pipeline.run_task(task_id))
+
+@celery_app.task(name="earth_engine.process_cells")
+def process_cells_task(task_id: int) -> Dict[str, Any]:
+    """Run a queued batch_processing task"""
+    return _run_job(task_id, lambda pipeline: pipeline.run_task(task_id))
+
+@celery_app.task(name="earth_engine.resume_task")
+def resume_task(task_id: int, ee_request_budget: Optional[int] = None) -> Dict[str, Any]:
+    """Resume an interrupted, failed or paused region or batch processing task"""
+    return _run_job(task_id, lambda pipeline: pipeline.resume(task_id, ee_request_budget=ee_request_budget))
+
+@celery_app.task(name="earth_engine.process_cell")
+def process_cell_task(cell_id: str, task_id: int) -> Dict[str, Any]:
+    """Run a queued full_cell_processing task for one cell"""
+    return _run_job(task_id, lambda pipeline: pipeline.process_cell_complete(cell_id, task_id=task_id))
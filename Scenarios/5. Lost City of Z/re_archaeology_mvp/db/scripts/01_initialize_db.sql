@@ -48,6 +48,7 @@ CREATE TABLE re_archaeology.phi0_results (
     site_type_prediction VARCHAR(50),
     contradiction_patterns JSONB,
     calculation_metadata JSONB,
+    fingerprint VARCHAR(64),
     calculated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -55,6 +56,27 @@ CREATE TABLE re_archaeology.phi0_results (
 CREATE INDEX phi0_results_cell_id_idx ON re_archaeology.phi0_results(cell_id);
 CREATE INDEX phi0_results_score_idx ON re_archaeology.phi0_results(phi0_score);
 
+-- Create queue of cells whose phi0 results are stale after attractor changes
+CREATE TABLE re_archaeology.phi0_rescore_queue (
+    cell_id VARCHAR(50) PRIMARY KEY REFERENCES re_archaeology.grid_cells(cell_id),
+    reason VARCHAR(100),
+    enqueued_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    claimed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX phi0_rescore_queue_enqueued_idx ON re_archaeology.phi0_rescore_queue(enqueued_at);
+
+-- Create table of attractor influence regions whose cells are not queued for rescoring yet
+CREATE TABLE re_archaeology.phi0_dirty_regions (
+    id SERIAL PRIMARY KEY,
+    lon FLOAT NOT NULL,
+    lat FLOAT NOT NULL,
+    radius_km FLOAT NOT NULL,
+    reason VARCHAR(100),
+    attractor_id INTEGER,
+    marked_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Create seed site catalog table
 CREATE TABLE re_archaeology.seed_sites (
     id SERIAL PRIMARY KEY,
@@ -152,6 +174,25 @@ CREATE INDEX data_proc_tasks_status_idx ON re_archaeology.data_processing_tasks(
 CREATE INDEX data_proc_tasks_type_idx ON re_archaeology.data_processing_tasks(task_type);
 CREATE INDEX data_proc_tasks_cell_idx ON re_archaeology.data_processing_tasks(cell_id);
 
+-- Create per-cell checkpoint table of processing tasks (resumable region/batch processing)
+CREATE TABLE re_archaeology.task_cell_checkpoints (
+    task_id INTEGER REFERENCES re_archaeology.data_processing_tasks(id) ON DELETE CASCADE,
+    cell_id VARCHAR(50),
+    source VARCHAR(20), -- 'ndvi', 'canopy', 'terrain', 'water'
+    success BOOLEAN NOT NULL,
+    result JSONB, -- Processor output for the cell
+    error_message TEXT,
+    checkpointed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (task_id, cell_id, source)
+);
+
+-- Create daily Earth Engine request usage table (per-day quota budget of processing tasks)
+CREATE TABLE re_archaeology.ee_request_usage (
+    usage_date DATE PRIMARY KEY, -- UTC day
+    requests INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Grant privileges
 ALTER SCHEMA re_archaeology OWNER TO re_archaeology;
 GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA re_archaeology TO re_archaeology;
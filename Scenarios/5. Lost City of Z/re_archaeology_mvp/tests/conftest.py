@@ -0,0 +1,30 @@
+"""
+Test configuration: the backend runs offline against the fake Earth Engine
+backend, with the reduction cache bypassed, and Celery jobs run in the calling
+process on the in-memory broker.
+"""
+
+import os
+import sys
+
+# Must be set before the backend settings are imported
+os.environ.setdefault("EE_BACKEND", "fake")
+os.environ.setdefault("EE_CACHE_BYPASS", "true")
+os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
+os.environ.setdefault("CELERY_TASK_ALWAYS_EAGER", "true")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+# Importing the package installs the fake backend as `ee`
+from backend.data_processors.earth_engine import fake_ee
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+@pytest.fixture
+def round_trips():
+    """Reset the fake backend's request counter; call the fixture's value to read it"""
+    fake_ee.reset_round_trips()
+    return fake_ee.round_trips
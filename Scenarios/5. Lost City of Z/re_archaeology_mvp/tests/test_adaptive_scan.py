@@ -0,0 +1,81 @@
+"""
+Adaptive quadtree scan (adaptive_scan.py) against the fake backend
+"""
+
+import math
+import pytest
+
+from backend.data_processors.earth_engine import fake_ee
+from backend.data_processors.earth_engine.adaptive_scan import AdaptiveQuadtreeScanner
+from backend.data_processors.earth_engine.enhanced_connector import EnhancedEarthEngineConnector
+from backend.core.resonance_calculation.calculator import ResonanceCalculator
+
+# Two coarse cells by two at the default 0.04°
+REGION = (-10.08, -63.08, -10.0, -63.0)
+
+def scanner(threshold: float) -> AdaptiveQuadtreeScanner:
+    """Scanner refining the cells whose φ⁰ score reaches threshold; no attractors, no contradictions"""
+    connector = EnhancedEarthEngineConnector()
+    # Without a session the calculator loads no attractors
+    scan = AdaptiveQuadtreeScanner(None, connector=connector, calculator=ResonanceCalculator(None))
+    scan.thresholds = {"phi0_score": threshold, "attractor_influence": math.inf, "contradiction_strength": math.inf}
+    return scan
+
+@pytest.fixture
+def reduced_geometries(monkeypatch):
+    """Bounds of the regions reduced by reduceRegions on fake images"""
+    bounds = []
+    reduce_regions = fake_ee.Image.reduceRegions
+
+    def recording(self, *args, **kwargs):
+        bounds.extend(feature.geometry.bounds_coords() for feature in kwargs["collection"]._features())
+        return reduce_regions(self, *args, **kwargs)
+
+    monkeypatch.setattr(fake_ee.Image, "reduceRegions", recording)
+    return bounds
+
+def test_quiet_region_stays_coarse():
+    result = scanner(math.inf).scan(*REGION)
+
+    assert [level["cells"] for level in result["levels"]] == [4]
+    assert result["candidates"] == []
+    assert all(not record["children"] for record in result["cells"].values())
+
+def test_refinement_and_lineage():
+    scan = scanner(-math.inf)
+    result = scan.scan(*REGION)
+    cells = result["cells"]
+
+    # 0.04° down to the finest resolution, every cell refined
+    assert [level["cells"] for level in result["levels"]] == [4 * 4 ** level for level in range(len(result["levels"]))]
+    assert result["levels"][-1]["size_degrees"] == pytest.approx(scan.finest_degrees)
+    assert len(result["candidates"]) == result["levels"][-1]["cells"]
+    for cell_id, record in cells.items():
+        level, row, col = map(int, cell_id.split(":"))
+        if level == 0:
+            assert record["parent"] is None
+        else:
+            assert record["parent"] == f"{level - 1}:{row // 2}:{col // 2}"
+            assert cell_id in cells[record["parent"]]["children"]
+        west, south, east, north = record["bounds"]
+        assert west <= record["lon"] <= east and south <= record["lat"] <= north
+
+def test_coarse_cells_are_reduced_over_their_footprint(reduced_geometries):
+    scan = scanner(math.inf)
+    scan.connector.terrain = None
+    scan.scan(*REGION)
+
+    # Every band of a coarse cell covers at least the whole cell, not a disc at its centre
+    assert reduced_geometries
+    for west, south, east, north in reduced_geometries:
+        assert north - south >= scan.coarse_degrees
+        assert east - west >= scan.coarse_degrees
+
+def test_cell_features_differ_from_centre_samples():
+    connector = EnhancedEarthEngineConnector()
+    centre = [(-10.02, -63.02)]
+    point = connector.extract_all_features_fast_batch(centre)[0]["features"]
+    cell = connector.extract_all_features_fast_batch(centre, cell_size=0.04)[0]["features"]
+
+    assert set(cell) == set(point)
+    assert cell != point
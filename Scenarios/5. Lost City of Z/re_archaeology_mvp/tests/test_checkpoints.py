@@ -0,0 +1,186 @@
+"""
+Task checkpoints (checkpoints.py) and request budgets (quota.py) across pipeline runs
+"""
+
+import pytest
+
+from backend.data_processors.earth_engine import pipeline as pipeline_module
+from backend.data_processors.earth_engine.ndvi_processor import NDVIProcessor
+from backend.data_processors.earth_engine.pipeline import EarthEnginePipeline
+from backend.models.database import DataProcessingTask, EnvironmentalData
+from backend.utils.config import settings
+
+def square(lon: float, lat: float, size: float):
+    return [[[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]]
+
+CELLS = {f"cell-{i}": square(-63.4 + 0.01 * i, -10.0, 0.005) for i in range(4)}
+
+class Result:
+    def __init__(self, rows=(), value=None):
+        self.rows = list(rows)
+        self.value = value
+
+    def fetchall(self):
+        return self.rows
+
+    def scalar(self):
+        return self.value
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return list(self.rows)
+
+class CheckpointSession:
+    """
+    Session keeping model rows (filters are ignored), task_cell_checkpoints and
+    ee_request_usage; the raw SQL of checkpoints.py and quota.py is recognized
+    by its text and applied at once, so commits and rollbacks do nothing
+    """
+
+    def __init__(self, *rows):
+        self.rows = {}
+        for row in rows:
+            self.add(row)
+        self.checkpoints = {}
+        self.usage = {}
+
+    def query(self, model):
+        return FakeQuery(self.rows.get(model, []))
+
+    def add(self, row):
+        self.rows.setdefault(type(row), []).append(row)
+
+    def add_all(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        if sql.startswith("INSERT INTO public.task_cell_checkpoints"):
+            for row in params:
+                self.checkpoints[(row["task_id"], row["cell_id"], row["source"])] = row["success"]
+            return Result()
+        if sql.startswith("SELECT cell_id, source FROM public.task_cell_checkpoints"):
+            return Result([
+                (cell_id, source) for (task_id, cell_id, source), success in self.checkpoints.items()
+                if success and task_id == params["task_id"] and cell_id in params.get("cell_ids", [cell_id])
+            ])
+        if sql.startswith("SELECT COUNT(*) FROM public.task_cell_checkpoints"):
+            return Result(value=sum(
+                1 for (task_id, _, source), success in self.checkpoints.items()
+                if success and task_id == params["task_id"] and source in params["sources"]
+            ))
+        if sql.startswith("SELECT requests FROM public.ee_request_usage"):
+            return Result(value=self.usage.get(params["usage_date"]))
+        if sql.startswith("INSERT INTO public.ee_request_usage"):
+            self.usage[params["usage_date"]] = self.usage.get(params["usage_date"], 0) + params["requests"]
+            return Result()
+        raise AssertionError(f"Unexpected statement: {sql}")
+
+    def flush(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def refresh(self, row):
+        pass
+
+@pytest.fixture
+def requested(monkeypatch):
+    """One NDVI request per cell, sent one at a time; the value lists the cells of every NDVI job"""
+    monkeypatch.setattr(settings, "EE_BATCH_CHUNK_SIZE", 1)
+    monkeypatch.setattr(settings, "EE_MAX_CONCURRENT_REQUESTS", 1)
+    monkeypatch.setattr(settings, "EE_REQUESTS_PER_SECOND", 0)
+    monkeypatch.setattr(settings, "EE_DAILY_REQUEST_BUDGET", 0)
+    monkeypatch.setattr(pipeline_module, "load_cell_polygons", lambda db, cell_ids: {cell_id: CELLS[cell_id] for cell_id in cell_ids})
+
+    cells = []
+    calculate = NDVIProcessor.calculate_ndvi_for_cells
+
+    def recording_calculate(self, cell_ids, *args, **kwargs):
+        cells.append(list(cell_ids))
+        return calculate(self, cell_ids, *args, **kwargs)
+
+    monkeypatch.setattr(NDVIProcessor, "calculate_ndvi_for_cells", recording_calculate)
+    return cells
+
+def batch_task(**params) -> DataProcessingTask:
+    return DataProcessingTask(id=9, task_type="batch_processing", status="queued",
+                              params=dict({"cell_ids": list(CELLS), "data_sources": ["ndvi"]}, **params))
+
+def test_failed_sources_are_redone_on_resume(requested, monkeypatch):
+    task = batch_task()
+    db = CheckpointSession(task)
+    calculate = NDVIProcessor.calculate_ndvi_for_cells
+    failures = ["cell-2"]
+
+    def failing_once(self, cell_ids, *args, **kwargs):
+        if cell_ids == failures[:1]:
+            failures.pop()
+            raise ValueError("Image.select: Pattern 'B8' did not match any bands.")
+        return calculate(self, cell_ids, *args, **kwargs)
+
+    monkeypatch.setattr(NDVIProcessor, "calculate_ndvi_for_cells", failing_once)
+    results = EarthEnginePipeline(db).run_task(task.id)
+
+    assert results["errors"] == 1
+    assert db.checkpoints == {(9, cell_id, "ndvi"): cell_id != "cell-2" for cell_id in CELLS}
+    written = {row.cell_id for row in db.rows[EnvironmentalData]}
+    assert written == {"cell-0", "cell-1", "cell-3"}
+
+    del requested[:]
+    results = EarthEnginePipeline(db).resume(task.id)
+
+    # Only the failed source is requested again; the others are read back from the checkpoints
+    assert requested == [["cell-2"]]
+    assert results["resumed_sources"] == 3
+    assert results["errors"] == 0
+    assert task.status == "completed"
+    assert all(db.checkpoints.values())
+    assert {row.cell_id for row in db.rows[EnvironmentalData]} == set(CELLS)
+
+def requests_per_cell() -> int:
+    """Earth Engine requests of one cell's NDVI job on the fake backend"""
+    task = batch_task(cell_ids=["cell-0"])
+    results = EarthEnginePipeline(CheckpointSession(task)).run_task(task.id)
+    return results["ee_requests"]
+
+def test_budget_pauses_and_resumes(requested):
+    per_cell = requests_per_cell()
+    assert per_cell > 0
+    task = batch_task(ee_request_budget=2 * per_cell)
+    db = CheckpointSession(task)
+    del requested[:]
+
+    results = EarthEnginePipeline(db).run_task(task.id)
+
+    assert task.status == "paused"
+    assert results["paused"]["budget"] == "job"
+    assert results["processed_cells"] == 2
+    assert results["deferred_cells"] == 2
+    assert results["ee_requests"] == 2 * per_cell
+    assert requested == [["cell-0"], ["cell-1"]]
+
+    # The budget covers all runs of the task: raising it lets the rest through
+    del requested[:]
+    results = EarthEnginePipeline(db).resume(task.id, ee_request_budget=4 * per_cell)
+
+    assert task.status == "completed"
+    assert "paused" not in results
+    assert requested == [["cell-2"], ["cell-3"]]
+    assert results["resumed_sources"] == 2
+    assert results["ee_requests"] == 4 * per_cell
+    assert all(db.checkpoints.values()) and len(db.checkpoints) == len(CELLS)
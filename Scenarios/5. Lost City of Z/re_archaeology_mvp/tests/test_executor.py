@@ -0,0 +1,183 @@
+"""
+Earth Engine request executor (executor.py) and per-request metering (metering.py)
+"""
+
+import time
+import threading
+import pytest
+
+from backend.data_processors.earth_engine import fake_ee
+from backend.data_processors.earth_engine.executor import EERequestExecutor, is_retryable, is_transient
+from backend.data_processors.earth_engine.metering import get_info
+from backend.data_processors.earth_engine.quota import EERequestBudget, QuotaExhaustedError
+
+class HttpError(Exception):
+    """Error carrying an HTTP response, like googleapiclient's HttpError"""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Response", (), {"status": status})()
+
+class CountingLimiter:
+    """Rate limiter that only counts the tokens taken"""
+
+    def __init__(self):
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        with self.lock:
+            self.tokens += tokens
+        return 0.0
+
+def executor(**kwargs) -> EERequestExecutor:
+    options = {"max_workers": 2, "requests_per_second": 0, "timeout": 0, "max_retries": 0, "backoff_base": 0.001, "seed": 1}
+    options.update(kwargs)
+    return EERequestExecutor(**options)
+
+def run(pool: EERequestExecutor, jobs):
+    with pool:
+        return {key: (result, error) for key, result, error in pool.run(jobs)}
+
+def requests(count: int):
+    """Job sending count Earth Engine requests"""
+    def job():
+        return [get_info(fake_ee.Number(i)) for i in range(count)]
+    return job
+
+@pytest.mark.parametrize("error, retryable", [
+    (HttpError(429), True),
+    (HttpError(503), True),
+    (HttpError(400), False),
+    (HttpError(404), False),
+    (TimeoutError("read timed out"), True),
+    (fake_ee.EEException("Too many concurrent aggregations."), True),
+    (fake_ee.EEException("Computation timed out."), True),
+    (fake_ee.EEException("Image.select: Pattern 'B99' did not match any bands."), False),
+    # The limit in the message is not an HTTP status
+    (QuotaExhaustedError("job", 500), False)
+])
+def test_retry_classification(error, retryable):
+    assert is_retryable(error) is retryable
+
+def test_quota_errors_are_left_to_the_executor():
+    assert is_transient(QuotaExhaustedError("daily", 1000))
+    assert is_transient(HttpError(429))
+    assert not is_transient(HttpError(400))
+
+def test_backoff_is_jittered_exponential_and_capped():
+    pool = executor(backoff_base=1.0, backoff_max=5.0)
+    for retry_number in range(1, 8):
+        bound = min(5.0, 2.0 ** (retry_number - 1))
+        delays = [pool.backoff(retry_number) for _ in range(50)]
+        assert all(0.0 <= delay <= bound for delay in delays)
+        assert max(delays) > bound / 2
+    pool.shutdown()
+
+def test_retryable_errors_are_retried():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise HttpError(429)
+        return "done"
+
+    pool = executor(max_retries=5)
+    assert run(pool, [("job", flaky, (), {})]) == {"job": ("done", None)}
+    assert len(calls) == 3
+    assert pool.stats["retries"] == 2
+
+def test_permanent_errors_are_not_retried():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise HttpError(400)
+
+    pool = executor(max_retries=5)
+    result, error = run(pool, [("job", broken, (), {})])["job"]
+    assert result is None and isinstance(error, HttpError)
+    assert len(calls) == 1
+
+def test_retries_run_out():
+    def overloaded():
+        raise HttpError(503)
+
+    pool = executor(max_retries=2)
+    _, error = run(pool, [("job", overloaded, (), {})])["job"]
+    assert isinstance(error, HttpError)
+    assert pool.stats["retries"] == 2
+    assert pool.stats["failed"] == 1
+
+def test_rate_limit_is_charged_per_request():
+    pool = executor()
+    limiter = CountingLimiter()
+    pool.rate_limiter = limiter
+    outcomes = run(pool, [("three", requests(3), (), {}), ("cached", requests(0), (), {})])
+
+    assert outcomes["three"] == ([0, 1, 2], None)
+    assert outcomes["cached"] == ([], None)
+    assert limiter.tokens == 3
+    assert pool.stats["requests"] == 3
+
+def test_budget_is_charged_per_request():
+    budget = EERequestBudget(None, job_limit=4)
+    started = []
+
+    def job(key):
+        started.append(key)
+        return requests(3)()
+
+    pool = executor(max_workers=1, budget=budget)
+    outcomes = run(pool, [(key, job, (key,), {}) for key in ("first", "second", "third")])
+
+    assert outcomes["first"] == ([0, 1, 2], None)
+    # The second job runs out of budget at its second request; the third is not started
+    assert isinstance(outcomes["second"][1], QuotaExhaustedError)
+    assert isinstance(outcomes["third"][1], QuotaExhaustedError)
+    assert started == ["first", "second"]
+    assert budget.job_used == 4
+    assert pool.stats["over_budget"] == 2
+
+def test_deadline_stops_requests_inside_the_job():
+    finished = threading.Event()
+    sent = []
+
+    def slow_requests():
+        try:
+            while True:
+                sent.append(get_info(fake_ee.Number(1)))
+                time.sleep(0.05)
+        finally:
+            finished.set()
+
+    pool = executor(timeout=0.3)
+    _, error = run(pool, [("job", slow_requests, (), {})])["job"]
+
+    assert isinstance(error, TimeoutError)
+    # The job ends itself at its first request past the deadline
+    assert finished.wait(1.0)
+    assert len(sent) < 20
+
+def test_abandoned_attempts_do_not_hold_workers():
+    release = threading.Event()
+
+    def stuck():
+        release.wait(10.0)
+        return "late"
+
+    pool = executor(max_workers=2, timeout=0.3)
+    started = time.monotonic()
+    finished = {}
+    try:
+        with pool:
+            for key, result, error in pool.run([("stuck-1", stuck, (), {}), ("stuck-2", stuck, (), {}), ("quick", lambda: "quick", (), {})]):
+                finished[key] = (time.monotonic() - started, result, error)
+    finally:
+        release.set()
+
+    assert finished["quick"][1] == "quick"
+    assert finished["quick"][0] < 1.5
+    assert isinstance(finished["stuck-1"][2], TimeoutError)
+    assert pool.stats["timeouts"] == 2
@@ -0,0 +1,91 @@
+"""
+FFT / Hough geometric pattern detection (contradiction_detection/geometric.py)
+"""
+
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter
+
+from backend.core.contradiction_detection.geometric import detect_geometric_stack, fft_periodicity
+
+SIZES = [10, 32]
+
+def grid(n: int):
+    y, x = np.mgrid[0:n, 0:n].astype(float)
+    return y, x, np.hypot(y - n // 2, x - n // 2)
+
+def ramp(n: int):
+    _, x, _ = grid(n)
+    return 0.6 + 0.005 * x
+
+def blob(n: int):
+    _, _, r = grid(n)
+    return 0.5 + 0.3 * np.exp(-r ** 2 / (2.0 * (n / 6.0) ** 2))
+
+def ring(n: int):
+    _, _, r = grid(n)
+    return 0.7 - 0.4 * (np.abs(r - n / 3.5) < 1.2)
+
+def stripes(n: int, period: float = 4.0):
+    _, x, _ = grid(n)
+    return 0.6 + 0.2 * np.sin(2.0 * np.pi * x / period)
+
+def smooth_fields(n: int, count: int = 100, sigma: float = 2.0):
+    rng = np.random.default_rng(0)
+    fields = [gaussian_filter(rng.standard_normal((n, n)), sigma) for _ in range(count)]
+    return np.stack([0.6 + 0.1 * field / field.std() for field in fields])
+
+def noise_fields(n: int, count: int = 100):
+    rng = np.random.default_rng(1)
+    return 0.6 + 0.05 * rng.standard_normal((count, n, n))
+
+@pytest.mark.parametrize("n", SIZES)
+@pytest.mark.parametrize("make_matrix", [ramp, blob])
+def test_smooth_matrices_are_not_periodic(make_matrix, n):
+    result = detect_geometric_stack(make_matrix(n))
+
+    assert result["periodicity"][0] < 0.2
+    assert not result["detected"][0]
+
+@pytest.mark.parametrize("n", SIZES)
+def test_smoothed_random_fields_are_rarely_periodic(n):
+    result = detect_geometric_stack(smooth_fields(n))
+
+    # Their power lies in a few low bins, so a peak just outside the masked disc is possible
+    assert (result["periodicity"] > 0.5).mean() <= 0.2
+    assert result["detected"].mean() <= 0.2
+
+@pytest.mark.parametrize("n", SIZES)
+def test_noise_is_not_detected(n):
+    result = detect_geometric_stack(noise_fields(n))
+
+    assert not result["detected"].any()
+
+@pytest.mark.parametrize("n", SIZES)
+def test_stripes_are_periodic(n):
+    result = fft_periodicity(stripes(n)[None])
+
+    assert result["strength"][0] > 0.7
+    assert result["period"][0] == pytest.approx(4.0, rel=0.2)
+    assert result["orientation"][0] == pytest.approx(0.0, abs=1.0)
+
+@pytest.mark.parametrize("n", SIZES)
+def test_periods_are_at_least_two_pixels(n):
+    result = fft_periodicity(noise_fields(n))
+
+    assert ((result["period"] == 0) | (result["period"] >= 2.0)).all()
+
+@pytest.mark.parametrize("n", SIZES)
+def test_ring_is_a_circle(n):
+    result = detect_geometric_stack(ring(n))
+
+    assert result["circle"][0] > 0.5
+    assert result["detected"][0]
+    assert result["circle_center"][0] == pytest.approx([n // 2, n // 2], abs=1)
+
+@pytest.mark.parametrize("n", SIZES)
+def test_stripes_are_not_circles(n):
+    result = detect_geometric_stack(stripes(n))
+
+    assert result["circle"][0] < 0.5
+    assert result["line"][0] > 0.5
@@ -0,0 +1,85 @@
+"""
+φ⁰ collapse stages (phi0_collapse/stages.py) against per-row references
+"""
+
+import numpy as np
+import pytest
+
+from backend.core.geo.distance import haversine_km
+from backend.core.phi0_collapse.stages import attractor_boost, patch_mask, psi0_drift, psi0_similarity, phi0_collapse
+from backend.data_processors.earth_engine.enhanced_connector import EnhancedEarthEngineConnector
+
+SITES = [
+    {"name": "A", "lat": -10.0, "lon": -63.0, "type": "lidar"},
+    {"name": "B", "lat": -10.05, "lon": -62.9, "type": "mythic"},
+    {"name": "C", "lat": -9.9, "lon": -63.1, "type": "unknown"}
+]
+BOOST_RULES = {"lidar": {"dist_5km": 1.5, "dist_10km": 0.75}, "mythic": {"dist_10km": 1.0, "dist_20km": 0.5}}
+
+def cells(n: int = 400, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return -10.0 + rng.uniform(-0.2, 0.2, n), -63.0 + rng.uniform(-0.2, 0.2, n)
+
+def test_attractor_boost_matches_per_row_tiers():
+    lats, lons = cells()
+    expected = np.zeros(len(lats))
+    for i in range(len(lats)):
+        for site in SITES:
+            rules = BOOST_RULES.get(site["type"], {})
+            distance = haversine_km(lats[i], lons[i], site["lat"], site["lon"])
+            for key, boost in sorted(rules.items(), key=lambda rule: float(rule[0][5:-2])):
+                if distance < float(key[5:-2]):
+                    expected[i] += boost
+                    break
+
+    assert attractor_boost(lats, lons, SITES, BOOST_RULES) == pytest.approx(expected)
+    assert expected.max() > 0
+
+def test_invalid_boost_rule():
+    with pytest.raises(ValueError):
+        attractor_boost([0.0], [0.0], SITES, {"lidar": {"within_5km": 1.0}})
+
+def test_patch_mask_is_a_great_circle_disc():
+    lats, lons = cells()
+    mask = patch_mask(lats, lons, SITES[0], radius_km=5.0)
+
+    assert mask.any() and not mask.all()
+    assert (haversine_km(lats[mask], lons[mask], -10.0, -63.0) < 5.0).all()
+
+def test_psi0_drift_matches_brute_force_neighbours():
+    lats, lons = cells(200)
+    similarity = np.random.default_rng(1).uniform(-1.0, 1.0, len(lats))
+    expected = np.empty(len(lats))
+    for i in range(len(lats)):
+        nearest = np.argsort(haversine_km(lats[i], lons[i], lats, lons))[1:6]
+        expected[i] = np.std(similarity[nearest])
+
+    assert psi0_drift(lats, lons, similarity, n_neighbors=6) == pytest.approx(expected)
+
+def test_psi0_similarity():
+    features = np.array([[1.0, 10.0], [1.1, 11.0], [-1.0, -10.0], [np.nan, np.nan]])
+    similarity = psi0_similarity(features, np.array([True, False, False, False]))
+
+    assert similarity[0] == pytest.approx(1.0)
+    assert similarity[1] > 0.9
+    assert similarity[2] < -0.9
+    assert similarity[3] == 0.0
+
+def test_phi0_collapse_is_capped_and_thresholded():
+    result = phi0_collapse(np.array([-5.0, 0.0, 5.0]), np.array([0.0, 1.5, 1.5]))
+
+    assert result["phi0_total"].max() <= 5.0
+    assert list(result["collapse_zone"]) == [False, True, True]
+
+def test_connector_collapse_grid():
+    connector = EnhancedEarthEngineConnector()
+    points = connector.create_grid(-10.02, -63.02, -9.98, -62.98, resolution=0.01)
+    results = connector.collapse_grid(points, seed_site=SITES[0], chunk_size=len(points))
+
+    assert len(results) == len(points)
+    assert all(result["success_ratio"] > 0 for result in results)
+    for result in results:
+        assert 0.0 <= result["phi0_total"] <= 5.0
+        assert result["collapse_zone"] == (result["phi0_total"] >= 3.5)
+    # The configured lidar sites are far away: no boost
+    assert all(result["boost"] == 0.0 for result in results)
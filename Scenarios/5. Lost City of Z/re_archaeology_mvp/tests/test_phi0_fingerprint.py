@@ -0,0 +1,103 @@
+"""
+φ⁰ result fingerprints (resonance_calculation/fingerprint.py) in the calculate endpoint
+"""
+
+import pytest
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point
+
+from backend.api.routers import phi0_results
+from backend.core.contradiction_detection.detector import ContradictionDetector
+from backend.core.resonance_calculation.calculator import ResonanceCalculator
+from backend.models.database import EnvironmentalData, GridCell, Phi0Result
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+class FakeSession:
+    """Session holding one row per model; filters are ignored"""
+
+    def __init__(self, *rows):
+        self.rows = {type(row): row for row in rows}
+        self.commits = 0
+
+    def query(self, model):
+        return FakeQuery([self.rows[model]] if model in self.rows else [])
+
+    def add(self, row):
+        self.rows[type(row)] = row
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def refresh(self, row):
+        pass
+
+class CountingDetector(ContradictionDetector):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def detect_all_contradictions(self, cell_data):
+        self.calls += 1
+        return super().detect_all_contradictions(cell_data)
+
+@pytest.fixture
+def session():
+    cell = GridCell(id=1, cell_id="cell-0", centroid=from_shape(Point(-63.0, -10.0), srid=4326))
+    env_data = EnvironmentalData(cell_id="cell-0", ndvi_mean=0.8, ndvi_std=0.05, canopy_height_mean=5.0,
+                                 canopy_height_std=1.0, elevation_mean=120.0, elevation_std=3.0,
+                                 slope_mean=2.0, slope_std=0.5, water_proximity=200.0, raw_data={})
+    return FakeSession(cell, env_data)
+
+def calculate(db, detector, calculator):
+    results, failed, cache_stats = phi0_results._calculate_cells(db, ["cell-0"], detector, calculator)
+    assert not failed
+    return results, cache_stats
+
+def test_unchanged_inputs_are_not_recalculated(session):
+    detector = CountingDetector()
+    # Without a session the calculator loads no attractors
+    calculator = ResonanceCalculator(None)
+
+    results, stats = calculate(session, detector, calculator)
+    assert stats == {"hits": 0, "misses": 1}
+    stored = session.rows[Phi0Result]
+    assert stored.fingerprint and results == [stored]
+
+    commits = session.commits
+    results, stats = calculate(session, detector, calculator)
+
+    assert stats == {"hits": 1, "misses": 0}
+    assert results == [stored]
+    assert detector.calls == 1
+    assert session.commits == commits
+
+@pytest.mark.parametrize("change", ["environmental_data", "attractors", "scoring"])
+def test_changed_inputs_are_recalculated(session, change):
+    detector = CountingDetector()
+    calculator = ResonanceCalculator(None)
+    calculate(session, detector, calculator)
+    fingerprint = session.rows[Phi0Result].fingerprint
+
+    if change == "environmental_data":
+        session.rows[EnvironmentalData].ndvi_mean = 0.75
+    elif change == "attractors":
+        calculator.attractor_version = "another attractor set"
+    else:
+        calculator.type_modifiers = dict(calculator.type_modifiers, water_proximity=0.2)
+    _, stats = calculate(session, detector, calculator)
+
+    assert stats == {"hits": 0, "misses": 1}
+    assert detector.calls == 2
+    assert session.rows[Phi0Result].fingerprint != fingerprint
@@ -0,0 +1,72 @@
+"""
+Pixel-array zonal statistics (backend/data_processors/earth_engine/pixels.py)
+"""
+
+import os
+import glob
+import math
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import Polygon
+
+import ee
+from backend.data_processors.earth_engine.pixels import PixelArrayReducer, METERS_PER_DEGREE
+from backend.data_processors.earth_engine.cache import band_reduction
+
+from conftest import FIXTURE_DIR
+
+PIXEL_TILES = os.path.join(FIXTURE_DIR, "pixel_tiles")
+SCALE = 30
+
+def square(lon: float, lat: float, size: float):
+    return [[[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]]
+
+# Cells of the recorded tile (tests/fixtures/pixel_tiles, recorded from the fake backend)
+RECORDED_CELLS = {
+    "a": square(-63.4, -10.0, 0.003),
+    "b": square(-63.397, -10.0, 0.003),
+    "c": square(-63.4, -9.997, 0.003)
+}
+ELEVATION = [band_reduction("elevation", "USGS/SRTMGL1_003", "select(elevation)", ("mean", "stdDev", "min"), SCALE)]
+
+def test_replayed_tile_matches_bincount():
+    reducer = PixelArrayReducer(tile_pixels=64, fixture_dir=PIXEL_TILES, fixture_mode="replay")
+    results = reducer.zonal_statistics(None, RECORDED_CELLS, ELEVATION, SCALE)
+    
+    # The whole chunk fits in the one recorded tile, on the pixel-snapped grid
+    (path,) = glob.glob(os.path.join(PIXEL_TILES, "*.npz"))
+    with np.load(path) as recorded:
+        values = recorded["elevation"]
+    pixel_size = SCALE / METERS_PER_DEGREE
+    x0 = math.floor(-63.4 / pixel_size) * pixel_size
+    y0 = math.ceil(-9.994 / pixel_size) * pixel_size
+    height, width = values.shape
+    lon, lat = np.meshgrid(x0 + (np.arange(width) + 0.5) * pixel_size, y0 - (np.arange(height) + 0.5) * pixel_size)
+    
+    labels = np.full(values.shape, -1)
+    for index, coords in enumerate(RECORDED_CELLS.values()):
+        labels[shapely.contains_xy(Polygon(coords[0]), lon, lat)] = index
+    inside = labels >= 0
+    count = np.bincount(labels[inside], minlength=3)
+    mean = np.bincount(labels[inside], weights=values[inside], minlength=3) / count
+    squares = np.bincount(labels[inside], weights=values[inside] ** 2, minlength=3) / count
+    
+    assert count.min() > 0
+    for index, cell_id in enumerate(RECORDED_CELLS):
+        assert results[cell_id]["elevation_mean"] == pytest.approx(mean[index])
+        assert results[cell_id]["elevation_stdDev"] == pytest.approx(np.sqrt(squares[index] - mean[index] ** 2))
+        assert results[cell_id]["elevation_min"] == pytest.approx(values[labels == index].min())
+
+def test_tiles_without_cells_are_not_fetched(round_trips):
+    cells = {"west": square(-63.5, -10.2, 0.003), "east": square(-63.0, -9.7, 0.003)}
+    image = ee.Image("USGS/SRTMGL1_003").select("elevation")
+    reducer = PixelArrayReducer(tile_pixels=64, fixture_dir="", fixture_mode="")
+    
+    results = reducer.zonal_statistics(image, cells, ELEVATION, SCALE)
+    
+    # The bounding box spans about 30 x 30 tiles; only the (at most four) tiles under each cell are fetched
+    assert round_trips() <= 8
+    for cell_id, coords in cells.items():
+        alone = reducer.zonal_statistics(image, {cell_id: coords}, ELEVATION, SCALE)[cell_id]
+        assert results[cell_id] == pytest.approx(alone)
@@ -0,0 +1,95 @@
+"""
+Contradiction rule registry (contradiction_detection/rules.py) against the rules it replaced
+"""
+
+import numpy as np
+import pytest
+
+from backend.core.contradiction_detection.rules import RuleRegistry, compile_expression
+
+@pytest.mark.parametrize("source", [
+    "ndvi_mean.real",                      # attribute access
+    "np.exp(ndvi_mean)",
+    "ndvi_mean.__class__",
+    "eval('1')",                           # calls outside the whitelist
+    "__import__('os')",
+    "clip(ndvi_mean, a_min=0, a_max=1)",   # keyword arguments
+    "(lambda x: x)(ndvi_mean)",
+    "ndvi_mean[0]",                        # subscripts
+    "__builtins__",                        # dunder names
+    "__class__ + 1",
+    "[x for x in ndvi_mean]",
+    "'text'",
+    "True"
+])
+def test_unsafe_expressions_are_rejected(source):
+    with pytest.raises(ValueError):
+        compile_expression(source)
+
+def test_expressions_are_vectorized():
+    expression, names = compile_expression("50 < d < 500 and not (x > 1 or -x > 1)")
+    result = expression({"d": np.array([10.0, 100.0, 100.0, np.nan]), "x": np.array([0.0, 0.5, 2.0, 0.0])})
+
+    assert names == ["d", "x"]
+    assert list(result) == [False, True, False, False]
+
+def test_modifiers_match_the_hard_coded_values():
+    modifiers = RuleRegistry.from_file().modifiers
+
+    # The φ⁰ modifiers ResonanceCalculator used to add per contradiction type
+    assert modifiers["geometric_pattern"] == 0.15
+    assert modifiers["water_proximity"] == 0.1
+    assert modifiers["ndvi_canopy"] == 0.0
+
+def ndvi_canopy(ndvi, canopy_height):
+    """The detector's former detect_ndvi_canopy_contradiction"""
+    if ndvi > 0.7 and canopy_height < 10.0:
+        return True, min(ndvi, 1.0) * (1.0 - (canopy_height / 10.0))
+    elif ndvi < 0.3 and canopy_height > 20.0:
+        return True, (1.0 - min(ndvi, 1.0)) * (canopy_height / 30.0)
+    return False, 0.0
+
+def water_proximity(water_proximity, elevation, slope):
+    """The detector's former detect_water_proximity_contradiction"""
+    if 50 < water_proximity < 500 and elevation > 5.0 and slope < 10.0:
+        return True, (1.0 - (water_proximity / 500.0)) * min(elevation / 20.0, 1.0) * (1.0 - (slope / 10.0))
+    return False, 0.0
+
+def test_rules_match_the_hard_coded_detection():
+    rng = np.random.default_rng(0)
+    n = 2000
+    features = {
+        "ndvi_mean": rng.uniform(0.0, 1.0, n),
+        "canopy_height_mean": rng.uniform(0.0, 40.0, n),
+        "water_proximity": rng.uniform(0.0, 800.0, n),
+        "elevation_mean": rng.uniform(0.0, 40.0, n),
+        "slope_mean": rng.uniform(0.0, 20.0, n)
+    }
+    results = RuleRegistry.from_file().evaluate(features)
+
+    expected = [ndvi_canopy(*values) for values in zip(features["ndvi_mean"], features["canopy_height_mean"])]
+    detected, strength = results["ndvi_canopy"]
+    assert list(detected) == [found for found, _ in expected]
+    assert strength == pytest.approx([value for _, value in expected])
+
+    expected = [water_proximity(*values) for values in zip(
+        features["water_proximity"], features["elevation_mean"], features["slope_mean"]
+    )]
+    detected, strength = results["water_proximity"]
+    assert list(detected) == [found for found, _ in expected]
+    assert strength == pytest.approx([value for _, value in expected])
+    assert detected.any()
+
+def test_missing_features_never_match():
+    results = RuleRegistry.from_file().evaluate({"ndvi_mean": [0.9], "canopy_height_mean": [2.0]})
+
+    assert results["ndvi_canopy"][0][0]
+    assert not any(detected[0] for rule, (detected, _) in results.items() if rule != "ndvi_canopy")
+
+def test_parameter_grid_broadcasts():
+    registry = RuleRegistry.from_file()
+    features = {"ndvi_mean": np.array([0.2, 0.25, 0.35]), "canopy_height_mean": np.array([25.0, 25.0, 25.0])}
+    detected, _ = registry.evaluate(features, {"ndvi_canopy_low_ndvi": np.array([[0.3], [0.22]])})["ndvi_canopy"]
+
+    assert detected.shape == (2, 3)
+    assert detected.tolist() == [[True, True, False], [True, False, False]]
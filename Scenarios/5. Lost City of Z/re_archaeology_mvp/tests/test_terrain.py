@@ -0,0 +1,98 @@
+"""
+Terrain stage (terrain.py) on synthetic DEMs with known slope, aspect and anomaly
+"""
+
+import math
+import numpy as np
+import pytest
+
+from backend.data_processors.earth_engine.cache import band_reduction
+from backend.data_processors.earth_engine.pixels import METERS_PER_DEGREE
+from backend.data_processors.earth_engine.terrain import TerrainStage, window_pixels
+
+SCALE = 30
+PIXEL_SIZE = SCALE / METERS_PER_DEGREE
+
+def square(lon: float, lat: float, size: float):
+    return [[[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]]
+
+class SyntheticDEM:
+    """Stands in for PixelArrayReducer: serves elevation(lon, lat) at the pixel centres of each requested tile"""
+
+    def __init__(self, elevation, tile_pixels: int = 96):
+        self.elevation = elevation
+        self.tile_pixels = tile_pixels
+        self.fetched = []
+
+    def fetch_tile(self, image, bands, reductions, x0, y0, pixel_size, width, height):
+        self.fetched.append((x0, y0))
+        lon, lat = np.meshgrid(x0 + (np.arange(width) + 0.5) * pixel_size, y0 - (np.arange(height) + 0.5) * pixel_size)
+        return {"elevation": self.elevation(lon, lat)}
+
+def plane(east_gradient: float, north_gradient: float, lat0: float = -10.0):
+    """Plane rising east_gradient and north_gradient meters per meter"""
+    meters_east = METERS_PER_DEGREE * math.cos(math.radians(lat0))
+    return lambda lon, lat: 100.0 + east_gradient * lon * meters_east + north_gradient * lat * METERS_PER_DEGREE
+
+def stage(elevation, **kwargs) -> TerrainStage:
+    return TerrainStage(scale=SCALE, cached_tiles=4, anomaly_windows=(25, 300), pixel_reducer=SyntheticDEM(elevation, **kwargs))
+
+def terrain_reductions():
+    return [band_reduction(band, "USGS/SRTMGL1_003", band, ("mean",), SCALE)
+            for band in ("elevation", "slope", "aspect", "elevation_anomaly")]
+
+@pytest.mark.parametrize("east, north, aspect", [
+    (0.1, 0.0, 270.0),   # Rising eastward: downslope faces west
+    (0.0, 0.1, 180.0),   # Rising northward: faces south
+    (-0.05, -0.05, 45.0)
+])
+def test_plane_slope_and_aspect(east, north, aspect):
+    terrain = stage(plane(east, north))
+    results = terrain.cell_statistics({"cell": square(-63.4, -10.0, 0.005)}, terrain_reductions())["cell"]
+
+    assert results["slope_mean"] == pytest.approx(math.degrees(math.atan(math.hypot(east, north))), rel=1e-3)
+    assert results["aspect_mean"] == pytest.approx(aspect, abs=0.1)
+    # The mean of a plane over a centred window is its value at the centre
+    assert results["elevation_anomaly_mean"] == pytest.approx(0.0, abs=1e-6)
+
+def test_block_anomaly():
+    lon0, lat0 = -63.4, -10.0
+    height = 20.0
+
+    def block(lon, lat):
+        inside = (np.abs(lon - lon0) < 3 * PIXEL_SIZE) & (np.abs(lat - lat0) < 3 * PIXEL_SIZE)
+        return np.where(inside, 100.0 + height, 100.0)
+
+    terrain = stage(block)
+    value = terrain.point_values({"centre": (lat0, lon0)}, {"anomaly": ("elevation_anomaly", 0)})["centre"]["anomaly"]
+
+    # The local window is one pixel; the context window of the 300 m buffer holds the 6x6 block
+    tile = terrain.tile(next(iter(terrain.tiles)))
+    rows = window_pixels(300, tile.pixel_height)
+    cols = window_pixels(300, tile.mean_pixel_width)
+    assert value == pytest.approx(height - height * 36 / (rows * cols))
+
+def test_only_tiles_with_cells_are_fetched():
+    terrain = stage(plane(0.1, 0.0))
+    cells = {"west": square(-63.5, -10.2, 0.003), "east": square(-63.0, -9.7, 0.003)}
+
+    results = terrain.cell_statistics(cells, terrain_reductions())
+
+    # The bounding box spans hundreds of tiles; each cell needs at most four
+    assert len(terrain.pixel_reducer.fetched) <= 8
+    for cell_id, coords in cells.items():
+        alone = stage(plane(0.1, 0.0)).cell_statistics({cell_id: coords}, terrain_reductions())[cell_id]
+        assert results[cell_id] == pytest.approx(alone)
+
+def test_window_tiles_stay_cached():
+    terrain = stage(plane(0.1, 0.0))
+    cells = {f"cell-{i}": square(-63.4 + 0.03 * i, -10.0, 0.003) for i in range(10)}
+
+    assert terrain.plan_window(cells) > terrain.cached_tiles
+    for cell_id, coords in cells.items():
+        terrain.cell_statistics({cell_id: coords}, terrain_reductions())
+    fetched = len(terrain.pixel_reducer.fetched)
+    for cell_id, coords in cells.items():
+        terrain.cell_statistics({cell_id: coords}, terrain_reductions())
+
+    assert len(terrain.pixel_reducer.fetched) == fetched
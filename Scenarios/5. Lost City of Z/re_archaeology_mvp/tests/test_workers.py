@@ -0,0 +1,305 @@
+"""
+Celery worker tier (backend.workers) on the in-memory broker
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.database import get_db
+from backend.api.routers import earth_engine as router_module
+from backend.data_processors.earth_engine import pipeline as pipeline_module
+from backend.data_processors.earth_engine.ndvi_processor import NDVIProcessor
+from backend.data_processors.earth_engine.pipeline import EarthEnginePipeline
+from backend.models.database import DataProcessingTask, GridCell
+from backend.workers import tasks
+from backend.workers.celery_app import celery_app, EARTH_ENGINE_QUEUE
+
+def square(lon: float, lat: float, size: float):
+    return [[[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]]
+
+CELLS = {f"cell-{i}": square(-63.4 + 0.01 * i, -10.0, 0.005) for i in range(4)}
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return list(self.rows)
+
+class FakeSession:
+    """Session holding the rows of each model; filters are ignored, added rows get IDs on refresh"""
+
+    def __init__(self, *rows):
+        self.rows = {}
+        for row in rows:
+            self.rows.setdefault(type(row), []).append(row)
+        self.closed = False
+
+    def query(self, model):
+        return FakeQuery(self.rows.get(model, []))
+
+    def add(self, row):
+        self.rows.setdefault(type(row), []).append(row)
+
+    def refresh(self, row):
+        if row.id is None:
+            row.id = sum(len(rows) for rows in self.rows.values())
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+class WorkerLost(BaseException):
+    """Raised to stop a job the way a lost worker would, past all exception handlers"""
+
+@pytest.fixture
+def worker(monkeypatch):
+    """Jobs store their outcome in a fake Redis and run without the agent model"""
+    redis_client = FakeRedis()
+    monkeypatch.setattr(tasks, "_redis", lambda: redis_client)
+    monkeypatch.setattr(tasks, "_agent_model", lambda db: None)
+    return redis_client
+
+@pytest.fixture
+def broker(monkeypatch):
+    """Send jobs to the in-memory broker instead of running them; call the fixture's value to read them"""
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", False)
+    with celery_app.connection_for_write() as connection:
+        queue = connection.SimpleQueue(EARTH_ENGINE_QUEUE)
+        queue.clear()
+
+        def messages():
+            received = []
+            while True:
+                try:
+                    message = queue.get(block=False)
+                except queue.Empty:
+                    return received
+                message.ack()
+                received.append((message.headers["task"], message.payload[0]))
+
+        yield messages
+        queue.close()
+
+def api_client(session: FakeSession) -> TestClient:
+    app = FastAPI()
+    app.include_router(router_module.router)
+    app.dependency_overrides[get_db] = lambda: session
+    return TestClient(app)
+
+def failed_region_task() -> DataProcessingTask:
+    return DataProcessingTask(id=7, task_type="region_processing", status="failed",
+                              params={"bounding_box": [-63.5, -10.1, -63.3, -9.9]},
+                              results={"total_cells": 4, "processed_cells": 2})
+
+# (request, rows in the database, enqueued job, its arguments given the task ID)
+ENDPOINTS = [
+    (("post", "/earth-engine/process-region", {"json": {"bounding_box": {"min_lon": -63.5, "min_lat": -10.1, "max_lon": -63.3, "max_lat": -9.9}}}),
+     [], "earth_engine.process_region", lambda task_id: [task_id]),
+    (("post", "/earth-engine/process-cells", {"json": {"cell_ids": ["cell-0"]}}),
+     [GridCell(id=1, cell_id="cell-0")], "earth_engine.process_cells", lambda task_id: [task_id]),
+    (("post", "/earth-engine/process-cell/cell-0", {}),
+     [GridCell(id=1, cell_id="cell-0")], "earth_engine.process_cell", lambda task_id: ["cell-0", task_id]),
+    (("post", "/earth-engine/task/7/resume", {"params": {"ee_request_budget": 50}}),
+     [failed_region_task()], "earth_engine.resume_task", lambda task_id: [task_id, 50])
+]
+
+@pytest.mark.parametrize("request_args, rows, job, job_args", ENDPOINTS)
+def test_endpoint_enqueues_and_returns_queued(request_args, rows, job, job_args, broker, worker, monkeypatch):
+    method, path, kwargs = request_args
+    session = FakeSession(*rows)
+    monkeypatch.setattr(router_module, "redis_client", FakeRedis())
+
+    def not_in_the_api_process(*args, **kwargs):
+        raise AssertionError("the job ran in the API process")
+
+    monkeypatch.setattr(tasks, "EarthEnginePipeline", not_in_the_api_process)
+
+    response = getattr(api_client(session), method)(path, **kwargs)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["status"] == "queued"
+    assert broker() == [(job, job_args(body["task_id"]))]
+    # The task record is left for the worker
+    task = session.query(DataProcessingTask).first()
+    assert task.id == body["task_id"]
+    assert task.status in ("queued", "failed")
+
+@pytest.mark.parametrize("status", ["running", "queued"])
+def test_resume_refuses_a_task_with_a_job(status, broker, monkeypatch):
+    task = failed_region_task()
+    task.status = status
+    redis_client = FakeRedis()
+    redis_client.values["earth_engine:task:7"] = "{}"
+    monkeypatch.setattr(router_module, "redis_client", redis_client)
+    client = api_client(FakeSession(task))
+
+    response = client.post("/earth-engine/task/7/resume")
+
+    assert response.status_code == 409
+    assert broker() == []
+    assert "earth_engine:task:7" in redis_client.values
+    # A task whose worker was lost can still be resumed
+    assert client.post("/earth-engine/task/7/resume", params={"force": True}).status_code == 200
+    assert broker() == [("earth_engine.resume_task", [7, None])]
+
+def test_process_region_task_opens_and_closes_its_session(worker, monkeypatch):
+    sessions = []
+    pipelines = []
+
+    def session_local():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    class RecordingPipeline:
+        def __init__(self, db, agent_model=None):
+            self.db = db
+            pipelines.append(self)
+
+        def run_task(self, task_id):
+            assert not self.db.closed
+            return {"task_id": task_id, "total_cells": 0, "processed_cells": 0}
+
+    monkeypatch.setattr(tasks, "SessionLocal", session_local)
+    monkeypatch.setattr(tasks, "EarthEnginePipeline", RecordingPipeline)
+
+    summary = tasks.process_region_task.delay(3).get()
+
+    assert summary == {"task_id": 3, "status": "completed", "total_cells": 0, "processed_cells": 0}
+    assert len(sessions) == 1
+    assert sessions[0].closed
+    assert pipelines[0].db is sessions[0]
+    assert "processed_cells" in worker.get("earth_engine:task:3")
+
+def test_failed_job_closes_its_session(worker, monkeypatch):
+    sessions = []
+
+    def session_local():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    class FailingPipeline:
+        def __init__(self, db, agent_model=None):
+            pass
+
+        def run_task(self, task_id):
+            raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(tasks, "SessionLocal", session_local)
+    monkeypatch.setattr(tasks, "EarthEnginePipeline", FailingPipeline)
+
+    with pytest.raises(RuntimeError):
+        tasks.process_region_task.delay(3)
+
+    assert len(sessions) == 1
+    assert sessions[0].closed
+    assert "connection lost" in worker.get("earth_engine:task:3")
+
+def test_redelivered_task_resumes_from_checkpoints(worker, monkeypatch):
+    """A job delivered again after its worker was lost only processes the cells not checkpointed yet"""
+    task = DataProcessingTask(id=5, task_type="batch_processing", status="queued",
+                              params={"cell_ids": list(CELLS), "data_sources": ["ndvi"], "prioritize": False})
+    # Successful (cell, source) checkpoints of the task
+    checkpoints = set()
+    lose_worker_after = [2]
+
+    class LosingCheckpointWriter:
+        """Commits every outcome at once; the worker is lost after lose_worker_after outcomes"""
+
+        def __init__(self, db, task, results, **kwargs):
+            self.rows = []
+
+        def add(self, cell_id, source, success, data=None, error_message=None):
+            if success:
+                checkpoints.add((cell_id, source))
+            if lose_worker_after and len(checkpoints) >= lose_worker_after[0]:
+                lose_worker_after.pop()
+                raise WorkerLost()
+
+        def flush(self):
+            pass
+
+    class DiscardingWriter:
+        pending = []
+
+        def __init__(self, db, autocommit=True):
+            pass
+
+        def add(self, source, data):
+            pass
+
+        def discard(self):
+            return 0
+
+    def completed_sources(db, task_id, cell_ids=None):
+        completed = {}
+        for cell_id, source in checkpoints:
+            completed.setdefault(cell_id, set()).add(source)
+        return completed
+
+    monkeypatch.setattr(tasks, "SessionLocal", lambda: FakeSession(task))
+    monkeypatch.setattr(pipeline_module, "CheckpointWriter", LosingCheckpointWriter)
+    monkeypatch.setattr(pipeline_module, "EnvironmentalDataWriter", DiscardingWriter)
+    monkeypatch.setattr(pipeline_module, "completed_sources", completed_sources)
+    monkeypatch.setattr(pipeline_module, "count_completed", lambda db, task_id, sources: len(checkpoints))
+    monkeypatch.setattr(pipeline_module, "load_cell_polygons", lambda db, cell_ids: {cell_id: CELLS[cell_id] for cell_id in cell_ids})
+    monkeypatch.setattr(EarthEnginePipeline, "_request_budget", lambda self, task, results: None)
+
+    runs = []
+    run_task = EarthEnginePipeline.run_task
+
+    def recording_run_task(self, task_id):
+        runs.append(task_id)
+        return run_task(self, task_id)
+
+    monkeypatch.setattr(EarthEnginePipeline, "run_task", recording_run_task)
+
+    requested = []
+    calculate = NDVIProcessor.calculate_ndvi_for_cells
+
+    def recording_calculate(self, cell_ids, *args, **kwargs):
+        requested.append(list(cell_ids))
+        return calculate(self, cell_ids, *args, **kwargs)
+
+    monkeypatch.setattr(NDVIProcessor, "calculate_ndvi_for_cells", recording_calculate)
+
+    with pytest.raises(WorkerLost):
+        tasks.process_cells_task.delay(task.id)
+    assert task.status == "running"
+    assert len(checkpoints) == 2
+
+    # Delivered again: the acknowledgement was never sent
+    summary = tasks.process_cells_task.delay(task.id).get()
+
+    assert runs == [task.id, task.id]
+    assert requested[-1] == ["cell-2", "cell-3"]
+    assert summary["status"] == "completed"
+    assert summary["processed_cells"] == len(CELLS)
+    assert task.results["resumed_sources"] == 2
+    assert checkpoints == {(cell_id, "ndvi") for cell_id in CELLS}
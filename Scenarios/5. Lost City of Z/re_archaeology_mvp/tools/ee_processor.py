@@ -24,6 +24,7 @@ from typing import Dict, List, Any, Optional
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.data_processors.earth_engine.pipeline import EarthEnginePipeline
+from backend.data_processors.earth_engine.adaptive_scan import AdaptiveQuadtreeScanner
 from backend.core.agent_self_model.model import REAgentSelfModel
 from backend.models.database import Base
 
@@ -157,6 +158,49 @@ def process_cells(args):
     finally:
         session.close()
 
+def adaptive_scan(args):
+    """Scan a region coarse to fine, refining only the interesting cells"""
+    session = setup_database()
+    
+    try:
+        # Parse bounding box
+        try:
+            bbox = [float(x) for x in args.bbox.split(',')]
+            if len(bbox) != 4:
+                raise ValueError("Bounding box must have 4 values: min_lon,min_lat,max_lon,max_lat")
+        except Exception as e:
+            logger.error(f"Failed to parse bounding box: {e}")
+            return
+        
+        # Scan region
+        logger.info(f"Adaptive scan of region {bbox}")
+        scanner = AdaptiveQuadtreeScanner(session)
+        result = scanner.scan(
+            min_lat=bbox[1],
+            min_lon=bbox[0],
+            max_lat=bbox[3],
+            max_lon=bbox[2],
+            include_fractal=args.include_fractal,
+            chunk_size=args.chunk_size
+        )
+        
+        # Print result summary
+        print(f"Adaptive scan complete!")
+        for level in result["levels"]:
+            print(f"Level {level['level']} ({level['size_degrees']}°): "
+                  f"{level['cells']} cells, {level['above_threshold']} above threshold")
+        print(f"Candidates: {len(result['candidates'])}")
+        print(f"Extracted points: {result['extracted_points']} (uniform grid: {result['uniform_points']})")
+        
+        # Save detailed results if output file specified
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+            print(f"Detailed results saved to {args.output}")
+            
+    finally:
+        session.close()
+
 def check_status(args):
     """Check Earth Engine connection status"""
     session = setup_database()
@@ -197,6 +241,13 @@ def main():
     cells_parser.add_argument('--sources', help='Data sources to process (comma-separated): ndvi,canopy,terrain,water')
     cells_parser.add_argument('--output', help='Output file to save detailed results (JSON)')
     
+    # Adaptive scan command
+    scan_parser = subparsers.add_parser('adaptive-scan', help='Scan a region coarse to fine, refining only interesting cells')
+    scan_parser.add_argument('--bbox', required=True, help='Bounding box in format: min_lon,min_lat,max_lon,max_lat')
+    scan_parser.add_argument('--include-fractal', action='store_true', help='Also extract FractalNDVI (one more request per chunk)')
+    scan_parser.add_argument('--chunk-size', type=int, help='Points per Earth Engine request')
+    scan_parser.add_argument('--output', help='Output file to save detailed results (JSON)')
+    
     args = parser.parse_args()
     
     if args.command == 'status':
@@ -205,6 +256,8 @@ def main():
         process_region(args)
     elif args.command == 'process-cells':
         process_cells(args)
+    elif args.command == 'adaptive-scan':
+        adaptive_scan(args)
     else:
         parser.print_help()
 